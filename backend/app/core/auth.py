@@ -1,21 +1,185 @@
 """
 Authentication dependencies for FastAPI.
 """
+import hashlib
+import hmac
+import os
+import secrets
 from fastapi import Depends, HTTPException, status
-from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from typing import Optional
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBasic, HTTPBasicCredentials, HTTPBearer
+from typing import Any, Dict, Optional
 
 from app.models.user import UserDB
-from app.db.data import u_c
-from app.core.password import verify_password
+from app.db.async_data import u_c
+from app.core.cache import TTLCache
+from app.core.password import PasswordPoolSaturated, verify_password_async
+from app.core.token import TokenError, decode_token
+
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "1024"))     # Max cached verifications (0 disables)
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "300"))      # Seconds a verification stays valid
+AUTH_IDENTITY_CACHE_SIZE = int(os.getenv("AUTH_IDENTITY_CACHE_SIZE", "1024"))  # Max cached login names (0 disables)
+AUTH_IDENTITY_CACHE_TTL = float(os.getenv("AUTH_IDENTITY_CACHE_TTL", "60"))    # Bounds staleness across workers
 
 security = HTTPBasic()
+optional_basic_security = HTTPBasic(auto_error=False)
+bearer_security = HTTPBearer(auto_error=False)
+
+# Successful bcrypt verifications, keyed on a keyed hash of the credentials and
+# the stored hash so that plain-text passwords are never held in memory and a
+# password change naturally misses. Values are the owning user ID.
+_credential_key = secrets.token_bytes(32)
+credential_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+
+# Login name (username or email), or ("id", user ID) for bearer tokens -> resolved
+# user, so the common request does no Mongo work to identify its caller.
+identity_cache = TTLCache(maxsize=AUTH_IDENTITY_CACHE_SIZE, ttl=AUTH_IDENTITY_CACHE_TTL)
+
+# Only the fields needed to authenticate and build a UserDB
+AUTH_PROJECTION = {"_id": 0, **{field: 1 for field in UserDB.model_fields}}
+
 
-async def get_current_user(credentials: HTTPBasicCredentials = Depends(security)) -> UserDB:
+def _credential_digest(username: str, password: str, hashed_password: str) -> bytes:
     """
-    Get the currently authenticated user.
-    
-    Uses HTTP Basic Authentication to validate the user.
+    Derive the cache key for a set of credentials.
+
+    Args:
+        username (str): Login name as supplied by the client.
+        password (str): Plain-text password as supplied by the client.
+        hashed_password (str): Stored bcrypt hash for the user.
+
+    Returns:
+        bytes: HMAC-SHA256 digest identifying the verification.
+    """
+    message = "\0".join((username, password, hashed_password)).encode("utf-8")
+    return hmac.new(_credential_key, message, hashlib.sha256).digest()
+
+
+async def find_user_by_login(login: str) -> Optional[UserDB]:
+    """
+    Resolve a login name to a user, preferring a username match over an email match.
+
+    Served from the identity cache when possible; otherwise a single `$or`
+    query fetches both candidates in one round trip.
+
+    Args:
+        login (str): Username or email address supplied by the client.
+
+    Returns:
+        Optional[UserDB]: The matching user, or None if there is none.
+    """
+    user = identity_cache.get(login)
+    if user is not None:
+        return user
+
+    candidates = await u_c.find(
+        {"$or": [{"username": login}, {"email": login}]}, AUTH_PROJECTION
+    ).limit(2).to_list(None)
+    if not candidates:
+        return None
+
+    document = next((c for c in candidates if c.get("username") == login), candidates[0])
+    user = UserDB(**document)
+    identity_cache.set(login, user)
+    return user
+
+
+async def find_user_by_id(user_id: str) -> Optional[UserDB]:
+    """
+    Resolve a user ID to a user, served from the identity cache when possible.
+
+    Args:
+        user_id (str): ID of the user.
+
+    Returns:
+        Optional[UserDB]: The user, or None if there is none.
+    """
+    key = ("id", user_id)
+    user = identity_cache.get(key)
+    if user is not None:
+        return user
+
+    document = await u_c.find_one({"id": user_id}, AUTH_PROJECTION)
+    if not document:
+        return None
+
+    user = UserDB(**document)
+    identity_cache.set(key, user)
+    return user
+
+
+async def check_credentials(username: str, password: str, user: UserDB) -> bool:
+    """
+    Verify a password against a user, consulting the credential cache first.
+
+    Args:
+        username (str): Login name as supplied by the client.
+        password (str): Plain-text password as supplied by the client.
+        user (UserDB): User holding the stored password hash.
+
+    Returns:
+        bool: (True: Credentials are valid); (False: Credentials are invalid).
+
+    Raises:
+        PasswordPoolSaturated: If the password pool cannot accept more work.
+    """
+    key = _credential_digest(username, password, user.hashed_password)
+    if credential_cache.get(key) == user.id:
+        return True
+
+    if not await verify_password_async(password, user.hashed_password):
+        return False
+
+    credential_cache.set(key, user.id)
+    return True
+
+
+def invalidate_user(user_id: str) -> None:
+    """
+    Drop every cached identity and verification belonging to a user.
+
+    Must be called whenever a user's credentials, login names or status change.
+
+    Args:
+        user_id (str): ID of the user whose entries should be removed.
+    """
+    credential_cache.discard_where(lambda _, cached_id: cached_id == user_id)
+    identity_cache.discard_where(lambda _, cached_user: cached_user.id == user_id)
+
+
+def invalidate_logins(*logins: str) -> None:
+    """
+    Drop cached identities for login names that now resolve differently.
+
+    Args:
+        *logins (str): Usernames or email addresses to forget.
+    """
+    for login in logins:
+        identity_cache.pop(login)
+
+
+def auth_cache_stats() -> Dict[str, Any]:
+    """
+    Report credential cache counters.
+
+    Returns:
+        Dict[str, Any]: Hit/miss statistics for the verification cache.
+    """
+    return credential_cache.stats()
+
+
+def identity_cache_stats() -> Dict[str, Any]:
+    """
+    Report identity cache counters.
+
+    Returns:
+        Dict[str, Any]: Hit/miss statistics for the login name cache.
+    """
+    return identity_cache.stats()
+
+
+async def authenticate_basic(credentials: HTTPBasicCredentials) -> UserDB:
+    """
+    Resolve HTTP Basic credentials to a user.
     
     Args:
         credentials: The HTTP Basic credentials from the request
@@ -32,23 +196,122 @@ async def get_current_user(credentials: HTTPBasicCredentials = Depends(security)
         headers={"WWW-Authenticate": "Basic"},
     )
     
-    # Try to find user by username
-    user = u_c.find_one({"username": credentials.username})
-    
-    # If not found, try by email
-    if not user:
-        user = u_c.find_one({"email": credentials.username})
+    # Find user by username or email
+    user = await find_user_by_login(credentials.username)
     
     # Check credentials
-    if not user or not verify_password(credentials.password, user["hashed_password"]):
+    try:
+        valid = user is not None and await check_credentials(credentials.username, credentials.password, user)
+    except PasswordPoolSaturated as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication is temporarily overloaded, retry shortly",
+            headers={"Retry-After": "1"},
+        ) from e
+    
+    if not valid:
         raise auth_exception
     
     # Check if user is active
-    if not user.get("active", True):  # Default to active if not specified
+    if not user.active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Inactive user account",
             headers={"WWW-Authenticate": "Basic"},
         )
     
-    return UserDB(**user)
+    return user
+
+
+async def get_basic_user(credentials: HTTPBasicCredentials = Depends(security)) -> UserDB:
+    """
+    Get the user authenticated by HTTP Basic credentials only.
+    
+    Used where a real password check is required, e.g. when issuing tokens.
+    
+    Args:
+        credentials: The HTTP Basic credentials from the request
+        
+    Returns:
+        UserDB: The authenticated user
+    """
+    return await authenticate_basic(credentials)
+
+
+async def get_token_user(credentials: HTTPAuthorizationCredentials = Depends(bearer_security)) -> UserDB:
+    """
+    Get the user authenticated by a signed bearer token.
+    
+    The signature proves who the caller is without a password hash. Whether
+    the account is still active, and its role, are read from the account
+    through the identity cache, so deactivation and role changes apply to
+    tokens already issued: at once on this worker, and on others within
+    `AUTH_IDENTITY_CACHE_TTL`.
+    
+    Args:
+        credentials: The bearer credentials from the request
+        
+    Returns:
+        UserDB: The user the token was issued to
+        
+    Raises:
+        HTTPException: If the token is missing, invalid or expired, or the account
+            is gone or inactive
+    """
+    if credentials is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    try:
+        claims = decode_token(credentials.credentials)
+    except TokenError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e),
+            headers={"WWW-Authenticate": "Bearer"},
+        ) from e
+    
+    user = await find_user_by_id(claims.get("sub"))
+    if user is None or not user.active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Inactive user account",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    return user
+
+
+async def get_current_user(
+    basic: Optional[HTTPBasicCredentials] = Depends(optional_basic_security),
+    bearer: Optional[HTTPAuthorizationCredentials] = Depends(bearer_security),
+) -> UserDB:
+    """
+    Get the currently authenticated user.
+    
+    Accepts either a bearer token issued by `/auth/token` or HTTP Basic credentials.
+    
+    Args:
+        basic: The HTTP Basic credentials from the request, if any
+        bearer: The bearer token from the request, if any
+        
+    Returns:
+        UserDB: The authenticated user
+        
+    Raises:
+        HTTPException: If authentication fails
+    """
+    if bearer is not None:
+        return await get_token_user(bearer)
+    
+    if basic is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Basic"},
+        )
+    
+    return await authenticate_basic(basic)
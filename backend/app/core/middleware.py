@@ -0,0 +1,62 @@
+"""
+ASGI middleware for the smart home API.
+"""
+import logging
+import os
+from typing import Optional
+
+from app.db.monitoring import begin_request, end_request, route_db_stats
+
+logger = logging.getLogger(__name__)
+
+# Expose per-request counts as response headers; only applies while DB_METRICS installs the middleware
+DB_METRICS_HEADERS = os.getenv("DB_METRICS_HEADERS", "false").lower() in ("1", "true", "yes")
+
+
+class DBMetricsMiddleware:
+    """
+    Counts & times the MongoDB commands each request issues.
+
+    Installed only when `DB_METRICS` is on, since that also registers the
+    command listener feeding it. Totals are aggregated per route for
+    `/metrics/`. With `DB_METRICS_HEADERS`, responses also carry `X-DB-Commands`,
+    `X-DB-Time-Ms` and `X-DB-Slowest`. Query shapes repeated more than
+    `DB_N_PLUS_ONE_THRESHOLD` times in one request are logged as warnings.
+    """
+    def __init__(self, app, headers: Optional[bool] = None):
+        self.app = app
+        self.headers = DB_METRICS_HEADERS if headers is None else headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats, token = begin_request()
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.extend([
+                    (b"x-db-commands", str(stats.commands).encode()),
+                    (b"x-db-time-ms", f"{stats.total_ms:.3f}".encode()),
+                ])
+                if stats.slowest:
+                    slowest = f"{stats.slowest_ms:.3f}ms {stats.slowest}"
+                    headers.append((b"x-db-slowest", slowest.encode("latin-1", "replace")[:512]))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers if self.headers else send)
+        finally:
+            end_request(token)
+            # The router records the matched route on the scope
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "<unmatched>"
+            label = f"{scope['method']} {path}"
+
+            repeated = stats.repeated_shapes()
+            for shape, count in repeated:
+                logger.warning("Possible N+1 query in %s: %r ran %d times", label, shape, count)
+            route_db_stats.record(label, stats, len(repeated))
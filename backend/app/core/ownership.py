@@ -0,0 +1,88 @@
+"""
+Caches of device ownership for authorizing usage requests.
+
+Every usage request from a regular user checks that the device belongs to the
+caller. `device_owner_cache` maps a device ID to its owner's user ID and
+`user_devices_cache` maps a user ID to the IDs of their devices, so that the
+ingestion hot path does no device lookup once a device has been seen.
+
+The device routes call `invalidate_device` whenever a device is created,
+updated or deleted. Other workers only learn of the change when their entries
+expire, so the TTLs bound how long a deleted device can keep receiving data.
+"""
+import os
+from typing import Any, Dict, Iterable, Optional
+
+from app.core.cache import TTLCache
+
+DEVICE_OWNER_CACHE_SIZE = int(os.getenv("DEVICE_OWNER_CACHE_SIZE", "10000"))   # Max cached devices (0 disables)
+DEVICE_OWNER_CACHE_TTL = float(os.getenv("DEVICE_OWNER_CACHE_TTL", "60"))      # Bounds staleness across workers
+USER_DEVICES_CACHE_SIZE = int(os.getenv("USER_DEVICES_CACHE_SIZE", "1024"))    # Max cached device lists (0 disables)
+USER_DEVICES_CACHE_TTL = float(os.getenv("USER_DEVICES_CACHE_TTL", "60"))
+
+# Device ID -> owning user ID. Unknown devices are not cached, so a device
+# created on another worker is usable immediately.
+device_owner_cache = TTLCache(maxsize=DEVICE_OWNER_CACHE_SIZE, ttl=DEVICE_OWNER_CACHE_TTL)
+
+# User ID -> tuple of the IDs of that user's devices
+user_devices_cache = TTLCache(maxsize=USER_DEVICES_CACHE_SIZE, ttl=USER_DEVICES_CACHE_TTL)
+
+
+def cached_owner(device_id: str) -> Optional[str]:
+    """
+    Look up a device's owner without touching the database.
+
+    Args:
+        device_id (str): ID of the device.
+
+    Returns:
+        Optional[str]: Owner's user ID, or None if not cached.
+    """
+    return device_owner_cache.get(device_id)
+
+
+def remember_owner(user_id: str, device_ids: Iterable[str]) -> None:
+    """
+    Record that a user owns the given devices.
+
+    Args:
+        user_id (str): ID of the owner.
+        device_ids (Iterable[str]): IDs of devices read from the database.
+    """
+    for device_id in device_ids:
+        device_owner_cache.set(device_id, user_id)
+
+
+def invalidate_device(device_id: str, *user_ids: Optional[str]) -> None:
+    """
+    Forget a device's owner and the device lists of the users involved.
+
+    Must be called whenever a device is created, deleted or changes owner.
+
+    Args:
+        device_id (str): ID of the device that changed.
+        *user_ids (Optional[str]): Previous and current owners; None is ignored.
+    """
+    device_owner_cache.pop(device_id)
+    for user_id in user_ids:
+        if user_id:
+            user_devices_cache.pop(user_id)
+
+
+def clear_ownership_caches() -> None:
+    """Drop every cached owner and device list."""
+    device_owner_cache.clear()
+    user_devices_cache.clear()
+
+
+def ownership_cache_stats() -> Dict[str, Any]:
+    """
+    Report ownership cache counters.
+
+    Returns:
+        Dict[str, Any]: Hit/miss statistics for the device owner and user device caches.
+    """
+    return {
+        "device_owner": device_owner_cache.stats(),
+        "user_devices": user_devices_cache.stats(),
+    }
@@ -0,0 +1,178 @@
+"""
+Keyset ("cursor") pagination for list endpoints.
+
+`skip(n)` makes MongoDB walk and discard `n` documents, so deep pages get
+linearly slower. List routes accept an opt-in `cursor` parameter instead: an
+empty `cursor` asks for the first page, and every full page answers with an
+opaque continuation token in the `X-Next-Cursor` header. The token holds the
+sort key values of the last document returned, always ending in the unique
+`id`, and the next page is read with a range predicate from there:
+
+    sort [("timestamp", -1), ("id", -1)], last document (t, x) ->
+    {"timestamp": {"$lte": t}, "$or": [{"timestamp": {"$lt": t}},
+                                       {"timestamp": t, "id": {"$lt": x}}]}
+
+The plain bound on the leading key gives the planner tight index bounds, so
+with an index on the sort keys page N costs the same as page 1.
+"""
+import base64
+import binascii
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from bson import json_util
+from fastapi import HTTPException, Response, status
+from pymongo import ASCENDING
+
+CURSOR_HEADER = "X-Next-Cursor"
+
+SortSpec = Sequence[Tuple[str, int]]
+
+
+class CursorError(ValueError):
+    """A continuation token that was not issued for this listing."""
+
+
+def keyset_sort(*keys: Tuple[str, int]) -> List[Tuple[str, int]]:
+    """
+    Sort keys completed with `id` as the tie-breaker.
+
+    Args:
+        *keys (Tuple[str, int]): Leading sort keys; none to sort by `id` alone.
+
+    Returns:
+        List[Tuple[str, int]]: The keys, then `id` in the direction of the last key.
+    """
+    direction = keys[-1][1] if keys else ASCENDING
+    return [key for key in keys if key[0] != "id"] + [("id", direction)]
+
+
+def encode_cursor(document: Dict[str, Any], sort: SortSpec) -> str:
+    """Continuation token pointing just past `document`."""
+    token = {"k": [list(key) for key in sort], "v": [document.get(field) for field, _ in sort]}
+    return base64.urlsafe_b64encode(json_util.dumps(token).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, sort: SortSpec) -> List[Any]:
+    """
+    Sort key values held by a continuation token.
+
+    Args:
+        token (str): Token from `encode_cursor`.
+        sort (SortSpec): Sort of the listing being continued.
+
+    Returns:
+        List[Any]: One value per sort key.
+
+    Raises:
+        CursorError: If the token is malformed or was issued for another sort.
+    """
+    try:
+        decoded = json_util.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (binascii.Error, ValueError, TypeError, UnicodeDecodeError, json.JSONDecodeError) as error:
+        raise CursorError("Malformed cursor") from error
+    if not isinstance(decoded, dict) or decoded.get("k") != [list(key) for key in sort]:
+        raise CursorError("Cursor does not belong to this listing")
+    values = decoded.get("v")
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise CursorError("Malformed cursor")
+    return values
+
+
+def keyset_filter(sort: SortSpec, values: Sequence[Any], nullable: Sequence[str] = ()) -> Dict[str, Any]:
+    """
+    Filter matching the documents after `values` in `sort` order.
+
+    Missing values sort before every other value, as in MongoDB. For the
+    `nullable` fields a `None` key is continued with the remaining `None`s
+    (and, ascending, everything non-null), and a descending key also
+    continues into the `None`s after the last value.
+
+    Args:
+        sort (SortSpec): Sort keys, the last one unique.
+        values (Sequence[Any]): Sort key values of the last document returned.
+        nullable (Sequence[str]): Sort fields that may be missing or null.
+
+    Returns:
+        Dict[str, Any]: Filter to combine with the listing's query.
+    """
+    branches: List[Dict[str, Any]] = []
+    equal: Dict[str, Any] = {}
+    for (field, direction), value in zip(sort, values):
+        if value is None:
+            if direction == ASCENDING:
+                branches.append({**equal, field: {"$ne": None}})
+        else:
+            branches.append({**equal, field: {"$gt" if direction == ASCENDING else "$lt": value}})
+            if direction != ASCENDING and field in nullable:
+                branches.append({**equal, field: None})
+        equal[field] = value
+
+    if len(branches) == 1:
+        return branches[0]
+    keyset: Dict[str, Any] = {"$or": branches}
+    (field, direction), value = sort[0], values[0]
+    if value is not None and (direction == ASCENDING or field not in nullable):
+        # Implied by the branches, but gives the planner a range on the leading key
+        keyset[field] = {"$gte" if direction == ASCENDING else "$lte": value}
+    return keyset
+
+
+def page_query(
+    query: Dict[str, Any], sort: SortSpec, cursor: Optional[str], nullable: Sequence[str] = ()
+) -> Dict[str, Any]:
+    """
+    Narrow a listing's query to the page after `cursor`.
+
+    Raises:
+        HTTPException: 400 if the cursor is not valid for this listing.
+    """
+    if not cursor:
+        return query
+    try:
+        keyset = keyset_filter(sort, decode_cursor(cursor, sort), nullable)
+    except CursorError as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
+    return {"$and": [query, keyset]} if query else keyset
+
+
+async def find_page(
+    collection,
+    query: Dict[str, Any],
+    projection: Dict[str, int],
+    sort: SortSpec,
+    limit: int,
+    cursor: Optional[str],
+    response: Response,
+    nullable: Sequence[str] = (),
+    skip: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    Read one keyset page and set the `X-Next-Cursor` header if it is full.
+
+    Args:
+        collection: Asyncio collection (or reading adapter) to read.
+        query (Dict[str, Any]): The listing's filter.
+        projection (Dict[str, int]): Inclusion projection; sort keys are added.
+        sort (SortSpec): Sort keys from `keyset_sort`.
+        limit (int): Page size.
+        cursor (Optional[str]): Token of the previous page; empty for the first page.
+        response (Response): Outgoing response receiving the header.
+        nullable (Sequence[str]): Sort fields that may be missing or null.
+        skip (int): The listing's `skip`, which cannot be combined with a cursor.
+
+    Returns:
+        List[Dict[str, Any]]: The page's documents.
+
+    Raises:
+        HTTPException: 400 if the cursor is not valid for this listing or `skip` is set.
+    """
+    if skip:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="skip cannot be combined with cursor")
+    projection = {**projection, **{field: 1 for field, _ in sort}}
+    documents = await collection.find(page_query(query, sort, cursor, nullable), projection).sort(
+        list(sort)
+    ).limit(limit).to_list(None)
+    if len(documents) == limit:
+        response.headers[CURSOR_HEADER] = encode_cursor(documents[-1], sort)
+    return documents
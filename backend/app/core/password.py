@@ -1,11 +1,31 @@
 """
 Implements password security features.
 """
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
 from passlib.context import CryptContext    # for hashing
 from fastapi import HTTPException, status   # for online updating
 
 pc = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt is CPU-bound, so async callers hand it to a process pool instead of
+# blocking the event loop. A size of 0 hashes inline on the calling thread.
+PASSWORD_POOL_SIZE = int(os.getenv("PASSWORD_POOL_SIZE", str(min(4, os.cpu_count() or 1))))
+PASSWORD_POOL_QUEUE = int(os.getenv("PASSWORD_POOL_QUEUE", "64"))  # Jobs allowed to wait for a free worker
+
+_pool: Optional[ProcessPoolExecutor] = None
+_in_flight = 0
+
+
+class PasswordPoolSaturated(RuntimeError):
+    """
+    Raised when the password pool already has its maximum number of jobs queued.
+    """
+
 def hash_password(p: str) -> str:
     """
     Hashes a password.
@@ -44,6 +64,109 @@ def verify_password(p: str, h: str) -> bool:
     except Exception as e:
         raise ValueError(f"Error verifying password: {e}") from e
 
+def _get_pool() -> ProcessPoolExecutor:
+    """
+    Create the password worker pool on first use.
+
+    Returns:
+        ProcessPoolExecutor: Shared pool for password hashing jobs.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=PASSWORD_POOL_SIZE,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+async def _run_in_pool(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Run a password function in the worker pool without blocking the event loop.
+
+    Args:
+        func (Callable): Module-level function to execute.
+        *args (Any): Arguments for the function.
+
+    Returns:
+        Any: Result of the function.
+
+    Raises:
+        PasswordPoolSaturated: If every worker is busy and the wait queue is full.
+    """
+    global _in_flight
+    if PASSWORD_POOL_SIZE <= 0:
+        return func(*args)
+
+    if _in_flight >= PASSWORD_POOL_SIZE + PASSWORD_POOL_QUEUE:
+        raise PasswordPoolSaturated("Password hashing pool is saturated")
+
+    _in_flight += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_pool(), func, *args)
+    finally:
+        _in_flight -= 1
+
+
+async def hash_password_async(p: str) -> str:
+    """
+    Hashes a password in the worker pool.
+
+    Args:
+        p (str): Password to hash.
+
+    Returns:
+        str: Hashed password.
+
+    Raises:
+        ValueError: If password fails to hash.
+        PasswordPoolSaturated: If the pool cannot accept more work.
+    """
+    return await _run_in_pool(hash_password, p)
+
+
+async def verify_password_async(p: str, h: str) -> bool:
+    """
+    Matches plain-text password with the hashed password in the worker pool.
+
+    Args:
+        p (str): Plain-text password.
+        h (str): Hashed password.
+
+    Returns:
+        bool: (True: Passwords match); (False: Passwords don't match).
+
+    Raises:
+        ValueError: If passwords fail to compare.
+        PasswordPoolSaturated: If the pool cannot accept more work.
+    """
+    return await _run_in_pool(verify_password, p, h)
+
+
+def password_pool_stats() -> Dict[str, Any]:
+    """
+    Report password pool occupancy.
+
+    Returns:
+        Dict[str, Any]: Pool size, queue limit and jobs currently in flight.
+    """
+    return {
+        "size": PASSWORD_POOL_SIZE,
+        "queue": PASSWORD_POOL_QUEUE,
+        "in_flight": _in_flight,
+    }
+
+
+def shutdown_password_pool() -> None:
+    """
+    Stop the worker pool, waiting for running jobs to finish.
+    """
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+        _pool = None
+
+
 def verify_role(u: str, r: str):
     """
     Enforces correct user role for access.
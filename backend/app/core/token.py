@@ -0,0 +1,115 @@
+"""
+Issues & verifies HMAC-signed bearer tokens.
+
+Tokens are `<payload>.<signature>`, both URL-safe base64 without padding. The
+payload is a compact JSON object carrying only the user's id, the issue time
+and an expiry, so checking the signature needs no database round trip. The
+account itself, including its active flag and role, is read by
+`get_token_user` through the identity cache.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from app.models.user import UserDB
+
+logger = logging.getLogger(__name__)
+
+AUTH_TOKEN_TTL = int(os.getenv("AUTH_TOKEN_TTL", "900"))   # Token lifetime in seconds
+# Development only: sign with a random per-process key when AUTH_TOKEN_SECRET is unset
+AUTH_DEV_RANDOM_SECRET = os.getenv("AUTH_DEV_RANDOM_SECRET", "false").lower() in ("1", "true", "yes")
+
+_secret = os.getenv("AUTH_TOKEN_SECRET")
+if not _secret:
+    if not AUTH_DEV_RANDOM_SECRET:
+        # Every worker would sign with its own key, so tokens would only validate where issued
+        raise RuntimeError(
+            "AUTH_TOKEN_SECRET must be set to a secret shared by every worker "
+            "(set AUTH_DEV_RANDOM_SECRET=true to use a random key in development)"
+        )
+    logger.warning("AUTH_TOKEN_SECRET is not set; using a random per-process signing key (development only).")
+    _secret = secrets.token_urlsafe(32)
+AUTH_TOKEN_SECRET = _secret.encode("utf-8")
+
+
+class TokenError(ValueError):
+    """
+    Raised when a bearer token is malformed, forged or expired.
+    """
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _sign(payload: str) -> str:
+    return _b64encode(hmac.new(AUTH_TOKEN_SECRET, payload.encode("ascii"), hashlib.sha256).digest())
+
+
+def create_token(user: UserDB, ttl: Optional[int] = None) -> Tuple[str, int]:
+    """
+    Issue a signed token for an authenticated user.
+
+    Args:
+        user (UserDB): User the token is issued to.
+        ttl (Optional[int]): Lifetime in seconds, defaults to `AUTH_TOKEN_TTL`.
+
+    Returns:
+        Tuple[str, int]: The encoded token and its expiry as a Unix timestamp.
+    """
+    now = int(time.time())
+    expires = now + (ttl if ttl is not None else AUTH_TOKEN_TTL)
+    claims = {"sub": user.id, "iat": now, "exp": expires}
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    return f"{payload}.{_sign(payload)}", expires
+
+
+def decode_token(token: str) -> Dict[str, Any]:
+    """
+    Verify a token's signature and expiry and return its claims.
+
+    Args:
+        token (str): Encoded bearer token.
+
+    Returns:
+        Dict[str, Any]: Token claims.
+
+    Raises:
+        TokenError: If the token is malformed, has a bad signature or has expired.
+    """
+    try:
+        payload, signature = token.split(".")
+    except ValueError as e:
+        raise TokenError("Malformed token") from e
+
+    try:
+        # Compared as bytes: compare_digest rejects str holding non-ASCII characters
+        valid = hmac.compare_digest(signature.encode("utf-8"), _sign(payload).encode("ascii"))
+    except (UnicodeEncodeError, TypeError) as e:
+        # A payload outside ASCII cannot have been issued here
+        raise TokenError("Malformed token") from e
+    if not valid:
+        raise TokenError("Invalid token signature")
+
+    try:
+        claims = json.loads(_b64decode(payload))
+    except ValueError as e:
+        raise TokenError("Malformed token payload") from e
+    if not isinstance(claims, dict):
+        raise TokenError("Malformed token payload")
+
+    if claims.get("exp", 0) <= time.time():
+        raise TokenError("Token has expired")
+
+    return claims
+
@@ -0,0 +1,51 @@
+"""
+Handles asyncio MongoDB connections for the API routes.
+
+Exposes the same collection names as `app.db.data`, backed by PyMongo's native
+asyncio client so database round trips never block the event loop. Operations
+are awaited (`await u_c.find_one(...)`) and cursors are drained with
+`await cursor.to_list(None)` or `async for`.
+
+Scripts, seeds & the thread-pooled report service keep using the synchronous
+collections in `app.db.data`.
+"""
+from pymongo import AsyncMongoClient
+
+from app.db.settings import (
+    MONGO_URI, USAGE_BUCKET_COLLECTION, USAGE_COLLECTION, USAGE_DAILY_COLLECTION, USAGE_HOURLY_COLLECTION,
+    WORKLOAD_ANALYTICS, WORKLOAD_INGEST, client_options, with_workload
+)
+
+# Initializing client (connects lazily on the first awaited operation)
+try:
+    ac = AsyncMongoClient(MONGO_URI, **client_options())
+    ad = ac.sync
+
+    u_c = ad["user"]                 # User collection
+    p_c = ad["profile"]              # Profile collection
+    d_c = ad["device"]               # Device collection
+    r_c = ad["room"]                 # Room collection
+    us_c = ad[USAGE_COLLECTION]      # Usage collection
+    a_c = ad["automation"]           # Automation collection
+    n_c = ad["notification"]         # Notification collection
+    am_c = ad["access management"]   # Access Management collection
+    g_c = ad["goal"]                 # Energy Goal collection
+    an_c = ad["analytics"]           # Analytics collection
+    s_c = ad["suggestion"]           # Suggestion collection
+    ush_c = ad[USAGE_HOURLY_COLLECTION]    # Hourly usage rollups
+    usd_c = ad[USAGE_DAILY_COLLECTION]     # Daily usage rollups
+    ub_c = ad[USAGE_BUCKET_COLLECTION]     # Usage readings bucketed per device & hour
+
+    # Workload handles (see app.db.settings)
+    us_c_ingest = with_workload(us_c, WORKLOAD_INGEST)          # Usage writes without journal wait
+    us_c_analytics = with_workload(us_c, WORKLOAD_ANALYTICS)    # Usage scans off the primary
+    an_c_analytics = with_workload(an_c, WORKLOAD_ANALYTICS)    # Analytics scans off the primary
+except Exception as e:
+    raise ConnectionError(f"Failed to configure async MongoDB client: {e}") from e
+
+
+async def close_async_db():
+    """
+    Close the asyncio client and its connection pool.
+    """
+    await ac.close()
@@ -1,93 +1,52 @@
 """
 Handles MongoDB database connections & operations.
 """
-import os       # Connection to external database
 from pymongo import MongoClient
 
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+from app.db.indexes import bootstrap_indexes
+from app.db.settings import (
+    MONGO_URI, USAGE_BUCKET_COLLECTION, USAGE_COLLECTION, USAGE_DAILY_COLLECTION, USAGE_HOURLY_COLLECTION,
+    WORKLOAD_ANALYTICS, WORKLOAD_INGEST, client_options, with_workload
+)
 
-# Initializing client
+# Initializing client (connects on first use, not at import)
 try:
-    c = MongoClient(MONGO_URI)
+    c = MongoClient(MONGO_URI, connect=False, **client_options())
     d = c.sync
 
     u_c = d["user"]                 # User collection
     p_c = d["profile"]              # Profile collection
     d_c = d["device"]               # Device collection
     r_c = d["room"]                 # Room collection
-    us_c = d["usage"]               # Usage collection
+    us_c = d[USAGE_COLLECTION]      # Usage collection
     a_c = d["automation"]           # Automation collection
     n_c = d["notification"]         # Notification collection
     am_c = d["access management"]   # Access Management collection
     g_c = d["goal"]                 # Energy Goal collection
     an_c = d["analytics"]           # Analytics collection
     s_c = d["suggestion"]           # Suggestion collection
-
-    print(f"Connected to MongoDB database: {MONGO_URI}")
+    ush_c = d[USAGE_HOURLY_COLLECTION]    # Hourly usage rollups
+    usd_c = d[USAGE_DAILY_COLLECTION]     # Daily usage rollups
+    ub_c = d[USAGE_BUCKET_COLLECTION]     # Usage readings bucketed per device & hour
+
+    # Workload handles (see app.db.settings)
+    us_c_ingest = with_workload(us_c, WORKLOAD_INGEST)          # Usage writes without journal wait
+    us_c_analytics = with_workload(us_c, WORKLOAD_ANALYTICS)    # Usage scans off the primary
+    d_c_analytics = with_workload(d_c, WORKLOAD_ANALYTICS)      # Device lookups for reports
+    u_c_analytics = with_workload(u_c, WORKLOAD_ANALYTICS)      # User lookups for reports
+    an_c_analytics = with_workload(an_c, WORKLOAD_ANALYTICS)    # Analytics scans off the primary
+    ub_c_analytics = with_workload(ub_c, WORKLOAD_ANALYTICS)    # Usage buckets for reports
 except Exception as e:
-    raise ConnectionError(f"Failed to connect to MongoDB: {e}") from e
+    raise ConnectionError(f"Failed to configure MongoDB client: {e}") from e
 
 
 def init_db():
     """
-    Initialize MongoDB database & creates indexes.
-    """
-    # User collection
-    u_c.create_index("id", unique=True)     # Unique identification
-    u_c.create_index("email", unique=True)  # Unique email address
-    u_c.create_index("username")            # General username
-
-    # Profile collection
-    p_c.create_index("id", unique=True)         # Unique identification
-    p_c.create_index("user_id", unique=True)    # Unique user identification
-
-    # Device collection
-    d_c.create_index("id", unique=True)             # Device identification
-    d_c.create_index("user_id")                     # User identification
-    d_c.create_index([("type", 1), ("user_id", 1)]) # Filter type through user identification
-
-    # Room collection
-    r_c.create_index("id", unique=True)     # Unique identification
-    r_c.create_index("user_id")             # User identification
-    r_c.create_index("home_id")             # Home identification
-
-    # Usage collection
-    us_c.create_index("id", unique=True)                     # Unique identification
-    us_c.create_index("device_id")                           # Device identification
-    us_c.create_index("timestamp")                           # Usage log
-    us_c.create_index([("device_id", 1), ("timestamp", -1)])  # Filter log by device identification
-
-    # Automation collection
-    a_c.create_index("id", unique=True)     # Unique identification
-    a_c.create_index("user_id")             # User identification
-    a_c.create_index("device_id")           # User identification
+    Initialize MongoDB database & creates any missing indexes.
 
-    # Notification collection
-    n_c.create_index("id", unique=True)                                 # Unique identification
-    n_c.create_index("user_id")                                         # User identification
-    n_c.create_index([("user_id", 1), ("read", 1), ("timestamp", -1)])  # Filter notification read by device & time
-
-    # Access Management collection
-    am_c.create_index("id", unique=True)                        # Unique identification
-    am_c.create_index("owner_id")                               # Owner identification
-    am_c.create_index("resource_id")                            # Resource identification
-    am_c.create_index([("owner_id", 1), ("resource_id", 1)])    # Filters resource by its owner
-
-    # Goal collection
-    g_c.create_index("id", unique=True)                 # Unique identification
-    g_c.create_index("user_id")                         # User identification
-    g_c.create_index("type")                            # Type of goal
-    g_c.create_index([("user_id", 1), ("type", 1)])     # Filters types of goals by user identification
-
-    # Analytics collection
-    an_c.create_index("id", unique=True)                    # Unique identification
-    an_c.create_index("user_id")                            # User identification
-    an_c.create_index("device_id")                          # Device identification
-    an_c.create_index([("user_id", 1), ("timestamp", -1)])  # Filters user identification by timestamp
-
-    # Suggestion collection
-    s_c.create_index("id", unique=True)                                     # Unique identification
-    s_c.create_index("user_id")                                             # User identification
-    s_c.create_index([("user_id", 1), ("status", 1), ("timestamp", -1)])    # Filters user identification with status by timestamp
-
-    print("Database initialized with indexes.")
+    Index definitions live in `app.db.indexes`; this is a single round trip
+    once a deployment's indexes are in place.
+    """
+    created = bootstrap_indexes(d)
+    if created:
+        print(f"Database initialized with indexes: {created}")
@@ -0,0 +1,371 @@
+"""
+Declares the MongoDB indexes & bootstraps them once per deployment.
+
+Index definitions live in `INDEXES`, keyed by collection name; collections
+that need creation options (the time-series usage collection) are declared in
+`COLLECTIONS`. On startup
+`bootstrap_indexes` compares a hash of those definitions with the one recorded
+in the `bootstrap` collection. When they match (the usual case for a worker
+joining an existing deployment) it returns after a single `find_one`. Otherwise
+one worker takes a lock document, creates any declared collections that are
+missing, diffs each collection against
+`list_indexes()`, creates only the missing indexes with one `create_indexes`
+call per collection, drops the indexes listed in `SUPERSEDED_INDEXES` once
+their replacements exist and records the new hash. Other workers skip the
+bootstrap while the lock is held.
+
+Run it by hand with `python -m app.db.indexes [--force]`.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument
+from pymongo.database import Database
+from pymongo.errors import DuplicateKeyError
+
+from app.db.settings import (
+    USAGE_BUCKET_COLLECTION, USAGE_COLLECTION, USAGE_DAILY_COLLECTION, USAGE_HOURLY_COLLECTION, USAGE_NATURAL_KEY,
+    USAGE_STORAGE, USAGE_TIMESERIES, usage_timeseries_options
+)
+
+logger = logging.getLogger(__name__)
+
+BOOTSTRAP_COLLECTION = "bootstrap"      # Holds the index lock & version
+INDEX_LOCK_ID = "indexes"
+INDEX_LOCK_TTL = int(os.getenv("INDEX_LOCK_TTL", "600"))   # Seconds before a stale lock can be taken over
+
+# Collections created with options, by name
+COLLECTIONS: Dict[str, Dict] = {
+    USAGE_COLLECTION: {"timeseries": usage_timeseries_options()},
+} if USAGE_TIMESERIES else {}
+
+# Time-series collections reject unique indexes and already cluster readings
+# by (device_id, timestamp), so only the id lookup is indexed
+TIMESERIES_USAGE_INDEXES = [
+    IndexModel("id"),                                                   # Identification
+]
+
+USAGE_INDEXES = TIMESERIES_USAGE_INDEXES if USAGE_TIMESERIES else [
+    IndexModel("id", unique=True),                                      # Unique identification
+    IndexModel("device_id"),                                            # Device identification
+    IndexModel([("timestamp", DESCENDING), ("id", DESCENDING)]),        # Usage log, pages continued by (timestamp, id)
+    IndexModel([("device_id", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)]),  # Filter log by device identification
+    IndexModel([("energy_consumed", DESCENDING), ("id", DESCENDING)]),  # Usage log by energy, pages continued by (energy, id)
+]
+
+# One reading per device & instant; existing duplicates must be removed first
+# (`python -m app.db.migrate_usage --dedupe usage`) or the build fails
+NATURAL_KEY_INDEX = IndexModel(
+    [("device_id", ASCENDING), ("timestamp", ASCENDING)], unique=True, name="device_id_timestamp_unique"
+)
+if USAGE_NATURAL_KEY and not USAGE_TIMESERIES:
+    USAGE_INDEXES = USAGE_INDEXES + [NATURAL_KEY_INDEX]
+elif USAGE_NATURAL_KEY:
+    logger.warning("USAGE_NATURAL_KEY is ignored: time-series collections cannot have unique indexes")
+if USAGE_NATURAL_KEY and USAGE_STORAGE == "buckets":
+    logger.warning("USAGE_NATURAL_KEY does not apply to bucketed usage storage")
+
+# Readings appended to per-device hourly buckets (USAGE_STORAGE=buckets). Several
+# buckets may share an hour once one fills up, so the key is not unique
+USAGE_BUCKET_INDEXES = [
+    IndexModel([("device_id", ASCENDING), ("start", DESCENDING)]),  # Device log by hour
+    IndexModel("start"),                                            # Time range scans & retention
+    IndexModel("ids"),                                              # Reading lookup by id
+]
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "user": [
+        IndexModel("id", unique=True),      # Unique identification
+        IndexModel("email", unique=True),   # Unique email address
+        IndexModel("username"),             # General username
+    ],
+    "profile": [
+        IndexModel("id", unique=True),          # Unique identification
+        IndexModel("user_id", unique=True),     # Unique user identification
+    ],
+    "device": [
+        IndexModel("id", unique=True),                          # Device identification
+        IndexModel("user_id"),                                  # User identification
+        IndexModel([("type", ASCENDING), ("user_id", ASCENDING)]),  # Filter type through user identification
+    ],
+    "room": [
+        IndexModel("id", unique=True),      # Unique identification
+        IndexModel("user_id"),              # User identification
+        IndexModel("home_id"),              # Home identification
+    ],
+    USAGE_COLLECTION: USAGE_INDEXES,
+    **({USAGE_BUCKET_COLLECTION: USAGE_BUCKET_INDEXES} if USAGE_STORAGE == "buckets" else {}),
+    USAGE_HOURLY_COLLECTION: [
+        IndexModel([("device_id", ASCENDING), ("start", ASCENDING)], unique=True),  # One bucket per device & hour
+        IndexModel("start"),                                                        # Retention sweeps
+    ],
+    USAGE_DAILY_COLLECTION: [
+        IndexModel([("device_id", ASCENDING), ("start", ASCENDING)], unique=True),  # One bucket per device & day
+        IndexModel("start"),                                                        # Retention sweeps
+    ],
+    "automation": [
+        IndexModel("id", unique=True),      # Unique identification
+        IndexModel("user_id"),              # User identification
+        IndexModel("device_id"),            # Device identification
+    ],
+    "notification": [
+        IndexModel("id", unique=True),                                                          # Unique identification
+        IndexModel("user_id"),                                                                  # User identification
+        IndexModel([("user_id", ASCENDING), ("read", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)]),   # Filter notification read by device & time
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)]),    # Notifications of a user by time
+    ],
+    "access management": [
+        IndexModel("id", unique=True),                                      # Unique identification
+        IndexModel("owner_id"),                                             # Owner identification
+        IndexModel("resource_id"),                                          # Resource identification
+        IndexModel([("owner_id", ASCENDING), ("resource_id", ASCENDING)]),  # Filters resource by its owner
+    ],
+    "goal": [
+        IndexModel("id", unique=True),                                  # Unique identification
+        IndexModel("user_id"),                                          # User identification
+        IndexModel("type"),                                             # Type of goal
+        IndexModel([("user_id", ASCENDING), ("type", ASCENDING)]),      # Filters types of goals by user identification
+    ],
+    "analytics": [
+        IndexModel("id", unique=True),                                      # Unique identification
+        IndexModel("user_id"),                                              # User identification
+        IndexModel("device_id"),                                            # Device identification
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)]),    # Filters user identification by timestamp
+        IndexModel([("timestamp", DESCENDING), ("id", DESCENDING)]),                            # Analytics of every user by time
+    ],
+    "suggestion": [
+        IndexModel("id", unique=True),                                                              # Unique identification
+        IndexModel("user_id"),                                                                      # User identification
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING), ("timestamp", DESCENDING)]),     # Filters user identification with status by timestamp
+        IndexModel([("user_id", ASCENDING), ("created", DESCENDING), ("id", DESCENDING)]),          # Suggestions of a user, newest first
+    ],
+}
+
+# Key patterns replaced by the indexes above, by collection; dropped once the
+# replacements exist so writes stop maintaining them
+SUPERSEDED_INDEXES: Dict[str, List[List[Tuple[str, int]]]] = {
+    USAGE_COLLECTION: [
+        [("timestamp", ASCENDING)],                                 # By (timestamp, id)
+        [("device_id", ASCENDING), ("timestamp", DESCENDING)],      # By (device_id, timestamp, id)
+    ],
+    "notification": [
+        [("user_id", ASCENDING), ("read", ASCENDING), ("timestamp", DESCENDING)],  # By (..., id)
+    ],
+    "analytics": [
+        [("user_id", ASCENDING), ("timestamp", DESCENDING)],        # By (user_id, timestamp, id)
+    ],
+}
+
+
+def _key(spec: Dict) -> Tuple:
+    """Normalize an index key document for comparison."""
+    return tuple((field, int(direction) if isinstance(direction, (int, float)) else direction)
+                 for field, direction in spec.items())
+
+
+def index_version(
+    indexes: Dict[str, List[IndexModel]] = INDEXES,
+    collections: Dict[str, Dict] = COLLECTIONS,
+    superseded: Dict[str, List[List[Tuple[str, int]]]] = SUPERSEDED_INDEXES
+) -> str:
+    """
+    Hash the index & collection definitions so changes trigger a new bootstrap.
+
+    Args:
+        indexes (Dict[str, List[IndexModel]]): Index definitions by collection.
+        collections (Dict[str, Dict]): Creation options by collection.
+        superseded (Dict[str, List[List[Tuple[str, int]]]]): Key patterns to drop by collection.
+
+    Returns:
+        str: Hex digest of the definitions.
+    """
+    documents = {name: [model.document for model in models] for name, models in sorted(indexes.items())}
+    encoded = json.dumps([documents, collections, superseded], default=str, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def missing_indexes(collection, models: Iterable[IndexModel]) -> List[IndexModel]:
+    """
+    Find the indexes in `models` whose keys are not yet indexed.
+
+    Indexes are matched by key pattern, so an existing index with the same
+    keys under a different name counts as present.
+
+    Args:
+        collection: Collection to inspect.
+        models (Iterable[IndexModel]): Desired indexes.
+
+    Returns:
+        List[IndexModel]: Indexes that need to be created.
+    """
+    existing = {_key(index["key"]) for index in collection.list_indexes()}
+    return [model for model in models if _key(model.document["key"]) not in existing]
+
+
+def drop_superseded(collection, keys: Iterable[List[Tuple[str, int]]], models: Iterable[IndexModel]) -> List[str]:
+    """
+    Drop existing indexes on the superseded key patterns `keys`.
+
+    A key pattern that is still declared in `models` is kept.
+
+    Args:
+        collection: Collection to inspect.
+        keys (Iterable[List[Tuple[str, int]]]): Superseded key patterns.
+        models (Iterable[IndexModel]): Desired indexes.
+
+    Returns:
+        List[str]: Names of the indexes dropped.
+    """
+    declared = {_key(model.document["key"]) for model in models}
+    superseded = {tuple(key) for key in keys} - declared
+    dropped = []
+    for index in list(collection.list_indexes()):
+        if _key(index["key"]) in superseded:
+            collection.drop_index(index["name"])
+            dropped.append(index["name"])
+    return dropped
+
+
+def ensure_collections(db: Database, collections: Dict[str, Dict]) -> List[str]:
+    """
+    Create declared collections that do not exist yet.
+
+    This must run before any index is built, because building an index
+    implicitly creates a plain collection.
+
+    Args:
+        db (Database): Database holding the collections.
+        collections (Dict[str, Dict]): Creation options by collection.
+
+    Returns:
+        List[str]: Names of the collections created.
+    """
+    created = []
+    for name, options in collections.items():
+        existing = list(db.list_collections(filter={"name": name}))
+        if not existing:
+            db.create_collection(name, **options)
+            created.append(name)
+        elif "timeseries" in options and existing[0].get("type") != "timeseries":
+            logger.warning(
+                "Collection %r exists but is not a time-series collection; "
+                "migrate it with `python -m app.db.migrate_usage`.", name
+            )
+    return created
+
+
+def acquire_lock(meta, owner: str, now: datetime, lock_id: str = INDEX_LOCK_ID, ttl: int = INDEX_LOCK_TTL) -> bool:
+    """
+    Take a lock document unless another worker holds an unexpired one.
+
+    Args:
+        meta: Collection holding the lock documents.
+        owner (str): Identifies the caller; stored in the lock.
+        now (datetime): Current time.
+        lock_id (str): `_id` of the lock document.
+        ttl (int): Seconds before the lock can be taken over.
+
+    Returns:
+        bool: True if `owner` now holds the lock.
+    """
+    try:
+        state = meta.find_one_and_update(
+            {
+                "_id": lock_id,
+                "$or": [{"locked_until": None}, {"locked_until": {"$lt": now}}],
+            },
+            {"$set": {"owner": owner, "locked_until": now + timedelta(seconds=ttl)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # The lock document exists and is held; the upsert collided with it
+        return False
+    return state is not None and state.get("owner") == owner
+
+
+def bootstrap_indexes(
+    db: Database,
+    indexes: Dict[str, List[IndexModel]] = INDEXES,
+    force: bool = False,
+    collections: Dict[str, Dict] = COLLECTIONS,
+    superseded: Dict[str, List[List[Tuple[str, int]]]] = SUPERSEDED_INDEXES
+) -> Dict[str, List[str]]:
+    """
+    Create any missing collections & indexes once per deployment, then drop superseded indexes.
+
+    Args:
+        db (Database): Database holding the collections.
+        indexes (Dict[str, List[IndexModel]]): Index definitions by collection.
+        force (bool): Diff the collections even if the recorded version matches.
+        collections (Dict[str, Dict]): Creation options by collection.
+        superseded (Dict[str, List[List[Tuple[str, int]]]]): Key patterns to drop by collection.
+
+    Returns:
+        Dict[str, List[str]]: Names of the indexes created, by collection. Empty
+            when the bootstrap was already done or is running elsewhere.
+    """
+    meta = db[BOOTSTRAP_COLLECTION]
+    version = index_version(indexes, collections, superseded)
+
+    state = meta.find_one({"_id": INDEX_LOCK_ID}, {"version": 1})
+    if not force and state and state.get("version") == version:
+        return {}
+
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    if not acquire_lock(meta, owner, datetime.utcnow()):
+        logger.info("Index bootstrap is running on another worker; skipping.")
+        return {}
+
+    created: Dict[str, List[str]] = {}
+    dropped: Dict[str, List[str]] = {}
+    completed = False
+    try:
+        ensure_collections(db, collections)
+        for name, models in indexes.items():
+            missing = missing_indexes(db[name], models)
+            if missing:
+                created[name] = db[name].create_indexes(missing)
+        # Only after their replacements are built, so queries are never left without an index
+        for name, keys in superseded.items():
+            names = drop_superseded(db[name], keys, indexes.get(name, []))
+            if names:
+                dropped[name] = names
+        completed = True
+    finally:
+        # Release the lock; only record the version once every collection is done
+        update = {"$unset": {"locked_until": ""}}
+        if completed:
+            update["$set"] = {"version": version, "completed": datetime.utcnow()}
+        meta.update_one({"_id": INDEX_LOCK_ID, "owner": owner}, update)
+
+    if created:
+        logger.info("Created indexes: %s", created)
+    if dropped:
+        logger.info("Dropped superseded indexes: %s", dropped)
+    return created
+
+
+def main():
+    """Run the index bootstrap from the command line."""
+    from app.db.data import d
+
+    parser = argparse.ArgumentParser(description="Create missing MongoDB indexes")
+    parser.add_argument("--force", action="store_true", help="Diff every collection even if the version is current")
+    args = parser.parse_args()
+
+    created = bootstrap_indexes(d, force=args.force)
+    for name, index_names in created.items():
+        print(f"{name}: {', '.join(index_names)}")
+    print(f"Created {sum(len(names) for names in created.values())} indexes.")
+
+
+if __name__ == "__main__":
+    main()
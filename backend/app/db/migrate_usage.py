@@ -0,0 +1,214 @@
+"""
+Copies usage readings into a time-series collection while the API keeps running.
+
+Time-series collections cannot be renamed, so the readings are copied into a
+new collection that the API is then pointed at:
+
+1. `python -m app.db.migrate_usage --target usage_ts` copies existing readings
+   in `_id` order, recording a checkpoint after every batch. It can be stopped
+   and re-run; it resumes from the checkpoint.
+2. Deploy with `USAGE_TIMESERIES=true USAGE_COLLECTION=usage_ts`.
+3. Re-run step 1 to copy readings written to the old collection in between.
+
+Resumed runs re-scan a short overlap before the checkpoint, because ObjectIds
+from different workers are only ordered to the second; readings already in the
+target (matched on `id`) are not copied twice. Readings without a valid
+`timestamp` cannot be stored in a time-series collection and are skipped.
+Edits made to already-copied readings during the migration are not carried
+over.
+
+Before enabling `USAGE_NATURAL_KEY`, remove readings stored more than once for
+the same device & timestamp with `python -m app.db.migrate_usage --dedupe
+--source usage`; the unique index cannot be built while duplicates exist.
+"""
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict
+
+from bson import ObjectId
+from pymongo.database import Database
+
+from app.db.indexes import BOOTSTRAP_COLLECTION, TIMESERIES_USAGE_INDEXES, missing_indexes
+from app.db.settings import usage_timeseries_options
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 5000
+RESUME_OVERLAP = timedelta(seconds=60)     # Re-scanned before the checkpoint on resume
+
+
+def create_timeseries_collection(db: Database, name: str) -> bool:
+    """
+    Create the target time-series collection & its indexes if missing.
+
+    Args:
+        db (Database): Database holding the collections.
+        name (str): Name of the time-series collection.
+
+    Returns:
+        bool: True if the collection was created.
+
+    Raises:
+        ValueError: If a collection with that name exists but is not time-series.
+    """
+    existing = list(db.list_collections(filter={"name": name}))
+    if existing:
+        if existing[0].get("type") != "timeseries":
+            raise ValueError(f"Collection {name!r} exists and is not a time-series collection")
+        return False
+
+    db.create_collection(name, timeseries=usage_timeseries_options())
+    missing = missing_indexes(db[name], TIMESERIES_USAGE_INDEXES)
+    if missing:
+        db[name].create_indexes(missing)
+    return True
+
+
+def migrate_usage(
+    db: Database,
+    source: str,
+    target: str,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    pause: float = 0.0
+) -> Dict[str, int]:
+    """
+    Copy readings from `source` to `target` in resumable batches.
+
+    Args:
+        db (Database): Database holding both collections.
+        source (str): Collection to copy from.
+        target (str): Collection to copy into; create it first with
+            `create_timeseries_collection`.
+        batch_size (int): Readings per batch.
+        pause (float): Seconds to sleep between batches to limit load on the primary.
+
+    Returns:
+        Dict[str, int]: Readings copied & skipped during this run, and in total.
+    """
+    checkpoints = db[BOOTSTRAP_COLLECTION]
+    checkpoint_id = f"migrate:{source}->{target}"
+    state = checkpoints.find_one({"_id": checkpoint_id}) or {}
+    checkpoint = last_id = state.get("last_id")
+    if checkpoint is not None:
+        last_id = ObjectId.from_datetime(checkpoint.generation_time - RESUME_OVERLAP)
+
+    copied = skipped = 0
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        batch = list(db[source].find(query).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+
+        # Skip readings a previous run already copied
+        present = {
+            doc["id"] for doc in db[target].find({"id": {"$in": [doc.get("id") for doc in batch]}}, {"id": 1})
+        }
+        readings = [
+            doc for doc in batch
+            if doc.get("id") not in present and isinstance(doc.get("timestamp"), datetime)
+        ]
+        invalid = sum(
+            1 for doc in batch
+            if not isinstance(doc.get("timestamp"), datetime) and (checkpoint is None or doc["_id"] > checkpoint)
+        )
+        if readings:
+            db[target].insert_many(readings, ordered=False)
+
+        last_id = batch[-1]["_id"]
+        copied += len(readings)
+        skipped += invalid
+        checkpoints.update_one(
+            {"_id": checkpoint_id},
+            {
+                "$set": {"last_id": last_id, "updated": datetime.utcnow()},
+                "$inc": {"copied": len(readings), "skipped": invalid},
+            },
+            upsert=True,
+        )
+        logger.info("Copied %d readings up to %s", copied, last_id)
+
+        if pause:
+            time.sleep(pause)
+
+    state = checkpoints.find_one({"_id": checkpoint_id}) or {}
+    return {
+        "copied": copied,
+        "skipped": skipped,
+        "total_copied": state.get("copied", 0),
+        "total_skipped": state.get("skipped", 0),
+    }
+
+
+def remove_duplicate_readings(db: Database, collection: str, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Delete readings that repeat an earlier reading's device & timestamp.
+
+    The first stored copy (lowest `_id`) of each reading is kept.
+
+    Args:
+        db (Database): Database holding the collection.
+        collection (str): Usage collection to clean.
+        batch_size (int): Readings deleted per `delete_many`.
+
+    Returns:
+        int: Number of readings deleted.
+    """
+    groups = db[collection].aggregate([
+        {"$group": {
+            "_id": {"device_id": "$device_id", "timestamp": "$timestamp"},
+            "keep": {"$min": "$_id"},
+            "ids": {"$push": "$_id"},
+            "count": {"$sum": 1},
+        }},
+        {"$match": {"count": {"$gt": 1}}},
+    ], allowDiskUse=True)
+
+    removed = 0
+    pending = []
+    for group in groups:
+        pending.extend(_id for _id in group["ids"] if _id != group["keep"])
+        while len(pending) >= batch_size:
+            removed += db[collection].delete_many({"_id": {"$in": pending[:batch_size]}}).deleted_count
+            del pending[:batch_size]
+    if pending:
+        removed += db[collection].delete_many({"_id": {"$in": pending}}).deleted_count
+    return removed
+
+
+def main():
+    """Run the migration from the command line."""
+    from app.db.data import d
+
+    parser = argparse.ArgumentParser(description="Copy usage readings into a time-series collection")
+    parser.add_argument("--source", default="usage", help="Collection to copy from")
+    parser.add_argument("--target", default="usage_ts", help="Time-series collection to copy into")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Readings per batch")
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="Only remove repeated (device_id, timestamp) readings from --source")
+    args = parser.parse_args()
+
+    if args.dedupe:
+        removed = remove_duplicate_readings(d, args.source, args.batch_size)
+        print(f"Removed {removed} duplicate readings from {args.source!r}")
+        return
+
+    if args.source == args.target:
+        parser.error("--source and --target must differ")
+
+    logging.basicConfig(level=logging.INFO)
+    if create_timeseries_collection(d, args.target):
+        print(f"Created time-series collection {args.target!r}")
+
+    result = migrate_usage(d, args.source, args.target, args.batch_size, args.pause)
+    print(
+        f"Copied {result['copied']} readings ({result['skipped']} skipped) this run; "
+        f"{result['total_copied']} copied in total."
+    )
+    print(f"Source: {d[args.source].estimated_document_count()}, target: {d[args.target].estimated_document_count()}")
+
+
+if __name__ == "__main__":
+    main()
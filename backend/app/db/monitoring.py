@@ -0,0 +1,196 @@
+"""
+Per-request accounting of MongoDB commands.
+
+With `DB_METRICS` enabled (it is off by default), `command_listener` is
+registered on both clients. While a request is being served,
+`DBMetricsMiddleware` binds a `RequestDBStats` to the current context; every
+command the request issues is counted, timed and reduced to a query shape
+(command, collection & filter keys with the values stripped). At the end of
+the request the totals are folded into per-route statistics and any shape
+that repeated more than `DB_N_PLUS_ONE_THRESHOLD` times is logged as a likely
+N+1 query.
+
+Commands issued outside a request (startup, scripts, thread pools that do not
+copy the context) are not attributed to any route.
+"""
+import logging
+import os
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+DB_N_PLUS_ONE_THRESHOLD = int(os.getenv("DB_N_PLUS_ONE_THRESHOLD", "10"))  # Repeats of one shape per request
+
+# Keys of a command document that describe the query shape
+_SHAPE_KEYS = ("filter", "query", "q", "pipeline", "sort", "updates", "deletes")
+
+
+def _strip_values(value: Any) -> Any:
+    """Replace literal values with placeholders, keeping field & operator names."""
+    if isinstance(value, dict):
+        return {key: _strip_values(item) for key, item in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(item, dict) for item in value):
+            return [_strip_values(item) for item in value]
+        return "?"
+    return "?"
+
+
+def query_shape(command_name: str, command: Dict[str, Any]) -> str:
+    """
+    Describe a command without its literal values.
+
+    Args:
+        command_name (str): Name of the command, e.g. `find`.
+        command (Dict[str, Any]): The command document.
+
+    Returns:
+        str: A shape such as `find device {'id': '?'}`.
+    """
+    # getMore names its collection separately; its own value is a cursor id
+    collection = command.get("collection", "") if command_name == "getMore" else command.get(command_name, "")
+    parts = [command_name, str(collection)]
+    for key in _SHAPE_KEYS:
+        if key in command:
+            parts.append(repr(_strip_values(command[key])))
+    return " ".join(parts)
+
+
+class RequestDBStats:
+    """
+    Database commands issued while serving one request.
+    """
+    def __init__(self):
+        self.commands = 0
+        self.total_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest: Optional[str] = None
+        self.shapes: Counter = Counter()
+        self._pending: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def started(self, request_id: int, shape: str):
+        with self._lock:
+            self._pending[request_id] = shape
+
+    def finished(self, request_id: int, command_name: str, duration_micros: int):
+        with self._lock:
+            shape = self._pending.pop(request_id, command_name)
+            elapsed_ms = duration_micros / 1000
+            self.commands += 1
+            self.total_ms += elapsed_ms
+            self.shapes[shape] += 1
+            if elapsed_ms >= self.slowest_ms:
+                self.slowest_ms = elapsed_ms
+                self.slowest = shape
+
+    def repeated_shapes(self, threshold: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Shapes issued more than `threshold` times, most frequent first."""
+        limit = DB_N_PLUS_ONE_THRESHOLD if threshold is None else threshold
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > limit]
+
+
+_current_stats: ContextVar[Optional[RequestDBStats]] = ContextVar("db_request_stats", default=None)
+
+
+def begin_request() -> Tuple[RequestDBStats, Any]:
+    """
+    Start attributing commands in this context to a new request.
+
+    Returns:
+        Tuple[RequestDBStats, Any]: The stats object and a token for `end_request`.
+    """
+    stats = RequestDBStats()
+    return stats, _current_stats.set(stats)
+
+
+def end_request(token: Any):
+    """Stop attributing commands to the request started with `token`."""
+    _current_stats.reset(token)
+
+
+def current_request_stats() -> Optional[RequestDBStats]:
+    """Stats for the request being served in this context, if any."""
+    return _current_stats.get()
+
+
+class CommandStatsListener(monitoring.CommandListener):
+    """
+    Feeds command events into the current request's stats.
+    """
+    def started(self, event: monitoring.CommandStartedEvent):
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.started(event.request_id, query_shape(event.command_name, event.command))
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.finished(event.request_id, event.command_name, event.duration_micros)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.finished(event.request_id, event.command_name, event.duration_micros)
+
+
+command_listener = CommandStatsListener()
+
+
+class RouteDBStats:
+    """
+    Database command totals aggregated per route.
+    """
+    def __init__(self):
+        self._routes: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, route: str, stats: RequestDBStats, repeated: int = 0):
+        """Fold one request's stats into its route's totals."""
+        with self._lock:
+            totals = self._routes.setdefault(route, {
+                "requests": 0, "commands": 0, "db_ms": 0.0,
+                "max_commands": 0, "slowest_ms": 0.0, "n_plus_one": 0,
+            })
+            totals["requests"] += 1
+            totals["commands"] += stats.commands
+            totals["db_ms"] += stats.total_ms
+            totals["max_commands"] = max(totals["max_commands"], stats.commands)
+            totals["slowest_ms"] = max(totals["slowest_ms"], stats.slowest_ms)
+            totals["n_plus_one"] += repeated
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-route totals with per-request averages."""
+        with self._lock:
+            return {
+                route: {
+                    **totals,
+                    "db_ms": round(totals["db_ms"], 3),
+                    "slowest_ms": round(totals["slowest_ms"], 3),
+                    "avg_commands": round(totals["commands"] / totals["requests"], 2),
+                    "avg_db_ms": round(totals["db_ms"] / totals["requests"], 3),
+                }
+                for route, totals in sorted(self._routes.items())
+            }
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+
+
+route_db_stats = RouteDBStats()
+
+
+def db_route_stats() -> Dict[str, Dict[str, float]]:
+    """
+    Get database command totals for each route served by this worker.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Totals keyed by `METHOD /path/{param}`.
+    """
+    return route_db_stats.stats()
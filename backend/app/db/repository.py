@@ -0,0 +1,40 @@
+"""
+Derives MongoDB projections from the API's response models.
+
+List & detail endpoints validate documents into a response model that usually
+exposes a fraction of the stored fields (e.g. `AutomationResponse` drops
+`trigger_data`, `action_data` & `conditions`; `UserResponse` drops the password
+hash). Passing `projection_for(Model)` to `find` / `find_one` makes MongoDB
+return only those fields, which saves wire bytes and BSON decoding.
+"""
+from functools import lru_cache
+from typing import Dict, Tuple, Type
+
+from pydantic import BaseModel
+
+
+@lru_cache(maxsize=None)
+def _projected_fields(model: Type[BaseModel], extra: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Stored field names read by `model`, plus `extra`."""
+    fields = []
+    for name, info in model.model_fields.items():
+        alias = info.validation_alias if isinstance(info.validation_alias, str) else info.alias
+        fields.append(alias or name)
+    return tuple(dict.fromkeys(fields + list(extra)))
+
+
+def projection_for(model: Type[BaseModel], *extra: str) -> Dict[str, int]:
+    """
+    Build an inclusion projection for the fields a model reads.
+
+    Args:
+        model (Type[BaseModel]): Response model the documents are validated into.
+        *extra (str): Additional stored fields the route needs (e.g. an owner
+            field used for authorization that the response does not expose).
+
+    Returns:
+        Dict[str, int]: Projection for `find` / `find_one`, excluding `_id`.
+    """
+    projection = {"_id": 0}
+    projection.update((field, 1) for field in _projected_fields(model, extra))
+    return projection
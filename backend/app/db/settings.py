@@ -0,0 +1,163 @@
+"""
+MongoDB connection settings read from the environment.
+
+Client-wide options (pool sizing, wire compression) apply to every handle.
+Per-workload options are applied to individual collections with
+`with_workload`, so each call site picks the read preference or write concern
+that suits it:
+
+- `WORKLOAD_ANALYTICS`: long scans for reports, analytics & aggregates, routed
+  to secondaries when available so they stay off the primary.
+- `WORKLOAD_INGEST`: high-volume usage writes acknowledged by the primary
+  without waiting for the journal.
+"""
+import os
+from typing import Any, Dict, Optional, TypeVar, Union
+
+from pymongo import WriteConcern
+from pymongo.read_preferences import (
+    Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred, make_read_preference, read_pref_mode_from_name
+)
+
+from app.db.monitoring import command_listener
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+
+# Connection pool
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))             # Connections per server
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))               # Connections kept warm
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "0"))  # Pool checkout timeout, 0 waits forever
+
+# Per-request command accounting (see app.db.monitoring). Off by default: every
+# command then pays for a listener callback, a query-shape walk of its document
+# and a lock, which shows on high-rate ingest; enable it to profile routes
+DB_METRICS = os.getenv("DB_METRICS", "false").lower() in ("1", "true", "yes")
+
+# Wire compression, comma-separated in order of preference (e.g. "zstd,snappy,zlib")
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "")
+
+# Heavy read paths
+MONGO_ANALYTICS_READ_PREFERENCE = os.getenv("MONGO_ANALYTICS_READ_PREFERENCE", "secondaryPreferred")
+MONGO_ANALYTICS_MAX_STALENESS = int(os.getenv("MONGO_ANALYTICS_MAX_STALENESS", "-1"))  # Seconds, -1 for no limit
+
+# High-volume usage ingestion
+MONGO_INGEST_W = int(os.getenv("MONGO_INGEST_W", "1"))
+MONGO_INGEST_JOURNAL = os.getenv("MONGO_INGEST_JOURNAL", "false").lower() in ("1", "true", "yes")
+
+# Usage storage; a time-series collection needs MongoDB 7.0+ for per-reading updates & deletes
+USAGE_COLLECTION = os.getenv("USAGE_COLLECTION", "usage")
+USAGE_TIMESERIES = os.getenv("USAGE_TIMESERIES", "false").lower() in ("1", "true", "yes")
+USAGE_TIMESERIES_GRANULARITY = os.getenv("USAGE_TIMESERIES_GRANULARITY", "minutes")   # seconds, minutes or hours
+# Treat (device_id, timestamp) as a reading's identity so retried uploads are
+# absorbed instead of stored twice. Needs a regular (not time-series) collection.
+USAGE_NATURAL_KEY = os.getenv("USAGE_NATURAL_KEY", "false").lower() in ("1", "true", "yes")
+
+# "documents" stores one document per reading; "buckets" appends readings to one
+# document per device & hour (see app.services.usage_buckets)
+USAGE_STORAGE = os.getenv("USAGE_STORAGE", "documents").lower()
+USAGE_BUCKET_COLLECTION = os.getenv("USAGE_BUCKET_COLLECTION", "usage_buckets")
+
+# Per-device hourly & daily totals maintained on every usage write (see app.services.usage_rollups)
+USAGE_ROLLUPS = os.getenv("USAGE_ROLLUPS", "false").lower() in ("1", "true", "yes")
+USAGE_HOURLY_COLLECTION = os.getenv("USAGE_HOURLY_COLLECTION", "usage_hourly")
+USAGE_DAILY_COLLECTION = os.getenv("USAGE_DAILY_COLLECTION", "usage_daily")
+
+# Index bootstrap on startup: "background", "blocking" or "off"
+DB_INDEX_BOOTSTRAP = os.getenv("DB_INDEX_BOOTSTRAP", "background").lower()
+
+WORKLOAD_ANALYTICS = "analytics"
+WORKLOAD_INGEST = "ingest"
+
+Collection = TypeVar("Collection")
+# Read preferences `make_read_preference` can return
+AnyReadPreference = Union[Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest]
+
+
+def client_options() -> Dict[str, Any]:
+    """
+    Build keyword arguments shared by the sync & asyncio clients.
+
+    Returns:
+        Dict[str, Any]: Options for `MongoClient` / `AsyncMongoClient`.
+    """
+    options: Dict[str, Any] = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+    }
+    if MONGO_WAIT_QUEUE_TIMEOUT_MS > 0:
+        options["waitQueueTimeoutMS"] = MONGO_WAIT_QUEUE_TIMEOUT_MS
+    if MONGO_COMPRESSORS:
+        options["compressors"] = MONGO_COMPRESSORS
+    if DB_METRICS:
+        options["event_listeners"] = [command_listener]
+    return options
+
+
+def usage_timeseries_options() -> Dict[str, str]:
+    """
+    Time-series options for the usage collection.
+
+    Readings are bucketed per device, so range scans over one device's history
+    read a few compressed buckets instead of one document per reading.
+
+    Returns:
+        Dict[str, str]: The `timeseries` argument for `create_collection`.
+    """
+    return {
+        "timeField": "timestamp",
+        "metaField": "device_id",
+        "granularity": USAGE_TIMESERIES_GRANULARITY,
+    }
+
+
+def analytics_read_preference() -> AnyReadPreference:
+    """
+    Read preference for report, analytics & aggregate scans.
+
+    Returns:
+        AnyReadPreference: The configured read preference.
+
+    Raises:
+        ValueError: If `MONGO_ANALYTICS_READ_PREFERENCE` is not a valid mode name.
+    """
+    try:
+        mode = read_pref_mode_from_name(MONGO_ANALYTICS_READ_PREFERENCE)
+    except ValueError as e:
+        raise ValueError(f"Invalid MONGO_ANALYTICS_READ_PREFERENCE: {MONGO_ANALYTICS_READ_PREFERENCE}") from e
+    max_staleness = MONGO_ANALYTICS_MAX_STALENESS if mode else -1   # Primary reads cannot set staleness
+    return make_read_preference(mode, None, max_staleness)
+
+
+def ingest_write_concern() -> WriteConcern:
+    """
+    Write concern for high-volume usage ingestion.
+
+    Returns:
+        WriteConcern: The configured write concern.
+    """
+    return WriteConcern(w=MONGO_INGEST_W, j=MONGO_INGEST_JOURNAL)
+
+
+def with_workload(collection: Collection, workload: Optional[str]) -> Collection:
+    """
+    Return a handle to a collection carrying a workload's options.
+
+    Works with both `Collection` and `AsyncCollection`; no connection is made.
+
+    Args:
+        collection: Base collection handle.
+        workload (Optional[str]): `WORKLOAD_ANALYTICS`, `WORKLOAD_INGEST` or None.
+
+    Returns:
+        The same collection with the workload's read preference or write concern.
+
+    Raises:
+        ValueError: If the workload is unknown.
+    """
+    if workload is None:
+        return collection
+    if workload == WORKLOAD_ANALYTICS:
+        return collection.with_options(read_preference=analytics_read_preference())
+    if workload == WORKLOAD_INGEST:
+        return collection.with_options(write_concern=ingest_write_concern())
+    raise ValueError(f"Unknown workload: {workload}")
@@ -1,13 +1,22 @@
 """
 Main application entry point for the smart home API.
 """
+import asyncio
+import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 # Import database initialization
-from app.db.data import init_db
+from app.db.data import d, init_db
+from app.db.settings import DB_INDEX_BOOTSTRAP, DB_METRICS
+from app.db.async_data import close_async_db
+from app.core.password import shutdown_password_pool
+from app.core.middleware import DBMetricsMiddleware
+from app.services.usage_buffer import close_usage_buffer
+from app.services.usage_retention import USAGE_RETENTION_INTERVAL, retention_loop, stop_retention
 
 # Import routers
+from app.routes.auth_routes import router as auth_router
 from app.routes.user_routes import router as user_router
 from app.routes.profile_routes import router as profile_router
 from app.routes.device_routes import router as device_router
@@ -20,6 +29,7 @@ from app.routes.goal_routes import router as goal_router
 from app.routes.analytics_routes import router as analytics_router
 from app.routes.suggestion_routes import router as suggestion_router
 from app.routes.report_routes import router as report_router  # NEW: Import report router
+from app.routes.metrics_routes import router as metrics_router
 
 # Create FastAPI application
 app = FastAPI(
@@ -37,18 +47,52 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Count database commands per request
+if DB_METRICS:
+    app.add_middleware(DBMetricsMiddleware)
+
+logger = logging.getLogger(__name__)
+
+
+def _log_bootstrap_result(task: asyncio.Task):
+    """Report a failed background index bootstrap."""
+    if not task.cancelled() and task.exception():
+        logger.error("Index bootstrap failed", exc_info=task.exception())
+
 # Add event handlers for startup
 @app.on_event("startup")
-def startup_event():
+async def startup_event():
     """Initialize database on startup."""
-    init_db()
+    if DB_INDEX_BOOTSTRAP == "blocking":
+        await asyncio.to_thread(init_db)
+    elif DB_INDEX_BOOTSTRAP != "off":
+        # Serve requests while indexes are checked; hold a reference so the task is not collected
+        app.state.index_bootstrap = asyncio.create_task(asyncio.to_thread(init_db))
+        app.state.index_bootstrap.add_done_callback(_log_bootstrap_result)
+    
+    # Compact & delete expired usage data; a lease keeps it to one worker at a time
+    if USAGE_RETENTION_INTERVAL > 0:
+        app.state.usage_retention = asyncio.create_task(retention_loop(d, USAGE_RETENTION_INTERVAL))
     
     # Create reports directory if it doesn't exist
     import os
     from app.utils.report.report_generator import REPORTS_DIR
     os.makedirs(REPORTS_DIR, exist_ok=True)
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release database connections and worker pools on shutdown."""
+    retention = getattr(app.state, "usage_retention", None)
+    if retention is not None:
+        stop_retention()
+        retention.cancel()
+    # Queued usage records need the client, so flush them first
+    await close_usage_buffer()
+    await close_async_db()
+    shutdown_password_pool()
+
 # Include routers
+app.include_router(auth_router, prefix="/api/v1")
 app.include_router(user_router, prefix="/api/v1")
 app.include_router(profile_router, prefix="/api/v1")
 app.include_router(device_router, prefix="/api/v1")
@@ -61,6 +105,7 @@ app.include_router(goal_router, prefix="/api/v1")
 app.include_router(analytics_router, prefix="/api/v1")
 app.include_router(suggestion_router, prefix="/api/v1")
 app.include_router(report_router, prefix="/api/v1")  # NEW: Include report router
+app.include_router(metrics_router, prefix="/api/v1")
 
 # Add a root endpoint for API health check
 @app.get("/")
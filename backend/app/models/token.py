@@ -0,0 +1,23 @@
+"""
+Models for bearer token authentication.
+"""
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict
+
+
+class TokenResponse(BaseModel):
+    """
+    Model for an issued bearer token returned in API responses.
+
+    Attributes:
+        access_token (str): Signed token to send as `Authorization: Bearer <token>`.
+        token_type (str): Token scheme, always "bearer".
+        expires_in (int): Seconds until the token expires.
+        expires_at (datetime): When the token expires (UTC).
+    """
+    access_token: str
+    token_type: str = "bearer"
+    expires_in: int
+    expires_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
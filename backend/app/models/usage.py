@@ -3,6 +3,7 @@ Models for device usage tracking.
 """
 import uuid
 from datetime import datetime
+from enum import Enum
 from typing import Optional, Dict, Any, List
 from pydantic import BaseModel, ConfigDict, Field, field_validator
 
@@ -22,7 +23,7 @@ class CreateUsage(BaseModel):
     metrics: Dict[str, Any]
     timestamp: Optional[datetime] = None
     duration: Optional[int] = None
-    energy_consumed: Optional[float] = None
+    energy_consumed: Optional[float] = Field(None, allow_inf_nan=False)
     status: Optional[str] = None
 
     @field_validator("device_id")
@@ -150,7 +151,7 @@ class UsageUpdate(BaseModel):
     """
     metrics: Optional[Dict[str, Any]] = None
     duration: Optional[int] = None
-    energy_consumed: Optional[float] = None
+    energy_consumed: Optional[float] = Field(None, allow_inf_nan=False)
     status: Optional[str] = None
 
     @field_validator("energy_consumed")
@@ -199,7 +200,9 @@ class UsageAggregateResponse(BaseModel):
     Model for aggregated usage statistics returned in API responses.
 
     Attributes:
-        device_id (str): ID of the device being monitored.
+        device_id (Optional[str]): ID of the device, when one device was aggregated.
+        device_ids (List[str]): IDs of the devices aggregated; empty when an
+            admin aggregated every device.
         start_date (datetime): Start of the aggregation period.
         end_date (datetime): End of the aggregation period.
         total_duration (int): Total usage duration in seconds.
@@ -207,7 +210,8 @@ class UsageAggregateResponse(BaseModel):
         average_metrics (Dict[str, float]): Average of numeric metrics.
         usage_count (int): Number of usage records in the period.
     """
-    device_id: str
+    device_id: Optional[str] = None
+    device_ids: List[str] = []
     start_date: datetime
     end_date: datetime
     total_duration: int = 0
@@ -248,6 +252,72 @@ class UsageBulkCreate(BaseModel):
         return v
 
 
+class UsageBulkRecordResult(BaseModel):
+    """
+    Outcome of one record in a bulk usage insert.
+
+    Attributes:
+        index (int): Position of the record in the request.
+        id (Optional[str]): ID assigned to the record.
+        status (str): `created`, `duplicate` or `failed`.
+        error (Optional[str]): Why the record was not stored.
+    """
+    index: int
+    id: Optional[str] = None
+    status: str
+    error: Optional[str] = None
+
+
+class UsageBulkResponse(BaseModel):
+    """
+    Model for the result of a bulk usage insert.
+
+    Attributes:
+        inserted (int): Number of records stored.
+        duplicates (int): Number of records that were already stored.
+        failed (int): Number of records rejected for other reasons.
+        results (List[UsageBulkRecordResult]): Per-record outcomes in request order.
+    """
+    inserted: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    results: List[UsageBulkRecordResult] = []
+
+
+class UsageStreamLineError(BaseModel):
+    """
+    A line of an NDJSON usage upload that was not stored.
+
+    Attributes:
+        line (int): Line number in the upload, starting at 1.
+        error (str): Why the line was rejected.
+    """
+    line: int
+    error: str
+
+
+class UsageStreamSummary(BaseModel):
+    """
+    Model for the result of a streamed NDJSON usage upload.
+
+    Attributes:
+        lines (int): Non-empty lines read.
+        accepted (int): Records stored.
+        rejected (int): Lines that failed validation, authorization or insertion.
+        duplicates (int): Lines whose reading was already stored (not rejected).
+        batches (int): Number of inserts issued.
+        errors (List[UsageStreamLineError]): The first rejected lines.
+        errors_truncated (bool): Whether more lines were rejected than are listed.
+    """
+    lines: int = 0
+    accepted: int = 0
+    rejected: int = 0
+    duplicates: int = 0
+    batches: int = 0
+    errors: List[UsageStreamLineError] = []
+    errors_truncated: bool = False
+
+
 class UsageTimeRange(BaseModel):
     """
     Model for specifying a time range for usage queries.
@@ -256,10 +326,13 @@ class UsageTimeRange(BaseModel):
         start_time (datetime): Start of the time range.
         end_time (datetime): End of the time range.
         device_id (Optional[str]): Optional device ID to filter by.
+        device_ids (Optional[List[str]]): Optional device IDs to filter by,
+            together with `device_id`.
     """
     start_time: datetime
     end_time: datetime
     device_id: Optional[str] = None
+    device_ids: Optional[List[str]] = None
 
     @field_validator("end_time")
     @classmethod
@@ -271,3 +344,53 @@ class UsageTimeRange(BaseModel):
             raise ValueError("End time must be after start time")
 
         return v
+
+
+class ExportFormat(str, Enum):
+    """
+    Enumeration of usage export formats.
+    """
+    NDJSON = "ndjson"
+    CSV = "csv"
+    ARROW = "arrow"
+
+
+class SeriesInterval(str, Enum):
+    """
+    Enumeration of usage series bucket widths.
+    """
+    MINUTE = "minute"
+    HOUR = "hour"
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+
+class SeriesFill(str, Enum):
+    """
+    Enumeration of ways to fill series buckets without readings.
+    """
+    NULL = "null"
+    ZERO = "zero"
+    PREVIOUS = "previous"
+
+
+class UsageSeriesResponse(BaseModel):
+    """
+    Model for a time-bucketed usage series returned in API responses.
+
+    Attributes:
+        interval (SeriesInterval): Width of each bucket.
+        value (str): What each bucket holds: `energy`, `duration` or `count`
+            totals, or the average of a numeric metric.
+        start_date (datetime): Start of the series range.
+        end_date (datetime): End of the series range.
+        timestamps (List[datetime]): Start of each bucket (UTC), shared by every device.
+        series (Dict[str, List[Optional[float]]]): One value per bucket for each device.
+    """
+    interval: SeriesInterval
+    value: str
+    start_date: datetime
+    end_date: datetime
+    timestamps: List[datetime] = []
+    series: Dict[str, List[Optional[float]]] = {}
@@ -16,7 +16,9 @@ from app.models.access_management import (
     AccessLevel
 )
 # Import at module level for easier patching in tests
-from app.db.data import am_c  # Access Management collection
+from app.db.async_data import am_c  # Access Management collection
+from app.db.repository import projection_for
+from app.core.pagination import find_page, keyset_sort
 from app.core.auth import get_current_user
 from app.models.user import UserDB  # For authorization
 
@@ -24,8 +26,10 @@ router = APIRouter(prefix="/access-management", tags=["access-management"])
 
 @router.get("/", response_model=List[AccessManagementResponse])
 async def get_all_access_management(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     current_user: UserDB = Depends(get_current_user),
     owner_id: Optional[str] = None,
     resource_id: Optional[str] = None,
@@ -39,6 +43,9 @@ async def get_all_access_management(
     
     Admin users can see all entries.
     Regular users can only see entries where they are the owner or the granted user.
+    
+    Pass `cursor` (empty for the first page) to page by keyset instead of
+    `skip`; the cursor of the next page is returned in the `X-Next-Cursor` header.
     """
     # Build query filter
     query: Dict[str, Any] = {}
@@ -66,8 +73,12 @@ async def get_all_access_management(
         query["active"] = active
     
     # Convert cursor to list
-    cursor = am_c.find(query).skip(skip).limit(limit)
-    entries = list(cursor)
+    if cursor is not None:
+        entries = await find_page(
+            am_c, query, projection_for(AccessManagementResponse), keyset_sort(), limit, cursor, response, skip=skip
+        )
+    else:
+        entries = await am_c.find(query, projection_for(AccessManagementResponse)).skip(skip).limit(limit).to_list(None)
     
     # Convert to AccessManagementResponse models
     return [AccessManagementResponse.model_validate(entry) for entry in entries]
@@ -84,7 +95,7 @@ async def get_access_management(
     Admin users can access any entry.
     """
     # Get the entry
-    entry = am_c.find_one({"id": entry_id})
+    entry = await am_c.find_one({"id": entry_id}, projection_for(AccessManagementResponse))
     
     if not entry:
         raise HTTPException(
@@ -139,7 +150,7 @@ async def create_access_management(
         
         # Insert the entry into the database
         try:
-            am_c.insert_one(access_db.model_dump())
+            await am_c.insert_one(access_db.model_dump())
             created_entries.append(access_db)
         except DuplicateKeyError:
             # Skip duplicates and continue
@@ -166,7 +177,7 @@ async def update_access_management(
     Admin users can update any entry.
     """
     # Find the entry to update
-    entry = am_c.find_one({"id": entry_id})
+    entry = await am_c.find_one({"id": entry_id})
     if not entry:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -189,7 +200,7 @@ async def update_access_management(
     # Perform the update if there's data to update
     if update_data:
         try:
-            result = am_c.update_one(
+            result = await am_c.update_one(
                 {"id": entry_id},
                 {"$set": update_data}
             )
@@ -205,7 +216,7 @@ async def update_access_management(
             )
     
     # Retrieve and return the updated entry
-    updated_entry = am_c.find_one({"id": entry_id})
+    updated_entry = await am_c.find_one({"id": entry_id}, projection_for(AccessManagementResponse))
     return AccessManagementResponse.model_validate(updated_entry)
 
 @router.delete("/{entry_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -220,7 +231,7 @@ async def delete_access_management(
     Admin users can delete any entry.
     """
     # Find the entry to delete
-    entry = am_c.find_one({"id": entry_id})
+    entry = await am_c.find_one({"id": entry_id})
     if not entry:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -235,7 +246,7 @@ async def delete_access_management(
         )
     
     # Perform the deletion
-    result = am_c.delete_one({"id": entry_id})
+    result = await am_c.delete_one({"id": entry_id})
     
     if result.deleted_count == 0:
         raise HTTPException(
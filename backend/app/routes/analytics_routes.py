@@ -15,7 +15,9 @@ from app.models.analytics import (
     AnalyticsQuery
 )
 # Import at module level for easier patching in tests
-from app.db.data import an_c  # Analytics collection
+from app.db.async_data import an_c, an_c_analytics  # Analytics collection & scan handle
+from app.db.repository import projection_for
+from app.core.pagination import find_page, keyset_sort
 from app.core.auth import get_current_user
 from app.models.user import UserDB  # For authorization
 
@@ -23,8 +25,10 @@ router = APIRouter(prefix="/analytics", tags=["analytics"])
 
 @router.get("/", response_model=List[AnalyticsResponse])
 async def get_all_analytics(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     current_user: UserDB = Depends(get_current_user),
     user_id: Optional[str] = None,
     device_id: Optional[str] = None,
@@ -36,6 +40,9 @@ async def get_all_analytics(
     """
     Get all analytics data with filtering options.
     Admin users can see all analytics, while regular users can only see their own.
+    
+    Pass `cursor` (empty for the first page) to page by keyset instead of
+    `skip`; the cursor of the next page is returned in the `X-Next-Cursor` header.
     """
     # Create query object and validate time range if provided
     query_params = AnalyticsQuery(
@@ -83,8 +90,12 @@ async def get_all_analytics(
         query["tags"] = {"$in": query_params.tags}
     
     # Add sorting by timestamp (descending)
-    cursor = an_c.find(query).sort("timestamp", -1).skip(skip).limit(limit)
-    analytics_data = list(cursor)
+    if cursor is not None:
+        analytics_data = await find_page(
+            an_c_analytics, query, projection_for(AnalyticsResponse), keyset_sort(("timestamp", -1)), limit, cursor, response, skip=skip
+        )
+    else:
+        analytics_data = await an_c_analytics.find(query, projection_for(AnalyticsResponse)).sort("timestamp", -1).skip(skip).limit(limit).to_list(None)
     
     # Convert to AnalyticsResponse models
     return [AnalyticsResponse.model_validate(item) for item in analytics_data]
@@ -99,7 +110,7 @@ async def get_analytics(
     Users can only access their own analytics, while admins can access any analytics.
     """
     # Get the analytics record
-    analytics = an_c.find_one({"id": analytics_id})
+    analytics = await an_c.find_one({"id": analytics_id}, projection_for(AnalyticsResponse))
     
     if not analytics:
         raise HTTPException(
@@ -137,7 +148,7 @@ async def create_analytics(
     
     # Insert the analytics into the database
     try:
-        an_c.insert_one(analytics_db.model_dump())
+        await an_c.insert_one(analytics_db.model_dump())
     except DuplicateKeyError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -157,7 +168,7 @@ async def update_analytics(
     Users can only update their own analytics, while admins can update any analytics.
     """
     # Find the analytics to update
-    analytics = an_c.find_one({"id": analytics_id})
+    analytics = await an_c.find_one({"id": analytics_id})
     if not analytics:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -179,7 +190,7 @@ async def update_analytics(
     
     # Perform the update if there's data to update
     if update_data:
-        result = an_c.update_one(
+        result = await an_c.update_one(
             {"id": analytics_id},
             {"$set": update_data}
         )
@@ -190,7 +201,7 @@ async def update_analytics(
             )
     
     # Retrieve and return the updated analytics
-    updated_analytics = an_c.find_one({"id": analytics_id})
+    updated_analytics = await an_c.find_one({"id": analytics_id}, projection_for(AnalyticsResponse))
     return AnalyticsResponse.model_validate(updated_analytics)
 
 @router.delete("/{analytics_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -203,7 +214,7 @@ async def delete_analytics(
     Users can only delete their own analytics, while admins can delete any analytics.
     """
     # Find the analytics to delete
-    analytics = an_c.find_one({"id": analytics_id})
+    analytics = await an_c.find_one({"id": analytics_id})
     if not analytics:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -218,7 +229,7 @@ async def delete_analytics(
         )
     
     # Perform the deletion
-    result = an_c.delete_one({"id": analytics_id})
+    result = await an_c.delete_one({"id": analytics_id})
     
     if result.deleted_count == 0:
         raise HTTPException(
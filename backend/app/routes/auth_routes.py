@@ -0,0 +1,29 @@
+"""
+Authentication routes for the smart home system.
+"""
+import time
+from datetime import datetime
+from fastapi import APIRouter, Depends, status
+
+from app.models.token import TokenResponse
+from app.core.auth import get_basic_user
+from app.core.token import create_token
+from app.models.user import UserDB  # For authorization
+
+router = APIRouter(prefix="/auth", tags=["auth"])
+
+@router.post("/token", response_model=TokenResponse, status_code=status.HTTP_200_OK)
+async def issue_token(
+    current_user: UserDB = Depends(get_basic_user)
+) -> TokenResponse:
+    """
+    Exchange HTTP Basic credentials for a short-lived bearer token.
+    The token is accepted by every endpoint in place of Basic credentials.
+    """
+    token, expires = create_token(current_user)
+
+    return TokenResponse(
+        access_token=token,
+        expires_in=max(0, expires - int(time.time())),
+        expires_at=datetime.utcfromtimestamp(expires)
+    )
@@ -9,7 +9,9 @@ from pymongo.errors import DuplicateKeyError
 
 from app.models.automation import CreateAutomation, AutomationDB, AutomationResponse, AutomationDetailResponse, AutomationUpdate, TriggerType, ActionType
 # Import at module level for easier patching in tests
-from app.db.data import a_c  # Automation collection
+from app.db.async_data import a_c  # Automation collection
+from app.db.repository import projection_for
+from app.core.pagination import find_page, keyset_sort
 from app.core.auth import get_current_user
 from app.models.user import UserDB  # For authorization
 
@@ -17,8 +19,10 @@ router = APIRouter(prefix="/automations", tags=["automations"])
 
 @router.get("/", response_model=List[AutomationResponse])
 async def get_all_automations(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     current_user: UserDB = Depends(get_current_user),
     user_id: Optional[str] = None,
     device_id: Optional[str] = None,
@@ -29,6 +33,9 @@ async def get_all_automations(
     """
     Get all automations.
     Admin users can see all automations, while regular users can only see their own.
+    
+    Pass `cursor` (empty for the first page) to page by keyset instead of
+    `skip`; the cursor of the next page is returned in the `X-Next-Cursor` header.
     """
     # Check if user is admin
     if current_user.role != "admin":
@@ -49,8 +56,12 @@ async def get_all_automations(
         query["enabled"] = enabled
     
     # Convert cursor to list
-    cursor = a_c.find(query).skip(skip).limit(limit)
-    automations = list(cursor)
+    if cursor is not None:
+        automations = await find_page(
+            a_c, query, projection_for(AutomationResponse), keyset_sort(), limit, cursor, response, skip=skip
+        )
+    else:
+        automations = await a_c.find(query, projection_for(AutomationResponse)).skip(skip).limit(limit).to_list(None)
     
     # Convert to AutomationResponse models
     return [AutomationResponse.model_validate(automation) for automation in automations]
@@ -65,7 +76,7 @@ async def get_automation(
     Users can only access their own automations, while admins can access any automation.
     """
     # Get the automation
-    automation = a_c.find_one({"id": automation_id})
+    automation = await a_c.find_one({"id": automation_id}, projection_for(AutomationDetailResponse))
     
     if not automation:
         raise HTTPException(
@@ -103,7 +114,7 @@ async def create_automation(
     
     # Insert the automation into the database
     try:
-        a_c.insert_one(automation_db.model_dump())
+        await a_c.insert_one(automation_db.model_dump())
     except DuplicateKeyError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -123,7 +134,7 @@ async def update_automation(
     Users can only update their own automations, while admins can update any automation.
     """
     # Find the automation to update
-    automation = a_c.find_one({"id": automation_id})
+    automation = await a_c.find_one({"id": automation_id})
     if not automation:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -146,7 +157,7 @@ async def update_automation(
     # Perform the update if there's data to update
     if update_data:
         try:
-            result = a_c.update_one(
+            result = await a_c.update_one(
                 {"id": automation_id},
                 {"$set": update_data}
             )
@@ -162,7 +173,7 @@ async def update_automation(
             )
     
     # Retrieve and return the updated automation
-    updated_automation = a_c.find_one({"id": automation_id})
+    updated_automation = await a_c.find_one({"id": automation_id}, projection_for(AutomationDetailResponse))
     return AutomationDetailResponse.model_validate(updated_automation)
 
 @router.delete("/{automation_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -175,7 +186,7 @@ async def delete_automation(
     Users can only delete their own automations, while admins can delete any automation.
     """
     # Find the automation to delete
-    automation = a_c.find_one({"id": automation_id})
+    automation = await a_c.find_one({"id": automation_id})
     if not automation:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -190,7 +201,7 @@ async def delete_automation(
         )
     
     # Perform the deletion
-    result = a_c.delete_one({"id": automation_id})
+    result = await a_c.delete_one({"id": automation_id})
     
     if result.deleted_count == 0:
         raise HTTPException(
@@ -10,16 +10,21 @@ from pymongo.errors import DuplicateKeyError
 
 from app.models.device import CreateDevice, DeviceDB, DeviceResponse, DeviceUpdate, DeviceType, DeviceStatus
 # Import at module level for easier patching in tests
-from app.db.data import d_c  # Device collection
+from app.db.async_data import d_c  # Device collection
+from app.db.repository import projection_for
+from app.core.pagination import find_page, keyset_sort
 from app.core.auth import get_current_user
+from app.core.ownership import invalidate_device
 from app.models.user import UserDB  # For authorization
 
 router = APIRouter(prefix="/devices", tags=["devices"])
 
 @router.get("/", response_model=List[DeviceResponse])
 async def get_all_devices(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     current_user: UserDB = Depends(get_current_user),
     user_id: Optional[str] = None,
     type: Optional[DeviceType] = None,
@@ -37,6 +42,9 @@ async def get_all_devices(
     - room_id: Filter by room ID
     - status: Filter by device status
     - manufacturer: Filter by manufacturer
+    
+    Pass `cursor` (empty for the first page) to page by keyset instead of
+    `skip`; the cursor of the next page is returned in the `X-Next-Cursor` header.
     """
     # Check if user is admin
     if current_user.role != "admin":
@@ -57,8 +65,12 @@ async def get_all_devices(
         query["manufacturer"] = manufacturer
     
     # Convert cursor to list
-    cursor = d_c.find(query).skip(skip).limit(limit)
-    devices = list(cursor)
+    if cursor is not None:
+        devices = await find_page(
+            d_c, query, projection_for(DeviceResponse), keyset_sort(), limit, cursor, response, skip=skip
+        )
+    else:
+        devices = await d_c.find(query, projection_for(DeviceResponse)).skip(skip).limit(limit).to_list(None)
     
     # Convert to DeviceResponse models
     return [DeviceResponse.model_validate(device) for device in devices]
@@ -73,7 +85,7 @@ async def get_device(
     Users can only access their own devices, while admins can access any device.
     """
     # Get the device
-    device = d_c.find_one({"id": device_id})
+    device = await d_c.find_one({"id": device_id}, projection_for(DeviceResponse))
     
     if not device:
         raise HTTPException(
@@ -116,15 +128,16 @@ async def create_device(
     
     # Insert the device into the database
     try:
-        d_c.insert_one(device_db.model_dump())
+        await d_c.insert_one(device_db.model_dump())
     except DuplicateKeyError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Device with this ID already exists"
         )
+    invalidate_device(device_id, device_db.user_id)
     
     # Fetch the newly created device from the database
-    device = d_c.find_one({"id": device_id})
+    device = await d_c.find_one({"id": device_id})
     
     return DeviceResponse.model_validate(device)
 
@@ -139,7 +152,7 @@ async def update_device(
     Users can only update their own devices, while admins can update any device.
     """
     # Find the device to update
-    device = d_c.find_one({"id": device_id})
+    device = await d_c.find_one({"id": device_id})
     if not device:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -162,7 +175,7 @@ async def update_device(
     # Perform the update if there's data to update
     if update_data:
         try:
-            result = d_c.update_one(
+            result = await d_c.update_one(
                 {"id": device_id},
                 {"$set": update_data}
             )
@@ -176,9 +189,10 @@ async def update_device(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Update would create a duplicate device"
             )
+        invalidate_device(device_id, device["user_id"], update_data.get("user_id"))
     
     # Retrieve and return the updated device
-    updated_device = d_c.find_one({"id": device_id})
+    updated_device = await d_c.find_one({"id": device_id}, projection_for(DeviceResponse))
     return DeviceResponse.model_validate(updated_device)
 
 @router.delete("/{device_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -191,7 +205,7 @@ async def delete_device(
     Users can only delete their own devices, while admins can delete any device.
     """
     # Find the device to delete
-    device = d_c.find_one({"id": device_id})
+    device = await d_c.find_one({"id": device_id})
     if not device:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -206,7 +220,8 @@ async def delete_device(
         )
     
     # Perform the deletion
-    result = d_c.delete_one({"id": device_id})
+    result = await d_c.delete_one({"id": device_id})
+    invalidate_device(device_id, device["user_id"])
     
     if result.deleted_count == 0:
         raise HTTPException(
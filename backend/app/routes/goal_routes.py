@@ -18,7 +18,9 @@ from app.models.goal import (
     GoalTimeframe
 )
 # Import at module level for easier patching in tests
-from app.db.data import g_c  # Goal collection
+from app.db.async_data import g_c  # Goal collection
+from app.db.repository import projection_for
+from app.core.pagination import find_page, keyset_sort
 from app.core.auth import get_current_user
 from app.models.user import UserDB  # For authorization
 
@@ -26,8 +28,10 @@ router = APIRouter(prefix="/goals", tags=["goals"])
 
 @router.get("/", response_model=List[EnergyGoalResponse])
 async def get_all_goals(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     current_user: UserDB = Depends(get_current_user),
     user_id: Optional[str] = None,
     type: Optional[GoalType] = None,
@@ -37,6 +41,9 @@ async def get_all_goals(
     """
     Get all energy goals with filtering options.
     Admin users can see all goals, while regular users can only see their own.
+    
+    Pass `cursor` (empty for the first page) to page by keyset instead of
+    `skip`; the cursor of the next page is returned in the `X-Next-Cursor` header.
     """
     # Check if user is admin
     if current_user.role != "admin":
@@ -55,8 +62,12 @@ async def get_all_goals(
         query["timeframe"] = timeframe
     
     # Convert cursor to list
-    cursor = g_c.find(query).skip(skip).limit(limit)
-    goals = list(cursor)
+    if cursor is not None:
+        goals = await find_page(
+            g_c, query, projection_for(EnergyGoalResponse), keyset_sort(), limit, cursor, response, skip=skip
+        )
+    else:
+        goals = await g_c.find(query, projection_for(EnergyGoalResponse)).skip(skip).limit(limit).to_list(None)
     
     # Convert to EnergyGoalResponse models
     return [EnergyGoalResponse.model_validate(goal) for goal in goals]
@@ -71,7 +82,7 @@ async def get_goal(
     Users can only access their own goals, while admins can access any goal.
     """
     # Get the goal
-    goal = g_c.find_one({"id": goal_id})
+    goal = await g_c.find_one({"id": goal_id}, projection_for(EnergyGoalResponse))
     
     if not goal:
         raise HTTPException(
@@ -113,7 +124,7 @@ async def create_goal(
     
     # Insert the goal into the database
     try:
-        g_c.insert_one(goal_db.model_dump())
+        await g_c.insert_one(goal_db.model_dump())
     except DuplicateKeyError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -133,7 +144,7 @@ async def update_goal(
     Users can only update their own goals, while admins can update any goal.
     """
     # Find the goal to update
-    goal = g_c.find_one({"id": goal_id})
+    goal = await g_c.find_one({"id": goal_id})
     if not goal:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -164,7 +175,7 @@ async def update_goal(
     # Perform the update if there's data to update
     if update_data:
         try:
-            result = g_c.update_one(
+            result = await g_c.update_one(
                 {"id": goal_id},
                 {"$set": update_data}
             )
@@ -180,7 +191,7 @@ async def update_goal(
             )
     
     # Retrieve and return the updated goal
-    updated_goal = g_c.find_one({"id": goal_id})
+    updated_goal = await g_c.find_one({"id": goal_id}, projection_for(EnergyGoalResponse))
     return EnergyGoalResponse.model_validate(updated_goal)
 
 @router.patch("/{goal_id}/progress", response_model=EnergyGoalResponse)
@@ -194,7 +205,7 @@ async def update_goal_progress(
     Users can only update their own goals, while admins can update any goal.
     """
     # Find the goal to update
-    goal = g_c.find_one({"id": goal_id})
+    goal = await g_c.find_one({"id": goal_id})
     if not goal:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -227,7 +238,7 @@ async def update_goal_progress(
     
     # Perform the update
     try:
-        result = g_c.update_one(
+        result = await g_c.update_one(
             {"id": goal_id},
             {"$set": update_data}
         )
@@ -243,7 +254,7 @@ async def update_goal_progress(
         )
     
     # Retrieve and return the updated goal
-    updated_goal = g_c.find_one({"id": goal_id})
+    updated_goal = await g_c.find_one({"id": goal_id}, projection_for(EnergyGoalResponse))
     return EnergyGoalResponse.model_validate(updated_goal)
 
 @router.delete("/{goal_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -256,7 +267,7 @@ async def delete_goal(
     Users can only delete their own goals, while admins can delete any goal.
     """
     # Find the goal to delete
-    goal = g_c.find_one({"id": goal_id})
+    goal = await g_c.find_one({"id": goal_id})
     if not goal:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -271,7 +282,7 @@ async def delete_goal(
         )
     
     # Perform the deletion
-    result = g_c.delete_one({"id": goal_id})
+    result = await g_c.delete_one({"id": goal_id})
     
     if result.deleted_count == 0:
         raise HTTPException(
@@ -0,0 +1,39 @@
+"""
+Runtime metrics routes for the smart home system.
+"""
+from typing import Any, Dict
+from fastapi import APIRouter, Depends
+
+from app.core.auth import get_current_user, auth_cache_stats, identity_cache_stats
+from app.core.ownership import ownership_cache_stats
+from app.core.password import password_pool_stats, verify_role
+from app.db.monitoring import db_route_stats
+from app.services.usage_buffer import usage_buffer_stats
+from app.services.usage_export import usage_export_stats
+from app.services.usage_retention import usage_retention_stats
+from app.services.usage_rollups import usage_rollup_stats
+from app.models.user import UserDB  # For authorization
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+@router.get("/", response_model=Dict[str, Any])
+async def get_metrics(
+    current_user: UserDB = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """
+    Get in-process performance counters for this worker.
+    Only admin users can view metrics.
+    """
+    verify_role(current_user.role, "admin")
+
+    return {
+        "auth_cache": auth_cache_stats(),
+        "identity_cache": identity_cache_stats(),
+        "ownership_cache": ownership_cache_stats(),
+        "password_pool": password_pool_stats(),
+        "db_routes": db_route_stats(),
+        "usage_buffer": usage_buffer_stats(),
+        "usage_export": usage_export_stats(),
+        "usage_rollups": usage_rollup_stats(),
+        "usage_retention": usage_retention_stats(),
+    }
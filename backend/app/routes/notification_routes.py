@@ -15,7 +15,9 @@ from app.models.notification import (
     NotificationBulkUpdate
 )
 # Import at module level for easier patching in tests
-from app.db.data import n_c  # Notification collection
+from app.db.async_data import n_c  # Notification collection
+from app.db.repository import projection_for
+from app.core.pagination import find_page, keyset_sort
 from app.core.auth import get_current_user
 from app.models.user import UserDB  # For authorization
 
@@ -23,8 +25,10 @@ router = APIRouter(prefix="/notifications", tags=["notifications"])
 
 @router.get("/", response_model=List[NotificationResponse])
 async def get_all_notifications(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     current_user: UserDB = Depends(get_current_user),
     user_id: Optional[str] = None,
     read: Optional[bool] = None,
@@ -37,6 +41,9 @@ async def get_all_notifications(
     """
     Get all notifications.
     Admin users can see all notifications, while regular users can only see their own.
+    
+    Pass `cursor` (empty for the first page) to page by keyset instead of
+    `skip`; the cursor of the next page is returned in the `X-Next-Cursor` header.
     """
     # Check if user is admin
     if current_user.role != "admin":
@@ -66,8 +73,12 @@ async def get_all_notifications(
         query["timestamp"] = date_query
     
     # Convert cursor to list
-    cursor = n_c.find(query).sort("timestamp", -1).skip(skip).limit(limit)
-    notifications = list(cursor)
+    if cursor is not None:
+        notifications = await find_page(
+            n_c, query, projection_for(NotificationResponse), keyset_sort(("timestamp", -1)), limit, cursor, response, skip=skip
+        )
+    else:
+        notifications = await n_c.find(query, projection_for(NotificationResponse)).sort("timestamp", -1).skip(skip).limit(limit).to_list(None)
     
     # Convert to NotificationResponse models
     return [NotificationResponse.model_validate(notification) for notification in notifications]
@@ -82,7 +93,7 @@ async def get_notification(
     Users can only access their own notifications, while admins can access any notification.
     """
     # Get the notification
-    notification = n_c.find_one({"id": notification_id})
+    notification = await n_c.find_one({"id": notification_id}, projection_for(NotificationResponse))
     
     if not notification:
         raise HTTPException(
@@ -121,7 +132,7 @@ async def create_notification(
     
     # Insert the notification into the database
     try:
-        n_c.insert_one(notification_db.model_dump())
+        await n_c.insert_one(notification_db.model_dump())
     except DuplicateKeyError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -141,7 +152,7 @@ async def update_notification(
     Users can only update their own notifications, while admins can update any notification.
     """
     # Find the notification to update
-    notification = n_c.find_one({"id": notification_id})
+    notification = await n_c.find_one({"id": notification_id})
     if not notification:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -169,7 +180,7 @@ async def update_notification(
     # Perform the update if there's data to update
     if update_data:
         try:
-            result = n_c.update_one(
+            result = await n_c.update_one(
                 {"id": notification_id},
                 {"$set": update_data}
             )
@@ -185,7 +196,7 @@ async def update_notification(
             )
     
     # Retrieve and return the updated notification
-    updated_notification = n_c.find_one({"id": notification_id})
+    updated_notification = await n_c.find_one({"id": notification_id}, projection_for(NotificationResponse))
     return NotificationResponse.model_validate(updated_notification)
 
 @router.post("/bulk_update", response_model=dict)
@@ -214,7 +225,7 @@ async def bulk_update_notifications(
         update_data["read_timestamp"] = None
     
     # Perform the update
-    result = n_c.update_many(
+    result = await n_c.update_many(
         query,
         {"$set": update_data}
     )
@@ -234,7 +245,7 @@ async def delete_notification(
     Users can only delete their own notifications, while admins can delete any notification.
     """
     # Find the notification to delete
-    notification = n_c.find_one({"id": notification_id})
+    notification = await n_c.find_one({"id": notification_id})
     if not notification:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -249,7 +260,7 @@ async def delete_notification(
         )
     
     # Perform the deletion
-    result = n_c.delete_one({"id": notification_id})
+    result = await n_c.delete_one({"id": notification_id})
     
     if result.deleted_count == 0:
         raise HTTPException(
@@ -295,7 +306,7 @@ async def delete_notifications(
         query["source"] = source
     
     # Perform the deletion
-    result = n_c.delete_many(query)
+    result = await n_c.delete_many(query)
     
     # Return a proper 204 No Content response with no body
     return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -9,7 +9,9 @@ from pymongo.errors import DuplicateKeyError
 
 from app.models.profile import CreateProfile, ProfileDB, ProfileResponse, ProfileUpdate
 # Import at module level for easier patching in tests
-from app.db.data import p_c  # Profile collection
+from app.db.async_data import p_c  # Profile collection
+from app.db.repository import projection_for
+from app.core.pagination import find_page, keyset_sort
 from app.core.auth import get_current_user
 from app.models.user import UserDB  # For authorization
 
@@ -17,8 +19,10 @@ router = APIRouter(prefix="/profiles", tags=["profiles"])
 
 @router.get("/", response_model=List[ProfileResponse])
 async def get_all_profiles(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     current_user: UserDB = Depends(get_current_user),
     user_id: Optional[str] = None,
     timezone: Optional[str] = None,
@@ -28,6 +32,9 @@ async def get_all_profiles(
     """
     Get all profiles.
     Admin users can see all profiles, while regular users can only see their own.
+    
+    Pass `cursor` (empty for the first page) to page by keyset instead of
+    `skip`; the cursor of the next page is returned in the `X-Next-Cursor` header.
     """
     # Check if user is admin
     if current_user.role != "admin":
@@ -46,8 +53,12 @@ async def get_all_profiles(
         query["dark_mode"] = dark_mode
     
     # Convert cursor to list
-    cursor = p_c.find(query).skip(skip).limit(limit)
-    profiles = list(cursor)
+    if cursor is not None:
+        profiles = await find_page(
+            p_c, query, projection_for(ProfileResponse), keyset_sort(), limit, cursor, response, skip=skip
+        )
+    else:
+        profiles = await p_c.find(query, projection_for(ProfileResponse)).skip(skip).limit(limit).to_list(None)
     
     # Convert to ProfileResponse models
     return [ProfileResponse.model_validate(profile) for profile in profiles]
@@ -62,7 +73,7 @@ async def get_profile(
     Users can only access their own profile, while admins can access any profile.
     """
     # Get the profile
-    profile = p_c.find_one({"id": profile_id})
+    profile = await p_c.find_one({"id": profile_id}, projection_for(ProfileResponse))
     
     if not profile:
         raise HTTPException(
@@ -96,7 +107,7 @@ async def create_profile(
         )
     
     # Check if a profile already exists for this user_id
-    existing_profile = p_c.find_one({"user_id": profile_create.user_id})
+    existing_profile = await p_c.find_one({"user_id": profile_create.user_id})
     
     if existing_profile:
         raise HTTPException(
@@ -109,7 +120,7 @@ async def create_profile(
     
     # Insert the profile into the database
     try:
-        p_c.insert_one(profile_db.model_dump())
+        await p_c.insert_one(profile_db.model_dump())
     except DuplicateKeyError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -129,7 +140,7 @@ async def update_profile(
     Users can only update their own profile, while admins can update any profile.
     """
     # Find the profile to update
-    profile = p_c.find_one({"id": profile_id})
+    profile = await p_c.find_one({"id": profile_id})
     if not profile:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -152,7 +163,7 @@ async def update_profile(
     # Perform the update if there's data to update
     if update_data:
         try:
-            result = p_c.update_one(
+            result = await p_c.update_one(
                 {"id": profile_id},
                 {"$set": update_data}
             )
@@ -168,7 +179,7 @@ async def update_profile(
             )
     
     # Retrieve and return the updated profile
-    updated_profile = p_c.find_one({"id": profile_id})
+    updated_profile = await p_c.find_one({"id": profile_id}, projection_for(ProfileResponse))
     return ProfileResponse.model_validate(updated_profile)
 
 @router.delete("/{profile_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -181,7 +192,7 @@ async def delete_profile(
     Users can only delete their own profile, while admins can delete any profile.
     """
     # Find the profile to delete
-    profile = p_c.find_one({"id": profile_id})
+    profile = await p_c.find_one({"id": profile_id})
     if not profile:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -196,7 +207,7 @@ async def delete_profile(
         )
     
     # Perform the deletion
-    result = p_c.delete_one({"id": profile_id})
+    result = await p_c.delete_one({"id": profile_id})
     
     if result.deleted_count == 0:
         raise HTTPException(
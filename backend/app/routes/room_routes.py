@@ -9,7 +9,9 @@ from pymongo.errors import DuplicateKeyError
 
 from app.models.room import CreateRoom, RoomDB, RoomResponse, RoomUpdate
 # Import at module level for easier patching in tests
-from app.db.data import r_c  # Room collection
+from app.db.async_data import r_c  # Room collection
+from app.db.repository import projection_for
+from app.core.pagination import find_page, keyset_sort
 from app.core.auth import get_current_user
 from app.models.user import UserDB  # For authorization
 
@@ -17,8 +19,10 @@ router = APIRouter(prefix="/rooms", tags=["rooms"])
 
 @router.get("/", response_model=List[RoomResponse])
 async def get_all_rooms(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     current_user: UserDB = Depends(get_current_user),
     user_id: Optional[str] = None,
     home_id: Optional[str] = None,
@@ -29,6 +33,9 @@ async def get_all_rooms(
     """
     Get all rooms with optional filtering.
     Admin users can see all rooms, while regular users can only see their own.
+    
+    Pass `cursor` (empty for the first page) to page by keyset instead of
+    `skip`; the cursor of the next page is returned in the `X-Next-Cursor` header.
     """
     # Check if user is admin
     if current_user.role != "admin":
@@ -49,8 +56,12 @@ async def get_all_rooms(
         query["active"] = active
     
     # Convert cursor to list
-    cursor = r_c.find(query).skip(skip).limit(limit)
-    rooms = list(cursor)
+    if cursor is not None:
+        rooms = await find_page(
+            r_c, query, projection_for(RoomResponse), keyset_sort(), limit, cursor, response, skip=skip
+        )
+    else:
+        rooms = await r_c.find(query, projection_for(RoomResponse)).skip(skip).limit(limit).to_list(None)
     
     # Convert to RoomResponse models
     return [RoomResponse.model_validate(room) for room in rooms]
@@ -65,7 +76,7 @@ async def get_room(
     Users can only access their own rooms, while admins can access any room.
     """
     # Get the room
-    room = r_c.find_one({"id": room_id})
+    room = await r_c.find_one({"id": room_id}, projection_for(RoomResponse, "user_id"))
     
     if not room:
         raise HTTPException(
@@ -98,7 +109,7 @@ async def create_room(
     
     # Insert the room into the database
     try:
-        r_c.insert_one(room_db.model_dump())
+        await r_c.insert_one(room_db.model_dump())
     except DuplicateKeyError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -118,7 +129,7 @@ async def update_room(
     Users can only update their own rooms, while admins can update any room.
     """
     # Find the room to update
-    room = r_c.find_one({"id": room_id})
+    room = await r_c.find_one({"id": room_id})
     if not room:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -141,7 +152,7 @@ async def update_room(
     # Perform the update if there's data to update
     if update_data:
         try:
-            result = r_c.update_one(
+            result = await r_c.update_one(
                 {"id": room_id},
                 {"$set": update_data}
             )
@@ -157,7 +168,7 @@ async def update_room(
             )
     
     # Retrieve and return the updated room
-    updated_room = r_c.find_one({"id": room_id})
+    updated_room = await r_c.find_one({"id": room_id}, projection_for(RoomResponse))
     return RoomResponse.model_validate(updated_room)
 
 @router.delete("/{room_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -170,7 +181,7 @@ async def delete_room(
     Users can only delete their own rooms, while admins can delete any room.
     """
     # Find the room to delete
-    room = r_c.find_one({"id": room_id})
+    room = await r_c.find_one({"id": room_id})
     if not room:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -185,7 +196,7 @@ async def delete_room(
         )
     
     # Perform the deletion
-    result = r_c.delete_one({"id": room_id})
+    result = await r_c.delete_one({"id": room_id})
     
     if result.deleted_count == 0:
         raise HTTPException(
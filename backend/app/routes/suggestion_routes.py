@@ -9,7 +9,9 @@ from pymongo.errors import DuplicateKeyError
 
 from app.models.suggestion import CreateSuggestion, SuggestionDB, SuggestionResponse, SuggestionUpdate, SuggestionStatus, SuggestionType
 # Import at module level for easier patching in tests
-from app.db.data import s_c  # Suggestion collection
+from app.db.async_data import s_c  # Suggestion collection
+from app.db.repository import projection_for
+from app.core.pagination import find_page, keyset_sort
 from app.core.auth import get_current_user
 from app.models.user import UserDB  # For authorization
 
@@ -17,8 +19,10 @@ router = APIRouter(prefix="/suggestions", tags=["suggestions"])
 
 @router.get("/", response_model=List[SuggestionResponse])
 async def get_all_suggestions(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     current_user: UserDB = Depends(get_current_user),
     user_id: Optional[str] = None,
     status: Optional[SuggestionStatus] = None,
@@ -30,6 +34,9 @@ async def get_all_suggestions(
     """
     Get all suggestions.
     Admin users can see all suggestions, while regular users can only see their own.
+    
+    Pass `cursor` (empty for the first page) to page by keyset instead of
+    `skip`; the cursor of the next page is returned in the `X-Next-Cursor` header.
     """
     # Check if user is admin
     if current_user.role != "admin":
@@ -58,8 +65,12 @@ async def get_all_suggestions(
             query["created"] = date_query
     
     # Convert cursor to list
-    cursor = s_c.find(query).skip(skip).limit(limit).sort("created", -1)
-    suggestions = list(cursor)
+    if cursor is not None:
+        suggestions = await find_page(
+            s_c, query, projection_for(SuggestionResponse), keyset_sort(("created", -1)), limit, cursor, response, skip=skip
+        )
+    else:
+        suggestions = await s_c.find(query, projection_for(SuggestionResponse)).skip(skip).limit(limit).sort("created", -1).to_list(None)
     
     # Convert to SuggestionResponse models
     return [SuggestionResponse.model_validate(suggestion) for suggestion in suggestions]
@@ -74,7 +85,7 @@ async def get_suggestion(
     Users can only access their own suggestions, while admins can access any suggestion.
     """
     # Get the suggestion
-    suggestion = s_c.find_one({"id": suggestion_id})
+    suggestion = await s_c.find_one({"id": suggestion_id}, projection_for(SuggestionResponse))
     
     if not suggestion:
         raise HTTPException(
@@ -112,7 +123,7 @@ async def create_suggestion(
     
     # Insert the suggestion into the database
     try:
-        s_c.insert_one(suggestion_db.model_dump())
+        await s_c.insert_one(suggestion_db.model_dump())
     except DuplicateKeyError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -132,7 +143,7 @@ async def update_suggestion(
     Users can only update their own suggestions, while admins can update any suggestion.
     """
     # Find the suggestion to update
-    suggestion = s_c.find_one({"id": suggestion_id})
+    suggestion = await s_c.find_one({"id": suggestion_id})
     if not suggestion:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -159,7 +170,7 @@ async def update_suggestion(
     # Perform the update if there's data to update
     if update_data:
         try:
-            result = s_c.update_one(
+            result = await s_c.update_one(
                 {"id": suggestion_id},
                 {"$set": update_data}
             )
@@ -175,7 +186,7 @@ async def update_suggestion(
             )
     
     # Retrieve and return the updated suggestion
-    updated_suggestion = s_c.find_one({"id": suggestion_id})
+    updated_suggestion = await s_c.find_one({"id": suggestion_id}, projection_for(SuggestionResponse))
     return SuggestionResponse.model_validate(updated_suggestion)
 
 @router.delete("/{suggestion_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -188,7 +199,7 @@ async def delete_suggestion(
     Users can only delete their own suggestions, while admins can delete any suggestion.
     """
     # Find the suggestion to delete
-    suggestion = s_c.find_one({"id": suggestion_id})
+    suggestion = await s_c.find_one({"id": suggestion_id})
     if not suggestion:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -203,7 +214,7 @@ async def delete_suggestion(
         )
     
     # Perform the deletion
-    result = s_c.delete_one({"id": suggestion_id})
+    result = await s_c.delete_one({"id": suggestion_id})
     
     if result.deleted_count == 0:
         raise HTTPException(
@@ -1,39 +1,194 @@
 """
 Usage data management routes for the smart home system.
 """
-from typing import Any, Dict, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from fastapi.responses import JSONResponse, Response
+import asyncio
+import os
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from datetime import datetime
-from pymongo.errors import DuplicateKeyError
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
 
 from app.models.usage import (
     CreateUsage, UsageDB, UsageResponse, UsageUpdate, 
-    UsageAggregateResponse, UsageBulkCreate, UsageTimeRange
+    UsageAggregateResponse, UsageBulkCreate, UsageTimeRange,
+    UsageBulkRecordResult, UsageBulkResponse, UsageStreamLineError, UsageStreamSummary,
+    ExportFormat, SeriesFill, SeriesInterval, UsageSeriesResponse
 )
 # Import at module level for easier patching in tests
-from app.db.data import us_c, d_c  # Usage and Device collections
+from app.db.async_data import us_c, d_c  # Usage and Device collections
+from app.db.async_data import us_c_ingest, us_c_analytics  # Usage ingest & scan handles
+from app.db.repository import projection_for
+from app.core.pagination import find_page, keyset_sort
+from app.db.settings import USAGE_NATURAL_KEY, USAGE_ROLLUPS, USAGE_STORAGE, WORKLOAD_ANALYTICS, WORKLOAD_INGEST
+from app.services.usage_buckets import BUCKETS, usage_store
+from app.services.usage_buffer import USAGE_WRITE_BUFFER, UsageBufferFull, usage_buffer
+from app.services.usage_arrow import arrow_stream_chunks, arrow_supported, usage_fields
+from app.services.usage_export import MEDIA_TYPES, export_chunks, export_cursor, export_filename
+from app.services.usage_series import SeriesError, usage_series
+from app.services.usage_rollups import (
+    aggregate_usage, apply_rollups, device_match, empty_totals, total_readings
+)
+from app.services.usage_columnar import (
+    COLUMNAR_CONTENT_TYPES, ColumnarPayloadError, columnar_supported, decode_usage_batch
+)
 from app.core.auth import get_current_user
+from app.core.ownership import cached_owner, remember_owner, user_devices_cache
 from app.models.user import UserDB  # For authorization
 
 router = APIRouter(prefix="/usage", tags=["usage"])
 
-def check_device_ownership(device_id: str, user_id: str) -> bool:
-    """Check if a user owns a device."""
-    device = d_c.find_one({"id": device_id})
-    if not device:
-        return False
-    return device.get("user_id") == user_id
+DUPLICATE_KEY_ERROR = 11000     # MongoDB error code for unique index violations
+
+USAGE_STREAM_BATCH_SIZE = int(os.getenv("USAGE_STREAM_BATCH_SIZE", "1000"))         # Records per insert
+USAGE_STREAM_MAX_LINE_BYTES = int(os.getenv("USAGE_STREAM_MAX_LINE_BYTES", "65536"))
+USAGE_STREAM_MAX_ERRORS = int(os.getenv("USAGE_STREAM_MAX_ERRORS", "100"))          # Rejected lines listed in the summary
+USAGE_BULK_MAX_RECORDS = int(os.getenv("USAGE_BULK_MAX_RECORDS", "10000"))          # Records per /bulk upload
+USAGE_BULK_MAX_BYTES = int(os.getenv("USAGE_BULK_MAX_BYTES", str(16 * 1024 * 1024)))  # Body size of a /bulk upload
+
+async def check_device_ownership(device_id: str, user_id: str) -> bool:
+    """Check if a user owns a device, consulting the ownership cache first."""
+    owner = cached_owner(device_id)
+    if owner is None:
+        device = await d_c.find_one({"id": device_id}, {"_id": 0, "user_id": 1})
+        if not device:
+            return False
+        owner = device.get("user_id")
+        remember_owner(owner, [device_id])
+    return owner == user_id
+
+async def owned_device_ids(device_ids: Iterable[str], user_id: str) -> Set[str]:
+    """Return which of the given devices a user owns, querying only uncached devices."""
+    owned = set()
+    unknown = []
+    for device_id in device_ids:
+        owner = cached_owner(device_id)
+        if owner is None:
+            unknown.append(device_id)
+        elif owner == user_id:
+            owned.add(device_id)
+    
+    if unknown:
+        devices = await d_c.find(
+            {"id": {"$in": unknown}, "user_id": user_id}, {"_id": 0, "id": 1}
+        ).to_list(None)
+        found = [device["id"] for device in devices]
+        remember_owner(user_id, found)
+        owned.update(found)
+    return owned
+
+async def user_device_ids(user_id: str) -> List[str]:
+    """Return the IDs of every device a user owns, cached per user."""
+    device_ids = user_devices_cache.get(user_id)
+    if device_ids is None:
+        devices = await d_c.find({"user_id": user_id}, {"_id": 0, "id": 1}).to_list(None)
+        device_ids = tuple(device["id"] for device in devices)
+        user_devices_cache.set(user_id, device_ids)
+        remember_owner(user_id, device_ids)
+    return list(device_ids)
+
+async def insert_usage_documents(documents: List[Dict[str, Any]], offset: int = 0) -> UsageBulkResponse:
+    """
+    Insert usage documents with one unordered `insert_many`.
+    
+    Args:
+        documents: Usage documents to insert
+        offset: Index of the first document in the caller's request
+        
+    Returns:
+        UsageBulkResponse: Counts and per-document outcomes
+    """
+    write_errors: Dict[int, Dict[str, Any]] = {}
+    try:
+        await usage_store(us_c_ingest, WORKLOAD_INGEST).insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        write_errors = {error["index"]: error for error in e.details.get("writeErrors", [])}
+    
+    await apply_rollups([document for index, document in enumerate(documents) if index not in write_errors])
+    
+    results = []
+    duplicates = 0
+    for index, document in enumerate(documents):
+        error = write_errors.get(index)
+        if error is None:
+            results.append(UsageBulkRecordResult(index=offset + index, id=document["id"], status="created"))
+        elif error.get("code") == DUPLICATE_KEY_ERROR:
+            duplicates += 1
+            results.append(UsageBulkRecordResult(
+                index=offset + index, id=document["id"], status="duplicate", error=duplicate_reason(error)
+            ))
+        else:
+            results.append(UsageBulkRecordResult(
+                index=offset + index, id=document["id"], status="failed", error=error.get("errmsg")
+            ))
+    
+    return UsageBulkResponse(
+        inserted=len(documents) - len(write_errors),
+        duplicates=duplicates,
+        failed=len(write_errors) - duplicates,
+        results=results
+    )
+
+def duplicate_reason(error: Dict[str, Any]) -> str:
+    """Describe which unique key a duplicate key error hit."""
+    if "device_id" in (error.get("keyPattern") or {}):
+        return "A reading for this device and timestamp is already stored"
+    return "Usage record with this ID already exists"
+
+async def ndjson_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Split a byte stream into NDJSON lines without buffering more than one line.
+    
+    Args:
+        chunks: Body chunks as received
+        max_line_bytes: Longest line accepted
+        
+    Yields:
+        Tuple[int, Optional[bytes]]: Line number and content, or `None` for a
+        line longer than `max_line_bytes` (the rest of it is skipped unread)
+    """
+    buffer = bytearray()
+    line_number = 0
+    oversized = False
+    
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end == -1:
+                if not oversized:
+                    buffer += chunk[start:]
+                    if len(buffer) > max_line_bytes:
+                        oversized = True
+                        buffer.clear()
+                break
+            
+            line_number += 1
+            if oversized:
+                yield line_number, None
+            else:
+                buffer += chunk[start:end]
+                yield line_number, (None if len(buffer) > max_line_bytes else bytes(buffer))
+            buffer.clear()
+            oversized = False
+            start = end + 1
+    
+    if oversized or buffer.strip():
+        yield line_number + 1, None if oversized else bytes(buffer)
 
 @router.get("/", response_model=List[UsageResponse])
 async def get_all_usage(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     current_user: UserDB = Depends(get_current_user),
     device_id: Optional[str] = None,
     start_time: Optional[datetime] = None,
     end_time: Optional[datetime] = None,
-    status: Optional[str] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
     min_energy: Optional[float] = None,
     max_energy: Optional[float] = None,
     sort: Optional[str] = "timestamp_desc"  # Options: timestamp_asc, timestamp_desc, energy_asc, energy_desc
@@ -42,17 +197,23 @@ async def get_all_usage(
     Get all usage records.
     Admin users can see all records, while regular users can only see records for their devices.
     
+    Pass `cursor` (empty for the first page) to page by keyset instead of
+    `skip`: records are ordered by the sort field and then `id`, and the
+    cursor of the next page is returned in the `X-Next-Cursor` header.
+    
     Args:
+        response: The outgoing response, receiving the next page's cursor
         skip: Number of records to skip (pagination)
         limit: Maximum number of records to return (pagination)
+        cursor: Continuation token of the previous page (keyset pagination)
         current_user: The authenticated user
         device_id: Filter by device ID
         start_time: Filter by records after this time
         end_time: Filter by records before this time
-        status: Filter by device status
+        status_filter: Filter by device status (`status` query parameter)
         min_energy: Filter by minimum energy consumed
         max_energy: Filter by maximum energy consumed
-        sort: Sorting method for results
+        sort: Sorting method for results; only the timestamp sorts with bucketed storage
         
     Returns:
         List[UsageResponse]: List of usage records
@@ -65,7 +226,7 @@ async def get_all_usage(
         
         # Check device ownership for regular users
         if current_user.role != "admin":
-            owns_device = check_device_ownership(device_id, current_user.id)
+            owns_device = await check_device_ownership(device_id, current_user.id)
             if not owns_device:
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
@@ -73,11 +234,10 @@ async def get_all_usage(
                 )
     elif current_user.role != "admin":
         # For non-admin users without a specific device_id, find all their devices
-        user_devices = list(d_c.find({"user_id": current_user.id}))
-        if not user_devices:
+        device_ids = await user_device_ids(current_user.id)
+        if not device_ids:
             return []  # User has no devices, return empty list
         
-        device_ids = [device["id"] for device in user_devices]
         query["device_id"] = {"$in": device_ids}
     
     # Add time range filter if provided
@@ -90,8 +250,8 @@ async def get_all_usage(
         if time_query:
             query["timestamp"] = time_query
     
-    if status:
-        query["status"] = status
+    if status_filter:
+        query["status"] = status_filter
     
     # Add energy consumption filter if provided
     if min_energy is not None or max_energy is not None:
@@ -117,13 +277,171 @@ async def get_all_usage(
         elif sort == "energy_desc":
             sort_field, sort_direction = "energy_consumed", -1
     
-    # Convert cursor to list
-    cursor = us_c.find(query).sort(sort_field, sort_direction).skip(skip).limit(limit)
-    usage_records = list(cursor)
+    if sort_field != "timestamp" and USAGE_STORAGE == BUCKETS:
+        # Bucketed readings are stored in hour order; any other order means sorting every match in memory
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Sorting by energy is not available with bucketed usage storage"
+        )
+    
+    if cursor is not None:
+        usage_records = await find_page(
+            usage_store(us_c), query, projection_for(UsageResponse), keyset_sort((sort_field, sort_direction)),
+            limit, cursor, response, nullable=("energy_consumed",), skip=skip
+        )
+    else:
+        # Convert cursor to list
+        records = usage_store(us_c).find(query, projection_for(UsageResponse))
+        records = records.sort(sort_field, sort_direction).skip(skip).limit(limit)
+        usage_records = await records.to_list(None)
     
     # Convert to UsageResponse models
     return [UsageResponse.model_validate(record) for record in usage_records]
 
+@router.get("/export")
+async def export_usage(
+    format: ExportFormat = ExportFormat.NDJSON,
+    compress: bool = False,
+    device_id: Optional[List[str]] = Query(None),
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    metric: Optional[List[str]] = Query(None),
+    current_user: UserDB = Depends(get_current_user)
+) -> StreamingResponse:
+    """
+    Export raw usage records as NDJSON, CSV or an Arrow IPC stream, streamed as they are read.
+    Users can only export records for their own devices, while admins can export any records.
+    
+    Records are read from one cursor in `(timestamp, id)` order and written
+    straight to the response (see `app.services.usage_export`), so memory use
+    does not grow with the size of the export. CSV exports start with a header
+    row and hold the metrics as one JSON column. Arrow exports hold typed
+    columns, with one column per requested metric (see `app.services.usage_arrow`).
+    
+    Args:
+        format: `ndjson` (one JSON object per line), `csv` or `arrow`
+        compress: Gzip the export; Arrow exports compress their buffers with zstd instead
+        device_id: Devices to export; all of the user's devices (all devices for admins) if omitted
+        start_time: Export records at or after this time
+        end_time: Export records at or before this time
+        metric: Metrics to export as Arrow columns
+        current_user: The authenticated user
+        
+    Returns:
+        StreamingResponse: The export, as a file download
+    """
+    if format == ExportFormat.ARROW and not arrow_supported():
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail="Arrow exports are not available on this server"
+        )
+    
+    query: Dict[str, Any] = {}
+    if device_id:
+        device_ids = list(dict.fromkeys(device_id))
+        if current_user.role != "admin" and set(device_ids) - await owned_device_ids(device_ids, current_user.id):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized to access these devices' data"
+            )
+        query["device_id"] = device_ids[0] if len(device_ids) == 1 else {"$in": device_ids}
+    elif current_user.role != "admin":
+        query["device_id"] = {"$in": await user_device_ids(current_user.id)}
+    
+    if start_time or end_time:
+        query["timestamp"] = {}
+        if start_time:
+            query["timestamp"]["$gte"] = start_time
+        if end_time:
+            query["timestamp"]["$lte"] = end_time
+    
+    cursor = export_cursor(usage_store(us_c_analytics, WORKLOAD_ANALYTICS), query)
+    filename = export_filename(format, compress)
+    if format == ExportFormat.ARROW:
+        chunks = arrow_stream_chunks(cursor, usage_fields(metric or ()), compress)
+        media_type = MEDIA_TYPES[format]
+    else:
+        chunks = export_chunks(cursor, format, compress)
+        media_type = "application/gzip" if compress else MEDIA_TYPES[format]
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.get("/series", response_model=UsageSeriesResponse)
+async def get_usage_series(
+    start_time: datetime,
+    end_time: datetime,
+    interval: SeriesInterval = SeriesInterval.HOUR,
+    device_id: Optional[List[str]] = Query(None),
+    room_id: Optional[str] = None,
+    value: str = "energy",
+    fill: SeriesFill = SeriesFill.NULL,
+    current_user: UserDB = Depends(get_current_user)
+) -> UsageSeriesResponse:
+    """
+    Get usage bucketed by time for charts: one shared time axis and one value array per device.
+    Users can only chart their own devices, while admins can chart any device.
+    
+    Devices are given as one or more `device_id` parameters or as a `room_id`;
+    without either, every device of the current user is charted. Buckets are
+    computed by the database (see `app.services.usage_series`), from the
+    rollups when `USAGE_ROLLUPS` is enabled.
+    
+    Args:
+        start_time: Start of the range, inclusive
+        end_time: End of the range, inclusive
+        interval: Bucket width (minute, hour, day, week or month; weeks start on Monday)
+        device_id: Devices to chart
+        room_id: Chart the devices in this room
+        value: `energy`, `duration` or `count` totals, or the name of a metric to average
+        fill: What buckets without readings hold (null, zero or the previous value)
+        current_user: The authenticated user
+        
+    Returns:
+        UsageSeriesResponse: The time axis and the values by device
+    """
+    if end_time < start_time:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="End time must be after start time"
+        )
+    
+    is_admin = current_user.role == "admin"
+    if device_id:
+        device_ids = list(dict.fromkeys(device_id))
+        if not is_admin and set(device_ids) - await owned_device_ids(device_ids, current_user.id):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized to access these devices' data"
+            )
+    elif room_id:
+        query = {"room_id": room_id} if is_admin else {"room_id": room_id, "user_id": current_user.id}
+        devices = await d_c.find(query, {"_id": 0, "id": 1}).to_list(None)
+        device_ids = [device["id"] for device in devices]
+    else:
+        device_ids = await user_device_ids(current_user.id)
+    
+    try:
+        timestamps, series = await usage_series(
+            usage_store(us_c_analytics, WORKLOAD_ANALYTICS), device_ids, start_time, end_time, interval, value, fill
+        )
+    except SeriesError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    return UsageSeriesResponse(
+        interval=interval,
+        value=value,
+        start_date=start_time,
+        end_date=end_time,
+        timestamps=timestamps,
+        series=series
+    )
+
 @router.get("/{usage_id}", response_model=UsageResponse)
 async def get_usage(
     usage_id: str,
@@ -141,7 +459,7 @@ async def get_usage(
         UsageResponse: The requested usage record
     """
     # Get the usage record
-    usage = us_c.find_one({"id": usage_id})
+    usage = await usage_store(us_c).find_one({"id": usage_id}, projection_for(UsageResponse))
     
     if not usage:
         raise HTTPException(
@@ -151,7 +469,7 @@ async def get_usage(
     
     # Check device ownership for regular users
     if current_user.role != "admin":
-        owns_device = check_device_ownership(usage["device_id"], current_user.id)
+        owns_device = await check_device_ownership(usage["device_id"], current_user.id)
         if not owns_device:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -163,22 +481,32 @@ async def get_usage(
 @router.post("/", response_model=UsageResponse, status_code=status.HTTP_201_CREATED)
 async def create_usage(
     usage_create: CreateUsage,
+    response: Response,
     current_user: UserDB = Depends(get_current_user)
 ):
     """
     Create a new usage record.
     Users can only create records for their own devices, while admins can create for any device.
     
+    With `USAGE_WRITE_BUFFER` enabled the record is written by the write-behind
+    buffer together with other single readings (see `app.services.usage_buffer`).
+    
+    With `USAGE_NATURAL_KEY` enabled, a reading whose device & timestamp are
+    already stored is not stored again; the stored record is returned with
+    200 instead of 201. Readings without a timestamp are stamped on arrival
+    and so are never recognized as replays.
+    
     Args:
         usage_create: Data for the new usage record
+        response: The outgoing response, whose status changes for replays
         current_user: The authenticated user
         
     Returns:
-        UsageResponse: The newly created usage record
+        UsageResponse: The newly created (or already stored) usage record
     """
     # Check device ownership for regular users
     if current_user.role != "admin":
-        owns_device = check_device_ownership(usage_create.device_id, current_user.id)
+        owns_device = await check_device_ownership(usage_create.device_id, current_user.id)
         if not owns_device:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -192,68 +520,289 @@ async def create_usage(
     # Create a new UsageDB model
     usage_db = UsageDB(**usage_create.model_dump())
     
-    # Insert the usage record into the database
+    # Insert the usage record into the database, or queue it for a batched insert
     try:
-        us_c.insert_one(usage_db.model_dump())
+        if USAGE_WRITE_BUFFER:
+            await usage_buffer.submit(usage_db.model_dump())
+        else:
+            document = usage_db.model_dump()
+            await usage_store(us_c_ingest, WORKLOAD_INGEST).insert_one(document)
+            await apply_rollups([document])
+    except UsageBufferFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Usage ingestion is temporarily overloaded, retry shortly",
+            headers={"Retry-After": "1"},
+        )
     except DuplicateKeyError:
+        # A replayed reading: answer with the stored one so retries are safe
+        existing = None
+        if USAGE_NATURAL_KEY:
+            existing = await usage_store(us_c).find_one(
+                {"device_id": usage_db.device_id, "timestamp": usage_db.timestamp},
+                projection_for(UsageResponse)
+            )
+        if not existing:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Usage record with this ID already exists"
+            )
+        response.status_code = status.HTTP_200_OK
+        return UsageResponse.model_validate(existing)
+    except PyMongoError as e:
+        if not USAGE_WRITE_BUFFER:
+            raise
+        # In `written` mode the batch holding this reading failed to flush; the reading was not stored
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Usage ingestion is temporarily unavailable, retry shortly",
+            headers={"Retry-After": "1"},
+        ) from e
+    
+    return UsageResponse.model_validate(usage_db)
+
+def _bulk_openapi() -> Dict[str, Any]:
+    """Document the JSON and columnar request bodies accepted by `/bulk`."""
+    schema = UsageBulkCreate.model_json_schema(ref_template="#/components/schemas/{model}")
+    schema.pop("$defs", None)
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": schema},
+                COLUMNAR_CONTENT_TYPES[0]: {
+                    "schema": {"type": "string", "format": "binary"},
+                    "description": "Columnar frames, see `app.services.usage_columnar`",
+                },
+            },
+        }
+    }
+
+async def read_bulk_documents(request: Request) -> List[Dict[str, Any]]:
+    """
+    Decode a bulk upload into usage documents according to its content type.
+    
+    Both encodings are held to `USAGE_BULK_MAX_BYTES` and `USAGE_BULK_MAX_RECORDS`.
+    
+    Args:
+        request: The incoming request
+        
+    Returns:
+        List[Dict[str, Any]]: Documents ready for insertion, in upload order
+        
+    Raises:
+        RequestValidationError: If a JSON body fails validation
+        HTTPException: If the body is too large or has too many records, or a
+            columnar body is malformed or cannot be decoded here
+    """
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > USAGE_BULK_MAX_BYTES:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Bulk uploads are limited to {USAGE_BULK_MAX_BYTES} bytes"
+            )
+        chunks.append(chunk)
+    body = b"".join(chunks)
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    
+    if content_type in COLUMNAR_CONTENT_TYPES:
+        if not columnar_supported():
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail="Columnar usage uploads are not available on this server"
+            )
+        try:
+            return decode_usage_batch(body, max_rows=USAGE_BULK_MAX_RECORDS)
+        except ColumnarPayloadError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    try:
+        bulk_create = UsageBulkCreate.model_validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)], body=body
+        )
+    if len(bulk_create.records) > USAGE_BULK_MAX_RECORDS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Usage record with this ID already exists"
+            detail=f"Bulk uploads are limited to {USAGE_BULK_MAX_RECORDS} records"
         )
     
-    return UsageResponse.model_validate(usage_db)
+    documents = []
+    for record in bulk_create.records:
+        # Set timestamp to now if not provided
+        if not record.timestamp:
+            record.timestamp = datetime.utcnow()
+        documents.append(UsageDB(**record.model_dump()).model_dump())
+    return documents
 
-@router.post("/bulk", response_model=List[UsageResponse], status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/bulk", response_model=UsageBulkResponse, status_code=status.HTTP_201_CREATED,
+    openapi_extra=_bulk_openapi()
+)
 async def create_bulk_usage(
-    bulk_create: UsageBulkCreate,
+    request: Request,
     current_user: UserDB = Depends(get_current_user)
 ):
     """
     Create multiple usage records at once.
     Users can only create records for their own devices, while admins can create for any device.
     
+    The body is either a JSON `UsageBulkCreate` or, with
+    `Content-Type: application/msgpack`, columnar frames of readings per device
+    (see `app.services.usage_columnar`), which skip per-record validation models.
+    
+    Ownership is checked with one query per batch and the records are written
+    with a single unordered `insert_many`, so one bad record does not stop the rest.
+    Records rejected by a unique index (with `USAGE_NATURAL_KEY`, replays of
+    stored readings) are reported as duplicates rather than failures.
+    
     Args:
-        bulk_create: List of usage records to create
+        request: The incoming request carrying the records
         current_user: The authenticated user
         
     Returns:
-        List[UsageResponse]: The newly created usage records
+        UsageBulkResponse: Counts and the outcome of each record, in request order
     """
+    documents = await read_bulk_documents(request)
+    
     # Check device ownership for regular users
     if current_user.role != "admin":
-        for record in bulk_create.records:
-            owns_device = check_device_ownership(record.device_id, current_user.id)
-            if not owns_device:
+        owned = await owned_device_ids({document["device_id"] for document in documents}, current_user.id)
+        for document in documents:
+            if document["device_id"] not in owned:
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
-                    detail=f"Not authorized to create usage data for device {record.device_id}"
+                    detail=f"Not authorized to create usage data for device {document['device_id']}"
                 )
     
-    created_records = []
+    result = await insert_usage_documents(documents)
     
-    for record in bulk_create.records:
-        # Set timestamp to now if not provided
-        if not record.timestamp:
-            record.timestamp = datetime.utcnow()
+    # Replays of stored readings are absorbed; only fail if nothing was usable
+    if not result.inserted and not result.duplicates:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Failed to create any usage records"
+        )
+    
+    return result
+
+@router.post("/stream", response_model=UsageStreamSummary)
+async def stream_usage(
+    request: Request,
+    current_user: UserDB = Depends(get_current_user)
+):
+    """
+    Create usage records from an NDJSON body, one `CreateUsage` object per line.
+    Users can only create records for their own devices, while admins can create for any device.
+    
+    The body is read incrementally and valid lines are inserted in batches of
+    `USAGE_STREAM_BATCH_SIZE`. One batch is inserted while the next is being
+    read; the body is not read any further until the earlier insert finishes,
+    so a gateway sending faster than MongoDB can write is slowed down instead
+    of being buffered. Memory use is bounded by two batches and one line,
+    regardless of the upload size.
+    
+    Unlike `/bulk`, a bad line does not fail the upload: lines that are not
+    valid JSON, fail validation, reference a device the user does not own or
+    cannot be inserted are counted as rejected and listed (up to
+    `USAGE_STREAM_MAX_ERRORS`) with their line number. Readings that are
+    already stored are only counted as duplicates, so a retried upload is safe.
+    
+    Args:
+        request: The incoming request, whose body is streamed
+        current_user: The authenticated user
         
-        # Create a new UsageDB model
-        usage_db = UsageDB(**record.model_dump())
+    Returns:
+        UsageStreamSummary: Counts of accepted & rejected lines
+    """
+    summary = UsageStreamSummary()
+    is_admin = current_user.role == "admin"
+    owned: Set[str] = set()
+    denied: Set[str] = set()
+    
+    def reject(line: int, error: str):
+        summary.rejected += 1
+        if len(summary.errors) < USAGE_STREAM_MAX_ERRORS:
+            summary.errors.append(UsageStreamLineError(line=line, error=error))
+        else:
+            summary.errors_truncated = True
+    
+    async def flush(batch: List[Tuple[int, Dict[str, Any]]]):
+        if not is_admin:
+            # Devices already seen in this upload are not looked up again
+            unknown = {document["device_id"] for _, document in batch} - owned - denied
+            if unknown:
+                found = await owned_device_ids(unknown, current_user.id)
+                owned.update(found)
+                denied.update(unknown - found)
+            allowed = []
+            for line, document in batch:
+                if document["device_id"] in owned:
+                    allowed.append((line, document))
+                else:
+                    reject(line, f"Not authorized to create usage data for device {document['device_id']}")
+            batch = allowed
+        if not batch:
+            return
         
-        # Insert the usage record into the database
-        try:
-            us_c.insert_one(usage_db.model_dump())
-            created_records.append(usage_db)
-        except DuplicateKeyError:
-            # Continue with other records if one fails
-            continue
-    
-    if not created_records:
+        result = await insert_usage_documents([document for _, document in batch])
+        summary.batches += 1
+        summary.accepted += result.inserted
+        summary.duplicates += result.duplicates
+        for (line, _), record in zip(batch, result.results):
+            if record.status == "failed":
+                reject(line, record.error or record.status)
+    
+    batch: List[Tuple[int, Dict[str, Any]]] = []
+    pending: Optional[asyncio.Task] = None
+    try:
+        async for line, raw in ndjson_lines(request.stream(), USAGE_STREAM_MAX_LINE_BYTES):
+            if raw is None:
+                summary.lines += 1
+                reject(line, f"Line exceeds {USAGE_STREAM_MAX_LINE_BYTES} bytes")
+                continue
+            if not raw.strip():
+                continue
+            summary.lines += 1
+            
+            try:
+                record = CreateUsage.model_validate_json(raw)
+            except ValidationError as e:
+                reject(line, "; ".join(
+                    f"{'.'.join(str(part) for part in error['loc']) or 'line'}: {error['msg']}"
+                    for error in e.errors()
+                ))
+                continue
+            
+            # Set timestamp to now if not provided
+            if not record.timestamp:
+                record.timestamp = datetime.utcnow()
+            batch.append((line, UsageDB(**record.model_dump()).model_dump()))
+            
+            if len(batch) >= USAGE_STREAM_BATCH_SIZE:
+                if pending:
+                    await pending
+                pending = asyncio.create_task(flush(batch))
+                batch = []
+    finally:
+        # Let an in-flight insert finish even if the client went away
+        if pending:
+            await pending
+    
+    if batch:
+        await flush(batch)
+    
+    if not summary.lines:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Failed to create any usage records"
+            detail="Request body contains no usage records"
         )
     
-    return [UsageResponse.model_validate(record) for record in created_records]
+    summary.errors.sort(key=lambda error: error.line)
+    return summary
 
 @router.patch("/{usage_id}", response_model=UsageResponse)
 async def update_usage(
@@ -274,7 +823,7 @@ async def update_usage(
         UsageResponse: The updated usage record
     """
     # Find the usage record to update
-    usage = us_c.find_one({"id": usage_id})
+    usage = await usage_store(us_c).find_one({"id": usage_id})
     if not usage:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -283,7 +832,7 @@ async def update_usage(
     
     # Check device ownership for regular users
     if current_user.role != "admin":
-        owns_device = check_device_ownership(usage["device_id"], current_user.id)
+        owns_device = await check_device_ownership(usage["device_id"], current_user.id)
         if not owns_device:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -299,7 +848,7 @@ async def update_usage(
     # Perform the update if there's data to update
     if update_data:
         try:
-            result = us_c.update_one(
+            result = await usage_store(us_c).update_one(
                 {"id": usage_id},
                 {"$set": update_data}
             )
@@ -315,7 +864,11 @@ async def update_usage(
             )
     
     # Retrieve and return the updated usage record
-    updated_usage = us_c.find_one({"id": usage_id})
+    updated_usage = await usage_store(us_c).find_one({"id": usage_id}, projection_for(UsageResponse))
+    if USAGE_ROLLUPS and updated_usage:
+        # Swap the old reading's contribution for the new one
+        await apply_rollups([usage], sign=-1)
+        await apply_rollups([updated_usage])
     return UsageResponse.model_validate(updated_usage)
 
 @router.delete("/{usage_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -335,7 +888,7 @@ async def delete_usage(
         Response: 204 No Content on success
     """
     # Find the usage record to delete
-    usage = us_c.find_one({"id": usage_id})
+    usage = await usage_store(us_c).find_one({"id": usage_id})
     if not usage:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -344,7 +897,7 @@ async def delete_usage(
     
     # Check device ownership for regular users
     if current_user.role != "admin":
-        owns_device = check_device_ownership(usage["device_id"], current_user.id)
+        owns_device = await check_device_ownership(usage["device_id"], current_user.id)
         if not owns_device:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -352,13 +905,14 @@ async def delete_usage(
             )
     
     # Perform the deletion
-    result = us_c.delete_one({"id": usage_id})
+    result = await usage_store(us_c).delete_one({"id": usage_id})
     
     if result.deleted_count == 0:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to delete usage record"
         )
+    await apply_rollups([usage], sign=-1)
     
     # Return a proper 204 No Content response with no body
     return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -369,88 +923,75 @@ async def get_usage_aggregate(
     current_user: UserDB = Depends(get_current_user)
 ):
     """
-    Get aggregated usage statistics for a specified time range and device.
+    Get aggregated usage statistics for a specified time range and devices.
     Users can only access data for their own devices, while admins can access any data.
     
+    Devices are given as `device_id`, `device_ids` or both. Without either,
+    every device of a regular user is aggregated, and every device for an admin.
+    
+    The totals are computed by the database (`$match` then `$group`, see
+    `app.services.usage_rollups.totals_pipeline`), which answers with one
+    small document however many readings the range holds. With
+    `USAGE_ROLLUPS` enabled, whole days & hours are read from the rollups.
+    
     Args:
-        time_range: Object containing start_time, end_time, and device_id
+        time_range: Object containing start_time, end_time, and device_id / device_ids
         current_user: The authenticated user
         
     Returns:
         UsageAggregateResponse: Aggregated usage statistics
     """
     # TimeRange validator already checks that end_time is after start_time
+    requested = ([time_range.device_id] if time_range.device_id else []) + (time_range.device_ids or [])
+    device_ids: Optional[List[str]] = list(dict.fromkeys(requested)) or None
     
     # Check device ownership for regular users
     if current_user.role != "admin":
-        if not check_device_ownership(time_range.device_id, current_user.id):
+        if device_ids is None:
+            device_ids = await user_device_ids(current_user.id)
+        elif len(device_ids) == 1:
+            if not await check_device_ownership(device_ids[0], current_user.id):
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Not authorized to access this device's data"
+                )
+        elif set(device_ids) - await owned_device_ids(device_ids, current_user.id):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not authorized to access this device's data"
+                detail="Not authorized to access these devices' data"
             )
     
-    # Build query filter
-    query = {
-        "device_id": time_range.device_id,
-        "timestamp": {
-            "$gte": time_range.start_time,
-            "$lte": time_range.end_time
-        }
-    }
-    
-    # Get all usage records for the specified time range and device
-    cursor = us_c.find(query)
-    usage_records = list(cursor)
-    
-    if not usage_records:
+    collection = usage_store(us_c_analytics, WORKLOAD_ANALYTICS)
+    if device_ids == []:
+        totals = empty_totals()  # User has no devices
+    elif USAGE_ROLLUPS:
+        # Whole days & hours come from the rollups, only the partial hours from raw readings
+        totals = await aggregate_usage(collection, device_ids, time_range.start_time, time_range.end_time)
+    else:
+        totals = await total_readings(collection, {
+            **device_match(device_ids),
+            "timestamp": {
+                "$gte": time_range.start_time,
+                "$lte": time_range.end_time
+            }
+        })
+    
+    if not totals["count"]:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No usage records found for the specified criteria"
         )
     
-    # Initialize aggregation results
-    total_duration = 0
-    total_energy = 0
-    usage_count = len(usage_records)
-    
-    # Collect numeric metrics for averaging
-    metric_sums = {}
-    metric_counts = {}
-    
-    for record in usage_records:
-        # Sum duration and energy
-        if "duration" in record and record["duration"]:
-            total_duration += record["duration"]
-        
-        if "energy_consumed" in record and record["energy_consumed"]:
-            total_energy += record["energy_consumed"]
-        
-        # Collect metrics for averaging
-        if "metrics" in record:
-            for key, value in record["metrics"].items():
-                if isinstance(value, (int, float)):  # Only average numeric metrics
-                    if key not in metric_sums:
-                        metric_sums[key] = 0
-                        metric_counts[key] = 0
-                    
-                    metric_sums[key] += value
-                    metric_counts[key] += 1
-    
-    # Calculate average metrics
-    average_metrics = {}
-    for key in metric_sums:
-        if metric_counts[key] > 0:
-            average_metrics[key] = metric_sums[key] / metric_counts[key]
-    
-    # Create the aggregated response
-    aggregated_data = UsageAggregateResponse(
-        device_id=time_range.device_id,
+    return UsageAggregateResponse(
+        device_id=device_ids[0] if device_ids and len(device_ids) == 1 else None,
+        device_ids=device_ids or [],
         start_date=time_range.start_time,
         end_date=time_range.end_time,
-        total_duration=total_duration,
-        total_energy=total_energy,
-        average_metrics=average_metrics,
-        usage_count=usage_count
+        total_duration=totals["duration"],
+        total_energy=totals["energy"],
+        average_metrics={
+            key: metric["sum"] / metric["count"]
+            for key, metric in totals["metrics"].items() if metric["count"] > 0
+        },
+        usage_count=totals["count"]
     )
-    
-    return aggregated_data
@@ -3,15 +3,17 @@ User management routes for the smart home system with debug prints.
 """
 from typing import Any, Dict, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from datetime import datetime
 from pymongo.errors import DuplicateKeyError
 
 from app.models.user import CreateUser, UserDB, UserResponse, UserUpdate
 # Import at module level for easier patching in tests
-from app.db.data import u_c  # User collection
-from app.core.password import hash_password, verify_role
-from app.core.auth import get_current_user
+from app.db.async_data import u_c  # User collection
+from app.db.repository import projection_for
+from app.core.pagination import find_page, keyset_sort
+from app.core.password import PasswordPoolSaturated, hash_password_async, verify_role
+from app.core.auth import get_current_user, invalidate_logins, invalidate_user
 
 # Print statement for debugging
 # print("DEBUG: user_routes.py loaded, u_c object:", u_c)
@@ -20,14 +22,19 @@ router = APIRouter(prefix="/users", tags=["users"])
 
 @router.get("/", response_model=List[UserResponse])
 async def get_all_users(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     current_user: UserDB = Depends(get_current_user),
     role: Optional[str] = None,
     active: Optional[bool] = None
 ) -> List[UserResponse]:
     """
     Get all users (admin only).
+    
+    Pass `cursor` (empty for the first page) to page by keyset instead of
+    `skip`; the cursor of the next page is returned in the `X-Next-Cursor` header.
     """
     # Debug print
     # print(f"DEBUG: get_all_users called with u_c={u_c}, id(u_c)={id(u_c)}")
@@ -49,11 +56,13 @@ async def get_all_users(
     # Debug print
     # print(f"DEBUG: Executing find with query={query}")
     
-    # Convert cursor to list explicitly
-    cursor = u_c.find(query).skip(skip).limit(limit)
-    # print(f"DEBUG: type(cursor)={type(cursor)}, cursor={cursor}")
-    
-    users = list(cursor)
+    if cursor is not None:
+        users = await find_page(
+            u_c, query, projection_for(UserResponse), keyset_sort(), limit, cursor, response, skip=skip
+        )
+    else:
+        # Convert cursor to list explicitly
+        users = await u_c.find(query, projection_for(UserResponse)).skip(skip).limit(limit).to_list(None)
     # print(f"DEBUG: users={users}, len(users)={len(users)}")
     
     # Convert to UserResponse models
@@ -78,7 +87,7 @@ async def get_user(
             detail="Not authorized to access this user's data"
         )
     
-    user = u_c.find_one({"id": user_id})
+    user = await u_c.find_one({"id": user_id}, projection_for(UserResponse))
     # print(f"DEBUG: find_one result={user}")
     
     if not user:
@@ -105,7 +114,7 @@ async def create_user(
     verify_role(current_user.role, "admin")
     
     # Check if username or email already exists
-    username_exists = u_c.find_one({"username": user_create.username})
+    username_exists = await u_c.find_one({"username": user_create.username})
     # print(f"DEBUG: username_exists={username_exists}")
     
     if username_exists:
@@ -114,7 +123,7 @@ async def create_user(
             detail="Username already exists"
         )
     
-    email_exists = u_c.find_one({"email": user_create.email})
+    email_exists = await u_c.find_one({"email": user_create.email})
     # print(f"DEBUG: email_exists={email_exists}")
     
     if email_exists:
@@ -124,7 +133,14 @@ async def create_user(
         )
     
     # Create a new UserDB model
-    hashed_password = hash_password(user_create.password)
+    try:
+        hashed_password = await hash_password_async(user_create.password)
+    except PasswordPoolSaturated as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Password hashing is temporarily overloaded, retry shortly",
+            headers={"Retry-After": "1"},
+        ) from e
     user_db = UserDB(
         username=user_create.username,
         email=user_create.email,
@@ -134,13 +150,16 @@ async def create_user(
     
     # Insert the user into the database
     try:
-        u_c.insert_one(user_db.model_dump())
+        await u_c.insert_one(user_db.model_dump())
     except DuplicateKeyError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User with this ID, username, or email already exists"
         )
     
+    # A cached login may have resolved to another user by email
+    invalidate_logins(user_db.username, user_db.email)
+    
     return UserResponse.model_validate(user_db)
 
 # [Add similar debug prints to other routes if needed]
@@ -163,7 +182,7 @@ async def update_user(
         )
     
     # Find the user to update
-    user = u_c.find_one({"id": user_id})
+    user = await u_c.find_one({"id": user_id})
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -175,7 +194,7 @@ async def update_user(
     if user_update.username is not None:
         # Check if new username already exists (if it's different from current)
         if user_update.username != user["username"]:
-            if u_c.find_one({"username": user_update.username}):
+            if await u_c.find_one({"username": user_update.username}):
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Username already exists"
@@ -185,7 +204,7 @@ async def update_user(
     if user_update.email is not None:
         # Check if new email already exists (if it's different from current)
         if user_update.email != user["email"]:
-            if u_c.find_one({"email": user_update.email}):
+            if await u_c.find_one({"email": user_update.email}):
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Email already exists"
@@ -198,7 +217,7 @@ async def update_user(
     # Perform the update if there's data to update
     if update_data:
         try:
-            result = u_c.update_one(
+            result = await u_c.update_one(
                 {"id": user_id},
                 {"$set": update_data}
             )
@@ -212,9 +231,13 @@ async def update_user(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Update would create a duplicate username or email"
             )
+        
+        # Cached identities and verifications were keyed on the old login names
+        invalidate_user(user_id)
+        invalidate_logins(*(update_data[k] for k in ("username", "email") if k in update_data))
     
     # Retrieve and return the updated user
-    updated_user = u_c.find_one({"id": user_id})
+    updated_user = await u_c.find_one({"id": user_id}, projection_for(UserResponse))
     return UserResponse.model_validate(updated_user)
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -230,7 +253,7 @@ async def delete_user(
     verify_role(current_user.role, "admin")
     
     # Find the user to delete
-    user = u_c.find_one({"id": user_id})
+    user = await u_c.find_one({"id": user_id})
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -238,7 +261,7 @@ async def delete_user(
         )
     
     # Perform the deletion
-    result = u_c.delete_one({"id": user_id})
+    result = await u_c.delete_one({"id": user_id})
     
     if result.deleted_count == 0:
         raise HTTPException(
@@ -246,4 +269,7 @@ async def delete_user(
             detail="Failed to delete user"
         )
     
+    # Stop accepting cached credentials for the removed account
+    invalidate_user(user_id)
+    
     return JSONResponse(status_code=status.HTTP_204_NO_CONTENT, content={})
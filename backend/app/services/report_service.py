@@ -4,10 +4,18 @@ Service for energy report generation and management.
 import os
 import json
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Any, Tuple
+from typing import List, Dict, Optional, Any, Iterable, Tuple
 
-from app.db.data import us_c, d_c, an_c, r_c, u_c
+import pandas as pd
+
+from app.db.data import r_c
+# Report scans read from secondaries when available to stay off the primary
+from app.db.data import us_c_analytics as us_c, d_c_analytics as d_c, u_c_analytics as u_c
+from app.db.data import ub_c_analytics as ub_c
+from app.db.settings import USAGE_STORAGE
 from app.models.report import ReportDB, ReportStatus, ReportFormat
+from app.services.usage_arrow import arrow_supported, field_projection, pa, usage_table
+from app.services.usage_buckets import BUCKETS, bucket_filter, matches, readings_in_order
 from app.utils.report.report_generator import EnergyReportGenerator, generate_energy_report
 
 
@@ -84,14 +92,14 @@ class ReportService:
         return result.modified_count > 0
     
     @staticmethod
-    def fetch_energy_data(
+    def energy_query(
         user_id: str,
         start_date: Optional[str] = None,
         end_date: Optional[str] = None,
         device_ids: Optional[List[str]] = None
-    ) -> List[Dict[str, Any]]:
+    ) -> Optional[Dict[str, Any]]:
         """
-        Fetch energy usage data from the database.
+        Build the query selecting a report's usage readings.
         
         Args:
             user_id: ID of the user
@@ -100,7 +108,7 @@ class ReportService:
             device_ids: List of device IDs to filter by
             
         Returns:
-            List[Dict]: List of energy usage records
+            Optional[Dict]: Query on reading fields, or None if the user has no devices
         """
         # Convert string dates to datetime objects if provided
         start_datetime = None
@@ -124,15 +132,15 @@ class ReportService:
             # If no specific devices are requested, get all devices for the user
             user_devices = list(d_c.find({"user_id": user_id}))
             if not user_devices:
-                return []  # User has no devices, return empty list
+                return None  # User has no devices
             
             user_device_ids = [device["id"] for device in user_devices]
             
             if user_device_ids:
                 query["device_id"] = {"$in": user_device_ids}
             else:
-                # If user has no devices, return empty list
-                return []
+                # If user has no devices
+                return None
         
         # Add date range filter if provided
         if start_datetime or end_datetime:
@@ -145,32 +153,138 @@ class ReportService:
             if timestamp_query:
                 query["timestamp"] = timestamp_query
         
+        return query
+    
+    @staticmethod
+    def energy_records(query: Dict[str, Any], projection: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
+        """
+        Read usage readings in timestamp order.
+        
+        Reports analyse individual readings (anomalies, forecasts, averages and
+        peak times per record), so they always read readings rather than the
+        hourly rollups, whose documents each stand for many readings. With
+        bucketed storage the matching buckets are read in `start` order and
+        expanded into readings one hour at a time.
+        
+        Args:
+            query: Query on reading fields
+            projection: Reading fields to read
+            
+        Returns:
+            Iterable[Dict]: Readings sorted by timestamp
+        """
+        if USAGE_STORAGE != BUCKETS:
+            return us_c.find(query, projection).sort("timestamp", 1)
+        buckets = ub_c.find(bucket_filter(query)).sort("start", 1)
+        return (reading for reading in readings_in_order(buckets) if matches(reading, query))
+    
+    @staticmethod
+    def device_rooms(device_ids: List[str]) -> Dict[str, Any]:
+        """
+        Look up the rooms of devices in one query.
+        
+        Args:
+            device_ids: IDs of the devices
+            
+        Returns:
+            Dict[str, Any]: Room ID by device ID, for devices that exist
+        """
+        return {
+            device["id"]: device.get("room_id")
+            for device in d_c.find({"id": {"$in": device_ids}}, {"_id": 0, "id": 1, "room_id": 1})
+        }
+    
+    @staticmethod
+    def fetch_energy_data(
+        user_id: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        device_ids: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Fetch energy usage data from the database.
+        
+        Args:
+            user_id: ID of the user
+            start_date: Start date in YYYY-MM-DD format
+            end_date: End date in YYYY-MM-DD format
+            device_ids: List of device IDs to filter by
+            
+        Returns:
+            List[Dict]: List of energy usage records
+        """
+        query = ReportService.energy_query(user_id, start_date, end_date, device_ids)
+        if query is None:
+            return []
+        
         # Execute the query
         print(f"Query: {query}")
-        cursor = us_c.find(query).sort("timestamp", 1)
+        cursor = ReportService.energy_records(query, {"_id": 0, "timestamp": 1, "device_id": 1, "energy_consumed": 1})
         print(f"Cursor type: {type(cursor)}")
         usage_data = list(cursor)  # Convert cursor to list
         print(f"Usage data type: {type(usage_data)}, length: {len(usage_data)}")
         
+        # Look up the devices' rooms in one query instead of one per record
+        rooms = ReportService.device_rooms(list({record.get("device_id") for record in usage_data}))
+        
         # Enhance usage data with device information
         enhanced_data = []
         for record in usage_data:
             # Get device info
             device_id = record.get("device_id")
-            device = d_c.find_one({"id": device_id})
             
             # Create enhanced record with location
+            timestamp = record.get("timestamp")
             enhanced_record = {
-                "timestamp": record.get("timestamp").isoformat() if isinstance(record.get("timestamp"), datetime) else record.get("timestamp"),
+                "timestamp": timestamp.isoformat() if isinstance(timestamp, datetime) else timestamp,
                 "device_id": device_id,
                 "energy_consumed": record.get("energy_consumed", 0),
-                "location": device.get("room_id") if device else "Unknown"
+                "location": rooms[device_id] if device_id in rooms else "Unknown"
             }
             
             enhanced_data.append(enhanced_record)
         
         return enhanced_data
     
+    @staticmethod
+    def fetch_energy_frame(
+        user_id: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        device_ids: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """
+        Fetch energy usage data as a DataFrame.
+        
+        With pyarrow installed the cursor is read straight into Arrow columns
+        (see `app.services.usage_arrow`) and converted in one step, without a
+        Python dict per record; otherwise the frame is built from
+        `fetch_energy_data`.
+        
+        Args:
+            user_id: ID of the user
+            start_date: Start date in YYYY-MM-DD format
+            end_date: End date in YYYY-MM-DD format
+            device_ids: List of device IDs to filter by
+            
+        Returns:
+            pd.DataFrame: `timestamp`, `device_id`, `energy_consumed` and `location` columns
+        """
+        if not arrow_supported():
+            return pd.DataFrame(ReportService.fetch_energy_data(user_id, start_date, end_date, device_ids))
+        
+        query = ReportService.energy_query(user_id, start_date, end_date, device_ids)
+        if query is None:
+            return pd.DataFrame()
+        
+        fields = {"timestamp": pa.timestamp("ms"), "device_id": pa.string(), "energy_consumed": pa.float64()}
+        frame = usage_table(ReportService.energy_records(query, field_projection(fields)), fields).to_pandas()
+        frame["energy_consumed"] = frame["energy_consumed"].fillna(0)
+        
+        rooms = ReportService.device_rooms(frame["device_id"].unique().tolist())
+        frame["location"] = frame["device_id"].map(rooms).where(frame["device_id"].isin(rooms), "Unknown")
+        return frame
+    
     @staticmethod
     def fetch_user_data(user_id: str) -> Dict[str, Any]:
         """
@@ -219,14 +333,14 @@ class ReportService:
             )
             
             # Fetch energy data
-            energy_data = ReportService.fetch_energy_data(
+            energy_data = ReportService.fetch_energy_frame(
                 user_id=report_data["user_id"],
                 start_date=report_data.get("start_date"),
                 end_date=report_data.get("end_date"),
                 device_ids=report_data.get("device_ids")
             )
             
-            if not energy_data:
+            if energy_data.empty:
                 error_msg = "No energy data found for the specified criteria"
                 ReportService.update_report_status(
                     report_id, 
@@ -248,8 +362,8 @@ class ReportService:
             )
             
             # Calculate some basic stats for metadata
-            total_energy = sum(record.get("energy_consumed", 0) for record in energy_data)
-            device_count = len(set(record.get("device_id") for record in energy_data))
+            total_energy = float(energy_data["energy_consumed"].sum())
+            device_count = int(energy_data["device_id"].nunique())
             
             # Update the report record with success status
             ReportService.update_report_status(
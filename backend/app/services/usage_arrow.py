@@ -0,0 +1,315 @@
+"""
+Columnar Arrow & Parquet export of usage readings.
+
+Analytics consumers build pandas frames from usage. Through the JSON export
+every reading becomes a dict, then text, then Python objects again before
+pandas assembles its columns. Here readings are read off the cursor straight
+into one list per field and turned into typed Arrow record batches of
+`USAGE_ARROW_BATCH_ROWS` rows:
+
+    id: string, device_id: string, timestamp: timestamp[ms] (UTC),
+    duration: int64, energy_consumed: double, status: string,
+    metrics.<name>: double     (one column per requested metric)
+
+The batches are
+
+- served by `GET /usage/export?format=arrow` as an Arrow IPC stream
+  (`pyarrow.ipc.open_stream(...).read_pandas()`), optionally with
+  zstd-compressed buffers;
+- written by `python -m app.services.usage_arrow --out DIR` as a Parquet
+  dataset partitioned by day (`DIR/day=2025-01-01/part-0.parquet`);
+- used by `ReportService.fetch_energy_frame` to build the report DataFrame
+  with `Table.to_pandas()` instead of from a list of records.
+
+A value of the wrong type for its column (e.g. a text metric) is exported as
+null. pyarrow is optional; without it Arrow exports are refused and reports
+build their DataFrame from records.
+"""
+import argparse
+import io
+import os
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Sequence
+
+from pymongo import ASCENDING
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:  # Arrow exports are refused without it
+    pa = None
+    ds = None
+
+USAGE_ARROW_BATCH_ROWS = int(os.getenv("USAGE_ARROW_BATCH_ROWS", "65536"))     # Readings per record batch
+
+
+def arrow_supported() -> bool:
+    """Whether pyarrow is installed so Arrow & Parquet exports can be written."""
+    return pa is not None
+
+
+def usage_fields(metrics: Sequence[str] = ()) -> Dict[str, Any]:
+    """
+    Arrow types of the exported reading fields.
+
+    Args:
+        metrics (Sequence[str]): Metrics to add as `metrics.<name>` columns.
+
+    Returns:
+        Dict[str, Any]: Arrow type by field path, in column order.
+    """
+    fields = {
+        "id": pa.string(),
+        "device_id": pa.string(),
+        "timestamp": pa.timestamp("ms", tz="UTC"),   # Stored naive datetimes are UTC
+        "duration": pa.int64(),
+        "energy_consumed": pa.float64(),
+        "status": pa.string(),
+    }
+    fields.update({f"metrics.{name}": pa.float64() for name in metrics})
+    return fields
+
+
+def arrow_schema(fields: Dict[str, Any]):
+    """Arrow schema with one column per field path."""
+    return pa.schema(list(fields.items()))
+
+
+def field_projection(fields: Dict[str, Any]) -> Dict[str, int]:
+    """MongoDB projection reading only the exported fields."""
+    return {"_id": 0, **{path: 1 for path in fields}}
+
+
+def _getter(path: str) -> Callable[[Dict[str, Any]], Any]:
+    """Read a field, or a field one level down such as `metrics.power`, from a document."""
+    if "." not in path:
+        return lambda document: document.get(path)
+    parent, child = path.split(".", 1)
+
+    def get(document: Dict[str, Any]) -> Any:
+        value = document.get(parent)
+        return value.get(child) if isinstance(value, dict) else None
+    return get
+
+
+def _coerce(value: Any, arrow_type) -> Any:
+    """`value` if it fits the column type, otherwise None."""
+    if pa.types.is_floating(arrow_type):
+        return float(value) if isinstance(value, (int, float)) else None
+    if pa.types.is_integer(arrow_type):
+        return int(value) if isinstance(value, (int, float)) and value == value else None
+    if pa.types.is_timestamp(arrow_type):
+        return value if isinstance(value, datetime) else None
+    return None if value is None else str(value)
+
+
+def _column(values: List[Any], arrow_type):
+    """Typed Arrow array of one column's values."""
+    try:
+        return pa.array(values, arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array([_coerce(value, arrow_type) for value in values], arrow_type)
+
+
+class BatchBuilder:
+    """
+    Collects documents into per-field lists and turns them into record batches.
+    """
+
+    def __init__(self, fields: Dict[str, Any]):
+        self.schema = arrow_schema(fields)
+        self.rows = 0
+        self._types = list(fields.values())
+        self._getters = [_getter(path) for path in fields]
+        self._columns: List[List[Any]] = [[] for _ in self._types]
+
+    def append(self, document: Dict[str, Any]) -> None:
+        """Add one document as a row."""
+        for column, get in zip(self._columns, self._getters):
+            column.append(get(document))
+        self.rows += 1
+
+    def flush(self):
+        """Record batch of the rows added since the last flush."""
+        batch = pa.RecordBatch.from_arrays(
+            [_column(values, arrow_type) for values, arrow_type in zip(self._columns, self._types)],
+            schema=self.schema,
+        )
+        self._columns = [[] for _ in self._types]
+        self.rows = 0
+        return batch
+
+
+def record_batches(
+    documents: Iterable[Dict[str, Any]], fields: Dict[str, Any], batch_rows: int = USAGE_ARROW_BATCH_ROWS
+) -> Iterator[Any]:
+    """
+    Turn synchronously read documents into record batches.
+
+    Args:
+        documents (Iterable[Dict[str, Any]]): Documents, e.g. a PyMongo cursor.
+        fields (Dict[str, Any]): Arrow type by field path (see `usage_fields`).
+        batch_rows (int): Rows per batch.
+
+    Yields:
+        pyarrow.RecordBatch: Batches of at most `batch_rows` rows.
+    """
+    builder = BatchBuilder(fields)
+    for document in documents:
+        builder.append(document)
+        if builder.rows >= batch_rows:
+            yield builder.flush()
+    if builder.rows:
+        yield builder.flush()
+
+
+async def arrow_batches(cursor, fields: Dict[str, Any], batch_rows: int = USAGE_ARROW_BATCH_ROWS) -> AsyncIterator[Any]:
+    """Turn the documents of an async cursor into record batches, as `record_batches`."""
+    builder = BatchBuilder(fields)
+    async for document in cursor:
+        builder.append(document)
+        if builder.rows >= batch_rows:
+            yield builder.flush()
+    if builder.rows:
+        yield builder.flush()
+
+
+def usage_table(documents: Iterable[Dict[str, Any]], fields: Dict[str, Any], batch_rows: int = USAGE_ARROW_BATCH_ROWS):
+    """
+    Read documents into one Arrow table.
+
+    Args:
+        documents (Iterable[Dict[str, Any]]): Documents, e.g. a PyMongo cursor.
+        fields (Dict[str, Any]): Arrow type by field path.
+        batch_rows (int): Rows per batch while reading.
+
+    Returns:
+        pyarrow.Table: The documents, with an empty table of the schema if there are none.
+    """
+    return pa.Table.from_batches(list(record_batches(documents, fields, batch_rows)), schema=arrow_schema(fields))
+
+
+def _drain(sink: io.BytesIO) -> bytes:
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
+
+
+async def arrow_stream_chunks(
+    cursor, fields: Dict[str, Any], compress: bool = False, batch_rows: int = USAGE_ARROW_BATCH_ROWS
+) -> AsyncIterator[bytes]:
+    """
+    Serialize the documents of a cursor as an Arrow IPC stream.
+
+    Args:
+        cursor: Async cursor over the documents.
+        fields (Dict[str, Any]): Arrow type by field path.
+        compress (bool): Whether to compress the batches' buffers with zstd.
+        batch_rows (int): Rows per record batch.
+
+    Yields:
+        bytes: The schema, then one record batch per chunk, then the end-of-stream marker.
+    """
+    sink = io.BytesIO()
+    options = pa.ipc.IpcWriteOptions(compression="zstd" if compress else None)
+    writer = pa.ipc.new_stream(sink, arrow_schema(fields), options=options)
+    yield _drain(sink)
+    async for batch in arrow_batches(cursor, fields, batch_rows):
+        writer.write_batch(batch)
+        yield _drain(sink)
+    writer.close()
+    yield _drain(sink)
+
+
+def write_parquet(
+    documents: Iterable[Dict[str, Any]], root: str, fields: Dict[str, Any], batch_rows: int = USAGE_ARROW_BATCH_ROWS
+) -> int:
+    """
+    Write readings as a Parquet dataset partitioned by the day of their timestamp.
+
+    Files are named `<root>/day=YYYY-MM-DD/part-<n>.parquet`, so the dataset
+    can be read back with `pyarrow.dataset.dataset(root, partitioning="hive")`
+    or `pandas.read_parquet(root)`. Re-exporting into the same root replaces
+    the days it writes; days it does not cover are kept.
+
+    Args:
+        documents (Iterable[Dict[str, Any]]): Readings, in any order.
+        root (str): Directory of the dataset.
+        fields (Dict[str, Any]): Arrow type by field path; must include `timestamp`.
+        batch_rows (int): Rows per record batch.
+
+    Returns:
+        int: Number of readings written.
+    """
+    schema = arrow_schema(fields).append(pa.field("day", pa.date32()))
+    written = 0
+
+    def with_day() -> Iterator[Any]:
+        nonlocal written
+        for batch in record_batches(documents, fields, batch_rows):
+            written += batch.num_rows
+            day = batch.column("timestamp").cast(pa.date32())
+            yield pa.RecordBatch.from_arrays(batch.columns + [day], schema=schema)
+
+    ds.write_dataset(
+        with_day(),
+        root,
+        schema=schema,
+        format="parquet",
+        partitioning=ds.partitioning(pa.schema([("day", pa.date32())]), flavor="hive"),
+        basename_template="part-{i}.parquet",
+        # Remove a day's earlier files first, or leftover parts of a larger export would be read twice
+        existing_data_behavior="delete_matching",
+    )
+    return written
+
+
+def _parse_day(value: str) -> datetime:
+    return datetime.strptime(value, "%Y-%m-%d")
+
+
+def main():
+    """Export usage readings as a Parquet dataset from the command line."""
+    from app.db.data import ub_c_analytics, us_c_analytics
+    from app.db.settings import USAGE_STORAGE
+    from app.services.usage_buckets import BUCKETS, bucket_filter, bucketed_readings, matches
+
+    parser = argparse.ArgumentParser(description="Export usage readings as Parquet partitioned by day")
+    parser.add_argument("--out", required=True, help="Directory of the dataset")
+    parser.add_argument("--device", action="append", help="Device to export (repeatable); all if omitted")
+    parser.add_argument("--start", type=_parse_day, help="First day to export (YYYY-MM-DD)")
+    parser.add_argument("--end", type=_parse_day, help="Day after the last day to export (YYYY-MM-DD)")
+    parser.add_argument("--metric", action="append", default=[], help="Metric to add as a column (repeatable)")
+    parser.add_argument("--batch-rows", type=int, default=USAGE_ARROW_BATCH_ROWS, help="Readings per record batch")
+    args = parser.parse_args()
+
+    if not arrow_supported():
+        parser.error("pyarrow is required for Parquet exports")
+
+    query: Dict[str, Any] = {}
+    if args.device:
+        query["device_id"] = {"$in": args.device}
+    if args.start or args.end:
+        query["timestamp"] = {}
+        if args.start:
+            query["timestamp"]["$gte"] = args.start
+        if args.end:
+            query["timestamp"]["$lt"] = args.end
+
+    fields = usage_fields(args.metric)
+    documents: Iterable[Dict[str, Any]]
+    if USAGE_STORAGE == BUCKETS:
+        documents = (
+            reading for reading in bucketed_readings(ub_c_analytics.find(bucket_filter(query)))
+            if matches(reading, query)
+        )
+    else:
+        documents = us_c_analytics.find(query, field_projection(fields)).sort([("timestamp", ASCENDING)])
+
+    written = write_parquet(documents, args.out, fields, args.batch_rows)
+    print(f"Wrote {written} readings to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
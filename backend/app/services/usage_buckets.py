@@ -0,0 +1,674 @@
+"""
+Bucketed usage storage: one document per device & hour.
+
+A reading stored as its own document carries its ids, timestamps and field
+names in every document, plus an entry in each usage index. With
+`USAGE_STORAGE=buckets` readings are instead appended to per-device, per-hour
+bucket documents in `USAGE_BUCKET_COLLECTION`:
+
+    {
+        "device_id": "thermostat-1",
+        "start": datetime(2025, 1, 1, 13),     # UTC start of the hour
+        "count": 3,                            # Readings (deleted ones excluded)
+        "total_energy": 0.75,
+        "total_duration": 180,
+        "min_energy": 0.25, "max_energy": 0.25,
+        "ids": ["3f2c…", "9a1e…", "c07b…"],    # Parallel arrays, one slot per reading
+        "offsets": [0, 60000, 120000],         # Milliseconds after `start`
+        "energy": [0.25, 0.25, 0.25],
+        "duration": [60, 60, 60],
+        "status": ["on", "on", "on"],
+        "metrics": [{"power": 100.0}, {"power": 101.5}, {"power": 99.0}],
+    }
+
+A batch of readings becomes one `$push`/`$inc` upsert per touched bucket. A
+bucket holds at most `USAGE_BUCKET_MAX_READINGS` readings; later readings for
+the same hour start another bucket.
+
+`BucketedUsage` wraps the bucket collection with the subset of the collection
+API the usage routes use (`find`, `find_one`, `aggregate`, `insert_one`,
+`insert_many`, `update_one`, `delete_one`), with queries & results expressed
+as reading documents, so `GET /usage/` and `GET /usage/{id}` answer exactly as they do
+for document storage. Readings can only be sorted by `timestamp` first: any
+other order would need every matching reading in memory, so `GET /usage/`
+refuses the energy sorts with bucket storage. `usage_store` picks the adapter or the plain collection
+for the configured storage. Per-reading `created` / `updated` times are not
+kept; a bucket records when it was last updated. Deleted readings leave an
+empty slot (`ids[i]` is null) that readers skip. `USAGE_NATURAL_KEY` does not
+apply to bucket storage.
+"""
+import os
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, WriteError
+from pymongo.results import DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+from app.db.async_data import ub_c
+from app.db.settings import USAGE_STORAGE, with_workload
+from app.services.usage_rollups import HOUR, bucket_start, naive_utc
+
+USAGE_BUCKET_MAX_READINGS = int(os.getenv("USAGE_BUCKET_MAX_READINGS", "1000"))    # Readings per bucket document
+
+BUCKETS = "buckets"
+DUPLICATE_KEY_ERROR = 11000
+MILLISECOND = timedelta(milliseconds=1)
+
+# Reading field -> bucket array
+FIELD_ARRAYS = {
+    "energy_consumed": "energy",
+    "duration": "duration",
+    "status": "status",
+    "metrics": "metrics",
+}
+BOUNDS = ("$gt", "$gte", "$lt", "$lte")
+COMPARISONS = {
+    "$eq": lambda value, bound: value == bound,
+    "$ne": lambda value, bound: value != bound,
+    "$gt": lambda value, bound: value is not None and value > bound,
+    "$gte": lambda value, bound: value is not None and value >= bound,
+    "$lt": lambda value, bound: value is not None and value < bound,
+    "$lte": lambda value, bound: value is not None and value <= bound,
+    "$in": lambda value, bound: value in bound,
+}
+
+
+def bucket_updates(
+    documents: List[Dict[str, Any]],
+    max_readings: int = USAGE_BUCKET_MAX_READINGS,
+) -> Tuple[List[UpdateOne], List[List[int]]]:
+    """
+    Build the bucket appends for a batch of usage documents.
+
+    Args:
+        documents (List[Dict[str, Any]]): Usage documents (`UsageDB` dumps).
+        max_readings (int): Readings per bucket.
+
+    Returns:
+        Tuple[List[UpdateOne], List[List[int]]]: One upsert per bucket chunk,
+        and for each the indexes of the documents it appends.
+    """
+    groups: Dict[Tuple[str, datetime], List[int]] = {}
+    for index, document in enumerate(documents):
+        groups.setdefault((document["device_id"], bucket_start(document["timestamp"], HOUR)), []).append(index)
+
+    operations, members = [], []
+    for (device_id, start), indexes in groups.items():
+        for chunk_start in range(0, len(indexes), max_readings):
+            chunk = indexes[chunk_start:chunk_start + max_readings]
+            readings = [documents[index] for index in chunk]
+            energies = [reading.get("energy_consumed") for reading in readings]
+            update: Dict[str, Any] = {
+                "$push": {
+                    "ids": {"$each": [reading["id"] for reading in readings]},
+                    "offsets": {"$each": [
+                        (naive_utc(reading["timestamp"]) - start) // MILLISECOND for reading in readings
+                    ]},
+                    **{
+                        array: {"$each": [reading.get(field) for reading in readings]}
+                        for field, array in FIELD_ARRAYS.items()
+                    },
+                },
+                "$inc": {
+                    "count": len(readings),
+                    "total_energy": sum(energy or 0 for energy in energies),
+                    "total_duration": sum(reading.get("duration") or 0 for reading in readings),
+                },
+            }
+            known = [energy for energy in energies if energy is not None]
+            if known:
+                update["$min"] = {"min_energy": min(known)}
+                update["$max"] = {"max_energy": max(known)}
+            # Only append to a bucket with room for the whole chunk
+            operations.append(UpdateOne(
+                {"device_id": device_id, "start": start, "count": {"$lte": max_readings - len(readings)}},
+                update, upsert=True
+            ))
+            members.append(chunk)
+    return operations, members
+
+
+def bucket_reading(bucket: Dict[str, Any], index: int) -> Dict[str, Any]:
+    """
+    Rebuild the reading stored in one slot of a bucket.
+
+    Args:
+        bucket (Dict[str, Any]): Bucket document.
+        index (int): Slot in the bucket's arrays.
+
+    Returns:
+        Dict[str, Any]: Reading with the `UsageResponse` fields.
+    """
+    reading = {
+        "id": bucket["ids"][index],
+        "device_id": bucket["device_id"],
+        "timestamp": bucket["start"] + bucket["offsets"][index] * MILLISECOND,
+    }
+    for field, array in FIELD_ARRAYS.items():
+        values = bucket.get(array) or []
+        reading[field] = values[index] if index < len(values) else None
+    return reading
+
+
+def expand_bucket(bucket: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the readings stored in a bucket, skipping deleted slots.
+
+    Args:
+        bucket (Dict[str, Any]): Bucket document.
+
+    Yields:
+        Dict[str, Any]: Readings in the order they were appended.
+    """
+    for index, usage_id in enumerate(bucket.get("ids") or []):
+        if usage_id is not None:
+            yield bucket_reading(bucket, index)
+
+
+def bucket_filter(query: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Translate a reading query into a filter selecting the buckets that may match.
+
+    Conditions on `id`, `device_id`, `timestamp`, `status` and
+    `energy_consumed` narrow the buckets, also inside `$and` & `$or`; every
+    condition is re-checked on the readings with `matches`.
+
+    Args:
+        query (Dict[str, Any]): Query on reading fields.
+
+    Returns:
+        Dict[str, Any]: Filter on bucket documents.
+    """
+    translated: Dict[str, Any] = {}
+    for field, condition in query.items():
+        if field in ("$and", "$or"):
+            parts = [bucket_filter(part) for part in condition]
+            # A part that cannot narrow the buckets makes an $or match every bucket
+            if field == "$and" and any(parts):
+                translated["$and"] = [part for part in parts if part]
+            elif field == "$or" and all(parts):
+                translated["$or"] = parts
+            continue
+        operators = condition if _is_operator(condition) else {"$eq": condition}
+        if field == "device_id":
+            translated["device_id"] = condition
+        elif field in ("id", "status"):
+            array = "ids" if field == "id" else "status"
+            if "$eq" in operators:
+                translated[array] = operators["$eq"]
+            elif "$in" in operators:
+                translated[array] = {"$in": operators["$in"]}
+        elif field == "timestamp":
+            start: Dict[str, Any] = {}
+            for operator, bound in operators.items():
+                if operator in ("$gt", "$gte"):
+                    start["$gte"] = bucket_start(bound, HOUR)
+                elif operator in ("$lt", "$lte"):
+                    start[operator] = naive_utc(bound)
+                elif operator == "$eq":
+                    start["$eq"] = bucket_start(bound, HOUR)
+            if start:
+                translated["start"] = start
+        elif field == "energy_consumed":
+            for operator, bound in operators.items():
+                if operator in ("$gt", "$gte"):
+                    translated.setdefault("max_energy", {})[operator] = bound
+                elif operator in ("$lt", "$lte"):
+                    translated.setdefault("min_energy", {})[operator] = bound
+    return translated
+
+
+def _is_operator(condition: Any) -> bool:
+    return isinstance(condition, dict) and bool(condition) and all(key.startswith("$") for key in condition)
+
+
+def matches(reading: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    """
+    Check a reading against a query of equality, `$in` & range conditions,
+    combined with `$and` & `$or`.
+
+    Args:
+        reading (Dict[str, Any]): Reading from `bucket_reading`.
+        query (Dict[str, Any]): Query on reading fields.
+
+    Returns:
+        bool: True if every condition holds.
+
+    Raises:
+        ValueError: If the query uses an operator buckets cannot evaluate.
+    """
+    for field, condition in query.items():
+        if field == "$and":
+            if not all(matches(reading, part) for part in condition):
+                return False
+            continue
+        if field == "$or":
+            if not any(matches(reading, part) for part in condition):
+                return False
+            continue
+        value = reading.get(field)
+        operators = condition if _is_operator(condition) else {"$eq": condition}
+        for operator, bound in operators.items():
+            if isinstance(bound, datetime):
+                bound = naive_utc(bound)
+            if operator not in COMPARISONS:
+                raise ValueError(f"Bucketed usage storage does not support {operator}")
+            try:
+                if not COMPARISONS[operator](value, bound):
+                    return False
+            except TypeError:
+                return False
+    return True
+
+
+def _slot(array: str) -> Dict[str, Any]:
+    return {"$arrayElemAt": [f"${array}", "$slot"]}
+
+
+# Pipeline stages turning bucket documents into reading documents, skipping deleted slots
+READING_STAGES: List[Dict[str, Any]] = [
+    {"$unwind": {"path": "$ids", "includeArrayIndex": "slot"}},
+    {"$match": {"ids": {"$ne": None}}},
+    {"$project": {
+        "_id": 0,
+        "id": "$ids",
+        "device_id": 1,
+        "timestamp": {"$add": ["$start", _slot("offsets")]},
+        **{field: _slot(array) for field, array in FIELD_ARRAYS.items()},
+    }},
+]
+
+
+def whole_bucket_split(query: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+    """
+    Split a reading query into the buckets it matches whole and the readings left over.
+
+    A bucket holds one device's readings of one hour, so for a query on
+    `device_id` and a `timestamp` range every bucket of a matching device
+    whose hour lies inside the range matches whole; only the partial hours at
+    either end need their readings checked.
+
+    Args:
+        query (Dict[str, Any]): Query on reading fields.
+
+    Returns:
+        Optional[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]: Filter on
+        the whole buckets and the reading query for the partial hours (None if
+        there are none), or None if the query has other conditions or no hour
+        lies inside its range.
+    """
+    bounds = query.get("timestamp", {})
+    if set(query) - {"device_id", "timestamp"} or not isinstance(bounds, dict) or set(bounds) - set(BOUNDS):
+        return None
+    if ("$gt" in bounds and "$gte" in bounds) or ("$lt" in bounds and "$lte" in bounds):
+        return None
+
+    first = last = None
+    lower_op = "$gt" if "$gt" in bounds else "$gte" if "$gte" in bounds else None
+    upper_op = "$lt" if "$lt" in bounds else "$lte" if "$lte" in bounds else None
+    if lower_op:
+        lower = naive_utc(bounds[lower_op])
+        first = bucket_start(lower, HOUR)
+        if first < lower or lower_op == "$gt":
+            first += timedelta(hours=1)
+    if upper_op:
+        upper = naive_utc(bounds[upper_op])
+        # Whole buckets end (exclusive) at or before `last`
+        last = bucket_start(upper + (MILLISECOND if upper_op == "$lte" else timedelta(0)), HOUR)
+    if first is not None and last is not None and first >= last:
+        return None
+
+    whole = bucket_filter({"device_id": query["device_id"]} if "device_id" in query else {})
+    start: Dict[str, Any] = {}
+    edges = []
+    if first is not None:
+        start["$gte"] = first
+        if not (lower_op == "$gte" and lower == first):
+            edges.append({"timestamp": {"$lt": first}})
+    if last is not None:
+        start["$lte"] = last - timedelta(hours=1)
+        if not (upper_op == "$lt" and upper == last):
+            edges.append({"timestamp": {"$gte": last}})
+    if start:
+        whole["start"] = start
+    if not edges:
+        return whole, None
+    return whole, {"$and": [query, edges[0] if len(edges) == 1 else {"$or": edges}]}
+
+
+class ResultsCursor:
+    """Async cursor over aggregation results already read."""
+
+    def __init__(self, results: List[Dict[str, Any]]):
+        self._results = results
+
+    async def __aiter__(self) -> AsyncIterator[Dict[str, Any]]:
+        for result in self._results:
+            yield result
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self._results[:length] if length else list(self._results)
+
+
+def _sort_key(field: str):
+    # Missing values sort first, as in MongoDB
+    return lambda reading: (reading.get(field) is not None, reading.get(field) if reading.get(field) is not None else 0)
+
+
+def _sorted(readings: List[Dict[str, Any]], keys: List[Tuple[str, int]]) -> List[Dict[str, Any]]:
+    """Readings ordered by several keys, the first one most significant."""
+    for field, direction in reversed(keys):
+        readings = sorted(readings, key=_sort_key(field), reverse=direction == DESCENDING)
+    return readings
+
+
+def _project(reading: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    included = [field for field, value in (projection or {}).items() if value and field != "_id"]
+    return {field: reading[field] for field in included if field in reading} if included else reading
+
+
+class BucketCursor:
+    """
+    Cursor over the readings in matching buckets.
+
+    Supports `sort` led by `timestamp` (ties broken by other reading fields),
+    `skip`, `limit`, `to_list` and `async for`. Buckets are streamed in hour
+    order and reading stops once `skip + limit` readings were produced.
+    """
+    def __init__(self, collection, query: Dict[str, Any], projection: Optional[Dict[str, Any]] = None):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort: List[Tuple[str, int]] = [("timestamp", ASCENDING)]
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key, direction: int = ASCENDING) -> "BucketCursor":
+        """
+        Order the readings.
+
+        Raises:
+            ValueError: If the first sort key is not `timestamp`.
+        """
+        keys = [tuple(pair) for pair in key] if isinstance(key, list) else [(key, direction)]
+        if keys[0][0] != "timestamp":
+            raise ValueError("Bucketed usage storage can only sort readings by timestamp")
+        self._sort = keys
+        return self
+
+    def skip(self, count: int) -> "BucketCursor":
+        self._skip = count
+        return self
+
+    def limit(self, count: int) -> "BucketCursor":
+        self._limit = count
+        return self
+
+    def batch_size(self, count: int) -> "BucketCursor":
+        return self
+
+    async def _ordered(self) -> AsyncIterator[Dict[str, Any]]:
+        """Matching readings in sort order."""
+        direction = self._sort[0][1]
+        buckets = self._collection.find(bucket_filter(self._query))
+
+        # Buckets of different devices (or a full bucket & its successor) share an
+        # hour, so readings are ordered one hour at a time
+        group: List[Dict[str, Any]] = []
+        group_start = None
+        async for bucket in buckets.sort("start", direction):
+            if group and bucket["start"] != group_start:
+                for reading in _sorted(group, self._sort):
+                    yield reading
+                group = []
+            group_start = bucket["start"]
+            group.extend(reading for reading in expand_bucket(bucket) if matches(reading, self._query))
+        for reading in _sorted(group, self._sort):
+            yield reading
+
+    async def _iterate(self) -> AsyncIterator[Dict[str, Any]]:
+        skipped = returned = 0
+        async for reading in self._ordered():
+            if skipped < self._skip:
+                skipped += 1
+                continue
+            yield _project(reading, self._projection)
+            returned += 1
+            if self._limit and returned >= self._limit:
+                return
+
+    def __aiter__(self) -> AsyncIterator[Dict[str, Any]]:
+        return self._iterate()
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        readings = []
+        async for reading in self:
+            readings.append(reading)
+            if length and len(readings) >= length:
+                break
+        return readings
+
+
+class BucketedUsage:
+    """
+    Usage readings stored in hourly buckets, behind a collection-like API.
+
+    Attributes:
+        collection: Asyncio bucket collection.
+        max_readings (int): Readings per bucket.
+    """
+    def __init__(self, collection, max_readings: int = USAGE_BUCKET_MAX_READINGS):
+        self.collection = collection
+        self.max_readings = max(1, max_readings)
+
+    def find(self, query: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None) -> BucketCursor:
+        """Readings matching `query`; see `BucketCursor`."""
+        return BucketCursor(self.collection, query or {}, projection)
+
+    async def aggregate(self, pipeline: List[Dict[str, Any]], whole_pipeline: Optional[List[Dict[str, Any]]] = None):
+        """
+        Run a pipeline written for reading documents on the buckets.
+
+        `pipeline` must start with a `$match` on reading fields. The buckets
+        it may match are unwound into readings in the database
+        (`READING_STAGES`) and the rest of the pipeline runs on those.
+
+        With `whole_pipeline`, buckets whose every reading matches (see
+        `whole_bucket_split`) are answered by it on the bucket documents,
+        e.g. from their stored totals, and only the partial hours at either end
+        are unwound. The answers of both pipelines are returned together, so
+        they must produce documents the caller adds up.
+
+        Args:
+            pipeline (List[Dict[str, Any]]): Pipeline on reading documents.
+            whole_pipeline (Optional[List[Dict[str, Any]]]): Stages run on whole bucket documents.
+
+        Returns:
+            An async cursor over the results.
+
+        Raises:
+            ValueError: If the pipeline does not start with `$match`.
+        """
+        if not pipeline or "$match" not in pipeline[0]:
+            raise ValueError("Bucketed usage pipelines must start with $match")
+        match, stages = pipeline[0]["$match"], pipeline[1:]
+        split = whole_bucket_split(match) if whole_pipeline is not None else None
+        if split is None:
+            return await self.collection.aggregate(
+                [{"$match": bucket_filter(match)}, *READING_STAGES, {"$match": match}, *stages]
+            )
+
+        whole, edges = split
+        cursor = await self.collection.aggregate([{"$match": whole}, *whole_pipeline])
+        results = await cursor.to_list(None)
+        if edges is not None:
+            cursor = await self.collection.aggregate(
+                [{"$match": bucket_filter(edges)}, *READING_STAGES, {"$match": edges}, *stages]
+            )
+            results.extend(await cursor.to_list(None))
+        return ResultsCursor(results)
+
+    async def find_one(self, query: Dict[str, Any], projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """First reading matching `query`, or None."""
+        readings = await self.find(query, projection).limit(1).to_list(1)
+        return readings[0] if readings else None
+
+    async def insert_many(self, documents: List[Dict[str, Any]], ordered: bool = False) -> InsertManyResult:
+        """
+        Append usage documents to their buckets with one `bulk_write`.
+
+        Raises:
+            BulkWriteError: With `writeErrors` indexed by document, if any bucket append failed.
+        """
+        operations, members = bucket_updates(documents, self.max_readings)
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # A failed append fails every reading in that bucket chunk
+            errors = [
+                {**error, "index": index}
+                for error in e.details.get("writeErrors", [])
+                for index in members[error["index"]]
+            ]
+            raise BulkWriteError({
+                **e.details,
+                "writeErrors": sorted(errors, key=lambda error: error["index"]),
+                "nInserted": len(documents) - len(errors),
+            })
+        return InsertManyResult([document["id"] for document in documents], True)
+
+    async def insert_one(self, document: Dict[str, Any]) -> InsertOneResult:
+        """
+        Append one usage document to its bucket.
+
+        Raises:
+            DuplicateKeyError: If the append hit a unique index.
+            WriteError: If the append failed otherwise.
+        """
+        try:
+            await self.insert_many([document])
+        except BulkWriteError as e:
+            error = e.details["writeErrors"][0]
+            if error.get("code") == DUPLICATE_KEY_ERROR:
+                raise DuplicateKeyError(error.get("errmsg", "Duplicate key"), DUPLICATE_KEY_ERROR, error)
+            raise WriteError(error.get("errmsg", "Insert failed"), error.get("code"), error)
+        return InsertOneResult(document["id"], True)
+
+    async def _locate(self, usage_id: str) -> Tuple[Optional[Dict[str, Any]], int]:
+        """The bucket holding a reading and its slot."""
+        bucket = await self.collection.find_one({"ids": usage_id})
+        if not bucket:
+            return None, -1
+        return bucket, bucket["ids"].index(usage_id)
+
+    async def update_one(self, query: Dict[str, Any], update: Dict[str, Any]) -> UpdateResult:
+        """
+        Apply a `{"$set": ...}` to the reading matched by `{"id": ...}`.
+
+        Fields other than `energy_consumed`, `duration`, `status` & `metrics`
+        are not stored per reading; `updated` is recorded on the bucket.
+        """
+        bucket, index = await self._locate(query["id"])
+        if bucket is None:
+            return UpdateResult({"n": 0, "nModified": 0, "ok": 1}, True)
+
+        changes = update.get("$set", {})
+        set_fields: Dict[str, Any] = {}
+        increments: Dict[str, Any] = {}
+        for field, value in changes.items():
+            if field in FIELD_ARRAYS:
+                set_fields[f"{FIELD_ARRAYS[field]}.{index}"] = value
+            elif field == "updated":
+                set_fields["updated"] = value
+        previous = bucket_reading(bucket, index)
+        if "energy_consumed" in changes:
+            increments["total_energy"] = (changes["energy_consumed"] or 0) - (previous["energy_consumed"] or 0)
+        if "duration" in changes:
+            increments["total_duration"] = (changes["duration"] or 0) - (previous["duration"] or 0)
+
+        bucket_update: Dict[str, Any] = {"$set": set_fields}
+        if increments:
+            bucket_update["$inc"] = increments
+        if changes.get("energy_consumed") is not None:
+            bucket_update["$min"] = {"min_energy": changes["energy_consumed"]}
+            bucket_update["$max"] = {"max_energy": changes["energy_consumed"]}
+        return await self.collection.update_one(
+            {"_id": bucket["_id"], f"ids.{index}": query["id"]}, bucket_update
+        )
+
+    async def delete_one(self, query: Dict[str, Any]) -> DeleteResult:
+        """Empty the slot of the reading matched by `{"id": ...}`."""
+        bucket, index = await self._locate(query["id"])
+        if bucket is None:
+            return DeleteResult({"n": 0, "ok": 1}, True)
+
+        previous = bucket_reading(bucket, index)
+        result = await self.collection.update_one(
+            {"_id": bucket["_id"], f"ids.{index}": query["id"]},
+            {
+                "$set": {f"ids.{index}": None, f"metrics.{index}": None},
+                "$inc": {
+                    "count": -1,
+                    "total_energy": -(previous["energy_consumed"] or 0),
+                    "total_duration": -(previous["duration"] or 0),
+                },
+            }
+        )
+        return DeleteResult({"n": result.modified_count, "ok": 1}, True)
+
+
+_stores: Dict[Optional[str], BucketedUsage] = {}
+
+
+def usage_store(collection, workload: Optional[str] = None):
+    """
+    Pick where usage readings are read & written.
+
+    Args:
+        collection: Usage collection used with document storage.
+        workload (Optional[str]): Workload whose options the bucket collection
+            should carry (see `app.db.settings.with_workload`).
+
+    Returns:
+        `collection` with `USAGE_STORAGE=documents`, otherwise a `BucketedUsage`.
+    """
+    if USAGE_STORAGE != BUCKETS:
+        return collection
+    store = _stores.get(workload)
+    if store is None:
+        store = _stores[workload] = BucketedUsage(with_workload(ub_c, workload))
+    return store
+
+
+def bucketed_readings(buckets: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    Expand synchronously read buckets into readings, for scripts & jobs.
+
+    Args:
+        buckets (Iterable[Dict[str, Any]]): Bucket documents.
+
+    Yields:
+        Dict[str, Any]: Readings.
+    """
+    for bucket in buckets:
+        yield from expand_bucket(bucket)
+
+
+def readings_in_order(buckets: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    Expand buckets read in `start` order into readings in timestamp order.
+
+    A bucket's readings all fall within the hour it starts, so only the
+    buckets sharing one `start` (one per device, plus any overflow buckets)
+    are held and sorted at a time rather than every matching reading.
+
+    Args:
+        buckets (Iterable[Dict[str, Any]]): Bucket documents sorted by `start`.
+
+    Yields:
+        Dict[str, Any]: Readings sorted by timestamp.
+    """
+    for _, hour in groupby(buckets, key=lambda bucket: bucket["start"]):
+        yield from sorted(bucketed_readings(hour), key=lambda reading: reading["timestamp"])
@@ -0,0 +1,264 @@
+"""
+Write-behind buffer for single usage records.
+
+Devices usually post one reading per request. With `USAGE_WRITE_BUFFER`
+enabled, `POST /usage/` hands its document to `usage_buffer` instead of
+calling `insert_one`, and a background task writes the queued documents with
+one unordered `insert_many` every `USAGE_BUFFER_MAX_RECORDS` records or
+`USAGE_BUFFER_FLUSH_MS` milliseconds, whichever comes first.
+
+`USAGE_BUFFER_DURABILITY` decides when the request is acknowledged:
+
+- `enqueued`: as soon as the record is queued. Fastest, but records still
+  queued when the process dies are lost and insert errors are only logged.
+- `written`: once the batch holding the record has been inserted. Requests
+  still share one `insert_many`, so the round trip is amortized while the
+  client learns about duplicates & failures.
+
+At most `USAGE_BUFFER_MAX_QUEUE` records wait at once; beyond that
+`UsageBufferFull` is raised so the route can shed load. The buffer is drained
+on shutdown.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+
+from app.db.async_data import us_c_ingest
+from app.db.settings import WORKLOAD_INGEST
+from app.services.usage_buckets import usage_store
+from app.services.usage_rollups import apply_rollups
+
+logger = logging.getLogger(__name__)
+
+USAGE_WRITE_BUFFER = os.getenv("USAGE_WRITE_BUFFER", "false").lower() in ("1", "true", "yes")
+USAGE_BUFFER_MAX_RECORDS = int(os.getenv("USAGE_BUFFER_MAX_RECORDS", "500"))     # Records per insert_many
+USAGE_BUFFER_FLUSH_MS = float(os.getenv("USAGE_BUFFER_FLUSH_MS", "50"))          # Longest a record waits
+USAGE_BUFFER_MAX_QUEUE = int(os.getenv("USAGE_BUFFER_MAX_QUEUE", "10000"))       # Records allowed to wait
+USAGE_BUFFER_DURABILITY = os.getenv("USAGE_BUFFER_DURABILITY", "enqueued").lower()  # enqueued | written
+
+DURABILITY_MODES = ("enqueued", "written")
+DUPLICATE_KEY_ERROR = 11000
+
+
+class UsageBufferFull(RuntimeError):
+    """
+    Raised when the write-behind buffer already holds its maximum number of records.
+    """
+
+
+class UsageWriteBuffer:
+    """
+    Coalesces usage inserts into batched `insert_many` calls.
+
+    Attributes:
+        max_records (int): Records written per batch.
+        flush_ms (float): Longest time a queued record waits for its batch to fill.
+        max_queue (int): Records allowed to wait before `submit` refuses more.
+        durability (str): `enqueued` or `written`, see the module docstring.
+    """
+    def __init__(
+        self,
+        max_records: int = USAGE_BUFFER_MAX_RECORDS,
+        flush_ms: float = USAGE_BUFFER_FLUSH_MS,
+        max_queue: int = USAGE_BUFFER_MAX_QUEUE,
+        durability: str = USAGE_BUFFER_DURABILITY,
+    ):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"USAGE_BUFFER_DURABILITY must be one of {', '.join(DURABILITY_MODES)}")
+        self.max_records = max(1, max_records)
+        self.flush_ms = max(0.0, flush_ms)
+        self.max_queue = max(self.max_records, max_queue)
+        self.durability = durability
+
+        self._pending: List[Tuple[Dict[str, Any], Optional[asyncio.Future]]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._full: Optional[asyncio.Event] = None
+        self._closing = False
+
+        self.submitted = 0
+        self.written = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.rejected = 0
+        self.batches = 0
+        self.last_flush_ms = 0.0
+
+    def _ensure_flusher(self):
+        """Start the flush task on the running loop, restarting it if the loop changed."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._full = asyncio.Event()
+            self._task = loop.create_task(self._run())
+            if self._pending:
+                self._wakeup.set()
+
+    async def submit(self, document: Dict[str, Any]):
+        """
+        Queue a usage document for insertion.
+
+        In `written` mode this waits until the document's batch is inserted.
+
+        Args:
+            document (Dict[str, Any]): Usage document to insert.
+
+        Raises:
+            UsageBufferFull: If the buffer is full or shutting down.
+            DuplicateKeyError: In `written` mode, if a record with this ID exists.
+            PyMongoError: In `written` mode, if the batch could not be written.
+        """
+        if self._closing or len(self._pending) >= self.max_queue:
+            self.rejected += 1
+            raise UsageBufferFull("Usage write buffer is full")
+
+        self._ensure_flusher()
+        future = self._loop.create_future() if self.durability == "written" else None
+        self._pending.append((document, future))
+        self.submitted += 1
+        self._wakeup.set()
+        if len(self._pending) >= self.max_records:
+            self._full.set()
+
+        if future is not None:
+            await future
+
+    async def _run(self):
+        """Write queued documents until the buffer is closed & drained."""
+        while True:
+            if not self._pending:
+                if self._closing:
+                    return
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            # Give the batch until the flush interval to fill up
+            if len(self._pending) < self.max_records and not self._closing:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.flush_ms / 1000)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = self._pending[:self.max_records]
+            del self._pending[:self.max_records]
+            try:
+                await self._write(batch)
+            except Exception:  # Keep draining later batches whatever happened to this one
+                logger.exception("Usage write buffer flush failed")
+
+    async def _write(self, batch: List[Tuple[Dict[str, Any], Optional[asyncio.Future]]]):
+        """
+        Insert one batch and settle the futures of its records.
+
+        Never raises: an unexpected error (e.g. a document BSON cannot encode
+        or a failed rollup update) is logged and fails every future of the
+        batch not settled yet, so waiting requests and later batches go on.
+        """
+        started = time.perf_counter()
+        write_errors: Dict[int, Dict[str, Any]] = {}
+        batch_error: Optional[Exception] = None
+        inserted = False
+        try:
+            try:
+                await usage_store(us_c_ingest, WORKLOAD_INGEST).insert_many(
+                    [document for document, _ in batch], ordered=False
+                )
+            except BulkWriteError as e:
+                write_errors = {error["index"]: error for error in e.details.get("writeErrors", [])}
+            inserted = True
+
+            duplicates = sum(1 for error in write_errors.values() if error.get("code") == DUPLICATE_KEY_ERROR)
+            self.written += len(batch) - len(write_errors)
+            self.duplicates += duplicates
+            self.failed += len(write_errors) - duplicates
+            if len(write_errors) > duplicates and self.durability == "enqueued":
+                logger.warning(
+                    "Usage write buffer failed to insert %d of %d records", len(write_errors) - duplicates, len(batch)
+                )
+            await apply_rollups([document for index, (document, _) in enumerate(batch) if index not in write_errors])
+        except Exception as e:
+            batch_error = e
+            if not inserted:
+                self.failed += len(batch)
+            logger.error("Usage write buffer failed a batch of %d records: %s", len(batch), e)
+        finally:
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+            self.batches += 1
+            for index, (_, future) in enumerate(batch):
+                if future is None or future.done():
+                    continue
+                error = write_errors.get(index)
+                if batch_error is not None:
+                    future.set_exception(batch_error)
+                elif error is None:
+                    future.set_result(None)
+                elif error.get("code") == DUPLICATE_KEY_ERROR:
+                    future.set_exception(DuplicateKeyError(error.get("errmsg", "Duplicate key"), DUPLICATE_KEY_ERROR, error))
+                else:
+                    future.set_exception(PyMongoError(error.get("errmsg", "Insert failed")))
+
+    async def close(self):
+        """
+        Stop accepting records and write everything still queued.
+        """
+        self._closing = True
+        try:
+            if self._pending or self._task is not None:
+                self._ensure_flusher()
+                self._wakeup.set()
+                self._full.set()
+                await self._task
+        finally:
+            self._closing = False
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report buffer configuration & counters.
+
+        Returns:
+            Dict[str, Any]: Settings, queue depth and write totals.
+        """
+        return {
+            "enabled": USAGE_WRITE_BUFFER,
+            "durability": self.durability,
+            "max_records": self.max_records,
+            "flush_ms": self.flush_ms,
+            "max_queue": self.max_queue,
+            "queued": len(self._pending),
+            "submitted": self.submitted,
+            "written": self.written,
+            "duplicates": self.duplicates,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "avg_batch": round((self.written + self.duplicates + self.failed) / self.batches, 2) if self.batches else 0,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+        }
+
+
+usage_buffer = UsageWriteBuffer()
+
+
+def usage_buffer_stats() -> Dict[str, Any]:
+    """
+    Get write-behind buffer counters for this worker.
+
+    Returns:
+        Dict[str, Any]: See `UsageWriteBuffer.stats`.
+    """
+    return usage_buffer.stats()
+
+
+async def close_usage_buffer():
+    """
+    Flush the write-behind buffer before the database client is closed.
+    """
+    await usage_buffer.close()
@@ -0,0 +1,221 @@
+"""
+Columnar msgpack encoding for bulk usage uploads.
+
+A JSON bulk upload repeats every key on every reading and is validated one
+`CreateUsage` at a time. The columnar encoding sends one frame per device
+with each field as a column instead:
+
+    {
+        "device_id": "thermostat-1",
+        "timestamp": <int64 ms since the Unix epoch, UTC>,
+        "energy_consumed": <float64 kWh, NaN for missing>,
+        "duration": <int64 seconds>,
+        "status": "on",                        # optional, applies to every row
+        "metrics": {"power": <float64>, ...}   # optional metric columns
+    }
+
+The body is either one frame or an array of frames, packed with msgpack and
+sent as `Content-Type: application/msgpack`. A column is either a msgpack
+`bin` holding the little-endian values (decoded without copying by
+`numpy.frombuffer`) or a plain array of numbers. `timestamp` is required;
+every column in a frame must have the same length.
+
+Columns are validated with vectorized checks and turned straight into usage
+documents, so no per-row model is built. The checks match what `CreateUsage`
+accepts on the JSON path: timestamps must fall in the years 1-9999, energy &
+metrics must be finite (NaN stands for a missing value), energy & duration
+cannot be negative and `status` must be a string.
+"""
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:  # Columnar uploads are refused without it
+    msgpack = None
+
+COLUMNAR_CONTENT_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+# Wire dtypes of the fixed columns
+COLUMN_DTYPES = {
+    "timestamp": "<i8",
+    "energy_consumed": "<f8",
+    "duration": "<i8",
+}
+METRIC_DTYPE = "<f8"
+
+# Timestamps representable as a datetime, in ms since the Unix epoch
+_EPOCH = datetime(1970, 1, 1)
+TIMESTAMP_MIN_MS = (datetime.min - _EPOCH) // timedelta(milliseconds=1)
+TIMESTAMP_MAX_MS = (datetime.max - _EPOCH) // timedelta(milliseconds=1)
+
+
+class ColumnarPayloadError(ValueError):
+    """
+    Raised when a columnar upload cannot be decoded or fails validation.
+    """
+
+
+def columnar_supported() -> bool:
+    """Whether msgpack is installed so columnar uploads can be decoded."""
+    return msgpack is not None
+
+
+def decode_column(value: Any, dtype: str, name: str) -> np.ndarray:
+    """
+    Turn a wire column into a one-dimensional array.
+
+    Args:
+        value (Any): Raw little-endian bytes or a list of numbers.
+        dtype (str): NumPy dtype of the column.
+        name (str): Column name, for error messages.
+
+    Returns:
+        np.ndarray: The column's values.
+
+    Raises:
+        ColumnarPayloadError: If the column is malformed.
+    """
+    try:
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return np.frombuffer(value, dtype=dtype)
+        if isinstance(value, list):
+            return np.asarray(value, dtype=dtype)
+    except (TypeError, ValueError) as e:
+        raise ColumnarPayloadError(f"Column {name} is not a valid {np.dtype(dtype).name} array: {e}") from e
+    raise ColumnarPayloadError(f"Column {name} must be binary or an array of numbers")
+
+
+def _nullable(column: np.ndarray) -> List[Optional[float]]:
+    """Column values with NaN as None."""
+    values = column.tolist()
+    missing = np.isnan(column)
+    if missing.any():
+        for index in np.flatnonzero(missing).tolist():
+            values[index] = None
+    return values
+
+
+def frame_to_documents(
+    frame: Dict[str, Any], now: Optional[datetime] = None, max_rows: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Build usage documents from one device's columns.
+
+    Args:
+        frame (Dict[str, Any]): Decoded frame, see the module docstring.
+        now (Optional[datetime]): Creation time for the documents.
+        max_rows (Optional[int]): Most rows the frame may hold, e.g. what is left of
+            an upload's limit; unlimited if omitted.
+
+    Returns:
+        List[Dict[str, Any]]: Documents shaped like `UsageDB.model_dump()`.
+
+    Raises:
+        ColumnarPayloadError: If the frame is malformed or fails validation.
+    """
+    if not isinstance(frame, dict):
+        raise ColumnarPayloadError("Each frame must be a map")
+    device_id = frame.get("device_id")
+    if not device_id or not isinstance(device_id, str):
+        raise ColumnarPayloadError("Device ID must be a valid string")
+    if "timestamp" not in frame:
+        raise ColumnarPayloadError(f"Frame for device {device_id} has no timestamp column")
+
+    timestamps = decode_column(frame["timestamp"], COLUMN_DTYPES["timestamp"], "timestamp")
+    rows = len(timestamps)
+    if not rows:
+        raise ColumnarPayloadError(f"Frame for device {device_id} has no rows")
+    if max_rows is not None and rows > max_rows:
+        raise ColumnarPayloadError(f"Frame for device {device_id} has more rows than the upload allows")
+    if timestamps.min() < TIMESTAMP_MIN_MS or timestamps.max() > TIMESTAMP_MAX_MS:
+        raise ColumnarPayloadError("Timestamps must be between the years 1 and 9999")
+    status = frame.get("status")
+    if status is not None and not isinstance(status, str):
+        raise ColumnarPayloadError("Status must be a string")
+
+    columns: Dict[str, np.ndarray] = {}
+    for name in ("energy_consumed", "duration"):
+        if frame.get(name) is not None:
+            columns[name] = decode_column(frame[name], COLUMN_DTYPES[name], name)
+    metrics = frame.get("metrics") or {}
+    if not isinstance(metrics, dict):
+        raise ColumnarPayloadError("Metrics must be a map of columns")
+    metric_columns = {
+        str(name): decode_column(value, METRIC_DTYPE, f"metrics.{name}") for name, value in metrics.items()
+    }
+
+    for name, column in {**columns, **metric_columns}.items():
+        if len(column) != rows:
+            raise ColumnarPayloadError(f"Column {name} has {len(column)} values, expected {rows}")
+    for name, column in {**columns, **metric_columns}.items():
+        if column.dtype.kind == "f" and np.isinf(column).any():
+            raise ColumnarPayloadError(f"Column {name} must hold finite numbers")
+    if "energy_consumed" in columns and (columns["energy_consumed"] < 0).any():
+        raise ColumnarPayloadError("Energy consumption cannot be negative")
+    if "duration" in columns and (columns["duration"] < 0).any():
+        raise ColumnarPayloadError("Duration cannot be negative")
+
+    created = now or datetime.utcnow()
+    timestamp_values = timestamps.astype("datetime64[ms]").tolist()
+    energy_values = _nullable(columns["energy_consumed"]) if "energy_consumed" in columns else [None] * rows
+    duration_values = columns["duration"].tolist() if "duration" in columns else [None] * rows
+    metric_names = list(metric_columns)
+    metric_rows = zip(*(_nullable(column) for column in metric_columns.values())) if metric_names else ([] for _ in range(rows))
+
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "device_id": device_id,
+            "metrics": dict(zip(metric_names, metric_values)),
+            "timestamp": timestamp,
+            "duration": duration,
+            "energy_consumed": energy,
+            "status": status,
+            "created": created,
+            "updated": None,
+        }
+        for timestamp, energy, duration, metric_values in zip(
+            timestamp_values, energy_values, duration_values, metric_rows
+        )
+    ]
+
+
+def decode_usage_batch(
+    body: bytes, now: Optional[datetime] = None, max_rows: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Decode a columnar msgpack upload into usage documents.
+
+    Args:
+        body (bytes): Request body.
+        now (Optional[datetime]): Creation time for the documents.
+        max_rows (Optional[int]): Most rows across all frames; unlimited if omitted.
+
+    Returns:
+        List[Dict[str, Any]]: Documents for every frame, in upload order.
+
+    Raises:
+        ColumnarPayloadError: If the body is malformed or a frame fails validation.
+        RuntimeError: If msgpack is not installed.
+    """
+    if msgpack is None:
+        raise RuntimeError("msgpack is required for columnar usage uploads")
+    try:
+        payload = msgpack.unpackb(body, raw=False)
+    except (ValueError, msgpack.UnpackException) as e:
+        raise ColumnarPayloadError(f"Body is not valid msgpack: {e}") from e
+
+    frames = payload if isinstance(payload, list) else [payload]
+    if not frames:
+        raise ColumnarPayloadError("Records list cannot be empty")
+
+    created = now or datetime.utcnow()
+    documents: List[Dict[str, Any]] = []
+    for frame in frames:
+        remaining = None if max_rows is None else max_rows - len(documents)
+        documents.extend(frame_to_documents(frame, created, remaining))
+    return documents
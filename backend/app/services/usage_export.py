@@ -0,0 +1,147 @@
+"""
+Streaming export of raw usage readings as NDJSON or CSV.
+
+`GET /usage/export` reads readings from one server-side cursor, fetched
+`USAGE_EXPORT_BATCH_SIZE` documents per round trip, and writes each document
+straight into the output format, with no response models in between. Lines are
+collected into chunks of about `USAGE_EXPORT_CHUNK_BYTES`, optionally gzipped
+by a streaming compressor, and handed to the response as they fill up. Memory
+therefore holds one cursor batch and one chunk however many rows are exported,
+and a slow client slows the cursor down rather than buffering the export.
+
+Rows are ordered by `(timestamp, id)`, which the usage indexes serve without
+an in-memory sort.
+"""
+import csv
+import io
+import json
+import os
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Optional
+
+from pymongo import ASCENDING
+
+from app.models.usage import ExportFormat
+
+USAGE_EXPORT_BATCH_SIZE = int(os.getenv("USAGE_EXPORT_BATCH_SIZE", "5000"))         # Documents per cursor round trip
+USAGE_EXPORT_CHUNK_BYTES = int(os.getenv("USAGE_EXPORT_CHUNK_BYTES", "262144"))     # Response chunk size before compression
+USAGE_EXPORT_GZIP_LEVEL = int(os.getenv("USAGE_EXPORT_GZIP_LEVEL", "6"))
+
+EXPORT_FIELDS = ("id", "device_id", "timestamp", "duration", "energy_consumed", "status", "metrics")
+EXPORT_PROJECTION = {"_id": 0, **{field: 1 for field in EXPORT_FIELDS}}
+EXPORT_SORT = [("timestamp", ASCENDING), ("id", ASCENDING)]
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+    ExportFormat.ARROW: "application/vnd.apache.arrow.stream",
+}
+
+_encoder = json.JSONEncoder(separators=(",", ":"), check_circular=False, default=str)
+_stats = {"exports": 0, "rows": 0, "bytes": 0}
+
+
+def _timestamp(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def write_ndjson(buffer: io.StringIO, document: Dict[str, Any]) -> None:
+    """Append one reading as a JSON line."""
+    if "timestamp" in document:
+        document["timestamp"] = _timestamp(document["timestamp"])
+    buffer.write(_encoder.encode(document))
+    buffer.write("\n")
+
+
+def csv_writer(buffer: io.StringIO):
+    """CSV writer over `buffer`; metrics are written as one JSON column."""
+    return csv.writer(buffer, lineterminator="\n")
+
+
+def csv_row(document: Dict[str, Any]) -> list:
+    """One reading as CSV cells, in `EXPORT_FIELDS` order."""
+    metrics = document.get("metrics")
+    return [
+        document.get("id"),
+        document.get("device_id"),
+        _timestamp(document.get("timestamp")),
+        document.get("duration"),
+        document.get("energy_consumed"),
+        document.get("status"),
+        _encoder.encode(metrics) if metrics is not None else "",
+    ]
+
+
+async def export_chunks(
+    cursor,
+    export_format: ExportFormat,
+    compress: bool = False,
+    chunk_bytes: int = USAGE_EXPORT_CHUNK_BYTES,
+) -> AsyncIterator[bytes]:
+    """
+    Serialize the readings of a cursor into response chunks.
+
+    Args:
+        cursor: Async cursor over readings projected with `EXPORT_PROJECTION`.
+        export_format (ExportFormat): NDJSON lines or CSV with a header row.
+        compress (bool): Whether to gzip the output.
+        chunk_bytes (int): Serialized bytes collected before a chunk is yielded.
+
+    Yields:
+        bytes: The next part of the export.
+    """
+    compressor = zlib.compressobj(USAGE_EXPORT_GZIP_LEVEL, zlib.DEFLATED, 31) if compress else None
+    buffer = io.StringIO()
+    writer: Optional[Any] = None
+    if export_format == ExportFormat.CSV:
+        writer = csv_writer(buffer)
+        writer.writerow(EXPORT_FIELDS)
+    _stats["exports"] += 1
+
+    def drain() -> bytes:
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        _stats["bytes"] += len(data)
+        return compressor.compress(data) if compressor else data
+
+    rows = 0
+    try:
+        async for document in cursor:
+            if writer is not None:
+                writer.writerow(csv_row(document))
+            else:
+                write_ndjson(buffer, document)
+            rows += 1
+            if buffer.tell() >= chunk_bytes:
+                chunk = drain()
+                if chunk:
+                    yield chunk
+        chunk = drain()
+        if compressor:
+            chunk += compressor.flush()
+        if chunk:
+            yield chunk
+    finally:
+        _stats["rows"] += rows
+
+
+def export_cursor(collection, query: Dict[str, Any], batch_size: int = USAGE_EXPORT_BATCH_SIZE):
+    """Cursor over the readings to export, in `(timestamp, id)` order."""
+    return collection.find(query, EXPORT_PROJECTION).sort(EXPORT_SORT).batch_size(batch_size)
+
+
+def export_filename(export_format: ExportFormat, compress: bool) -> str:
+    """Download name of an export; Arrow streams compress their buffers instead of being gzipped."""
+    return f"usage.{export_format.value}" + (".gz" if compress and export_format != ExportFormat.ARROW else "")
+
+
+def usage_export_stats() -> Dict[str, int]:
+    """
+    Report export counters for this worker.
+
+    Returns:
+        Dict[str, int]: Exports started, rows written and uncompressed bytes serialized.
+    """
+    return dict(_stats)
@@ -0,0 +1,392 @@
+"""
+Retention & downsampling for usage readings.
+
+Raw readings are kept for `USAGE_RAW_RETENTION_DAYS`, hourly rollups for
+`USAGE_HOURLY_RETENTION_DAYS` and daily rollups for
+`USAGE_DAILY_RETENTION_DAYS`; 0 keeps that tier forever (the default for all
+three, so nothing is deleted until a policy is configured). A typical policy is
+30 days of raw readings, a year of hourly buckets and daily buckets forever.
+
+Each run works through expired raw readings one UTC day at a time, oldest
+first:
+
+1. Compact: fold the day's readings into `usage_hourly` / `usage_daily` (see
+   `app.services.usage_rollups`). Skipped when `USAGE_ROLLUPS` is enabled,
+   because the buckets were already updated when the readings were written.
+2. Record a checkpoint in the `bootstrap` collection.
+3. Delete the day's readings in batches of `USAGE_RETENTION_BATCH_SIZE`,
+   sleeping `USAGE_RETENTION_PAUSE_MS` between batches so no single delete
+   holds the collection for long.
+
+A run that stops half-way resumes from the checkpoint: a day whose buckets were
+written is not compacted again, and deleting is naturally repeatable. Readings
+that arrive late for a day that was already compacted are added to its buckets
+with `$inc`; a crash between that update and their deletion can count them
+twice. Expired hourly and daily buckets are then deleted the same way. With
+`USAGE_STORAGE=buckets` the raw tier is the reading buckets of
+`app.services.usage_buckets`, dated by their hour and deleted a bucket at a
+time (`raw_deleted` then counts buckets).
+
+Only one worker runs the job at a time (a lease in the `bootstrap`
+collection). Run it once with `python -m app.services.usage_retention`, or set
+`USAGE_RETENTION_INTERVAL` to run it in the background of every API worker.
+Enable `USAGE_ROLLUPS` so aggregates & reports read the buckets for ranges whose
+raw readings are gone.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from pymongo import ASCENDING, ReplaceOne, UpdateOne
+from pymongo.database import Database
+
+from app.db.indexes import BOOTSTRAP_COLLECTION, acquire_lock
+from app.db.settings import (
+    USAGE_BUCKET_COLLECTION, USAGE_COLLECTION, USAGE_DAILY_COLLECTION, USAGE_HOURLY_COLLECTION, USAGE_ROLLUPS,
+    USAGE_STORAGE
+)
+from app.services.usage_buckets import BUCKETS, bucketed_readings
+from app.services.usage_rollups import DAY, HOUR, bucket_start, fold_readings
+
+logger = logging.getLogger(__name__)
+
+USAGE_RAW_RETENTION_DAYS = int(os.getenv("USAGE_RAW_RETENTION_DAYS", "0"))          # 0 keeps raw readings forever
+USAGE_HOURLY_RETENTION_DAYS = int(os.getenv("USAGE_HOURLY_RETENTION_DAYS", "0"))    # 0 keeps hourly buckets forever
+USAGE_DAILY_RETENTION_DAYS = int(os.getenv("USAGE_DAILY_RETENTION_DAYS", "0"))      # 0 keeps daily buckets forever
+USAGE_RETENTION_INTERVAL = int(os.getenv("USAGE_RETENTION_INTERVAL", "0"))          # Seconds between background runs; 0 disables
+USAGE_RETENTION_BATCH_SIZE = int(os.getenv("USAGE_RETENTION_BATCH_SIZE", "1000"))   # Documents per delete
+USAGE_RETENTION_PAUSE_MS = float(os.getenv("USAGE_RETENTION_PAUSE_MS", "100"))      # Sleep between deletes
+
+RETENTION_LOCK_ID = "retention:usage"
+RETENTION_LOCK_TTL = int(os.getenv("USAGE_RETENTION_LOCK_TTL", "600"))   # Seconds before a stale lease can be taken over
+CHECKPOINT_ID = "retention:usage:checkpoint"
+
+_stats: Dict[str, Any] = {
+    "runs": 0, "skipped": 0, "errors": 0, "days": 0, "compacted": 0,
+    "raw_deleted": 0, "hourly_deleted": 0, "daily_deleted": 0,
+    "last_run": None, "last_duration_ms": 0.0,
+}
+
+
+class RetentionPolicy:
+    """
+    How long each tier of usage data is kept.
+
+    Attributes:
+        raw_days (int): Days of raw readings to keep; 0 keeps them forever.
+        hourly_days (int): Days of hourly buckets to keep; 0 keeps them forever.
+        daily_days (int): Days of daily buckets to keep; 0 keeps them forever.
+        batch_size (int): Documents removed per `delete_many`.
+        pause (float): Seconds to sleep between deletes.
+    """
+    def __init__(
+        self,
+        raw_days: int = USAGE_RAW_RETENTION_DAYS,
+        hourly_days: int = USAGE_HOURLY_RETENTION_DAYS,
+        daily_days: int = USAGE_DAILY_RETENTION_DAYS,
+        batch_size: int = USAGE_RETENTION_BATCH_SIZE,
+        pause: float = USAGE_RETENTION_PAUSE_MS / 1000,
+    ):
+        self.raw_days = max(0, raw_days)
+        self.hourly_days = max(0, hourly_days)
+        self.daily_days = max(0, daily_days)
+        self.batch_size = max(1, batch_size)
+        self.pause = max(0.0, pause)
+
+    def cutoff(self, days: int, now: datetime) -> Optional[datetime]:
+        """Start of the oldest day kept, or None if the tier is kept forever."""
+        return bucket_start(now - timedelta(days=days), DAY) if days else None
+
+
+class _Lease:
+    """Keeps the retention lock while a run is in progress."""
+
+    def __init__(self, meta, ttl: int = RETENTION_LOCK_TTL):
+        self.meta = meta
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def acquire(self) -> bool:
+        return acquire_lock(self.meta, self.owner, datetime.utcnow(), RETENTION_LOCK_ID, self.ttl)
+
+    def renew(self):
+        self.meta.update_one(
+            {"_id": RETENTION_LOCK_ID, "owner": self.owner},
+            {"$set": {"locked_until": datetime.utcnow() + timedelta(seconds=self.ttl)}}
+        )
+
+    def release(self):
+        self.meta.update_one({"_id": RETENTION_LOCK_ID, "owner": self.owner}, {"$unset": {"locked_until": ""}})
+
+
+def delete_in_batches(
+    collection,
+    query: Dict[str, Any],
+    batch_size: int,
+    pause: float = 0.0,
+    stop: Optional[threading.Event] = None,
+) -> int:
+    """
+    Delete matching documents a bounded batch at a time.
+
+    Args:
+        collection: Collection to delete from.
+        query (Dict[str, Any]): Documents to delete.
+        batch_size (int): Documents per `delete_many`.
+        pause (float): Seconds to sleep between batches.
+        stop (Optional[threading.Event]): Stops after the current batch when set.
+
+    Returns:
+        int: Number of documents deleted.
+    """
+    deleted = 0
+    while not (stop and stop.is_set()):
+        ids = [document["_id"] for document in collection.find(query, {"_id": 1}).limit(batch_size)]
+        if not ids:
+            break
+        deleted += collection.delete_many({"_id": {"$in": ids}}).deleted_count
+        if len(ids) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return deleted
+
+
+def _time_field(source: str) -> str:
+    """Field that dates the documents of a raw usage collection."""
+    return "start" if source == USAGE_BUCKET_COLLECTION else "timestamp"
+
+
+def compact_day(db: Database, source: str, day: datetime, first_time: bool) -> int:
+    """
+    Fold one day's raw readings into the rollup collections.
+
+    Args:
+        db (Database): Database holding the collections.
+        source (str): Raw usage collection.
+        day (datetime): Start of the UTC day.
+        first_time (bool): Replace the day's buckets; otherwise add to them.
+
+    Returns:
+        int: Number of readings folded.
+    """
+    bucketed = source == USAGE_BUCKET_COLLECTION
+    query = {_time_field(source): {"$gte": day, "$lt": day + timedelta(days=1)}}
+    projection = {"_id": 0, "device_id": 1, "timestamp": 1, "energy_consumed": 1, "duration": 1, "metrics": 1}
+    folded = 0
+    for period, target in ((HOUR, USAGE_HOURLY_COLLECTION), (DAY, USAGE_DAILY_COLLECTION)):
+        # Stream the day once per period so only the buckets are held in memory
+        readings = bucketed_readings(db[source].find(query)) if bucketed else db[source].find(query, projection)
+        buckets = fold_readings(readings, period)
+        operations = [
+            ReplaceOne({"device_id": device_id, "start": start}, bucket.document(device_id, start), upsert=True)
+            if first_time else
+            UpdateOne({"device_id": device_id, "start": start}, bucket.update(), upsert=True)
+            for (device_id, start), bucket in buckets.items()
+        ]
+        if operations:
+            db[target].bulk_write(operations, ordered=False)
+        folded = sum(bucket.inc["count"] for bucket in buckets.values())
+    return folded
+
+
+def expire_raw(
+    db: Database,
+    source: str,
+    cutoff: datetime,
+    policy: RetentionPolicy,
+    lease: Optional[_Lease] = None,
+    stop: Optional[threading.Event] = None,
+) -> Dict[str, int]:
+    """
+    Compact & delete raw readings older than `cutoff`, one day at a time.
+
+    Args:
+        db (Database): Database holding the collections.
+        source (str): Raw usage collection.
+        cutoff (datetime): Readings before this (a day boundary) expire.
+        policy (RetentionPolicy): Batch size & pause.
+        lease (Optional[_Lease]): Renewed after every day.
+        stop (Optional[threading.Event]): Stops after the current batch when set.
+
+    Returns:
+        Dict[str, int]: Days processed, readings compacted and readings deleted.
+    """
+    meta = db[BOOTSTRAP_COLLECTION]
+    time_field = _time_field(source)
+    counts = {"days": 0, "compacted": 0, "raw_deleted": 0}
+    while not (stop and stop.is_set()):
+        oldest = list(
+            db[source].find({time_field: {"$lt": cutoff}}, {time_field: 1}).sort(time_field, ASCENDING).limit(1)
+        )
+        if not oldest:
+            break
+        day = bucket_start(oldest[0][time_field], DAY)
+        state = meta.find_one({"_id": CHECKPOINT_ID}) or {}
+
+        # A checkpointed day already has its buckets; only delete what is left
+        resuming = state.get("day") == day and state.get("phase") == "delete"
+        if not resuming and not USAGE_ROLLUPS:
+            compacted_through = state.get("compacted_through")
+            first_time = compacted_through is None or day > compacted_through
+            counts["compacted"] += compact_day(db, source, day, first_time)
+        meta.update_one(
+            {"_id": CHECKPOINT_ID},
+            {"$set": {"day": day, "phase": "delete", "compacted_through": max(day, state.get("compacted_through") or day)}},
+            upsert=True,
+        )
+
+        deleted = delete_in_batches(
+            db[source], {time_field: {"$gte": day, "$lt": day + timedelta(days=1)}},
+            policy.batch_size, policy.pause, stop
+        )
+        counts["raw_deleted"] += deleted
+        if stop and stop.is_set():
+            break
+        meta.update_one(
+            {"_id": CHECKPOINT_ID},
+            {"$set": {"phase": "done", "updated": datetime.utcnow()}, "$inc": {"raw_deleted": deleted}}
+        )
+        counts["days"] += 1
+        logger.info("Expired %d raw usage readings from %s", deleted, day.date())
+        if lease:
+            lease.renew()
+    return counts
+
+
+def run_retention(
+    db: Database,
+    policy: Optional[RetentionPolicy] = None,
+    now: Optional[datetime] = None,
+    source: Optional[str] = None,
+    stop: Optional[threading.Event] = None,
+) -> Dict[str, Any]:
+    """
+    Apply the retention policy once.
+
+    Args:
+        db (Database): Database holding the collections.
+        policy (Optional[RetentionPolicy]): Defaults to the environment settings.
+        now (Optional[datetime]): Current UTC time.
+        source (Optional[str]): Raw usage collection; defaults to the one of `USAGE_STORAGE`.
+        stop (Optional[threading.Event]): Stops after the current batch when set.
+
+    Returns:
+        Dict[str, Any]: Counts for this run; `skipped` if another worker holds the lease.
+    """
+    policy = policy or RetentionPolicy()
+    source = source or (USAGE_BUCKET_COLLECTION if USAGE_STORAGE == BUCKETS else USAGE_COLLECTION)
+    now = now or datetime.utcnow()
+    lease = _Lease(db[BOOTSTRAP_COLLECTION])
+    if not lease.acquire():
+        _stats["skipped"] += 1
+        logger.info("Usage retention is running on another worker; skipping.")
+        return {"skipped": True}
+
+    started = time.perf_counter()
+    counts: Dict[str, Any] = {"skipped": False, "days": 0, "compacted": 0, "raw_deleted": 0,
+                              "hourly_deleted": 0, "daily_deleted": 0}
+    try:
+        raw_cutoff = policy.cutoff(policy.raw_days, now)
+        if raw_cutoff:
+            counts.update(expire_raw(db, source, raw_cutoff, policy, lease, stop))
+
+        for period, days, target in (
+            (HOUR, policy.hourly_days, USAGE_HOURLY_COLLECTION),
+            (DAY, policy.daily_days, USAGE_DAILY_COLLECTION),
+        ):
+            cutoff = policy.cutoff(days, now)
+            if cutoff:
+                counts[f"{'hourly' if period == HOUR else 'daily'}_deleted"] = delete_in_batches(
+                    db[target], {"start": {"$lt": cutoff}}, policy.batch_size, policy.pause, stop
+                )
+    except Exception:
+        _stats["errors"] += 1
+        raise
+    finally:
+        lease.release()
+        _stats["runs"] += 1
+        _stats["last_run"] = now.isoformat()
+        _stats["last_duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        for key in ("days", "compacted", "raw_deleted", "hourly_deleted", "daily_deleted"):
+            _stats[key] += counts[key]
+    return counts
+
+
+def usage_retention_stats() -> Dict[str, Any]:
+    """
+    Report retention policy & counters for this worker.
+
+    Returns:
+        Dict[str, Any]: Configured retention, runs and documents processed.
+    """
+    return {
+        "raw_days": USAGE_RAW_RETENTION_DAYS,
+        "hourly_days": USAGE_HOURLY_RETENTION_DAYS,
+        "daily_days": USAGE_DAILY_RETENTION_DAYS,
+        "interval": USAGE_RETENTION_INTERVAL,
+        **_stats,
+    }
+
+
+_stop = threading.Event()
+
+
+async def retention_loop(db: Database, interval: float = USAGE_RETENTION_INTERVAL):
+    """
+    Run the retention job every `interval` seconds until cancelled.
+
+    Args:
+        db (Database): Synchronous database; runs happen in a worker thread.
+        interval (float): Seconds between runs.
+    """
+    _stop.clear()
+    while True:
+        try:
+            await asyncio.to_thread(run_retention, db, stop=_stop)
+        except Exception:
+            logger.exception("Usage retention run failed")
+        await asyncio.sleep(interval)
+
+
+def stop_retention():
+    """
+    Ask a running retention job to stop after its current batch.
+    """
+    _stop.set()
+
+
+def main():
+    """Run the retention job once from the command line."""
+    from app.db.data import d
+
+    parser = argparse.ArgumentParser(description="Compact & delete expired usage data")
+    parser.add_argument("--raw-days", type=int, default=USAGE_RAW_RETENTION_DAYS, help="Days of raw readings to keep")
+    parser.add_argument("--hourly-days", type=int, default=USAGE_HOURLY_RETENTION_DAYS, help="Days of hourly buckets to keep")
+    parser.add_argument("--daily-days", type=int, default=USAGE_DAILY_RETENTION_DAYS, help="Days of daily buckets to keep")
+    parser.add_argument("--batch-size", type=int, default=USAGE_RETENTION_BATCH_SIZE, help="Documents per delete")
+    parser.add_argument("--pause", type=float, default=USAGE_RETENTION_PAUSE_MS / 1000, help="Seconds to sleep between deletes")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    policy = RetentionPolicy(args.raw_days, args.hourly_days, args.daily_days, args.batch_size, args.pause)
+    result = run_retention(d, policy)
+    if result["skipped"]:
+        print("Another worker is running the retention job.")
+        return
+    print(
+        f"Expired {result['days']} days of raw readings ({result['compacted']} compacted, "
+        f"{result['raw_deleted']} deleted); deleted {result['hourly_deleted']} hourly and "
+        f"{result['daily_deleted']} daily buckets."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,552 @@
+"""
+Hourly & daily usage rollups maintained at write time.
+
+With `USAGE_ROLLUPS` enabled, every usage write also upserts one bucket per
+device & hour in `usage_hourly` and per device & day in `usage_daily`:
+
+    {
+        "device_id": "thermostat-1",
+        "start": datetime(2025, 1, 1, 13),   # UTC start of the hour / day
+        "count": 60,                          # readings
+        "energy": 1.25,                       # sum of energy_consumed (kWh)
+        "duration": 3600,                     # sum of duration (s)
+        "min_energy": 0.01, "max_energy": 0.05,
+        "metrics": {"power": {"sum": 5400.0, "count": 60}}
+    }
+
+A batch of readings is folded in memory first, so an insert of N readings
+costs one `bulk_write` per rollup collection with one `$inc` upsert per
+touched bucket. Aggregates over long ranges then read whole days from
+`usage_daily`, whole hours at the edges from `usage_hourly`, and only the
+partial hours at either end from the raw readings, each range totalled by an
+aggregation pipeline in the database (see `totals_pipeline`).
+
+Updates & deletes of raw readings adjust the sums and counts; `min_energy`
+and `max_energy` only ever widen. Rollups are derived data: a failed rollup
+write is logged and counted, not raised, and `python -m
+app.services.usage_rollups --backfill` rebuilds buckets from the raw readings
+(run it once before enabling `USAGE_ROLLUPS` on an existing deployment).
+"""
+import argparse
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, ReplaceOne, UpdateOne
+from pymongo.errors import PyMongoError
+
+from app.db.async_data import ush_c, usd_c
+from app.db.settings import USAGE_ROLLUPS
+
+logger = logging.getLogger(__name__)
+
+HOUR = "hour"
+DAY = "day"
+PERIOD_LENGTHS = {HOUR: timedelta(hours=1), DAY: timedelta(days=1)}
+
+_stats = {"bucket_updates": 0, "errors": 0}
+
+
+def naive_utc(timestamp: datetime) -> datetime:
+    """A timestamp as naive UTC, the way readings are stored."""
+    if timestamp.tzinfo is not None:
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+# Metrics that are totalled: numbers other than bools, under names that are valid field paths
+AVERAGED_METRIC_NAME = r"^[^$.][^.]*$"
+AVERAGED_METRIC_MATCH = {"$match": {"metric.k": {"$regex": AVERAGED_METRIC_NAME}, "metric.v": {"$type": "number"}}}
+
+
+def averaged_metric(name: str, value: Any) -> bool:
+    """
+    Whether a reading's metric is totalled.
+
+    Rollups store metrics under `metrics.<name>`, so names that are empty,
+    dotted or `$`-prefixed are skipped everywhere, as are bools (the database
+    does not count them as numbers). `AVERAGED_METRIC_MATCH` applies the same
+    rule in aggregation pipelines.
+    """
+    return (
+        isinstance(value, (int, float)) and not isinstance(value, bool)
+        and bool(name) and "." not in name and not name.startswith("$")
+    )
+
+
+def bucket_start(timestamp: datetime, period: str) -> datetime:
+    """
+    Start of the hour or day a timestamp falls in, as naive UTC.
+
+    Args:
+        timestamp (datetime): Reading time; aware values are converted to UTC.
+        period (str): `hour` or `day`.
+
+    Returns:
+        datetime: Start of the bucket.
+    """
+    timestamp = naive_utc(timestamp)
+    if period == DAY:
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def _ceil(timestamp: datetime, period: str) -> datetime:
+    """First bucket boundary at or after a timestamp."""
+    start = bucket_start(timestamp, period)
+    return start if start == naive_utc(timestamp) else start + PERIOD_LENGTHS[period]
+
+
+class UsageBucket:
+    """
+    Totals of the readings in one device's hour or day.
+
+    Attributes:
+        inc (Dict[str, float]): Sums & counts keyed by document path.
+        min_energy (Optional[float]): Lowest energy reading seen.
+        max_energy (Optional[float]): Highest energy reading seen.
+    """
+    __slots__ = ("inc", "min_energy", "max_energy")
+
+    def __init__(self):
+        self.inc: Dict[str, float] = {"count": 0, "energy": 0, "duration": 0}
+        self.min_energy: Optional[float] = None
+        self.max_energy: Optional[float] = None
+
+    def add(self, reading: Dict[str, Any], sign: int = 1):
+        """Fold a reading in (`sign=1`) or back out (`sign=-1`)."""
+        energy = reading.get("energy_consumed")
+        self.inc["count"] += sign
+        self.inc["energy"] += sign * (energy or 0)
+        self.inc["duration"] += sign * (reading.get("duration") or 0)
+        for name, value in (reading.get("metrics") or {}).items():
+            if averaged_metric(name, value):
+                self.inc[f"metrics.{name}.sum"] = self.inc.get(f"metrics.{name}.sum", 0) + sign * float(value)
+                self.inc[f"metrics.{name}.count"] = self.inc.get(f"metrics.{name}.count", 0) + sign
+        if sign > 0 and energy is not None:
+            self.min_energy = energy if self.min_energy is None else min(self.min_energy, energy)
+            self.max_energy = energy if self.max_energy is None else max(self.max_energy, energy)
+
+    def update(self) -> Dict[str, Any]:
+        """Update document applying these totals to a stored bucket."""
+        update: Dict[str, Any] = {"$inc": dict(self.inc)}
+        if self.min_energy is not None:
+            update["$min"] = {"min_energy": self.min_energy}
+            update["$max"] = {"max_energy": self.max_energy}
+        return update
+
+    def document(self, device_id: str, start: datetime) -> Dict[str, Any]:
+        """Full bucket document holding these totals."""
+        document: Dict[str, Any] = {
+            "device_id": device_id, "start": start, "metrics": {},
+            "min_energy": self.min_energy, "max_energy": self.max_energy,
+        }
+        for path, value in self.inc.items():
+            if path.startswith("metrics."):
+                _, name, field = path.split(".")
+                document["metrics"].setdefault(name, {})[field] = value
+            else:
+                document[path] = value
+        return document
+
+
+def fold_readings(readings: Iterable[Dict[str, Any]], period: str, sign: int = 1) -> Dict[Tuple[str, datetime], UsageBucket]:
+    """
+    Group readings into per-device buckets.
+
+    Args:
+        readings (Iterable[Dict[str, Any]]): Usage documents.
+        period (str): `hour` or `day`.
+        sign (int): 1 to add the readings, -1 to remove them.
+
+    Returns:
+        Dict[Tuple[str, datetime], UsageBucket]: Buckets keyed by device & start.
+    """
+    buckets: Dict[Tuple[str, datetime], UsageBucket] = {}
+    for reading in readings:
+        timestamp = reading.get("timestamp")
+        if not isinstance(timestamp, datetime):
+            continue
+        key = (reading["device_id"], bucket_start(timestamp, period))
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = UsageBucket()
+        bucket.add(reading, sign)
+    return buckets
+
+
+def rollup_updates(readings: Iterable[Dict[str, Any]], period: str, sign: int = 1) -> List[UpdateOne]:
+    """
+    Build the bucket upserts for a batch of readings.
+
+    Args:
+        readings (Iterable[Dict[str, Any]]): Usage documents.
+        period (str): `hour` or `day`.
+        sign (int): 1 for inserted readings, -1 for deleted ones.
+
+    Returns:
+        List[UpdateOne]: One operation per touched bucket.
+    """
+    return [
+        # Removing a reading never creates a bucket
+        UpdateOne({"device_id": device_id, "start": start}, bucket.update(), upsert=sign > 0)
+        for (device_id, start), bucket in fold_readings(readings, period, sign).items()
+    ]
+
+
+async def apply_rollups(readings: List[Dict[str, Any]], sign: int = 1):
+    """
+    Fold stored (or removed) readings into the hourly & daily rollups.
+
+    Does nothing unless `USAGE_ROLLUPS` is enabled. Failures are logged and
+    counted, never raised, so ingestion does not fail on derived data.
+
+    Args:
+        readings (List[Dict[str, Any]]): Usage documents that were written.
+        sign (int): 1 for inserted readings, -1 for deleted ones.
+    """
+    if not USAGE_ROLLUPS or not readings:
+        return
+    for period, collection in ((HOUR, ush_c), (DAY, usd_c)):
+        updates = rollup_updates(readings, period, sign)
+        if not updates:
+            continue
+        try:
+            await collection.bulk_write(updates, ordered=False)
+            _stats["bucket_updates"] += len(updates)
+        except PyMongoError as e:
+            _stats["errors"] += 1
+            logger.error("Failed to update %s usage rollups for %d readings: %s", period, len(readings), e)
+
+
+def empty_totals() -> Dict[str, Any]:
+    """Totals of no readings, in the shape of `summarize_readings`."""
+    return {"count": 0, "energy": 0, "duration": 0, "metrics": {}}
+
+
+def summarize_readings(readings: Iterable[Dict[str, Any]], totals: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Add raw readings to running totals.
+
+    Args:
+        readings (Iterable[Dict[str, Any]]): Usage documents.
+        totals (Optional[Dict[str, Any]]): Totals to add to; a new one if omitted.
+
+    Returns:
+        Dict[str, Any]: `count`, `energy` & `duration` sums and per-metric `sum` / `count`.
+    """
+    totals = totals or empty_totals()
+    for reading in readings:
+        totals["count"] += 1
+        totals["energy"] += reading.get("energy_consumed") or 0
+        totals["duration"] += reading.get("duration") or 0
+        for name, value in (reading.get("metrics") or {}).items():
+            if averaged_metric(name, value):
+                metric = totals["metrics"].setdefault(name, {"sum": 0, "count": 0})
+                metric["sum"] += value
+                metric["count"] += 1
+    return totals
+
+
+def plan_ranges(start: datetime, end: datetime) -> Dict[str, List[Tuple[datetime, datetime]]]:
+    """
+    Cover `[start, end]` with as few rollup buckets as possible.
+
+    Args:
+        start (datetime): Start of the range, inclusive.
+        end (datetime): End of the range, inclusive.
+
+    Returns:
+        Dict[str, List[Tuple[datetime, datetime]]]: Half-open `[from, to)`
+        bucket-start ranges for `day` and `hour`, and the `raw` ranges left
+        over at either end (the last one includes `end`).
+    """
+    start, end = naive_utc(start), naive_utc(end)
+    first_hour, last_hour = _ceil(start, HOUR), bucket_start(end, HOUR)
+    if first_hour >= last_hour:
+        return {DAY: [], HOUR: [], "raw": [(start, end)]}
+
+    first_day, last_day = _ceil(first_hour, DAY), bucket_start(last_hour, DAY)
+    plan: Dict[str, List[Tuple[datetime, datetime]]] = {DAY: [], HOUR: [], "raw": []}
+    if first_day < last_day:
+        plan[DAY].append((first_day, last_day))
+        plan[HOUR] = [(first_hour, first_day), (last_day, last_hour)]
+    else:
+        plan[HOUR].append((first_hour, last_hour))
+    plan[HOUR] = [(a, b) for a, b in plan[HOUR] if a < b]
+    plan["raw"] = [(a, b) for a, b in ((start, first_hour), (last_hour, end)) if a < b or b == end]
+    return plan
+
+
+def device_match(device_ids: Optional[List[str]]) -> Dict[str, Any]:
+    """Filter on `device_id` for one device, several, or every device (`None`)."""
+    if device_ids is None:
+        return {}
+    if len(device_ids) == 1:
+        return {"device_id": device_ids[0]}
+    return {"device_id": {"$in": list(device_ids)}}
+
+
+def totals_pipeline(match: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Aggregation pipeline totalling the raw readings matching `match`.
+
+    The database answers with one document: `totals` holds the count and the
+    energy & duration sums, `metrics` one sum & count per metric kept by
+    `averaged_metric` (`$objectToArray` turns each reading's metrics into
+    name/value pairs).
+    Read it with `facet_totals`.
+    """
+    return [
+        {"$match": match},
+        {"$facet": {
+            "totals": [{"$group": {
+                "_id": None,
+                "count": {"$sum": 1},
+                "energy": {"$sum": "$energy_consumed"},
+                "duration": {"$sum": "$duration"},
+            }}],
+            "metrics": [
+                {"$project": {"_id": 0, "metric": {"$objectToArray": "$metrics"}}},
+                {"$unwind": "$metric"},
+                AVERAGED_METRIC_MATCH,
+                {"$group": {"_id": "$metric.k", "sum": {"$sum": "$metric.v"}, "count": {"$sum": 1}}},
+            ],
+        }},
+    ]
+
+
+def bucket_totals_pipeline(match: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Aggregation pipeline totalling the rollup buckets matching `match`, read with `facet_totals`."""
+    return [
+        {"$match": match},
+        {"$facet": {
+            "totals": [{"$group": {
+                "_id": None,
+                "count": {"$sum": "$count"},
+                "energy": {"$sum": "$energy"},
+                "duration": {"$sum": "$duration"},
+            }}],
+            "metrics": [
+                {"$project": {"_id": 0, "metric": {"$objectToArray": "$metrics"}}},
+                {"$unwind": "$metric"},
+                {"$group": {"_id": "$metric.k", "sum": {"$sum": "$metric.v.sum"}, "count": {"$sum": "$metric.v.count"}}},
+            ],
+        }},
+    ]
+
+
+def stored_bucket_totals_pipeline() -> List[Dict[str, Any]]:
+    """
+    Stages totalling whole buckets of bucketed reading storage
+    (`app.services.usage_buckets`) from their stored totals, read with `facet_totals`.
+
+    Only the metrics are unwound; deleted slots hold null metrics and drop out.
+    """
+    return [
+        {"$facet": {
+            "totals": [{"$group": {
+                "_id": None,
+                "count": {"$sum": "$count"},
+                "energy": {"$sum": "$total_energy"},
+                "duration": {"$sum": "$total_duration"},
+            }}],
+            "metrics": [
+                {"$unwind": "$metrics"},
+                {"$project": {"_id": 0, "metric": {"$objectToArray": "$metrics"}}},
+                {"$unwind": "$metric"},
+                AVERAGED_METRIC_MATCH,
+                {"$group": {"_id": "$metric.k", "sum": {"$sum": "$metric.v"}, "count": {"$sum": 1}}},
+            ],
+        }},
+    ]
+
+
+def facet_totals(results: List[Dict[str, Any]], totals: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Add the answer of a totals pipeline to running totals."""
+    totals = totals or empty_totals()
+    for result in results:
+        for group in result.get("totals", []):
+            totals["count"] += group.get("count", 0)
+            totals["energy"] += group.get("energy") or 0
+            totals["duration"] += group.get("duration") or 0
+        for group in result.get("metrics", []):
+            metric = totals["metrics"].setdefault(group["_id"], {"sum": 0, "count": 0})
+            metric["sum"] += group["sum"]
+            metric["count"] += group["count"]
+    return totals
+
+
+async def total_readings(collection, match: Dict[str, Any], totals: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Add the readings matching `match` to running totals.
+
+    With bucketed storage, buckets whose hour lies inside the range are
+    totalled from their stored totals and only the partial hours at either
+    end are unwound into readings.
+
+    Args:
+        collection: Asyncio usage collection, or the reading adapter of bucketed storage.
+        match (Dict[str, Any]): Filter on reading fields.
+        totals (Optional[Dict[str, Any]]): Totals to add to; a new one if omitted.
+
+    Returns:
+        Dict[str, Any]: Totals in the shape of `summarize_readings`.
+    """
+    from app.services.usage_buckets import BucketedUsage  # usage_buckets imports this module
+
+    if isinstance(collection, BucketedUsage):
+        cursor = await collection.aggregate(totals_pipeline(match), stored_bucket_totals_pipeline())
+    else:
+        cursor = await collection.aggregate(totals_pipeline(match))
+    return facet_totals(await cursor.to_list(None), totals)
+
+
+async def aggregate_usage(
+    raw_collection, device_ids: Optional[List[str]], start: datetime, end: datetime
+) -> Dict[str, Any]:
+    """
+    Total readings in `[start, end]` from rollups & edge readings.
+
+    Args:
+        raw_collection: Asyncio usage collection read for the partial hours.
+        device_ids (Optional[List[str]]): Devices to total; `None` for all.
+        start (datetime): Start of the range, inclusive.
+        end (datetime): End of the range, inclusive.
+
+    Returns:
+        Dict[str, Any]: Totals in the shape of `summarize_readings`.
+    """
+    devices = device_match(device_ids)
+    plan = plan_ranges(start, end)
+    totals = empty_totals()
+    for period, collection in ((DAY, usd_c), (HOUR, ush_c)):
+        for range_start, range_end in plan[period]:
+            cursor = await collection.aggregate(
+                bucket_totals_pipeline({**devices, "start": {"$gte": range_start, "$lt": range_end}})
+            )
+            facet_totals(await cursor.to_list(None), totals)
+
+    end = naive_utc(end)
+    for range_start, range_end in plan["raw"]:
+        # Only the range reaching `end` includes its upper bound
+        upper = "$lte" if range_end == end else "$lt"
+        await total_readings(raw_collection, {**devices, "timestamp": {"$gte": range_start, upper: range_end}}, totals)
+    return totals
+
+
+def usage_rollup_stats() -> Dict[str, Any]:
+    """
+    Report rollup write counters for this worker.
+
+    Returns:
+        Dict[str, Any]: Whether rollups are enabled, bucket upserts issued and failed writes.
+    """
+    return {"enabled": USAGE_ROLLUPS, **_stats}
+
+
+def backfill_rollups(
+    db,
+    source: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    batch_size: int = 1000,
+) -> Dict[str, int]:
+    """
+    Rebuild rollup buckets from raw readings.
+
+    Buckets are replaced, not incremented, so the backfill can be re-run.
+    `since` and `until` are rounded down to whole days so no bucket is rebuilt
+    from part of its readings.
+
+    Args:
+        db: Synchronous database holding the collections.
+        source (str): Raw usage collection.
+        since (Optional[datetime]): Rebuild days from this one on.
+        until (Optional[datetime]): Rebuild days before this one.
+        batch_size (int): Bucket replacements per `bulk_write`.
+
+    Returns:
+        Dict[str, int]: Readings read and buckets written per period.
+    """
+    from app.db.settings import USAGE_BUCKET_COLLECTION, USAGE_DAILY_COLLECTION, USAGE_HOURLY_COLLECTION
+    from app.services.usage_buckets import bucketed_readings
+
+    targets = {HOUR: db[USAGE_HOURLY_COLLECTION], DAY: db[USAGE_DAILY_COLLECTION]}
+    # Bucketed storage (see app.services.usage_buckets) is read by bucket start
+    bucketed = source == USAGE_BUCKET_COLLECTION
+    time_field = "start" if bucketed else "timestamp"
+    query: Dict[str, Any] = {}
+    if since or until:
+        query[time_field] = {}
+        if since:
+            query[time_field]["$gte"] = bucket_start(since, DAY)
+        if until:
+            query[time_field]["$lt"] = bucket_start(until, DAY)
+
+    counts = {"readings": 0, HOUR: 0, DAY: 0}
+    pending: Dict[str, List[ReplaceOne]] = {HOUR: [], DAY: []}
+
+    def flush(period: str, force: bool = False):
+        if pending[period] and (force or len(pending[period]) >= batch_size):
+            targets[period].bulk_write(pending[period], ordered=False)
+            counts[period] += len(pending[period])
+            pending[period] = []
+
+    def emit(readings: List[Dict[str, Any]]):
+        for period in (HOUR, DAY):
+            for (bucket_device, start), bucket in fold_readings(readings, period).items():
+                pending[period].append(ReplaceOne(
+                    {"device_id": bucket_device, "start": start}, bucket.document(bucket_device, start), upsert=True
+                ))
+            flush(period)
+
+    # Walk one device at a time so only that device's readings are held
+    device_id = None
+    readings: List[Dict[str, Any]] = []
+    if bucketed:
+        cursor = bucketed_readings(db[source].find(query).sort([("device_id", ASCENDING), ("start", DESCENDING)]))
+    else:
+        cursor = db[source].find(
+            query, {"_id": 0, "device_id": 1, "timestamp": 1, "energy_consumed": 1, "duration": 1, "metrics": 1}
+        ).sort([("device_id", ASCENDING), ("timestamp", DESCENDING)])
+    for reading in cursor:
+        counts["readings"] += 1
+        if reading.get("device_id") != device_id:
+            emit(readings)
+            device_id, readings = reading.get("device_id"), []
+        readings.append(reading)
+    emit(readings)
+    for period in (HOUR, DAY):
+        flush(period, force=True)
+    return counts
+
+
+def _parse_date(value: str) -> datetime:
+    return datetime.strptime(value, "%Y-%m-%d")
+
+
+def main():
+    """Rebuild rollups from the command line."""
+    from app.db.data import d
+    from app.db.settings import USAGE_BUCKET_COLLECTION, USAGE_COLLECTION, USAGE_STORAGE
+
+    parser = argparse.ArgumentParser(description="Maintain hourly & daily usage rollups")
+    parser.add_argument("--backfill", action="store_true", required=True, help="Rebuild rollups from raw readings")
+    parser.add_argument(
+        "--source", default=USAGE_BUCKET_COLLECTION if USAGE_STORAGE == "buckets" else USAGE_COLLECTION,
+        help="Raw usage collection"
+    )
+    parser.add_argument("--since", type=_parse_date, help="First day to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--until", type=_parse_date, help="Day to stop before (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    result = backfill_rollups(d, args.source, args.since, args.until)
+    print(
+        f"Read {result['readings']} readings; wrote {result[HOUR]} hourly and {result[DAY]} daily buckets."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+Time-bucketed usage series for charts.
+
+A series answers "energy per hour for these devices over the last week" with
+one shared time axis and one value array per device:
+
+    {"timestamps": [t0, t1, ...], "series": {"device-1": [0.4, 0.6, ...], ...}}
+
+The database groups readings by device and `$dateTrunc` of their timestamp,
+so only one small document per device & bucket leaves MongoDB. With
+`USAGE_ROLLUPS` enabled, whole hours and days are read from the rollup
+buckets instead (the same `plan_ranges` split as `aggregate_usage`) and only
+the partial hours at either end from the raw readings. Buckets without
+readings are filled in Python with `null`, `0` or the previous value.
+
+Weeks start on Monday and all buckets are aligned in UTC.
+"""
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.db.async_data import ush_c, usd_c
+from app.db.settings import USAGE_ROLLUPS
+from app.models.usage import SeriesFill, SeriesInterval
+from app.services.usage_buckets import BucketedUsage
+from app.services.usage_rollups import DAY, HOUR, device_match, naive_utc, plan_ranges
+
+USAGE_SERIES_MAX_POINTS = int(os.getenv("USAGE_SERIES_MAX_POINTS", "20000"))    # Buckets x devices per request
+
+TOTALS = ("energy", "duration", "count")
+METRIC_NAME = re.compile(r"^[A-Za-z0-9_\-]+$")
+
+# Reading & rollup fields summed for each value: (raw sum, raw count, rollup sum, rollup count)
+_FIELDS = {
+    "energy": ("$energy_consumed", 1, "$energy", "$count"),
+    "duration": ("$duration", 1, "$duration", "$count"),
+    "count": (1, 1, "$count", "$count"),
+}
+# Stored totals of whole buckets of bucketed reading storage: (sum, count)
+_STORED_FIELDS = {
+    "energy": ("$total_energy", "$count"),
+    "duration": ("$total_duration", "$count"),
+    "count": ("$count", "$count"),
+}
+
+
+class SeriesError(ValueError):
+    """A series request that cannot be answered (unknown value, too many points)."""
+
+
+def truncate(timestamp: datetime, interval: SeriesInterval) -> datetime:
+    """
+    Start of the bucket a timestamp falls in, as naive UTC.
+
+    Args:
+        timestamp (datetime): Instant to truncate.
+        interval (SeriesInterval): Bucket width.
+
+    Returns:
+        datetime: Start of the minute, hour, day, week (Monday) or month.
+    """
+    timestamp = naive_utc(timestamp)
+    if interval == SeriesInterval.MINUTE:
+        return timestamp.replace(second=0, microsecond=0)
+    if interval == SeriesInterval.HOUR:
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    day = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == SeriesInterval.DAY:
+        return day
+    if interval == SeriesInterval.WEEK:
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def _next(start: datetime, interval: SeriesInterval) -> datetime:
+    """Start of the bucket after the one starting at `start`."""
+    if interval == SeriesInterval.MONTH:
+        return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    widths = {
+        SeriesInterval.MINUTE: timedelta(minutes=1),
+        SeriesInterval.HOUR: timedelta(hours=1),
+        SeriesInterval.DAY: timedelta(days=1),
+        SeriesInterval.WEEK: timedelta(weeks=1),
+    }
+    return start + widths[interval]
+
+
+def series_axis(start: datetime, end: datetime, interval: SeriesInterval, max_points: Optional[int] = None) -> List[datetime]:
+    """
+    Bucket starts covering `[start, end]`.
+
+    Args:
+        start (datetime): Start of the range, inclusive.
+        end (datetime): End of the range, inclusive.
+        interval (SeriesInterval): Bucket width.
+        max_points (Optional[int]): Largest axis allowed.
+
+    Returns:
+        List[datetime]: Start of every bucket, in order.
+
+    Raises:
+        SeriesError: If the axis would be longer than `max_points`.
+    """
+    axis = []
+    current, end = truncate(start, interval), naive_utc(end)
+    while current <= end:
+        axis.append(current)
+        if max_points is not None and len(axis) > max_points:
+            raise SeriesError(f"More than {max_points} {interval.value} buckets requested; use a wider interval")
+        current = _next(current, interval)
+    return axis
+
+
+def value_fields(value: str, rollup: bool) -> Tuple[Any, Any]:
+    """
+    Expressions summed per bucket for `value`, as (sum, count).
+
+    Metric averages sum the metric and count the readings where it is a
+    number; totals count readings so empty buckets can be told apart from zero.
+
+    Raises:
+        SeriesError: If `value` is neither a total nor a valid metric name.
+    """
+    if value in _FIELDS:
+        raw_sum, raw_count, rollup_sum, rollup_count = _FIELDS[value]
+        return (rollup_sum, rollup_count) if rollup else (raw_sum, raw_count)
+    if not METRIC_NAME.match(value):
+        raise SeriesError(f"Unknown series value {value!r}")
+    if rollup:
+        return f"$metrics.{value}.sum", f"$metrics.{value}.count"
+    return f"$metrics.{value}", {"$cond": [{"$isNumber": f"$metrics.{value}"}, 1, 0]}
+
+
+def series_pipeline(
+    match: Dict[str, Any], time_field: str, interval: SeriesInterval, value: str, rollup: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Aggregation pipeline summing `value` per device & bucket.
+
+    Args:
+        match (Dict[str, Any]): Filter on the documents read.
+        time_field (str): `timestamp` for readings, `start` for rollup buckets.
+        interval (SeriesInterval): Bucket width.
+        value (str): `energy`, `duration`, `count` or a metric name.
+        rollup (bool): Whether the documents are rollup buckets.
+
+    Returns:
+        List[Dict[str, Any]]: Pipeline answering `{_id: {device_id, t}, sum, n}` documents.
+    """
+    total, count = value_fields(value, rollup)
+    return [{"$match": match}, _group(time_field, interval, total, count)]
+
+
+def _group(time_field: str, interval: SeriesInterval, total: Any, count: Any) -> Dict[str, Any]:
+    """`$group` stage summing `total` & `count` per device & truncated `time_field`."""
+    return {"$group": {
+        "_id": {
+            "device_id": "$device_id",
+            "t": {"$dateTrunc": {"date": f"${time_field}", "unit": interval.value, "startOfWeek": "monday"}},
+        },
+        "sum": {"$sum": total},
+        "n": {"$sum": count},
+    }}
+
+
+def stored_bucket_stages(interval: SeriesInterval, value: str) -> List[Dict[str, Any]]:
+    """
+    Stages grouping whole buckets of bucketed reading storage like `series_pipeline` groups readings.
+
+    Totals are read from the buckets' stored totals; metrics unwind only the
+    buckets' metrics. Buckets cover one hour, so `interval` must be an hour or longer.
+    """
+    if value in TOTALS:
+        return [_group("start", interval, *_STORED_FIELDS[value])]
+    total, count = value_fields(value, rollup=False)
+    return [{"$unwind": "$metrics"}, _group("start", interval, total, count)]
+
+
+def add_groups(groups: Iterable[Dict[str, Any]], buckets: Dict[Tuple[str, datetime], List[float]]) -> None:
+    """Add `{_id: {device_id, t}, sum, n}` groups to per-device bucket sums."""
+    for group in groups:
+        key = (group["_id"]["device_id"], naive_utc(group["_id"]["t"]))
+        bucket = buckets.setdefault(key, [0, 0])
+        bucket[0] += group.get("sum") or 0
+        bucket[1] += group.get("n") or 0
+
+
+async def _group_raw(collection, match: Dict[str, Any], interval: SeriesInterval, value: str, buckets) -> None:
+    """Group raw readings in the database, from stored bucket totals where bucketed storage allows."""
+    pipeline = series_pipeline(match, "timestamp", interval, value)
+    if isinstance(collection, BucketedUsage) and interval != SeriesInterval.MINUTE:
+        cursor = await collection.aggregate(pipeline, stored_bucket_stages(interval, value))
+    else:
+        cursor = await collection.aggregate(pipeline)
+    add_groups(await cursor.to_list(None), buckets)
+
+
+def fill_series(
+    axis: List[datetime], device_ids: List[str], buckets: Dict[Tuple[str, datetime], List[float]],
+    value: str, fill: SeriesFill
+) -> Dict[str, List[Optional[float]]]:
+    """
+    One value per axis bucket for each device, gaps filled.
+
+    Args:
+        axis (List[datetime]): Bucket starts.
+        device_ids (List[str]): Devices, in response order.
+        buckets (Dict[Tuple[str, datetime], List[float]]): `[sum, count]` by device & bucket start.
+        value (str): Totals are reported as sums, metrics as averages.
+        fill (SeriesFill): What buckets without readings hold.
+
+    Returns:
+        Dict[str, List[Optional[float]]]: Values by device.
+    """
+    series = {}
+    for device_id in device_ids:
+        values: List[Optional[float]] = []
+        for start in axis:
+            total, count = buckets.get((device_id, start), (0, 0))
+            if count:
+                values.append(total if value in TOTALS else total / count)
+            elif fill == SeriesFill.ZERO:
+                values.append(0)
+            elif fill == SeriesFill.PREVIOUS and values:
+                values.append(values[-1])
+            else:
+                values.append(None)
+        series[device_id] = values
+    return series
+
+
+async def usage_series(
+    raw_collection,
+    device_ids: List[str],
+    start: datetime,
+    end: datetime,
+    interval: SeriesInterval,
+    value: str = "energy",
+    fill: SeriesFill = SeriesFill.NULL,
+    max_points: int = USAGE_SERIES_MAX_POINTS,
+) -> Tuple[List[datetime], Dict[str, List[Optional[float]]]]:
+    """
+    Bucket the devices' readings in `[start, end]` on a shared time axis.
+
+    Args:
+        raw_collection: Asyncio usage collection, or the reading adapter of bucketed storage.
+        device_ids (List[str]): Devices to chart.
+        start (datetime): Start of the range, inclusive.
+        end (datetime): End of the range, inclusive.
+        interval (SeriesInterval): Bucket width.
+        value (str): `energy`, `duration`, `count` or a metric name to average.
+        fill (SeriesFill): What buckets without readings hold.
+        max_points (int): Largest number of values (buckets x devices) returned.
+
+    Returns:
+        Tuple[List[datetime], Dict[str, List[Optional[float]]]]: The axis and the values by device.
+
+    Raises:
+        SeriesError: If `value` is unknown or the series would be too large.
+    """
+    value_fields(value, rollup=False)
+    axis = series_axis(start, end, interval, max_points // max(len(device_ids), 1))
+    buckets: Dict[Tuple[str, datetime], List[float]] = {}
+    if not axis or not device_ids:
+        return axis, fill_series(axis, device_ids, buckets, value, fill)
+
+    devices = device_match(device_ids)
+    if not USAGE_ROLLUPS or interval == SeriesInterval.MINUTE:
+        match = {**devices, "timestamp": {"$gte": naive_utc(start), "$lte": naive_utc(end)}}
+        await _group_raw(raw_collection, match, interval, value, buckets)
+        return axis, fill_series(axis, device_ids, buckets, value, fill)
+
+    plan = plan_ranges(start, end)
+    if interval == SeriesInterval.HOUR:
+        # Daily buckets are too coarse for an hourly axis
+        plan[HOUR] = sorted(plan[HOUR] + plan[DAY])
+        plan[DAY] = []
+    for period, collection in ((DAY, usd_c), (HOUR, ush_c)):
+        for range_start, range_end in plan[period]:
+            match = {**devices, "start": {"$gte": range_start, "$lt": range_end}}
+            cursor = await collection.aggregate(series_pipeline(match, "start", interval, value, rollup=True))
+            add_groups(await cursor.to_list(None), buckets)
+
+    end = naive_utc(end)
+    for range_start, range_end in plan["raw"]:
+        # Only the range reaching `end` includes its upper bound
+        upper = "$lte" if range_end == end else "$lt"
+        match = {**devices, "timestamp": {"$gte": range_start, upper: range_end}}
+        await _group_raw(raw_collection, match, interval, value, buckets)
+    return axis, fill_series(axis, device_ids, buckets, value, fill)
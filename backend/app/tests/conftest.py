@@ -12,6 +12,9 @@ from fastapi.testclient import TestClient
 # Add the project root to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Bearer tokens need a signing key before the app is imported
+os.environ.setdefault("AUTH_TOKEN_SECRET", "test-token-secret")
+
 # Import dependency before applying overrides
 from app.core.auth import get_current_user
 from app.models.user import UserDB
@@ -0,0 +1,58 @@
+"""
+Shared test doubles for the asyncio MongoDB collections.
+"""
+from unittest.mock import AsyncMock, MagicMock
+
+
+class AsyncCollectionMock(MagicMock):
+    """
+    Stand-in for a PyMongo `AsyncCollection`.
+
+    Query and write methods are `AsyncMock`s, so `return_value` is what the
+    route receives after `await`. `find()` stays synchronous and returns a
+    cursor, as in PyMongo.
+
+    Use with `patch(..., new_callable=AsyncCollectionMock)`.
+    """
+    _async_methods = {
+        "find_one", "insert_one", "insert_many", "update_one", "update_many",
+        "delete_one", "delete_many", "count_documents", "aggregate",
+        "bulk_write", "find_one_and_update", "distinct",
+    }
+
+    def _get_child_mock(self, **kwargs):
+        if kwargs.get("name") in self._async_methods:
+            return AsyncMock(**kwargs)
+        return MagicMock(**kwargs)
+
+
+class MockCursor:
+    """
+    Minimal async cursor over a fixed list of documents.
+    """
+    def __init__(self, items):
+        self.items = items
+
+    def skip(self, n):
+        return self
+
+    def limit(self, n):
+        return self
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    def batch_size(self, n):
+        return self
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __aiter__(self):
+        async def gen():
+            for item in self.items:
+                yield item
+        return gen()
+
+    async def to_list(self, length=None):
+        return list(self.items)
@@ -11,7 +11,9 @@ from datetime import datetime, timedelta
 sys.path.append(".")
 from app.main import app
 from app.models.user import UserDB
-from app.models.access_management import ResourceType, AccessLevel
+from app.models.access_management import ResourceType, AccessLevel, AccessManagementResponse
+from app.db.repository import projection_for
+from app.tests.mocks import AsyncCollectionMock, MockCursor
 
 # Initialize test client
 client = TestClient(app)
@@ -82,27 +84,13 @@ MOCK_ACCESS_2 = {
     "note": "Shared living room"
 }
 
-# Define a simple list-like cursor mock that works with iteration
-class MockCursor:
-    def __init__(self, items):
-        self.items = items
-    
-    def skip(self, n):
-        return self
-    
-    def limit(self, n):
-        return self
-    
-    def __iter__(self):
-        return iter(self.items)
-
 # Override auth dependency
 from app.core.auth import get_current_user
 app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_ADMIN)
 
 class TestAccessManagementRoutes:
     
-    @patch("app.routes.access_management_routes.am_c")
+    @patch("app.routes.access_management_routes.am_c", new_callable=AsyncCollectionMock)
     def test_get_all_access_management_as_admin(self, mock_collection):
         """Test getting all access management entries as admin."""
         # Setup the mock to return our test entries
@@ -122,7 +110,7 @@ class TestAccessManagementRoutes:
         # Verify the mock was called
         mock_collection.find.assert_called_once()
     
-    @patch("app.routes.access_management_routes.am_c")
+    @patch("app.routes.access_management_routes.am_c", new_callable=AsyncCollectionMock)
     def test_get_all_access_management_as_owner(self, mock_collection):
         """Test getting access management entries as owner."""
         # Override auth to be the owner
@@ -151,7 +139,7 @@ class TestAccessManagementRoutes:
             # Reset auth override
             app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_ADMIN)
     
-    @patch("app.routes.access_management_routes.am_c")
+    @patch("app.routes.access_management_routes.am_c", new_callable=AsyncCollectionMock)
     def test_get_all_access_management_as_user(self, mock_collection):
         """Test getting access management entries as user with granted access."""
         # Override auth to be the user
@@ -179,7 +167,7 @@ class TestAccessManagementRoutes:
             # Reset auth override
             app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_ADMIN)
     
-    @patch("app.routes.access_management_routes.am_c")
+    @patch("app.routes.access_management_routes.am_c", new_callable=AsyncCollectionMock)
     def test_get_access_management_by_id(self, mock_collection):
         """Test getting an access management entry by ID."""
         # Setup the mock
@@ -196,9 +184,9 @@ class TestAccessManagementRoutes:
         assert entry["access_level"] == MOCK_ACCESS_1["access_level"]
         
         # Verify the mock was called with correct parameters
-        mock_collection.find_one.assert_called_once_with({"id": MOCK_ACCESS_1["id"]})
+        mock_collection.find_one.assert_called_once_with({"id": MOCK_ACCESS_1["id"]}, projection_for(AccessManagementResponse))
     
-    @patch("app.routes.access_management_routes.am_c")
+    @patch("app.routes.access_management_routes.am_c", new_callable=AsyncCollectionMock)
     def test_get_access_management_by_id_not_found(self, mock_collection):
         """Test getting a non-existent access management entry."""
         # Setup the mock
@@ -211,7 +199,7 @@ class TestAccessManagementRoutes:
         assert response.status_code == 404
         assert "not found" in response.json()["detail"].lower()
     
-    @patch("app.routes.access_management_routes.am_c")
+    @patch("app.routes.access_management_routes.am_c", new_callable=AsyncCollectionMock)
     def test_get_access_management_by_id_unauthorized(self, mock_collection):
         """Test unauthorized access to another user's access management."""
         # Create unrelated user
@@ -244,7 +232,7 @@ class TestAccessManagementRoutes:
             # Reset auth override
             app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_ADMIN)
     
-    @patch("app.routes.access_management_routes.am_c")
+    @patch("app.routes.access_management_routes.am_c", new_callable=AsyncCollectionMock)
     def test_create_access_management(self, mock_collection):
         """Test creating access management entries."""
         # Setup the mock
@@ -272,7 +260,7 @@ class TestAccessManagementRoutes:
         # Verify mock calls
         assert mock_collection.insert_one.call_count == 1
     
-    @patch("app.routes.access_management_routes.am_c")
+    @patch("app.routes.access_management_routes.am_c", new_callable=AsyncCollectionMock)
     def test_create_access_management_multiple_users(self, mock_collection):
         """Test creating access management entries for multiple users."""
         # Setup the mock
@@ -299,7 +287,7 @@ class TestAccessManagementRoutes:
         # Verify mock calls
         assert mock_collection.insert_one.call_count == 2
     
-    @patch("app.routes.access_management_routes.am_c")
+    @patch("app.routes.access_management_routes.am_c", new_callable=AsyncCollectionMock)
     def test_create_access_management_unauthorized(self, mock_collection):
         """Test unauthorized creation of access management entry."""
         # Override auth to be a regular user
@@ -326,7 +314,7 @@ class TestAccessManagementRoutes:
             # Reset auth override
             app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_ADMIN)
     
-    @patch("app.routes.access_management_routes.am_c")
+    @patch("app.routes.access_management_routes.am_c", new_callable=AsyncCollectionMock)
     def test_update_access_management(self, mock_collection):
         """Test updating an access management entry."""
         # Setup the mocks
@@ -355,7 +343,7 @@ class TestAccessManagementRoutes:
         assert mock_collection.find_one.call_count == 2
         mock_collection.update_one.assert_called_once()
     
-    @patch("app.routes.access_management_routes.am_c")
+    @patch("app.routes.access_management_routes.am_c", new_callable=AsyncCollectionMock)
     def test_update_access_management_not_found(self, mock_collection):
         """Test updating a non-existent access management entry."""
         # Setup the mock
@@ -369,7 +357,7 @@ class TestAccessManagementRoutes:
         assert response.status_code == 404
         assert "not found" in response.json()["detail"].lower()
     
-    @patch("app.routes.access_management_routes.am_c")
+    @patch("app.routes.access_management_routes.am_c", new_callable=AsyncCollectionMock)
     def test_update_access_management_unauthorized(self, mock_collection):
         """Test unauthorized update of access management entry."""
         # Override auth to be a regular user (not the owner)
@@ -393,7 +381,7 @@ class TestAccessManagementRoutes:
             # Reset auth override
             app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_ADMIN)
     
-    @patch("app.routes.access_management_routes.am_c")
+    @patch("app.routes.access_management_routes.am_c", new_callable=AsyncCollectionMock)
     def test_delete_access_management(self, mock_collection):
         """Test deleting an access management entry."""
         # Setup the mocks
@@ -411,7 +399,7 @@ class TestAccessManagementRoutes:
         mock_collection.find_one.assert_called_once_with({"id": MOCK_ACCESS_1["id"]})
         mock_collection.delete_one.assert_called_once_with({"id": MOCK_ACCESS_1["id"]})
     
-    @patch("app.routes.access_management_routes.am_c")
+    @patch("app.routes.access_management_routes.am_c", new_callable=AsyncCollectionMock)
     def test_delete_access_management_not_found(self, mock_collection):
         """Test deleting a non-existent access management entry."""
         # Setup the mock
@@ -427,7 +415,7 @@ class TestAccessManagementRoutes:
         # Verify no deletion was performed
         mock_collection.delete_one.assert_not_called()
     
-    @patch("app.routes.access_management_routes.am_c")
+    @patch("app.routes.access_management_routes.am_c", new_callable=AsyncCollectionMock)
     def test_delete_access_management_unauthorized(self, mock_collection):
         """Test unauthorized deletion of access management entry."""
         # Override auth to be a regular user (not the owner)
@@ -450,7 +438,7 @@ class TestAccessManagementRoutes:
             # Reset auth override
             app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_ADMIN)
     
-    @patch("app.routes.access_management_routes.am_c")
+    @patch("app.routes.access_management_routes.am_c", new_callable=AsyncCollectionMock)
     def test_delete_fail(self, mock_collection):
         """Test failed deletion of access management entry."""
         # Setup the mocks
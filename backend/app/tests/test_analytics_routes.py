@@ -12,7 +12,9 @@ import uuid
 sys.path.append(".")
 from app.main import app
 from app.models.user import UserDB
-from app.models.analytics import AnalyticsDB
+from app.models.analytics import AnalyticsDB, AnalyticsResponse
+from app.db.repository import projection_for
+from app.tests.mocks import AsyncCollectionMock, MockCursor
 
 # Initialize test client
 client = TestClient(app)
@@ -59,24 +61,6 @@ def create_mock_analytics(user_id, device_id=None, data_type="energy"):
 MOCK_ADMIN_ANALYTICS = create_mock_analytics(MOCK_ADMIN["id"])
 MOCK_USER_ANALYTICS = create_mock_analytics(MOCK_USER["id"])
 
-# Define a simple list-like cursor mock that works with iteration
-class MockCursor:
-    def __init__(self, items):
-        self.items = items
-    
-    def skip(self, n):
-        return self
-    
-    def limit(self, n):
-        return self
-    
-    def sort(self, field, direction):
-        return self
-    
-    def __iter__(self):
-        return iter(self.items)
-
-
 # Override auth dependency for tests
 from app.core.auth import get_current_user
 
@@ -86,7 +70,7 @@ app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_ADMIN)
 
 class TestAnalyticsRoutes:
     
-    @patch("app.routes.analytics_routes.an_c")
+    @patch("app.routes.analytics_routes.an_c_analytics", new_callable=AsyncCollectionMock)
     def test_get_all_analytics(self, mock_collection):
         """Test getting all analytics."""
         # Setup the mock to return our test analytics
@@ -104,7 +88,7 @@ class TestAnalyticsRoutes:
         # Verify the mock was called
         mock_collection.find.assert_called_once()
     
-    @patch("app.routes.analytics_routes.an_c")
+    @patch("app.routes.analytics_routes.an_c", new_callable=AsyncCollectionMock)
     def test_get_analytics_by_id(self, mock_collection):
         """Test getting analytics by ID."""
         # Setup the mock
@@ -119,9 +103,9 @@ class TestAnalyticsRoutes:
         assert analytics["id"] == MOCK_USER_ANALYTICS["id"]
         
         # Verify the mock was called with correct parameters
-        mock_collection.find_one.assert_called_once_with({"id": MOCK_USER_ANALYTICS["id"]})
+        mock_collection.find_one.assert_called_once_with({"id": MOCK_USER_ANALYTICS["id"]}, projection_for(AnalyticsResponse))
     
-    @patch("app.routes.analytics_routes.an_c")
+    @patch("app.routes.analytics_routes.an_c", new_callable=AsyncCollectionMock)
     def test_get_analytics_not_found(self, mock_collection):
         """Test getting a non-existent analytics record."""
         # Setup the mock
@@ -134,7 +118,7 @@ class TestAnalyticsRoutes:
         assert response.status_code == 404
         assert "not found" in response.json()["detail"]
     
-    @patch("app.routes.analytics_routes.an_c")
+    @patch("app.routes.analytics_routes.an_c", new_callable=AsyncCollectionMock)
     @patch("app.models.analytics.CreateAnalytics.validate_id")
     @patch("app.models.analytics.CreateAnalytics.validate_data_type")
     def test_create_analytics(self, mock_type_validator, mock_id_validator, mock_collection):
@@ -171,7 +155,7 @@ class TestAnalyticsRoutes:
         # Verify the mock was called
         assert mock_collection.insert_one.call_count == 1
     
-    @patch("app.routes.analytics_routes.an_c")
+    @patch("app.routes.analytics_routes.an_c", new_callable=AsyncCollectionMock)
     def test_update_analytics(self, mock_collection):
         """Test updating analytics."""
         # Setup the mocks
@@ -198,10 +182,10 @@ class TestAnalyticsRoutes:
         assert analytics["metrics"]["value"] == 200.0
         
         # Verify the mock was called with correct parameters
-        mock_collection.find_one.assert_called_with({"id": MOCK_USER_ANALYTICS["id"]})
+        mock_collection.find_one.assert_called_with({"id": MOCK_USER_ANALYTICS["id"]}, projection_for(AnalyticsResponse))
         mock_collection.update_one.assert_called_once()
     
-    @patch("app.routes.analytics_routes.an_c")
+    @patch("app.routes.analytics_routes.an_c", new_callable=AsyncCollectionMock)
     def test_delete_analytics(self, mock_collection):
         """Test deleting analytics."""
         # Setup the mocks
@@ -218,7 +202,7 @@ class TestAnalyticsRoutes:
         mock_collection.find_one.assert_called_with({"id": MOCK_USER_ANALYTICS["id"]})
         mock_collection.delete_one.assert_called_once_with({"id": MOCK_USER_ANALYTICS["id"]})
     
-    @patch("app.routes.analytics_routes.an_c")
+    @patch("app.routes.analytics_routes.an_c", new_callable=AsyncCollectionMock)
     def test_user_access_restriction(self, mock_collection):
         """Test that regular users can only access their own analytics."""
         # Override the auth dependency to return a regular user
@@ -237,7 +221,7 @@ class TestAnalyticsRoutes:
         # Reset the auth override
         app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_ADMIN)
     
-    @patch("app.routes.analytics_routes.an_c")
+    @patch("app.routes.analytics_routes.an_c_analytics", new_callable=AsyncCollectionMock)
     def test_analytics_filtering(self, mock_collection):
         """Test filtering analytics by various parameters."""
         # Setup the mock
@@ -266,7 +250,7 @@ class TestAnalyticsRoutes:
         assert "tags" in query and "$in" in query["tags"]
         assert "monthly" in query["tags"]["$in"]
     
-    @patch("app.routes.analytics_routes.an_c")
+    @patch("app.routes.analytics_routes.an_c_analytics", new_callable=AsyncCollectionMock)
     def test_time_range_filtering(self, mock_collection):
         """Test filtering analytics by time range."""
         # Setup the mock
@@ -0,0 +1,307 @@
+"""
+Test suite for authentication dependencies.
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import pytest
+from unittest.mock import AsyncMock, patch
+from datetime import datetime
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBasicCredentials
+
+from app.core.auth import (
+    get_current_user, get_token_user, invalidate_logins, invalidate_user,
+    credential_cache, identity_cache
+)
+from app.core.cache import TTLCache
+from app.core.token import TokenError, create_token, decode_token
+from app.models.user import UserDB
+from app.tests.mocks import AsyncCollectionMock, MockCursor
+
+MOCK_USER = {
+    "id": "user-id-456",
+    "username": "testuser",
+    "email": "user@example.com",
+    "hashed_password": "hashed_password",
+    "active": True,
+    "verified": True,
+    "created": datetime.utcnow(),
+    "updated": None,
+    "role": "user"
+}
+
+
+def authenticate(username: str, password: str):
+    """Run the auth dependency outside of a request."""
+    credentials = HTTPBasicCredentials(username=username, password=password)
+    return asyncio.run(get_current_user(basic=credentials, bearer=None))
+
+
+class TestTTLCache:
+    """Tests for the bounded TTL cache."""
+
+    def test_hit_and_miss_counters(self):
+        """Test that lookups are counted."""
+        cache = TTLCache(maxsize=2, ttl=60)
+        assert cache.get("a") is None
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted when full."""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.evictions == 1
+
+    def test_ttl_expiry(self):
+        """Test that entries expire after their time-to-live."""
+        now = [0.0]
+        cache = TTLCache(maxsize=2, ttl=10, timer=lambda: now[0])
+        cache.set("a", 1)
+        now[0] = 9.9
+        assert cache.get("a") == 1
+        now[0] = 10.0
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_disabled_cache(self):
+        """Test that a zero-sized cache never stores entries."""
+        cache = TTLCache(maxsize=0, ttl=60)
+        cache.set("a", 1)
+        assert cache.get("a") is None
+
+
+class TestGetCurrentUser:
+    """Tests for HTTP Basic authentication with the credential cache."""
+
+    def setup_method(self):
+        credential_cache.clear()
+        identity_cache.clear()
+
+    @patch("app.core.auth.verify_password_async", new_callable=AsyncMock, return_value=True)
+    @patch("app.core.auth.u_c", new_callable=AsyncCollectionMock)
+    def test_repeat_requests_skip_bcrypt(self, mock_collection, mock_verify):
+        """Test that a verified password is not re-hashed on the next request."""
+        mock_collection.find.return_value = MockCursor([MOCK_USER])
+
+        first = authenticate("testuser", "Password123!")
+        second = authenticate("testuser", "Password123!")
+
+        assert first.id == second.id == MOCK_USER["id"]
+        assert mock_verify.call_count == 1
+        assert credential_cache.hits == 1
+        assert mock_collection.find.call_count == 1
+        assert identity_cache.hits == 1
+
+    @patch("app.core.auth.verify_password_async", new_callable=AsyncMock, return_value=False)
+    @patch("app.core.auth.u_c", new_callable=AsyncCollectionMock)
+    def test_failed_verification_not_cached(self, mock_collection, mock_verify):
+        """Test that wrong passwords are always checked and rejected."""
+        mock_collection.find.return_value = MockCursor([MOCK_USER])
+
+        for _ in range(2):
+            with pytest.raises(HTTPException) as exc_info:
+                authenticate("testuser", "wrong")
+            assert exc_info.value.status_code == 401
+
+        assert mock_verify.call_count == 2
+        assert len(credential_cache) == 0
+
+    @patch("app.core.auth.verify_password_async", new_callable=AsyncMock, return_value=True)
+    @patch("app.core.auth.u_c", new_callable=AsyncCollectionMock)
+    def test_changed_hash_misses_cache(self, mock_collection, mock_verify):
+        """Test that a new stored hash forces a fresh verification."""
+        mock_collection.find.return_value = MockCursor([MOCK_USER])
+        authenticate("testuser", "Password123!")
+
+        identity_cache.clear()
+        mock_collection.find.return_value = MockCursor([{**MOCK_USER, "hashed_password": "rotated"}])
+        authenticate("testuser", "Password123!")
+
+        assert mock_verify.call_count == 2
+
+    @patch("app.core.auth.verify_password_async", new_callable=AsyncMock, return_value=True)
+    @patch("app.core.auth.u_c", new_callable=AsyncCollectionMock)
+    def test_invalidate_user(self, mock_collection, mock_verify):
+        """Test that invalidation forces a fresh verification."""
+        mock_collection.find.return_value = MockCursor([MOCK_USER])
+        authenticate("testuser", "Password123!")
+
+        invalidate_user(MOCK_USER["id"])
+        authenticate("testuser", "Password123!")
+
+        assert mock_verify.call_count == 2
+
+    @patch("app.core.auth.verify_password_async", new_callable=AsyncMock, return_value=True)
+    @patch("app.core.auth.u_c", new_callable=AsyncCollectionMock)
+    def test_single_query_prefers_username(self, mock_collection, mock_verify):
+        """Test that one $or query resolves logins, preferring a username match."""
+        other = {**MOCK_USER, "id": "other-id", "username": "someone", "email": "testuser"}
+        mock_collection.find.return_value = MockCursor([other, MOCK_USER])
+
+        user = authenticate("testuser", "Password123!")
+
+        assert user.id == MOCK_USER["id"]
+        query, projection = mock_collection.find.call_args[0]
+        assert query == {"$or": [{"username": "testuser"}, {"email": "testuser"}]}
+        assert projection["_id"] == 0
+        mock_collection.find_one.assert_not_called()
+
+    @patch("app.core.auth.verify_password_async", new_callable=AsyncMock, return_value=True)
+    @patch("app.core.auth.u_c", new_callable=AsyncCollectionMock)
+    def test_invalidate_logins(self, mock_collection, mock_verify):
+        """Test that forgetting a login name forces a fresh lookup."""
+        mock_collection.find.return_value = MockCursor([MOCK_USER])
+        authenticate("testuser", "Password123!")
+
+        invalidate_logins("testuser")
+        authenticate("testuser", "Password123!")
+
+        assert mock_collection.find.call_count == 2
+
+    @patch("app.core.auth.verify_password_async", new_callable=AsyncMock, return_value=True)
+    @patch("app.core.auth.u_c", new_callable=AsyncCollectionMock)
+    def test_inactive_user_rejected(self, mock_collection, mock_verify):
+        """Test that inactive accounts are rejected even with a cached verification."""
+        mock_collection.find.return_value = MockCursor([MOCK_USER])
+        authenticate("testuser", "Password123!")
+
+        invalidate_user(MOCK_USER["id"])
+        mock_collection.find.return_value = MockCursor([{**MOCK_USER, "active": False}])
+        with pytest.raises(HTTPException) as exc_info:
+            authenticate("testuser", "Password123!")
+        assert exc_info.value.detail == "Inactive user account"
+
+
+def token_user(token: str) -> UserDB:
+    """Resolve a bearer token to its user."""
+    return asyncio.run(get_token_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)))
+
+
+class TestBearerTokens:
+    """Tests for signed bearer tokens."""
+
+    def setup_method(self):
+        identity_cache.clear()
+
+    @patch("app.core.auth.u_c", new_callable=AsyncCollectionMock)
+    def test_round_trip(self, mock_collection):
+        """Test that a token resolves back to the same user."""
+        mock_collection.find_one.return_value = MOCK_USER
+        user = UserDB(**MOCK_USER)
+        token, expires = create_token(user)
+
+        resolved = token_user(token)
+
+        assert resolved.id == user.id
+        assert resolved.username == user.username
+        assert resolved.email == user.email
+        assert resolved.role == user.role
+        assert expires > time.time()
+
+    def test_tampered_token_rejected(self):
+        """Test that a modified payload fails signature verification."""
+        token, _ = create_token(UserDB(**MOCK_USER))
+        forged_claims = create_token(UserDB(**{**MOCK_USER, "id": "another-user"}))[0].split(".")[0]
+        forged = f"{forged_claims}.{token.split('.')[1]}"
+
+        with pytest.raises(TokenError):
+            decode_token(forged)
+
+    def test_claims_carry_only_identity_and_expiry(self):
+        """Test that tokens do not embed account fields that are read from the account anyway."""
+        token, expires = create_token(UserDB(**MOCK_USER))
+
+        claims = decode_token(token)
+
+        assert set(claims) == {"sub", "iat", "exp"}
+        assert claims["sub"] == MOCK_USER["id"]
+        assert claims["exp"] == expires
+
+    def test_expired_token_rejected(self):
+        """Test that expired tokens are rejected with 401."""
+        token, _ = create_token(UserDB(**MOCK_USER), ttl=-1)
+
+        with pytest.raises(HTTPException) as exc_info:
+            token_user(token)
+        assert exc_info.value.status_code == 401
+
+    def test_malformed_token_rejected(self):
+        """Test that garbage tokens are rejected."""
+        with pytest.raises(TokenError):
+            decode_token("not-a-token")
+
+    @pytest.mark.parametrize("token", ["payload.sïgnature", "päyload.signature"])
+    def test_non_ascii_token_rejected(self, token):
+        """Test that tokens with non-ASCII characters are rejected with 401 rather than failing."""
+        with pytest.raises(HTTPException) as exc_info:
+            token_user(token)
+        assert exc_info.value.status_code == 401
+
+    @patch("app.core.auth.u_c", new_callable=AsyncCollectionMock)
+    def test_account_state_read_from_account(self, mock_collection):
+        """Test that the role comes from the account, not from the token."""
+        mock_collection.find_one.return_value = {**MOCK_USER, "role": "user"}
+        token, _ = create_token(UserDB(**{**MOCK_USER, "role": "admin"}))
+
+        assert token_user(token).role == "user"
+
+    @patch("app.core.auth.u_c", new_callable=AsyncCollectionMock)
+    def test_deactivated_account_rejected(self, mock_collection):
+        """Test that tokens of a deactivated account stop working once its cache entry is invalidated."""
+        mock_collection.find_one.return_value = MOCK_USER
+        token, _ = create_token(UserDB(**MOCK_USER))
+        token_user(token)
+
+        invalidate_user(MOCK_USER["id"])
+        mock_collection.find_one.return_value = {**MOCK_USER, "active": False}
+        with pytest.raises(HTTPException) as exc_info:
+            token_user(token)
+        assert exc_info.value.detail == "Inactive user account"
+
+    @patch("app.core.auth.u_c", new_callable=AsyncCollectionMock)
+    def test_current_user_prefers_bearer(self, mock_collection):
+        """Test that a bearer token needs no password check and its account is looked up once."""
+        mock_collection.find_one.return_value = MOCK_USER
+        token, _ = create_token(UserDB(**MOCK_USER))
+        bearer = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+        user = asyncio.run(get_current_user(basic=None, bearer=bearer))
+        asyncio.run(get_current_user(basic=None, bearer=bearer))
+
+        assert user.id == MOCK_USER["id"]
+        mock_collection.find_one.assert_called_once()
+        mock_collection.find.assert_not_called()
+
+    def test_current_user_requires_credentials(self):
+        """Test that requests without any credentials are rejected."""
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(get_current_user(basic=None, bearer=None))
+        assert exc_info.value.status_code == 401
+
+    @pytest.mark.parametrize("override, fails", [("false", True), ("true", False)])
+    def test_signing_secret_required(self, override, fails):
+        """Test that workers refuse to start without a shared signing key unless the dev override is set."""
+        env = {key: value for key, value in os.environ.items() if key != "AUTH_TOKEN_SECRET"}
+        env["AUTH_DEV_RANDOM_SECRET"] = override
+
+        result = subprocess.run(
+            [sys.executable, "-c", "import app.core.token"],
+            cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+            env=env, capture_output=True, text=True
+        )
+
+        assert (result.returncode != 0) == fails
+        assert ("AUTH_TOKEN_SECRET must be set" in result.stderr) == fails
@@ -0,0 +1,78 @@
+"""
+Test file for authentication routes.
+"""
+import sys
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from datetime import datetime
+
+# Import the app
+sys.path.append(".")
+from app.main import app
+from app.models.user import UserDB
+from app.core.auth import get_basic_user, get_current_user
+from app.tests.mocks import AsyncCollectionMock
+
+# Initialize test client
+client = TestClient(app)
+
+# Mock user data
+MOCK_USER = {
+    "id": "user-id-456",
+    "username": "testuser",
+    "email": "user@example.com",
+    "hashed_password": "hashed_password",
+    "active": True,
+    "verified": True,
+    "created": datetime.utcnow(),
+    "updated": None,
+    "role": "user"
+}
+
+
+class TestAuthRoutes:
+
+    def setup_method(self):
+        app.dependency_overrides[get_basic_user] = lambda: UserDB(**MOCK_USER)
+
+    def teardown_method(self):
+        app.dependency_overrides.pop(get_basic_user, None)
+
+    def test_issue_token(self):
+        """Test exchanging Basic credentials for a bearer token."""
+        response = client.post("/api/v1/auth/token")
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["token_type"] == "bearer"
+        assert body["expires_in"] > 0
+        assert body["access_token"].count(".") == 1
+
+    @patch("app.core.auth.u_c", new_callable=AsyncCollectionMock)
+    @patch("app.routes.user_routes.u_c", new_callable=AsyncCollectionMock)
+    def test_token_accepted_by_routers(self, mock_collection, mock_auth_collection):
+        """Test that an issued token authenticates against existing routers."""
+        token = client.post("/api/v1/auth/token").json()["access_token"]
+        app.dependency_overrides.pop(get_current_user, None)
+        mock_collection.find_one.return_value = MOCK_USER
+        mock_auth_collection.find_one.return_value = MOCK_USER
+
+        response = client.get(
+            f"/api/v1/users/{MOCK_USER['id']}",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+
+        assert response.status_code == 200
+        assert response.json()["id"] == MOCK_USER["id"]
+
+    def test_invalid_token_rejected(self):
+        """Test that a forged token is refused by existing routers."""
+        app.dependency_overrides.pop(get_current_user, None)
+
+        response = client.get(
+            f"/api/v1/users/{MOCK_USER['id']}",
+            headers={"Authorization": "Bearer forged.token"}
+        )
+
+        assert response.status_code == 401
@@ -11,6 +11,9 @@ from datetime import datetime
 sys.path.append(".")
 from app.main import app
 from app.models.user import UserDB
+from app.models.automation import AutomationDetailResponse
+from app.db.repository import projection_for
+from app.tests.mocks import AsyncCollectionMock, MockCursor
 
 # Initialize test client
 client = TestClient(app)
@@ -81,24 +84,9 @@ MOCK_AUTOMATION_ADMIN = {
 from app.core.auth import get_current_user
 app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_ADMIN)
 
-# Define a simple list-like cursor mock that works with iteration
-class MockCursor:
-    def __init__(self, items):
-        self.items = items
-    
-    def skip(self, n):
-        return self
-    
-    def limit(self, n):
-        return self
-    
-    def __iter__(self):
-        return iter(self.items)
-
-
 class TestAutomationRoutes:
     
-    @patch("app.routes.automation_routes.a_c")
+    @patch("app.routes.automation_routes.a_c", new_callable=AsyncCollectionMock)
     def test_get_all_automations(self, mock_collection):
         """Test getting all automations."""
         # Setup the mock to return our test automations
@@ -118,7 +106,7 @@ class TestAutomationRoutes:
         # Verify the mock was called
         mock_collection.find.assert_called_once()
     
-    @patch("app.routes.automation_routes.a_c")
+    @patch("app.routes.automation_routes.a_c", new_callable=AsyncCollectionMock)
     def test_get_automation_by_id(self, mock_collection):
         """Test getting an automation by ID."""
         # Setup the mock
@@ -133,9 +121,9 @@ class TestAutomationRoutes:
         assert automation["id"] == MOCK_AUTOMATION_USER["id"]
         
         # Verify the mock was called with correct parameters
-        mock_collection.find_one.assert_called_once_with({"id": MOCK_AUTOMATION_USER["id"]})
+        mock_collection.find_one.assert_called_once_with({"id": MOCK_AUTOMATION_USER["id"]}, projection_for(AutomationDetailResponse))
     
-    @patch("app.routes.automation_routes.a_c")
+    @patch("app.routes.automation_routes.a_c", new_callable=AsyncCollectionMock)
     def test_create_automation(self, mock_collection):
         """Test creating an automation."""
         # Setup the mocks
@@ -163,7 +151,7 @@ class TestAutomationRoutes:
         # Verify mock calls
         assert mock_collection.insert_one.call_count == 1  # Insert the automation
     
-    @patch("app.routes.automation_routes.a_c")
+    @patch("app.routes.automation_routes.a_c", new_callable=AsyncCollectionMock)
     def test_update_automation(self, mock_collection):
         """Test updating an automation."""
         # Setup the mocks
@@ -184,7 +172,7 @@ class TestAutomationRoutes:
         assert mock_collection.find_one.call_count >= 1  # Check automation exists
         assert mock_collection.update_one.call_count == 1  # Update the automation
     
-    @patch("app.routes.automation_routes.a_c")
+    @patch("app.routes.automation_routes.a_c", new_callable=AsyncCollectionMock)
     def test_delete_automation(self, mock_collection):
         """Test deleting an automation."""
         # Setup the mocks
@@ -202,7 +190,7 @@ class TestAutomationRoutes:
         assert mock_collection.delete_one.call_count == 1  # Delete the automation
         mock_collection.delete_one.assert_called_once_with({"id": MOCK_AUTOMATION_USER["id"]})
     
-    @patch("app.routes.automation_routes.a_c")
+    @patch("app.routes.automation_routes.a_c", new_callable=AsyncCollectionMock)
     def test_user_cannot_access_other_automation(self, mock_collection):
         """Test that a user cannot access another user's automation."""
         # Override auth dependency to use a regular user
@@ -220,7 +208,7 @@ class TestAutomationRoutes:
         # Restore admin user for other tests
         app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_ADMIN)
     
-    @patch("app.routes.automation_routes.a_c")
+    @patch("app.routes.automation_routes.a_c", new_callable=AsyncCollectionMock)
     def test_filtering_automations(self, mock_collection):
         """Test filtering automations by different parameters."""
         # Setup the mock
@@ -0,0 +1,127 @@
+"""
+Test suite for the index bootstrap.
+"""
+import mongomock
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from app.db.indexes import (
+    BOOTSTRAP_COLLECTION, INDEX_LOCK_ID, bootstrap_indexes, drop_superseded, ensure_collections, index_version,
+    missing_indexes
+)
+
+TEST_INDEXES = {
+    "usage": [
+        IndexModel("id", unique=True),
+        IndexModel([("device_id", ASCENDING), ("timestamp", DESCENDING)]),
+    ],
+    "device": [
+        IndexModel("user_id"),
+    ],
+}
+
+
+@pytest.fixture
+def db():
+    """Fresh in-memory database."""
+    return mongomock.MongoClient().sync
+
+
+class TestIndexBootstrap:
+    """Tests for diffing & creating indexes once per deployment."""
+
+    def test_creates_missing_indexes(self, db):
+        """Test that a fresh database gets every declared index."""
+        created = bootstrap_indexes(db, TEST_INDEXES)
+
+        assert created == {"usage": ["id_1", "device_id_1_timestamp_-1"], "device": ["user_id_1"]}
+        assert "device_id_1_timestamp_-1" in db["usage"].index_information()
+        state = db[BOOTSTRAP_COLLECTION].find_one({"_id": INDEX_LOCK_ID})
+        assert state["version"] == index_version(TEST_INDEXES)
+        assert "locked_until" not in state
+
+    def test_current_version_skips_diff(self, db):
+        """Test that a recorded version short-circuits the bootstrap."""
+        bootstrap_indexes(db, TEST_INDEXES)
+        db["usage"].drop_index("id_1")
+
+        assert bootstrap_indexes(db, TEST_INDEXES) == {}
+        assert bootstrap_indexes(db, TEST_INDEXES, force=True) == {"usage": ["id_1"]}
+
+    def test_only_missing_indexes_created(self, db):
+        """Test that existing key patterns are matched regardless of name."""
+        db["usage"].create_index("id", name="custom_id", unique=True)
+
+        missing = missing_indexes(db["usage"], TEST_INDEXES["usage"])
+
+        assert [model.document["name"] for model in missing] == ["device_id_1_timestamp_-1"]
+
+    def test_held_lock_skips(self, db):
+        """Test that another worker's unexpired lock is respected."""
+        db[BOOTSTRAP_COLLECTION].insert_one({
+            "_id": INDEX_LOCK_ID,
+            "owner": "other-worker",
+            "locked_until": datetime.utcnow() + timedelta(minutes=5)
+        })
+
+        assert bootstrap_indexes(db, TEST_INDEXES) == {}
+        assert "id_1" not in db["usage"].index_information()
+
+    def test_stale_lock_taken_over(self, db):
+        """Test that an expired lock does not block the bootstrap forever."""
+        db[BOOTSTRAP_COLLECTION].insert_one({
+            "_id": INDEX_LOCK_ID,
+            "owner": "crashed-worker",
+            "locked_until": datetime.utcnow() - timedelta(minutes=5)
+        })
+
+        assert "usage" in bootstrap_indexes(db, TEST_INDEXES)
+
+    def test_changed_definitions_rerun(self, db):
+        """Test that adding an index triggers a new bootstrap."""
+        bootstrap_indexes(db, TEST_INDEXES)
+        extended = {**TEST_INDEXES, "room": [IndexModel("home_id")]}
+
+        assert bootstrap_indexes(db, extended) == {"room": ["home_id_1"]}
+
+    def test_superseded_indexes_dropped(self, db):
+        """Test that indexes replaced by a longer key are dropped once the replacement exists."""
+        db["usage"].create_index("timestamp")
+        db["usage"].create_index([("device_id", ASCENDING), ("timestamp", DESCENDING)])
+        indexes = {"usage": [IndexModel([("device_id", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)])]}
+        superseded = {"usage": [[("timestamp", ASCENDING)], [("device_id", ASCENDING), ("timestamp", DESCENDING)]]}
+
+        created = bootstrap_indexes(db, indexes, superseded=superseded)
+
+        assert created == {"usage": ["device_id_1_timestamp_-1_id_-1"]}
+        assert sorted(db["usage"].index_information()) == ["_id_", "device_id_1_timestamp_-1_id_-1"]
+
+    def test_declared_index_not_dropped(self, db):
+        """Test that a superseded key pattern that is still declared is kept."""
+        db["usage"].create_index([("device_id", ASCENDING), ("timestamp", DESCENDING)])
+
+        dropped = drop_superseded(
+            db["usage"], [[("device_id", ASCENDING), ("timestamp", DESCENDING)]], TEST_INDEXES["usage"]
+        )
+
+        assert dropped == []
+        assert "device_id_1_timestamp_-1" in db["usage"].index_information()
+
+    def test_timeseries_collection_created_first(self):
+        """Test that declared collections are created with their options."""
+        options = {"timeseries": {"timeField": "timestamp", "metaField": "device_id", "granularity": "minutes"}}
+        db = MagicMock()
+        db.list_collections.return_value = []
+
+        assert ensure_collections(db, {"usage_ts": options}) == ["usage_ts"]
+        db.create_collection.assert_called_once_with("usage_ts", **options)
+
+    def test_existing_collection_not_recreated(self):
+        """Test that an existing collection is left alone."""
+        db = MagicMock()
+        db.list_collections.return_value = [{"name": "usage", "type": "collection"}]
+
+        assert ensure_collections(db, {"usage": {"timeseries": {"timeField": "timestamp"}}}) == []
+        db.create_collection.assert_not_called()
@@ -0,0 +1,101 @@
+"""
+Test suite for per-request database command accounting.
+"""
+import logging
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.middleware import DBMetricsMiddleware
+from app.db.monitoring import (
+    begin_request, command_listener, end_request, query_shape, route_db_stats
+)
+
+
+def emit(request_id: int, command: dict, micros: int = 1000):
+    """Send a started/succeeded event pair through the listener."""
+    name = next(iter(command))
+    command_listener.started(SimpleNamespace(request_id=request_id, command_name=name, command=command))
+    command_listener.succeeded(SimpleNamespace(request_id=request_id, command_name=name, duration_micros=micros))
+
+
+def make_app(lookups: int) -> FastAPI:
+    """App whose route issues one query per looked-up device."""
+    test_app = FastAPI()
+    test_app.add_middleware(DBMetricsMiddleware, headers=True)
+
+    @test_app.get("/devices/{device_id}")
+    async def lookup(device_id: str):
+        for n in range(lookups):
+            emit(n, {"find": "device", "filter": {"id": f"{device_id}-{n}"}}, micros=1000 * (n + 1))
+        return {"ok": True}
+
+    return test_app
+
+
+class TestQueryShape:
+    """Tests for reducing commands to query shapes."""
+
+    def test_values_stripped(self):
+        """Test that literal values do not split one shape into many."""
+        first = query_shape("find", {"find": "device", "filter": {"id": "a"}})
+        second = query_shape("find", {"find": "device", "filter": {"id": "b"}})
+        assert first == second == "find device {'id': '?'}"
+
+    def test_operators_kept(self):
+        """Test that operators remain part of the shape."""
+        shape = query_shape("find", {"find": "usage", "filter": {"device_id": {"$in": ["a", "b"]}}})
+        assert shape == "find usage {'device_id': {'$in': '?'}}"
+
+    def test_get_more_uses_collection(self):
+        """Test that cursor ids are not part of a getMore shape."""
+        shape = query_shape("getMore", {"getMore": 123456789, "collection": "usage"})
+        assert shape == "getMore usage"
+
+
+class TestDBMetrics:
+    """Tests for the listener & middleware."""
+
+    def setup_method(self):
+        route_db_stats.clear()
+
+    def test_commands_outside_request_ignored(self):
+        """Test that commands without a bound request are not counted."""
+        emit(1, {"find": "device", "filter": {}})
+        assert route_db_stats.stats() == {}
+
+    def test_listener_counts_request_commands(self):
+        """Test that commands are attributed to the bound request."""
+        stats, token = begin_request()
+        try:
+            emit(1, {"find": "device", "filter": {"id": "a"}}, micros=2000)
+            emit(2, {"insert": "usage"}, micros=5000)
+        finally:
+            end_request(token)
+
+        assert stats.commands == 2
+        assert stats.total_ms == 7.0
+        assert stats.slowest == "insert usage"
+
+    def test_headers_and_route_stats(self):
+        """Test that responses report their commands and routes aggregate them."""
+        client = TestClient(make_app(lookups=3))
+
+        response = client.get("/devices/abc")
+
+        assert response.headers["x-db-commands"] == "3"
+        assert response.headers["x-db-time-ms"] == "6.000"
+        assert response.headers["x-db-slowest"].startswith("3.000ms find device")
+        route = route_db_stats.stats()["GET /devices/{device_id}"]
+        assert route["requests"] == 1
+        assert route["commands"] == 3
+
+    def test_n_plus_one_warning(self, caplog):
+        """Test that a repeated query shape is logged."""
+        client = TestClient(make_app(lookups=12))
+
+        with caplog.at_level(logging.WARNING, logger="app.core.middleware"):
+            client.get("/devices/abc")
+
+        assert "Possible N+1 query" in caplog.text
+        assert route_db_stats.stats()["GET /devices/{device_id}"]["n_plus_one"] == 1
@@ -0,0 +1,63 @@
+"""
+Test suite for MongoDB connection settings.
+"""
+import pytest
+from unittest.mock import patch
+from pymongo import MongoClient
+from pymongo.read_preferences import Primary, SecondaryPreferred
+
+from app.db import settings
+from app.db.settings import (
+    WORKLOAD_ANALYTICS, WORKLOAD_INGEST, client_options, with_workload
+)
+
+
+@pytest.fixture
+def collection():
+    """Unconnected collection handle."""
+    client = MongoClient("mongodb://localhost:27017/", connect=False)
+    yield client.sync["usage"]
+    client.close()
+
+
+class TestDatabaseSettings:
+    """Tests for client options and workload handles."""
+
+    def test_client_options_defaults(self):
+        """Test that unset optional settings are left to the driver."""
+        options = client_options()
+        assert options["maxPoolSize"] == settings.MONGO_MAX_POOL_SIZE
+        assert options["minPoolSize"] == settings.MONGO_MIN_POOL_SIZE
+        assert "waitQueueTimeoutMS" not in options
+        assert "compressors" not in options
+
+    def test_client_options_overrides(self):
+        """Test that wait-queue timeout and compression are passed through."""
+        with patch.object(settings, "MONGO_WAIT_QUEUE_TIMEOUT_MS", 500), \
+             patch.object(settings, "MONGO_COMPRESSORS", "zlib"):
+            options = client_options()
+        assert options["waitQueueTimeoutMS"] == 500
+        assert options["compressors"] == "zlib"
+
+    def test_analytics_workload(self, collection):
+        """Test that analytics handles prefer secondaries."""
+        handle = with_workload(collection, WORKLOAD_ANALYTICS)
+        assert isinstance(handle.read_preference, SecondaryPreferred)
+        assert isinstance(collection.read_preference, Primary)
+
+    def test_ingest_workload(self, collection):
+        """Test that ingest handles skip the journal wait."""
+        handle = with_workload(collection, WORKLOAD_INGEST)
+        assert handle.write_concern.document == {"w": 1, "j": False}
+        assert collection.write_concern.document == {}
+
+    def test_invalid_read_preference(self, collection):
+        """Test that a misspelt read preference is reported."""
+        with patch.object(settings, "MONGO_ANALYTICS_READ_PREFERENCE", "nearest-ish"):
+            with pytest.raises(ValueError):
+                with_workload(collection, WORKLOAD_ANALYTICS)
+
+    def test_unknown_workload(self, collection):
+        """Test that unknown workloads are rejected."""
+        with pytest.raises(ValueError):
+            with_workload(collection, "batch")
@@ -10,8 +10,11 @@ from datetime import datetime, timezone
 from pymongo.errors import DuplicateKeyError
 
 from app.routes.device_routes import router as device_router
-from app.models.device import DeviceType, DeviceStatus
+from app.models.device import DeviceType, DeviceStatus, DeviceResponse
 from app.core.auth import get_current_user
+from app.core.ownership import cached_owner, remember_owner, user_devices_cache
+from app.db.repository import projection_for
+from app.tests.mocks import AsyncCollectionMock, MockCursor
 
 # Create a fresh app for tests to avoid conflicts with main.py
 app = FastAPI()
@@ -102,7 +105,7 @@ def with_db_mock(test_func):
     """Decorator to mock database collection."""
     from unittest.mock import patch
     
-    @patch("app.routes.device_routes.d_c")
+    @patch("app.routes.device_routes.d_c", new_callable=AsyncCollectionMock)
     def wrapper(mock_device_collection, *args, **kwargs):
         result = test_func(mock_device_collection, *args, **kwargs)
         return result
@@ -116,7 +119,7 @@ def test_get_all_devices_admin(mock_device_collection):
     get_test_user.user = MOCK_ADMIN_USER
     # Configure the mock to properly return our device
     mock_device_collection.find.return_value = MagicMock()
-    mock_device_collection.find.return_value.skip.return_value.limit.return_value = [MOCK_DEVICE]
+    mock_device_collection.find.return_value.skip.return_value.limit.return_value = MockCursor([MOCK_DEVICE])
     
     # Execute
     response = client.get("/devices/")
@@ -135,7 +138,7 @@ def test_get_all_devices_user(mock_device_collection):
     get_test_user.user = MOCK_REGULAR_USER
     # Configure the mock to properly return our device
     mock_device_collection.find.return_value = MagicMock()
-    mock_device_collection.find.return_value.skip.return_value.limit.return_value = [MOCK_DEVICE]
+    mock_device_collection.find.return_value.skip.return_value.limit.return_value = MockCursor([MOCK_DEVICE])
     
     # Execute
     response = client.get("/devices/")
@@ -143,7 +146,7 @@ def test_get_all_devices_user(mock_device_collection):
     # Assert
     assert response.status_code == 200
     # Check that find was called with the correct user_id filter
-    mock_device_collection.find.assert_called_once_with({"user_id": MOCK_USER_ID})
+    mock_device_collection.find.assert_called_once_with({"user_id": MOCK_USER_ID}, projection_for(DeviceResponse))
 
 @with_db_mock
 def test_get_all_devices_with_filters(mock_device_collection):
@@ -152,7 +155,7 @@ def test_get_all_devices_with_filters(mock_device_collection):
     get_test_user.user = MOCK_ADMIN_USER
     # Configure the mock to properly return our device
     mock_device_collection.find.return_value = MagicMock()
-    mock_device_collection.find.return_value.skip.return_value.limit.return_value = [MOCK_DEVICE]
+    mock_device_collection.find.return_value.skip.return_value.limit.return_value = MockCursor([MOCK_DEVICE])
     
     # Execute
     response = client.get(f"/devices/?type={DeviceType.LIGHT.value}&room_id={MOCK_ROOM_ID}")
@@ -178,7 +181,7 @@ def test_get_device_admin(mock_device_collection):
     # Assert
     assert response.status_code == 200
     assert response.json()["id"] == MOCK_DEVICE_ID
-    mock_device_collection.find_one.assert_called_once_with({"id": MOCK_DEVICE_ID})
+    mock_device_collection.find_one.assert_called_once_with({"id": MOCK_DEVICE_ID}, projection_for(DeviceResponse))
 
 @with_db_mock
 def test_get_device_owner(mock_device_collection):
@@ -496,6 +499,21 @@ def test_delete_device_owner(mock_device_collection):
     assert response.status_code == 204
     mock_device_collection.delete_one.assert_called_once_with({"id": MOCK_DEVICE_ID})
 
+@with_db_mock
+def test_delete_device_invalidates_ownership(mock_device_collection):
+    """Test that deleting a device drops its cached owner and the owner's device list."""
+    get_test_user.user = MOCK_ADMIN_USER
+    mock_device_collection.find_one.return_value = MOCK_DEVICE
+    mock_device_collection.delete_one.return_value = MagicMock(deleted_count=1)
+    remember_owner(MOCK_DEVICE["user_id"], [MOCK_DEVICE_ID])
+    user_devices_cache.set(MOCK_DEVICE["user_id"], (MOCK_DEVICE_ID,))
+    
+    response = client.delete(f"/devices/{MOCK_DEVICE_ID}")
+    
+    assert response.status_code == 204
+    assert cached_owner(MOCK_DEVICE_ID) is None
+    assert user_devices_cache.get(MOCK_DEVICE["user_id"]) is None
+
 @with_db_mock
 def test_delete_device_unauthorized(mock_device_collection):
     """Test that a non-owner non-admin user cannot delete another user's device."""
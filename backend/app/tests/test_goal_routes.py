@@ -11,7 +11,9 @@ from datetime import datetime
 sys.path.append(".")
 from app.main import app
 from app.models.user import UserDB
-from app.models.goal import GoalType, GoalStatus, GoalTimeframe
+from app.models.goal import GoalType, GoalStatus, GoalTimeframe, EnergyGoalResponse
+from app.db.repository import projection_for
+from app.tests.mocks import AsyncCollectionMock, MockCursor
 
 # Initialize test client
 client = TestClient(app)
@@ -82,24 +84,9 @@ MOCK_GOAL_2 = {
 from app.core.auth import get_current_user
 app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_ADMIN)
 
-# Define a simple list-like cursor mock that works with iteration
-class MockCursor:
-    def __init__(self, items):
-        self.items = items
-    
-    def skip(self, n):
-        return self
-    
-    def limit(self, n):
-        return self
-    
-    def __iter__(self):
-        return iter(self.items)
-
-
 class TestGoalRoutes:
     
-    @patch("app.routes.goal_routes.g_c")
+    @patch("app.routes.goal_routes.g_c", new_callable=AsyncCollectionMock)
     def test_get_all_goals(self, mock_collection):
         """Test getting all goals."""
         # Setup the mock to return our test goals
@@ -119,7 +106,7 @@ class TestGoalRoutes:
         # Verify the mock was called
         mock_collection.find.assert_called_once()
     
-    @patch("app.routes.goal_routes.g_c")
+    @patch("app.routes.goal_routes.g_c", new_callable=AsyncCollectionMock)
     def test_get_goal_by_id(self, mock_collection):
         """Test getting a goal by ID."""
         # Setup the mock
@@ -134,9 +121,9 @@ class TestGoalRoutes:
         assert goal["id"] == MOCK_GOAL_1["id"]
         
         # Verify the mock was called with correct parameters
-        mock_collection.find_one.assert_called_once_with({"id": MOCK_GOAL_1["id"]})
+        mock_collection.find_one.assert_called_once_with({"id": MOCK_GOAL_1["id"]}, projection_for(EnergyGoalResponse))
     
-    @patch("app.routes.goal_routes.g_c")
+    @patch("app.routes.goal_routes.g_c", new_callable=AsyncCollectionMock)
     def test_create_goal(self, mock_collection):
         """Test creating a goal."""
         # Setup the mocks
@@ -163,7 +150,7 @@ class TestGoalRoutes:
         # Verify mock calls
         assert mock_collection.insert_one.call_count == 1
     
-    @patch("app.routes.goal_routes.g_c")
+    @patch("app.routes.goal_routes.g_c", new_callable=AsyncCollectionMock)
     def test_update_goal(self, mock_collection):
         """Test updating a goal."""
         # Setup the mocks
@@ -188,7 +175,7 @@ class TestGoalRoutes:
         assert mock_collection.find_one.call_count == 2
         assert mock_collection.update_one.call_count == 1
     
-    @patch("app.routes.goal_routes.g_c")
+    @patch("app.routes.goal_routes.g_c", new_callable=AsyncCollectionMock)
     def test_update_goal_progress(self, mock_collection):
         """Test updating a goal's progress."""
         # Setup the mocks
@@ -215,7 +202,7 @@ class TestGoalRoutes:
         assert mock_collection.find_one.call_count == 2
         assert mock_collection.update_one.call_count == 1
     
-    @patch("app.routes.goal_routes.g_c")
+    @patch("app.routes.goal_routes.g_c", new_callable=AsyncCollectionMock)
     def test_delete_goal(self, mock_collection):
         """Test deleting a goal."""
         # Setup the mocks
@@ -232,7 +219,7 @@ class TestGoalRoutes:
         assert mock_collection.find_one.call_count == 1
         mock_collection.delete_one.assert_called_once_with({"id": MOCK_GOAL_1["id"]})
     
-    @patch("app.routes.goal_routes.g_c")
+    @patch("app.routes.goal_routes.g_c", new_callable=AsyncCollectionMock)
     def test_get_goals_with_filters(self, mock_collection):
         """Test getting goals with filters."""
         # Setup the mock
@@ -251,7 +238,7 @@ class TestGoalRoutes:
         # Verify the mock was called with correct filter parameters
         mock_collection.find.assert_called_once()
     
-    @patch("app.routes.goal_routes.g_c")
+    @patch("app.routes.goal_routes.g_c", new_callable=AsyncCollectionMock)
     def test_goal_not_found(self, mock_collection):
         """Test error when goal not found."""
         # Setup the mock
@@ -264,7 +251,7 @@ class TestGoalRoutes:
         assert response.status_code == 404
         assert "not found" in response.json()["detail"]
         
-    @patch("app.routes.goal_routes.g_c")
+    @patch("app.routes.goal_routes.g_c", new_callable=AsyncCollectionMock)
     def test_unauthorized_access(self, mock_collection):
         """Test error when unauthorized user tries to access a goal."""
         # Override auth dependency for this test
@@ -285,7 +272,7 @@ class TestGoalRoutes:
             # Restore original auth override
             app.dependency_overrides[get_current_user] = original_override
     
-    @patch("app.routes.goal_routes.g_c")
+    @patch("app.routes.goal_routes.g_c", new_callable=AsyncCollectionMock)
     def test_complete_goal_automatically(self, mock_collection):
         """Test goal is automatically marked as completed when target is reached."""
         # Setup the mocks
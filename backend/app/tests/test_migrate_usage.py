@@ -0,0 +1,82 @@
+"""
+Test suite for the usage time-series migration.
+"""
+import mongomock
+import pytest
+from datetime import datetime, timedelta
+from bson import ObjectId
+
+from app.db.indexes import BOOTSTRAP_COLLECTION
+from app.db.migrate_usage import migrate_usage, remove_duplicate_readings
+
+
+def make_reading(n: int, seconds: int = 0) -> dict:
+    """Build a stored usage reading with an ObjectId from a fixed clock."""
+    created = datetime(2025, 1, 1) + timedelta(seconds=seconds)
+    return {
+        "_id": ObjectId(ObjectId.from_datetime(created).binary[:4] + n.to_bytes(8, "big")),
+        "id": f"usage-{n}",
+        "device_id": "device-id-123",
+        "timestamp": created,
+        "energy_consumed": 1.0,
+    }
+
+
+@pytest.fixture
+def db():
+    """Fresh in-memory database with a few readings."""
+    database = mongomock.MongoClient().sync
+    database["usage"].insert_many([make_reading(n, seconds=n * 120) for n in range(5)])
+    return database
+
+
+class TestMigrateUsage:
+    """Tests for copying usage readings in resumable batches."""
+
+    def test_copies_all_readings(self, db):
+        """Test that every reading is copied in batches."""
+        result = migrate_usage(db, "usage", "usage_ts", batch_size=2)
+
+        assert result["copied"] == 5
+        assert db["usage_ts"].count_documents({}) == 5
+        checkpoint = db[BOOTSTRAP_COLLECTION].find_one({"_id": "migrate:usage->usage_ts"})
+        assert checkpoint["copied"] == 5
+
+    def test_resume_copies_only_new_readings(self, db):
+        """Test that a re-run copies readings written since the last run once."""
+        migrate_usage(db, "usage", "usage_ts", batch_size=2)
+        db["usage"].insert_one(make_reading(5, seconds=5 * 120))
+
+        result = migrate_usage(db, "usage", "usage_ts", batch_size=2)
+
+        assert result["copied"] == 1
+        assert result["total_copied"] == 6
+        assert db["usage_ts"].count_documents({}) == 6
+
+    def test_readings_without_timestamp_skipped(self, db):
+        """Test that readings a time-series collection would reject are skipped."""
+        broken = make_reading(9, seconds=9 * 120)
+        broken["timestamp"] = "not-a-date"
+        db["usage"].insert_one(broken)
+
+        result = migrate_usage(db, "usage", "usage_ts")
+
+        assert result["copied"] == 5
+        assert result["skipped"] == 1
+        assert db["usage_ts"].count_documents({"id": "usage-9"}) == 0
+
+
+class TestRemoveDuplicateReadings:
+    """Tests for cleaning up repeated readings before enabling the natural key."""
+
+    def test_keeps_first_copy(self, db):
+        """Test that only later copies of a device & timestamp are deleted."""
+        replay = make_reading(10, seconds=240)   # Same device & timestamp as reading 2
+        db["usage"].insert_one(replay)
+
+        removed = remove_duplicate_readings(db, "usage", batch_size=1)
+
+        assert removed == 1
+        assert db["usage"].count_documents({}) == 5
+        assert db["usage"].find_one({"id": "usage-2"}) is not None
+        assert db["usage"].find_one({"id": "usage-10"}) is None
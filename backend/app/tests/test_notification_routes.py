@@ -11,7 +11,9 @@ from datetime import datetime
 sys.path.append(".")
 from app.main import app
 from app.models.user import UserDB
-from app.models.notification import NotificationDB
+from app.models.notification import NotificationDB, NotificationResponse
+from app.db.repository import projection_for
+from app.tests.mocks import AsyncCollectionMock, MockCursor
 
 # Initialize test client
 client = TestClient(app)
@@ -72,27 +74,9 @@ MOCK_NOTIFICATION_2 = {
 # Override auth dependency
 from app.core.auth import get_current_user
 
-# Define a simple list-like cursor mock that works with iteration
-class MockCursor:
-    def __init__(self, items):
-        self.items = items
-    
-    def skip(self, n):
-        return self
-    
-    def limit(self, n):
-        return self
-    
-    def sort(self, field, direction):
-        return self
-    
-    def __iter__(self):
-        return iter(self.items)
-
-
 class TestNotificationRoutes:
     
-    @patch("app.routes.notification_routes.n_c")
+    @patch("app.routes.notification_routes.n_c", new_callable=AsyncCollectionMock)
     def test_get_all_notifications_admin(self, mock_collection):
         """Test getting all notifications as admin."""
         # Override auth dependency for admin
@@ -115,7 +99,7 @@ class TestNotificationRoutes:
         # Verify the mock was called
         mock_collection.find.assert_called_once()
     
-    @patch("app.routes.notification_routes.n_c")
+    @patch("app.routes.notification_routes.n_c", new_callable=AsyncCollectionMock)
     def test_get_all_notifications_user(self, mock_collection):
         """Test getting all notifications as regular user."""
         # Override auth dependency for regular user
@@ -139,7 +123,7 @@ class TestNotificationRoutes:
         query_arg = mock_collection.find.call_args[0][0]
         assert query_arg.get("user_id") == MOCK_USER["id"]
     
-    @patch("app.routes.notification_routes.n_c")
+    @patch("app.routes.notification_routes.n_c", new_callable=AsyncCollectionMock)
     def test_get_notification_by_id(self, mock_collection):
         """Test getting a single notification by ID."""
         # Override auth dependency for regular user
@@ -157,9 +141,9 @@ class TestNotificationRoutes:
         assert notification["id"] == MOCK_NOTIFICATION_1["id"]
         
         # Verify the mock was called with correct parameters
-        mock_collection.find_one.assert_called_once_with({"id": MOCK_NOTIFICATION_1["id"]})
+        mock_collection.find_one.assert_called_once_with({"id": MOCK_NOTIFICATION_1["id"]}, projection_for(NotificationResponse))
     
-    @patch("app.routes.notification_routes.n_c")
+    @patch("app.routes.notification_routes.n_c", new_callable=AsyncCollectionMock)
     def test_get_notification_unauthorized(self, mock_collection):
         """Test getting a notification that belongs to another user."""
         # Override auth dependency for regular user
@@ -177,7 +161,7 @@ class TestNotificationRoutes:
         assert response.status_code == 403
         assert "Not authorized" in response.json()["detail"]
     
-    @patch("app.routes.notification_routes.n_c")
+    @patch("app.routes.notification_routes.n_c", new_callable=AsyncCollectionMock)
     def test_create_notification(self, mock_collection):
         """Test creating a notification."""
         # Override auth dependency for regular user
@@ -207,7 +191,7 @@ class TestNotificationRoutes:
             # Verify mock calls
             assert mock_collection.insert_one.call_count == 1
     
-    @patch("app.routes.notification_routes.n_c")
+    @patch("app.routes.notification_routes.n_c", new_callable=AsyncCollectionMock)
     def test_update_notification(self, mock_collection):
         """Test updating a notification."""
         # Override auth dependency for regular user
@@ -237,7 +221,7 @@ class TestNotificationRoutes:
         assert update_arg["read"] is True
         assert "read_timestamp" in update_arg  # Should automatically add read_timestamp
     
-    @patch("app.routes.notification_routes.n_c")
+    @patch("app.routes.notification_routes.n_c", new_callable=AsyncCollectionMock)
     def test_bulk_update_notifications(self, mock_collection):
         """Test bulk updating notifications."""
         # Override auth dependency for regular user
@@ -272,7 +256,7 @@ class TestNotificationRoutes:
             assert query_arg["id"]["$in"] == bulk_update_data["notification_ids"]
             assert query_arg["user_id"] == MOCK_USER["id"]  # Regular user can only update their own
     
-    @patch("app.routes.notification_routes.n_c")
+    @patch("app.routes.notification_routes.n_c", new_callable=AsyncCollectionMock)
     def test_delete_notification(self, mock_collection):
         """Test deleting a notification."""
         # Override auth dependency for regular user
@@ -291,7 +275,7 @@ class TestNotificationRoutes:
         # Verify the delete operation was performed
         mock_collection.delete_one.assert_called_once_with({"id": MOCK_NOTIFICATION_1["id"]})
     
-    @patch("app.routes.notification_routes.n_c")
+    @patch("app.routes.notification_routes.n_c", new_callable=AsyncCollectionMock)
     def test_delete_notifications(self, mock_collection):
         """Test deleting multiple notifications."""
         # Override auth dependency for regular user
@@ -314,7 +298,7 @@ class TestNotificationRoutes:
         assert query_arg["user_id"] == MOCK_USER["id"]
         assert query_arg["read"] is True
 
-    @patch("app.routes.notification_routes.n_c")
+    @patch("app.routes.notification_routes.n_c", new_callable=AsyncCollectionMock)
     def test_notification_not_found(self, mock_collection):
         """Test error handling when notification is not found."""
         # Override auth dependency for regular user
@@ -0,0 +1,183 @@
+"""
+Test suite for keyset pagination.
+"""
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+from app.main import app
+from app.core.auth import get_current_user
+from app.core.pagination import (
+    CURSOR_HEADER, CursorError, decode_cursor, encode_cursor, keyset_filter, keyset_sort
+)
+from app.models.user import UserDB
+from app.tests.mocks import AsyncCollectionMock, MockCursor
+
+MOCK_ADMIN = {
+    "id": "admin-id-123",
+    "username": "admin",
+    "email": "admin@example.com",
+    "hashed_password": "hashed_password",
+    "role": "admin"
+}
+
+START = datetime(2025, 1, 1)
+
+
+def page_through(collection, sort, nullable=(), limit=3):
+    """Read every document page by page, as a client following the cursors would."""
+    seen, token = [], None
+    while True:
+        query = keyset_filter(sort, decode_cursor(token, sort), nullable) if token else {}
+        page = list(collection.find(query, {"_id": 0}).sort(sort).limit(limit))
+        seen.extend(page)
+        if len(page) < limit:
+            return seen
+        token = encode_cursor(page[-1], sort)
+
+
+@pytest.fixture
+def readings():
+    """Readings with tied timestamps & energies and some missing energies."""
+    collection = mongomock.MongoClient().db.usage
+    collection.insert_many([
+        {
+            "id": f"usage-{n:02}",
+            "timestamp": START + timedelta(minutes=n // 3),
+            "energy_consumed": None if n % 4 == 0 else float(n % 5),
+        }
+        for n in range(14)
+    ])
+    return collection
+
+
+class TestKeyset:
+    """Tests for continuation tokens & range predicates."""
+
+    @pytest.mark.parametrize("keys, nullable", [
+        ((("timestamp", -1),), ()),
+        ((("timestamp", 1),), ()),
+        ((("energy_consumed", -1),), ("energy_consumed",)),
+        ((("energy_consumed", 1),), ("energy_consumed",)),
+        ((), ()),
+    ])
+    def test_pages_cover_every_document_once(self, readings, keys, nullable):
+        """Test that following cursors returns the same documents as one sorted read."""
+        sort = keyset_sort(*keys)
+
+        paged = page_through(readings, sort, nullable)
+
+        expected = list(readings.find({}, {"_id": 0}).sort(sort))
+        assert [document["id"] for document in paged] == [document["id"] for document in expected]
+
+    def test_filter_bounds_the_leading_key(self):
+        """Test that the next page is a range on the leading key, tied on id."""
+        sort = keyset_sort(("timestamp", -1))
+
+        assert keyset_filter(sort, [START, "usage-07"]) == {
+            "timestamp": {"$lte": START},
+            "$or": [{"timestamp": {"$lt": START}}, {"timestamp": START, "id": {"$lt": "usage-07"}}],
+        }
+
+    def test_nullable_descending_key_is_not_bounded(self):
+        """Test that readings without energy still follow the last one with energy."""
+        query = keyset_filter(keyset_sort(("energy_consumed", -1)), [1.0, "usage-01"], ("energy_consumed",))
+
+        assert "energy_consumed" not in query
+        assert {"energy_consumed": None} in query["$or"]
+
+    def test_cursor_is_tied_to_its_sort(self):
+        """Test that a token from another listing or order is rejected."""
+        token = encode_cursor({"id": "usage-01", "timestamp": START}, keyset_sort(("timestamp", -1)))
+
+        assert decode_cursor(token, keyset_sort(("timestamp", -1))) == [START, "usage-01"]
+        with pytest.raises(CursorError):
+            decode_cursor(token, keyset_sort(("timestamp", 1)))
+        with pytest.raises(CursorError):
+            decode_cursor("not-a-cursor", keyset_sort())
+
+
+@patch("app.routes.device_routes.d_c", new_callable=AsyncCollectionMock)
+class TestCursorRoutes:
+    """Tests for the opt-in `cursor` parameter of list routes."""
+
+    def setup_method(self):
+        app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_ADMIN)
+
+    def teardown_method(self):
+        app.dependency_overrides.clear()
+
+    def devices(self, count):
+        return [
+            {
+                "id": f"device-{n}", "name": f"Device {n}", "type": "light", "user_id": "user-id-456",
+                "status": "online", "created": START,
+            }
+            for n in range(count)
+        ]
+
+    def test_first_page_returns_next_cursor(self, mock_devices):
+        """Test that an empty cursor reads the first page by id and a full page returns a cursor."""
+        mock_devices.find.return_value = MockCursor(self.devices(2))
+
+        response = TestClient(app).get("/api/v1/devices/?cursor=&limit=2")
+
+        assert response.status_code == 200
+        query = mock_devices.find.call_args[0][0]
+        assert query == {}
+        assert decode_cursor(response.headers[CURSOR_HEADER], keyset_sort()) == ["device-1"]
+
+    def test_next_page_continues_after_cursor(self, mock_devices):
+        """Test that a cursor becomes a range on id and a short page ends the listing."""
+        mock_devices.find.return_value = MockCursor(self.devices(1))
+        token = encode_cursor({"id": "device-1"}, keyset_sort())
+
+        response = TestClient(app).get(f"/api/v1/devices/?cursor={token}&limit=2&type=light")
+
+        assert response.status_code == 200
+        assert CURSOR_HEADER not in response.headers
+        assert mock_devices.find.call_args[0][0] == {"$and": [
+            {"type": "light"}, {"id": {"$gt": "device-1"}}
+        ]}
+
+    def test_invalid_cursor(self, mock_devices):
+        """Test that a malformed cursor is a client error."""
+        response = TestClient(app).get("/api/v1/devices/?cursor=bogus")
+
+        assert response.status_code == 400
+
+    def test_skip_with_cursor(self, mock_devices):
+        """Test that skip and cursor cannot be combined."""
+        response = TestClient(app).get("/api/v1/devices/?cursor=&skip=10")
+
+        assert response.status_code == 400
+
+    def test_without_cursor_uses_skip(self, mock_devices):
+        """Test that listings without a cursor are unchanged."""
+        mock_devices.find.return_value = MockCursor(self.devices(2))
+
+        response = TestClient(app).get("/api/v1/devices/?limit=2")
+
+        assert response.status_code == 200
+        assert CURSOR_HEADER not in response.headers
+
+
+@patch("app.routes.usage_routes.us_c", new_callable=AsyncCollectionMock)
+def test_usage_cursor_follows_sort(mock_usage):
+    """Test that usage pages are keyed on the chosen sort field, then id."""
+    app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_ADMIN)
+    mock_usage.find.return_value = MockCursor([])
+    sort = keyset_sort(("energy_consumed", 1))
+    token = encode_cursor({"id": "usage-1", "energy_consumed": 0.5}, sort)
+    try:
+        response = TestClient(app).get(f"/api/v1/usage/?sort=energy_asc&cursor={token}")
+        mismatched = TestClient(app).get(f"/api/v1/usage/?sort=timestamp_desc&cursor={token}")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    assert mock_usage.find.call_args[0][0]["energy_consumed"] == {"$gte": 0.5}
+    assert mismatched.status_code == 400
@@ -0,0 +1,43 @@
+"""
+Test suite for password hashing helpers.
+"""
+import asyncio
+import pytest
+from unittest.mock import patch
+
+from app.core import password
+from app.core.password import (
+    PasswordPoolSaturated, hash_password_async, verify_password_async
+)
+
+
+class TestPasswordPool:
+    """Tests for off-loop password hashing."""
+
+    def test_async_round_trip(self):
+        """Test that pooled hashing and verification agree."""
+        async def round_trip():
+            hashed = await hash_password_async("Password123!")
+            return (
+                await verify_password_async("Password123!", hashed),
+                await verify_password_async("WrongPassword1!", hashed),
+            )
+
+        assert asyncio.run(round_trip()) == (True, False)
+
+    def test_saturated_pool_rejects(self):
+        """Test that work is rejected once the wait queue is full."""
+        limit = password.PASSWORD_POOL_SIZE + password.PASSWORD_POOL_QUEUE
+        with patch.object(password, "PASSWORD_POOL_SIZE", max(1, password.PASSWORD_POOL_SIZE)), \
+             patch.object(password, "_in_flight", limit + 1):
+            with pytest.raises(PasswordPoolSaturated):
+                asyncio.run(verify_password_async("Password123!", "hash"))
+
+    def test_inline_when_pool_disabled(self):
+        """Test that a pool size of 0 hashes on the calling thread."""
+        with patch.object(password, "PASSWORD_POOL_SIZE", 0), \
+             patch.object(password, "_get_pool") as mock_pool:
+            hashed = asyncio.run(hash_password_async("Password123!"))
+
+        assert password.verify_password("Password123!", hashed)
+        mock_pool.assert_not_called()
@@ -2,7 +2,7 @@
 Tests for profile management routes.
 """
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import AsyncMock, patch, MagicMock
 from datetime import datetime, timezone
 from fastapi import FastAPI, Depends
 from fastapi.testclient import TestClient
@@ -11,6 +11,8 @@ from app.models.profile import ProfileDB, ProfileResponse
 from app.models.user import UserDB
 from app.core.auth import get_current_user
 from app.routes.profile_routes import router as profile_router
+from app.db.repository import projection_for
+from app.tests.mocks import AsyncCollectionMock
 
 # Mock data
 mock_admin_user = UserDB(
@@ -76,12 +78,12 @@ def test_get_all_profiles_admin():
     # Setup - get client with admin user
     client = get_test_client(mock_admin_user)
     
-    with patch("app.routes.profile_routes.p_c") as mock_p_c:
+    with patch("app.routes.profile_routes.p_c", new_callable=AsyncCollectionMock) as mock_p_c:
         # Configure mock
         mock_cursor = MagicMock()
         mock_cursor.skip.return_value = mock_cursor
         mock_cursor.limit.return_value = mock_cursor
-        mock_cursor.__iter__.return_value = [mock_profile.model_dump(), mock_admin_profile.model_dump()]
+        mock_cursor.to_list = AsyncMock(return_value=[mock_profile.model_dump(), mock_admin_profile.model_dump()])
         mock_p_c.find.return_value = mock_cursor
         
         # Execute
@@ -104,12 +106,12 @@ def test_get_all_profiles_regular_user():
     # Setup - get client with regular user
     client = get_test_client(mock_regular_user)
     
-    with patch("app.routes.profile_routes.p_c") as mock_p_c:
+    with patch("app.routes.profile_routes.p_c", new_callable=AsyncCollectionMock) as mock_p_c:
         # Configure mock
         mock_cursor = MagicMock()
         mock_cursor.skip.return_value = mock_cursor
         mock_cursor.limit.return_value = mock_cursor
-        mock_cursor.__iter__.return_value = [mock_profile.model_dump()]
+        mock_cursor.to_list = AsyncMock(return_value=[mock_profile.model_dump()])
         mock_p_c.find.return_value = mock_cursor
         
         # Execute
@@ -131,12 +133,12 @@ def test_get_all_profiles_with_filters():
     # Setup
     client = get_test_client(mock_admin_user)
     
-    with patch("app.routes.profile_routes.p_c") as mock_p_c:
+    with patch("app.routes.profile_routes.p_c", new_callable=AsyncCollectionMock) as mock_p_c:
         # Configure mock
         mock_cursor = MagicMock()
         mock_cursor.skip.return_value = mock_cursor
         mock_cursor.limit.return_value = mock_cursor
-        mock_cursor.__iter__.return_value = [mock_admin_profile.model_dump()]
+        mock_cursor.to_list = AsyncMock(return_value=[mock_admin_profile.model_dump()])
         mock_p_c.find.return_value = mock_cursor
         
         # Execute - with filters
@@ -160,7 +162,7 @@ def test_get_profile_by_id_admin():
     # Setup
     client = get_test_client(mock_admin_user)
     
-    with patch("app.routes.profile_routes.p_c") as mock_p_c:
+    with patch("app.routes.profile_routes.p_c", new_callable=AsyncCollectionMock) as mock_p_c:
         # Configure mock
         mock_p_c.find_one.return_value = mock_profile.model_dump()
         
@@ -174,14 +176,14 @@ def test_get_profile_by_id_admin():
         assert profile["user_id"] == mock_profile.user_id
         
         # Verify query
-        mock_p_c.find_one.assert_called_once_with({"id": mock_profile.id})
+        mock_p_c.find_one.assert_called_once_with({"id": mock_profile.id}, projection_for(ProfileResponse))
 
 
 def test_get_profile_by_id_regular_user_own_profile():
     # Setup
     client = get_test_client(mock_regular_user)
     
-    with patch("app.routes.profile_routes.p_c") as mock_p_c:
+    with patch("app.routes.profile_routes.p_c", new_callable=AsyncCollectionMock) as mock_p_c:
         # Configure mock
         mock_p_c.find_one.return_value = mock_profile.model_dump()
         
@@ -199,7 +201,7 @@ def test_get_profile_by_id_regular_user_other_profile():
     # Setup
     client = get_test_client(mock_regular_user)
     
-    with patch("app.routes.profile_routes.p_c") as mock_p_c:
+    with patch("app.routes.profile_routes.p_c", new_callable=AsyncCollectionMock) as mock_p_c:
         # Configure mock - trying to access admin profile
         mock_p_c.find_one.return_value = mock_admin_profile.model_dump()
         
@@ -215,7 +217,7 @@ def test_get_profile_not_found():
     # Setup
     client = get_test_client(mock_admin_user)
     
-    with patch("app.routes.profile_routes.p_c") as mock_p_c:
+    with patch("app.routes.profile_routes.p_c", new_callable=AsyncCollectionMock) as mock_p_c:
         # Configure mock - no profile found
         mock_p_c.find_one.return_value = None
         
@@ -231,7 +233,7 @@ def test_create_profile_admin():
     # Setup
     client = get_test_client(mock_admin_user)
     
-    with patch("app.routes.profile_routes.p_c") as mock_p_c:
+    with patch("app.routes.profile_routes.p_c", new_callable=AsyncCollectionMock) as mock_p_c:
         # Configure mock - no existing profile
         mock_p_c.find_one.return_value = None
         mock_p_c.insert_one.return_value = MagicMock()
@@ -262,7 +264,7 @@ def test_create_profile_regular_user_own_profile():
     # Setup
     client = get_test_client(mock_regular_user)
     
-    with patch("app.routes.profile_routes.p_c") as mock_p_c:
+    with patch("app.routes.profile_routes.p_c", new_callable=AsyncCollectionMock) as mock_p_c:
         # Configure mock - no existing profile
         mock_p_c.find_one.return_value = None
         mock_p_c.insert_one.return_value = MagicMock()
@@ -292,7 +294,7 @@ def test_create_profile_regular_user_other_profile():
     # Setup
     client = get_test_client(mock_regular_user)
     
-    with patch("app.routes.profile_routes.p_c") as mock_p_c:
+    with patch("app.routes.profile_routes.p_c", new_callable=AsyncCollectionMock) as mock_p_c:
         # Configure mock
         mock_p_c.find_one.return_value = None
         
@@ -319,7 +321,7 @@ def test_create_profile_duplicate():
     # Setup
     client = get_test_client(mock_admin_user)
     
-    with patch("app.routes.profile_routes.p_c") as mock_p_c:
+    with patch("app.routes.profile_routes.p_c", new_callable=AsyncCollectionMock) as mock_p_c:
         # Configure mock - existing profile found
         mock_p_c.find_one.return_value = mock_profile.model_dump()
         
@@ -346,7 +348,7 @@ def test_update_profile_admin():
     # Setup
     client = get_test_client(mock_admin_user)
     
-    with patch("app.routes.profile_routes.p_c") as mock_p_c:
+    with patch("app.routes.profile_routes.p_c", new_callable=AsyncCollectionMock) as mock_p_c:
         # Configure mock
         updated_profile = mock_profile.model_dump()
         updated_profile["first_name"] = "Updated"
@@ -381,7 +383,7 @@ def test_update_profile_regular_user_own_profile():
     # Setup
     client = get_test_client(mock_regular_user)
     
-    with patch("app.routes.profile_routes.p_c") as mock_p_c:
+    with patch("app.routes.profile_routes.p_c", new_callable=AsyncCollectionMock) as mock_p_c:
         # Configure mock
         updated_profile = mock_profile.model_dump()
         updated_profile["dark_mode"] = True
@@ -408,7 +410,7 @@ def test_update_profile_regular_user_other_profile():
     # Setup
     client = get_test_client(mock_regular_user)
     
-    with patch("app.routes.profile_routes.p_c") as mock_p_c:
+    with patch("app.routes.profile_routes.p_c", new_callable=AsyncCollectionMock) as mock_p_c:
         # Configure mock - trying to update admin's profile
         mock_p_c.find_one.return_value = mock_admin_profile.model_dump()
         
@@ -428,7 +430,7 @@ def test_update_profile_not_found():
     # Setup
     client = get_test_client(mock_admin_user)
     
-    with patch("app.routes.profile_routes.p_c") as mock_p_c:
+    with patch("app.routes.profile_routes.p_c", new_callable=AsyncCollectionMock) as mock_p_c:
         # Configure mock - profile not found
         mock_p_c.find_one.return_value = None
         
@@ -448,7 +450,7 @@ def test_delete_profile_admin():
     # Setup
     client = get_test_client(mock_admin_user)
     
-    with patch("app.routes.profile_routes.p_c") as mock_p_c:
+    with patch("app.routes.profile_routes.p_c", new_callable=AsyncCollectionMock) as mock_p_c:
         # Configure mock
         mock_p_c.find_one.return_value = mock_profile.model_dump()
         mock_p_c.delete_one.return_value = MagicMock(deleted_count=1)
@@ -468,7 +470,7 @@ def test_delete_profile_regular_user_own_profile():
     # Setup
     client = get_test_client(mock_regular_user)
     
-    with patch("app.routes.profile_routes.p_c") as mock_p_c:
+    with patch("app.routes.profile_routes.p_c", new_callable=AsyncCollectionMock) as mock_p_c:
         # Configure mock - own profile
         mock_p_c.find_one.return_value = mock_profile.model_dump()
         mock_p_c.delete_one.return_value = MagicMock(deleted_count=1)
@@ -488,7 +490,7 @@ def test_delete_profile_regular_user_other_profile():
     # Setup
     client = get_test_client(mock_regular_user)
     
-    with patch("app.routes.profile_routes.p_c") as mock_p_c:
+    with patch("app.routes.profile_routes.p_c", new_callable=AsyncCollectionMock) as mock_p_c:
         # Configure mock - admin's profile
         mock_p_c.find_one.return_value = mock_admin_profile.model_dump()
         
@@ -507,7 +509,7 @@ def test_delete_profile_not_found():
     # Setup
     client = get_test_client(mock_admin_user)
     
-    with patch("app.routes.profile_routes.p_c") as mock_p_c:
+    with patch("app.routes.profile_routes.p_c", new_callable=AsyncCollectionMock) as mock_p_c:
         # Configure mock - profile not found
         mock_p_c.find_one.return_value = None
         
@@ -526,12 +528,12 @@ def test_pagination():
     # Setup
     client = get_test_client(mock_admin_user)
     
-    with patch("app.routes.profile_routes.p_c") as mock_p_c:
+    with patch("app.routes.profile_routes.p_c", new_callable=AsyncCollectionMock) as mock_p_c:
         # Configure mock
         mock_cursor = MagicMock()
         mock_cursor.skip.return_value = mock_cursor
         mock_cursor.limit.return_value = mock_cursor
-        mock_cursor.__iter__.return_value = [mock_profile.model_dump()]
+        mock_cursor.to_list = AsyncMock(return_value=[mock_profile.model_dump()])
         mock_p_c.find.return_value = mock_cursor
         
         # Execute with pagination
@@ -0,0 +1,44 @@
+"""
+Test suite for response-model projections.
+"""
+from app.db.repository import projection_for
+from app.models.automation import AutomationResponse, AutomationDetailResponse
+from app.models.room import RoomResponse
+from app.models.user import UserResponse
+
+
+class TestProjectionFor:
+    """Tests for deriving projections from response models."""
+
+    def test_only_response_fields(self):
+        """Test that fields the response drops are not fetched."""
+        projection = projection_for(AutomationResponse)
+
+        assert projection["_id"] == 0
+        assert projection["id"] == 1
+        assert projection["trigger_type"] == 1
+        assert "trigger_data" not in projection
+        assert "action_data" not in projection
+        assert "conditions" not in projection
+
+    def test_subclass_fields_included(self):
+        """Test that detail models fetch their extra fields."""
+        projection = projection_for(AutomationDetailResponse)
+
+        assert projection["trigger_data"] == 1
+        assert projection["conditions"] == 1
+
+    def test_password_hash_never_fetched(self):
+        """Test that user listings do not read password hashes."""
+        assert "hashed_password" not in projection_for(UserResponse)
+
+    def test_extra_fields(self):
+        """Test that routes can request fields needed for authorization."""
+        assert "user_id" not in projection_for(RoomResponse)
+        assert projection_for(RoomResponse, "user_id")["user_id"] == 1
+
+    def test_returns_fresh_dict(self):
+        """Test that callers cannot corrupt the cached projection."""
+        projection_for(UserResponse)["hashed_password"] = 1
+
+        assert "hashed_password" not in projection_for(UserResponse)
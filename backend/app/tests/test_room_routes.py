@@ -12,6 +12,9 @@ from datetime import datetime
 sys.path.append(".")
 from app.main import app
 from app.models.user import UserDB
+from app.models.room import RoomResponse
+from app.db.repository import projection_for
+from app.tests.mocks import AsyncCollectionMock, MockCursor
 
 # Initialize test client
 client = TestClient(app)
@@ -73,21 +76,6 @@ MOCK_ADMIN_ROOM = {
 # Override auth dependency
 from app.core.auth import get_current_user
 
-# Define a simple list-like cursor mock that works with iteration
-class MockCursor:
-    def __init__(self, items):
-        self.items = items
-    
-    def skip(self, n):
-        return self
-    
-    def limit(self, n):
-        return self
-    
-    def __iter__(self):
-        return iter(self.items)
-
-
 class TestRoomRoutes:
     
     def setup_method(self):
@@ -100,7 +88,7 @@ class TestRoomRoutes:
         # Clear any dependency overrides
         app.dependency_overrides.clear()
     
-    @patch("app.routes.room_routes.r_c")
+    @patch("app.routes.room_routes.r_c", new_callable=AsyncCollectionMock)
     def test_get_all_rooms_as_admin(self, mock_collection):
         """Test getting all rooms as admin."""
         # Setup the mock to return our test rooms
@@ -120,7 +108,7 @@ class TestRoomRoutes:
         # Verify the mock was called
         mock_collection.find.assert_called_once()
     
-    @patch("app.routes.room_routes.r_c")
+    @patch("app.routes.room_routes.r_c", new_callable=AsyncCollectionMock)
     def test_get_all_rooms_as_user(self, mock_collection):
         """Test getting all rooms as regular user."""
         # Set auth override to regular user
@@ -144,7 +132,7 @@ class TestRoomRoutes:
         query = mock_collection.find.call_args[0][0]  # Get the query argument
         assert query["user_id"] == MOCK_USER["id"]  # Check if user_id is in the query
     
-    @patch("app.routes.room_routes.r_c")
+    @patch("app.routes.room_routes.r_c", new_callable=AsyncCollectionMock)
     def test_get_room_by_id(self, mock_collection):
         """Test getting a room by ID."""
         # Setup the mock
@@ -161,9 +149,9 @@ class TestRoomRoutes:
         assert room["type"] == MOCK_ROOM["type"]
         
         # Verify the mock was called with correct parameters
-        mock_collection.find_one.assert_called_once_with({"id": MOCK_ROOM["id"]})
+        mock_collection.find_one.assert_called_once_with({"id": MOCK_ROOM["id"]}, projection_for(RoomResponse, "user_id"))
     
-    @patch("app.routes.room_routes.r_c")
+    @patch("app.routes.room_routes.r_c", new_callable=AsyncCollectionMock)
     def test_get_room_not_found(self, mock_collection):
         """Test getting a room that doesn't exist."""
         # Setup the mock
@@ -176,7 +164,7 @@ class TestRoomRoutes:
         assert response.status_code == 404
         assert "not found" in response.json()["detail"]
     
-    @patch("app.routes.room_routes.r_c")
+    @patch("app.routes.room_routes.r_c", new_callable=AsyncCollectionMock)
     def test_get_room_unauthorized(self, mock_collection):
         """Test regular user trying to access another user's room."""
         # Set auth override to regular user
@@ -192,7 +180,7 @@ class TestRoomRoutes:
         assert response.status_code == 403
         assert "Not authorized" in response.json()["detail"]
     
-    @patch("app.routes.room_routes.r_c")
+    @patch("app.routes.room_routes.r_c", new_callable=AsyncCollectionMock)
     def test_create_room(self, mock_collection):
         """Test creating a room."""
         # Setup mock for insert_one
@@ -222,7 +210,7 @@ class TestRoomRoutes:
         insert_call_args = mock_collection.insert_one.call_args[0][0]
         assert insert_call_args["user_id"] == MOCK_ADMIN["id"]
     
-    @patch("app.routes.room_routes.r_c")
+    @patch("app.routes.room_routes.r_c", new_callable=AsyncCollectionMock)
     def test_create_room_duplicate(self, mock_collection):
         """Test creating a room with duplicate ID."""
         # Setup mock for insert_one to raise DuplicateKeyError
@@ -241,7 +229,7 @@ class TestRoomRoutes:
         assert response.status_code == 400
         assert "already exists" in response.json()["detail"]
     
-    @patch("app.routes.room_routes.r_c")
+    @patch("app.routes.room_routes.r_c", new_callable=AsyncCollectionMock)
     def test_update_room(self, mock_collection):
         """Test updating a room."""
         # Setup the mocks
@@ -275,7 +263,7 @@ class TestRoomRoutes:
         assert "description" in update_call_args[0][1]["$set"]
         assert "updated" in update_call_args[0][1]["$set"]
     
-    @patch("app.routes.room_routes.r_c")
+    @patch("app.routes.room_routes.r_c", new_callable=AsyncCollectionMock)
     def test_update_room_not_found(self, mock_collection):
         """Test updating a non-existent room."""
         # Setup the mock
@@ -289,7 +277,7 @@ class TestRoomRoutes:
         assert response.status_code == 404
         assert "not found" in response.json()["detail"]
     
-    @patch("app.routes.room_routes.r_c")
+    @patch("app.routes.room_routes.r_c", new_callable=AsyncCollectionMock)
     def test_update_room_unauthorized(self, mock_collection):
         """Test regular user trying to update another user's room."""
         # Set auth override to regular user
@@ -306,7 +294,7 @@ class TestRoomRoutes:
         assert response.status_code == 403
         assert "Not authorized" in response.json()["detail"]
     
-    @patch("app.routes.room_routes.r_c")
+    @patch("app.routes.room_routes.r_c", new_callable=AsyncCollectionMock)
     def test_delete_room(self, mock_collection):
         """Test deleting a room."""
         # Setup the mocks
@@ -324,7 +312,7 @@ class TestRoomRoutes:
         mock_collection.find_one.assert_called_once_with({"id": MOCK_ROOM["id"]})
         mock_collection.delete_one.assert_called_once_with({"id": MOCK_ROOM["id"]})
     
-    @patch("app.routes.room_routes.r_c")
+    @patch("app.routes.room_routes.r_c", new_callable=AsyncCollectionMock)
     def test_delete_room_not_found(self, mock_collection):
         """Test deleting a non-existent room."""
         # Setup the mock
@@ -337,7 +325,7 @@ class TestRoomRoutes:
         assert response.status_code == 404
         assert "not found" in response.json()["detail"]
     
-    @patch("app.routes.room_routes.r_c")
+    @patch("app.routes.room_routes.r_c", new_callable=AsyncCollectionMock)
     def test_delete_room_unauthorized(self, mock_collection):
         """Test regular user trying to delete another user's room."""
         # Set auth override to regular user
@@ -353,7 +341,7 @@ class TestRoomRoutes:
         assert response.status_code == 403
         assert "Not authorized" in response.json()["detail"]
     
-    @patch("app.routes.room_routes.r_c")
+    @patch("app.routes.room_routes.r_c", new_callable=AsyncCollectionMock)
     def test_delete_room_failed(self, mock_collection):
         """Test deletion failure in the database."""
         # Setup the mocks
@@ -367,7 +355,7 @@ class TestRoomRoutes:
         assert response.status_code == 500
         assert "Failed to delete" in response.json()["detail"]
     
-    @patch("app.routes.room_routes.r_c")
+    @patch("app.routes.room_routes.r_c", new_callable=AsyncCollectionMock)
     def test_get_rooms_with_filters(self, mock_collection):
         """Test getting rooms with various filters."""
         # Setup the mock
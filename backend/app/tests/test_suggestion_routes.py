@@ -11,8 +11,10 @@ from datetime import datetime
 sys.path.append(".")
 from app.main import app
 from app.models.user import UserDB
-from app.models.suggestion import SuggestionStatus, SuggestionType
+from app.models.suggestion import SuggestionStatus, SuggestionType, SuggestionResponse
 from app.core.auth import get_current_user
+from app.db.repository import projection_for
+from app.tests.mocks import AsyncCollectionMock, MockCursor
 
 # Use consistent UUIDs for tests
 ADMIN_UUID = "a385a273-d71e-4d95-9cea-b6ab1b62124f"
@@ -61,24 +63,6 @@ MOCK_SUGGESTION = {
     "user_feedback": None
 }
 
-# Define a simple list-like cursor mock that works with iteration
-class MockCursor:
-    def __init__(self, items):
-        self.items = items
-    
-    def skip(self, n):
-        return self
-    
-    def limit(self, n):
-        return self
-    
-    def sort(self, field, direction):
-        return self
-    
-    def __iter__(self):
-        return iter(self.items)
-
-
 # Fixtures for authentication and client
 @pytest.fixture
 def admin_client():
@@ -99,7 +83,7 @@ def user_client():
 
 
 # Tests
-@patch("app.routes.suggestion_routes.s_c")
+@patch("app.routes.suggestion_routes.s_c", new_callable=AsyncCollectionMock)
 def test_get_all_suggestions(mock_collection, admin_client):
     """Test getting all suggestions."""
     # Setup the mock to return our test suggestion
@@ -119,7 +103,7 @@ def test_get_all_suggestions(mock_collection, admin_client):
     mock_collection.find.assert_called_once()
 
 
-@patch("app.routes.suggestion_routes.s_c")
+@patch("app.routes.suggestion_routes.s_c", new_callable=AsyncCollectionMock)
 def test_get_suggestion_by_id(mock_collection, admin_client):
     """Test getting a suggestion by ID."""
     # Setup the mock
@@ -134,10 +118,10 @@ def test_get_suggestion_by_id(mock_collection, admin_client):
     assert suggestion["id"] == MOCK_SUGGESTION["id"]
     
     # Verify the mock was called with correct parameters
-    mock_collection.find_one.assert_called_once_with({"id": MOCK_SUGGESTION["id"]})
+    mock_collection.find_one.assert_called_once_with({"id": MOCK_SUGGESTION["id"]}, projection_for(SuggestionResponse))
 
 
-@patch("app.routes.suggestion_routes.s_c")
+@patch("app.routes.suggestion_routes.s_c", new_callable=AsyncCollectionMock)
 def test_create_suggestion(mock_collection, admin_client):
     """Test creating a suggestion."""
     # Call the endpoint
@@ -160,7 +144,7 @@ def test_create_suggestion(mock_collection, admin_client):
     assert mock_collection.insert_one.call_count == 1
 
 
-@patch("app.routes.suggestion_routes.s_c")
+@patch("app.routes.suggestion_routes.s_c", new_callable=AsyncCollectionMock)
 def test_update_suggestion(mock_collection, admin_client):
     """Test updating a suggestion."""
     # Setup the mocks
@@ -182,7 +166,7 @@ def test_update_suggestion(mock_collection, admin_client):
     mock_collection.update_one.assert_called()
 
 
-@patch("app.routes.suggestion_routes.s_c")
+@patch("app.routes.suggestion_routes.s_c", new_callable=AsyncCollectionMock)
 def test_delete_suggestion(mock_collection, admin_client):
     """Test deleting a suggestion."""
     # Setup the mocks
@@ -200,7 +184,7 @@ def test_delete_suggestion(mock_collection, admin_client):
     mock_collection.delete_one.assert_called_once_with({"id": MOCK_SUGGESTION['id']})
 
 
-@patch("app.routes.suggestion_routes.s_c")
+@patch("app.routes.suggestion_routes.s_c", new_callable=AsyncCollectionMock)
 def test_get_suggestion_not_found(mock_collection, admin_client):
     """Test getting a non-existent suggestion."""
     # Setup the mock
@@ -213,7 +197,7 @@ def test_get_suggestion_not_found(mock_collection, admin_client):
     assert response.status_code == 404
 
 
-@patch("app.routes.suggestion_routes.s_c")
+@patch("app.routes.suggestion_routes.s_c", new_callable=AsyncCollectionMock)
 def test_update_suggestion_not_found(mock_collection, admin_client):
     """Test updating a non-existent suggestion."""
     # Setup the mock
@@ -227,7 +211,7 @@ def test_update_suggestion_not_found(mock_collection, admin_client):
     assert response.status_code == 404
 
 
-@patch("app.routes.suggestion_routes.s_c")
+@patch("app.routes.suggestion_routes.s_c", new_callable=AsyncCollectionMock)
 def test_delete_suggestion_not_found(mock_collection, admin_client):
     """Test deleting a non-existent suggestion."""
     # Setup the mock
@@ -240,7 +224,7 @@ def test_delete_suggestion_not_found(mock_collection, admin_client):
     assert response.status_code == 404
 
 
-@patch("app.routes.suggestion_routes.s_c")
+@patch("app.routes.suggestion_routes.s_c", new_callable=AsyncCollectionMock)
 def test_authorization_regular_user(mock_collection, user_client):
     """Test authorization for regular users."""
     # Setup the mock for a suggestion owned by a different user
@@ -271,7 +255,7 @@ def test_authorization_regular_user(mock_collection, user_client):
     assert response.status_code == 200
 
 
-@patch("app.routes.suggestion_routes.s_c")
+@patch("app.routes.suggestion_routes.s_c", new_callable=AsyncCollectionMock)
 def test_get_suggestions_with_filters(mock_collection, admin_client):
     """Test getting suggestions with filters."""
     # Setup the mock
@@ -74,6 +74,16 @@ class TestCreateUsage:
         with pytest.raises(ValidationError):
             CreateUsage(**data)
 
+    def test_infinite_energy_consumed(self):
+        """Test that non-finite energy_consumed fails validation."""
+        data = {
+            "device_id": str(uuid.uuid4()),
+            "metrics": {"temperature": 22.5},
+            "energy_consumed": float("inf")
+        }
+        with pytest.raises(ValidationError):
+            CreateUsage(**data)
+
     def test_negative_duration(self):
         """Test that negative duration fails validation."""
         data = {
@@ -0,0 +1,201 @@
+"""
+Test suite for Arrow & Parquet usage exports.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import mongomock
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, patch
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.dataset as ds  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.core.auth import get_current_user  # noqa: E402
+from app.models.user import UserDB  # noqa: E402
+from app.services.report_service import ReportService  # noqa: E402
+from app.services.usage_arrow import (  # noqa: E402
+    arrow_stream_chunks, record_batches, usage_fields, write_parquet
+)
+from app.tests.mocks import AsyncCollectionMock, MockCursor  # noqa: E402
+
+MOCK_USER = {
+    "id": "user-id-456",
+    "username": "testuser",
+    "email": "user@example.com",
+    "hashed_password": "hashed_password",
+    "role": "user"
+}
+
+START = datetime(2025, 1, 1, 22)
+
+
+def readings(count: int) -> list:
+    """Readings an hour apart, crossing midnight after two."""
+    return [
+        {
+            "id": f"usage-{n}",
+            "device_id": f"device-{n % 2}",
+            "timestamp": START + timedelta(hours=n),
+            "duration": 60,
+            "energy_consumed": 0.5 * n,
+            "status": "on",
+            "metrics": {"power": 100 + n, "mode": "eco"},
+        }
+        for n in range(count)
+    ]
+
+
+class TestRecordBatches:
+    """Tests for reading documents into Arrow columns."""
+
+    def test_typed_columns(self):
+        """Test that fields become typed columns and metrics their own columns."""
+        batch, = record_batches(readings(3), usage_fields(["power", "mode"]))
+
+        assert batch.schema.field("timestamp").type == pa.timestamp("ms", tz="UTC")
+        assert batch.schema.field("duration").type == pa.int64()
+        assert batch.column("metrics.power").to_pylist() == [100.0, 101.0, 102.0]
+        assert batch.column("timestamp")[2].as_py() == datetime(2025, 1, 2, tzinfo=timezone.utc)
+
+    def test_mismatched_values_are_null(self):
+        """Test that values of another type are exported as null."""
+        documents = readings(2)
+        documents[1]["duration"] = "sixty"
+
+        batch, = record_batches(documents, usage_fields(["mode"]))
+
+        assert batch.column("duration").to_pylist() == [60, None]
+        assert batch.column("metrics.mode").to_pylist() == [None, None]
+
+    def test_batch_rows(self):
+        """Test that batches hold at most `batch_rows` rows."""
+        batches = list(record_batches(readings(5), usage_fields(), batch_rows=2))
+
+        assert [batch.num_rows for batch in batches] == [2, 2, 1]
+
+
+class TestArrowStream:
+    """Tests for the IPC stream."""
+
+    @pytest.mark.parametrize("compress", [False, True])
+    def test_round_trip(self, compress):
+        """Test that the chunks form one readable stream with every reading."""
+        async def run():
+            cursor = MockCursor(readings(5))
+            return [chunk async for chunk in arrow_stream_chunks(cursor, usage_fields(), compress, batch_rows=2)]
+
+        table = pa.ipc.open_stream(b"".join(asyncio.run(run()))).read_all()
+
+        assert table.num_rows == 5
+        assert table.column("id").to_pylist() == [f"usage-{n}" for n in range(5)]
+
+    def test_empty_stream_has_schema(self):
+        """Test that an export without readings is a stream with no batches."""
+        async def run():
+            return [chunk async for chunk in arrow_stream_chunks(MockCursor([]), usage_fields())]
+
+        table = pa.ipc.open_stream(b"".join(asyncio.run(run()))).read_all()
+
+        assert table.num_rows == 0
+        assert table.schema.names[:3] == ["id", "device_id", "timestamp"]
+
+
+def test_parquet_partitioned_by_day(tmp_path):
+    """Test that readings are written to one directory per day."""
+    written = write_parquet(readings(5), str(tmp_path), usage_fields(["power"]), batch_rows=2)
+
+    assert written == 5
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["day=2025-01-01", "day=2025-01-02"]
+    table = ds.dataset(str(tmp_path), format="parquet", partitioning="hive").to_table()
+    assert table.num_rows == 5
+    assert sorted(table.column("metrics.power").to_pylist()) == [100.0, 101.0, 102.0, 103.0, 104.0]
+
+
+def test_parquet_reexport_replaces_days(tmp_path):
+    """Test that exporting again into the same root replaces the days written, keeping the others."""
+    write_parquet(readings(5), str(tmp_path), usage_fields())
+    # A larger earlier export can leave more files in a day than the next one writes
+    day = tmp_path / "day=2025-01-02"
+    (day / "part-1.parquet").write_bytes((day / "part-0.parquet").read_bytes())
+
+    written = write_parquet(readings(5)[2:3], str(tmp_path), usage_fields())
+
+    assert written == 1
+    table = ds.dataset(str(tmp_path), format="parquet", partitioning="hive").to_table()
+    assert sorted(table.column("id").to_pylist()) == ["usage-0", "usage-1", "usage-2"]
+
+
+@patch("app.routes.usage_routes.us_c_analytics", new_callable=AsyncCollectionMock)
+class TestArrowRoute:
+    """Tests for GET /usage/export?format=arrow."""
+
+    def setup_method(self):
+        app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_USER)
+
+    def teardown_method(self):
+        app.dependency_overrides.clear()
+
+    @patch("app.routes.usage_routes.owned_device_ids", new_callable=AsyncMock)
+    def test_export_arrow(self, mock_owned, mock_usage):
+        """Test that readings download as an Arrow stream with the requested metrics."""
+        mock_owned.return_value = {"device-0"}
+        mock_usage.find.return_value = MockCursor(readings(3))
+
+        response = TestClient(app).get("/api/v1/usage/export", params={
+            "format": "arrow", "device_id": "device-0", "metric": "power", "compress": True
+        })
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+        assert 'filename="usage.arrow"' in response.headers["content-disposition"]
+        table = pa.ipc.open_stream(response.content).read_all()
+        assert table.column("metrics.power").to_pylist() == [100.0, 101.0, 102.0]
+
+    @patch("app.routes.usage_routes.arrow_supported", return_value=False)
+    def test_export_arrow_unavailable(self, mock_supported, mock_usage):
+        """Test that Arrow exports are refused without pyarrow."""
+        response = TestClient(app).get("/api/v1/usage/export", params={"format": "arrow"})
+
+        assert response.status_code == 406
+        mock_usage.find.assert_not_called()
+
+
+@patch("app.services.report_service.USAGE_STORAGE", "documents")
+def test_report_frame_from_arrow():
+    """Test that the report DataFrame is built with typed columns and device rooms."""
+    client = mongomock.MongoClient()
+    usage, devices = client.db.usage, client.db.devices
+    usage.insert_many(readings(4))
+    devices.insert_one({"id": "device-0", "user_id": "user-id-456", "room_id": "kitchen"})
+
+    with patch("app.services.report_service.us_c", usage), patch("app.services.report_service.d_c", devices):
+        frame = ReportService.fetch_energy_frame("user-id-456", device_ids=["device-0", "device-1"])
+
+    assert list(frame.columns) == ["timestamp", "device_id", "energy_consumed", "location"]
+    assert str(frame["timestamp"].dtype).startswith("datetime64")
+    assert frame["location"].tolist() == ["kitchen", "Unknown", "kitchen", "Unknown"]
+    assert frame["energy_consumed"].sum() == 3.0
+
+
+@patch("app.services.report_service.USAGE_STORAGE", "buckets")
+def test_report_frame_from_buckets():
+    """Test that reports on bucketed storage get one row per reading, in timestamp order."""
+    client = mongomock.MongoClient()
+    buckets, devices = client.db.usage_buckets, client.db.devices
+    day = datetime(2025, 1, 2)
+    buckets.insert_one({
+        "device_id": "device-0", "start": day, "count": 2, "total_energy": 1.5, "total_duration": 120,
+        "ids": ["late", None, "early"], "offsets": [1800000, 600000, 0],
+        "energy": [1.0, 9.0, 0.5], "duration": [60, 60, 60], "status": ["on", "on", "on"], "metrics": [{}, None, {}],
+    })
+    devices.insert_one({"id": "device-0", "user_id": "user-id-456", "room_id": "kitchen"})
+
+    with patch("app.services.report_service.ub_c", buckets), patch("app.services.report_service.d_c", devices):
+        frame = ReportService.fetch_energy_frame("user-id-456", start_date="2025-01-02")
+
+    assert frame["timestamp"].tolist() == [day, day + timedelta(minutes=30)]
+    assert frame["energy_consumed"].tolist() == [0.5, 1.0]
+    assert frame["location"].tolist() == ["kitchen", "kitchen"]
@@ -0,0 +1,354 @@
+"""
+Test suite for bucketed usage storage.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from pymongo import DESCENDING
+from pymongo.errors import BulkWriteError
+from unittest.mock import MagicMock, patch
+
+from app.main import app
+from app.core.auth import get_current_user
+from app.core.pagination import keyset_filter, keyset_sort
+from app.models.user import UserDB
+from app.services.usage_buckets import (
+    READING_STAGES, BucketedUsage, bucket_filter, bucket_updates, expand_bucket, matches, readings_in_order,
+    whole_bucket_split
+)
+from app.tests.mocks import AsyncCollectionMock, MockCursor
+
+MOCK_ADMIN = {
+    "id": "admin-id-123",
+    "username": "admin",
+    "email": "admin@example.com",
+    "hashed_password": "hashed_password",
+    "role": "admin"
+}
+
+HOUR = datetime(2025, 1, 1, 10)
+
+
+def usage(n: int, minutes: int, device_id: str = "device-id-123", energy: float = 0.5) -> dict:
+    """Build a usage document `minutes` after HOUR."""
+    return {
+        "id": f"usage-{n}",
+        "device_id": device_id,
+        "metrics": {"power": 100.0 + n},
+        "timestamp": HOUR + timedelta(minutes=minutes),
+        "duration": 60,
+        "energy_consumed": energy,
+        "status": "on",
+        "created": HOUR,
+        "updated": None,
+    }
+
+
+def bucket(device_id: str, start: datetime, readings: list, _id: str = "bucket-1") -> dict:
+    """Build a stored bucket holding `readings`."""
+    return {
+        "_id": _id,
+        "device_id": device_id,
+        "start": start,
+        "count": len(readings),
+        "ids": [reading["id"] for reading in readings],
+        "offsets": [int((reading["timestamp"] - start).total_seconds() * 1000) for reading in readings],
+        "energy": [reading["energy_consumed"] for reading in readings],
+        "duration": [reading["duration"] for reading in readings],
+        "status": [reading["status"] for reading in readings],
+        "metrics": [reading["metrics"] for reading in readings],
+    }
+
+
+class TestBucketUpdates:
+    """Tests for appending readings to buckets."""
+
+    def test_groups_by_device_and_hour(self):
+        """Test that one upsert is built per device & hour."""
+        documents = [usage(0, 0), usage(1, 30), usage(2, 61), usage(3, 5, "device-b")]
+
+        operations, members = bucket_updates(documents)
+
+        assert members == [[0, 1], [2], [3]]
+        first = operations[0]
+        assert first._filter == {"device_id": "device-id-123", "start": HOUR, "count": {"$lte": 998}}
+        assert first._upsert is True
+        assert first._doc["$push"]["offsets"]["$each"] == [0, 30 * 60 * 1000]
+        assert first._doc["$push"]["ids"]["$each"] == ["usage-0", "usage-1"]
+        assert first._doc["$inc"] == {"count": 2, "total_energy": 1.0, "total_duration": 120}
+        assert first._doc["$max"] == {"max_energy": 0.5}
+
+    def test_splits_full_buckets(self):
+        """Test that a chunk never exceeds the bucket size."""
+        operations, members = bucket_updates([usage(n, n) for n in range(5)], max_readings=2)
+
+        assert [len(chunk) for chunk in members] == [2, 2, 1]
+        assert operations[2]._filter["count"] == {"$lte": 1}
+
+
+class TestReadingQueries:
+    """Tests for reading readings back out of buckets."""
+
+    def test_expand_skips_deleted_slots(self):
+        """Test that readings round-trip and deleted slots are skipped."""
+        stored = bucket("device-id-123", HOUR, [usage(0, 0), usage(1, 15)])
+        stored["ids"][0] = None
+
+        readings = list(expand_bucket(stored))
+
+        assert readings == [{
+            "id": "usage-1", "device_id": "device-id-123", "timestamp": HOUR + timedelta(minutes=15),
+            "energy_consumed": 0.5, "duration": 60, "status": "on", "metrics": {"power": 101.0},
+        }]
+
+    def test_readings_in_order(self):
+        """Test that buckets read by start come out as readings in timestamp order."""
+        next_hour = HOUR + timedelta(hours=1)
+        buckets = iter([
+            bucket("device-a", HOUR, [usage(0, 30, "device-a"), usage(1, 5, "device-a")]),
+            bucket("device-b", HOUR, [usage(2, 10, "device-b")]),
+            # Overflow bucket of the same hour
+            bucket("device-a", HOUR, [usage(3, 20, "device-a")]),
+            bucket("device-b", next_hour, [usage(4, 70, "device-b"), usage(5, 61, "device-b")]),
+        ])
+
+        readings = readings_in_order(buckets)
+
+        assert [reading["id"] for reading in readings] == [
+            "usage-1", "usage-2", "usage-3", "usage-0", "usage-5", "usage-4"
+        ]
+
+    def test_bucket_filter(self):
+        """Test that reading conditions narrow the buckets read."""
+        query = {
+            "device_id": {"$in": ["a", "b"]},
+            "timestamp": {"$gte": HOUR + timedelta(minutes=30), "$lte": HOUR + timedelta(hours=3)},
+            "energy_consumed": {"$gte": 1.0},
+            "status": "on",
+            "id": "usage-1",
+        }
+
+        assert bucket_filter(query) == {
+            "device_id": {"$in": ["a", "b"]},
+            "start": {"$gte": HOUR, "$lte": HOUR + timedelta(hours=3)},
+            "max_energy": {"$gte": 1.0},
+            "status": "on",
+            "ids": "usage-1",
+        }
+
+    def test_matches(self):
+        """Test that conditions are re-checked on each reading."""
+        reading = next(expand_bucket(bucket("device-id-123", HOUR, [usage(0, 10)])))
+
+        assert matches(reading, {"timestamp": {"$gte": HOUR + timedelta(minutes=10)}, "status": "on"})
+        assert not matches(reading, {"timestamp": {"$gt": HOUR + timedelta(minutes=10)}})
+        assert not matches(reading, {"energy_consumed": {"$lte": 0.1}})
+        with pytest.raises(ValueError):
+            matches(reading, {"status": {"$regex": "o"}})
+
+    def test_whole_bucket_split(self):
+        """Test that hours inside a range are whole buckets and only the partial hours are left."""
+        query = {"device_id": "a", "timestamp": {"$gte": HOUR + timedelta(minutes=30), "$lte": HOUR + timedelta(hours=3, minutes=15)}}
+
+        whole, edges = whole_bucket_split(query)
+
+        assert whole == {"device_id": "a", "start": {"$gte": HOUR + timedelta(hours=1), "$lte": HOUR + timedelta(hours=2)}}
+        assert edges == {"$and": [query, {"$or": [
+            {"timestamp": {"$lt": HOUR + timedelta(hours=1)}}, {"timestamp": {"$gte": HOUR + timedelta(hours=3)}},
+        ]}]}
+
+    def test_whole_bucket_split_aligned(self):
+        """Test that a range on hour boundaries leaves no partial hours."""
+        query = {"timestamp": {"$gte": HOUR, "$lt": HOUR + timedelta(hours=2)}}
+
+        assert whole_bucket_split(query) == ({"start": {"$gte": HOUR, "$lte": HOUR + timedelta(hours=1)}}, None)
+
+    def test_whole_bucket_split_refused(self):
+        """Test that other conditions or a range inside one hour cannot be split."""
+        assert whole_bucket_split({"status": "on"}) is None
+        assert whole_bucket_split({"timestamp": {"$gt": HOUR, "$lt": HOUR + timedelta(minutes=90)}}) is None
+
+
+class TestBucketedUsage:
+    """Tests for the collection-like bucket adapter."""
+
+    def setup_method(self):
+        self.collection = AsyncCollectionMock()
+        self.store = BucketedUsage(self.collection)
+        self.buckets = [
+            bucket("device-a", HOUR, [usage(0, 0, "device-a"), usage(2, 40, "device-a")], "a-10"),
+            bucket("device-b", HOUR, [usage(1, 20, "device-b", energy=2.0)], "b-10"),
+            bucket("device-a", HOUR + timedelta(hours=1), [usage(3, 65, "device-a")], "a-11"),
+        ]
+
+    def test_find_sorts_across_buckets(self):
+        """Test that readings of one hour are ordered across devices."""
+        self.collection.find.return_value = MockCursor(list(reversed(self.buckets)))
+
+        readings = asyncio.run(self.store.find({}).sort("timestamp", DESCENDING).skip(1).limit(2).to_list(None))
+
+        # Buckets arrive newest hour first; within 10:00 the two devices interleave
+        assert [reading["id"] for reading in readings] == ["usage-2", "usage-1"]
+
+    def test_find_filters_and_projects(self):
+        """Test that reading conditions and inclusion projections apply."""
+        self.collection.find.return_value = MockCursor(self.buckets)
+
+        readings = asyncio.run(self.store.find(
+            {"energy_consumed": {"$gte": 1.0}}, {"_id": 0, "id": 1, "energy_consumed": 1}
+        ).to_list(None))
+
+        assert readings == [{"id": "usage-1", "energy_consumed": 2.0}]
+        assert self.collection.find.call_args[0][0] == {"max_energy": {"$gte": 1.0}}
+
+    def test_find_refuses_other_sorts(self):
+        """Test that sorts not led by timestamp are refused instead of read into memory."""
+        with pytest.raises(ValueError):
+            self.store.find({}).sort("energy_consumed", DESCENDING)
+
+    def test_find_continues_keyset_page(self):
+        """Test that keyset conditions narrow the buckets and order readings by (timestamp, id)."""
+        self.collection.find.return_value = MockCursor([self.buckets[0], self.buckets[1]])
+        sort = keyset_sort(("timestamp", DESCENDING))
+        after = keyset_filter(sort, [HOUR + timedelta(minutes=40), "usage-2"])
+
+        query = {"$and": [{"device_id": {"$in": ["device-a", "device-b"]}}, after]}
+        readings = asyncio.run(self.store.find(query).sort(sort).to_list(None))
+
+        assert [reading["id"] for reading in readings] == ["usage-1", "usage-0"]
+        device, keyset = self.collection.find.call_args[0][0]["$and"]
+        assert keyset["start"] == {"$lte": HOUR + timedelta(minutes=40)}
+
+    def test_aggregate_unwinds_readings(self):
+        """Test that a reading pipeline runs in the database on unwound buckets."""
+        self.collection.aggregate.return_value = MockCursor([{"_id": None, "n": 3}])
+        pipeline = [{"$match": {"status": "on"}}, {"$group": {"_id": None, "n": {"$sum": 1}}}]
+
+        results = asyncio.run(self._aggregate(pipeline))
+
+        assert results == [{"_id": None, "n": 3}]
+        assert self.collection.aggregate.call_args[0][0] == [
+            {"$match": {"status": "on"}}, *READING_STAGES, {"$match": {"status": "on"}}, pipeline[1]
+        ]
+
+    def test_aggregate_whole_buckets(self):
+        """Test that whole buckets are answered by the bucket pipeline and only the edges unwound."""
+        self.collection.aggregate.side_effect = [MockCursor([{"n": 5}]), MockCursor([{"n": 1}])]
+        match = {"device_id": "a", "timestamp": {"$gte": HOUR, "$lte": HOUR + timedelta(hours=2, minutes=5)}}
+        whole_pipeline = [{"$group": {"_id": None, "n": {"$sum": "$count"}}}]
+
+        results = asyncio.run(self._aggregate([{"$match": match}], whole_pipeline))
+
+        assert results == [{"n": 5}, {"n": 1}]
+        whole, edges = [call[0][0] for call in self.collection.aggregate.call_args_list]
+        assert whole == [
+            {"$match": {"device_id": "a", "start": {"$gte": HOUR, "$lte": HOUR + timedelta(hours=1)}}}, *whole_pipeline
+        ]
+        assert edges[0] == {"$match": {"$and": [
+            {"device_id": "a", "start": {"$gte": HOUR, "$lte": HOUR + timedelta(hours=2, minutes=5)}},
+            {"start": {"$gte": HOUR + timedelta(hours=2)}},
+        ]}}
+        assert edges[1:-1] == READING_STAGES
+
+    async def _aggregate(self, pipeline, whole_pipeline=None):
+        cursor = await self.store.aggregate(pipeline, whole_pipeline)
+        return await cursor.to_list(None)
+
+    def test_find_one(self):
+        """Test that a reading is found by id."""
+        self.collection.find.return_value = MockCursor([self.buckets[0]])
+
+        reading = asyncio.run(self.store.find_one({"id": "usage-2"}))
+
+        assert reading["timestamp"] == HOUR + timedelta(minutes=40)
+        assert self.collection.find.call_args[0][0] == {"ids": "usage-2"}
+
+    def test_insert_many_reports_failed_readings(self):
+        """Test that a failed bucket append fails each reading in it."""
+        self.collection.bulk_write.side_effect = BulkWriteError({
+            "writeErrors": [{"index": 1, "code": 2, "errmsg": "bad"}], "nInserted": 0
+        })
+
+        with pytest.raises(BulkWriteError) as error:
+            asyncio.run(self.store.insert_many([usage(0, 0), usage(1, 5, "device-b"), usage(2, 6, "device-b")]))
+
+        assert [e["index"] for e in error.value.details["writeErrors"]] == [1, 2]
+
+    def test_update_one_sets_slot(self):
+        """Test that an update rewrites one slot and adjusts the totals."""
+        self.collection.find_one.return_value = self.buckets[0]
+
+        asyncio.run(self.store.update_one({"id": "usage-2"}, {"$set": {"energy_consumed": 1.5, "updated": HOUR}}))
+
+        query, update = self.collection.update_one.call_args[0]
+        assert query == {"_id": "a-10", "ids.1": "usage-2"}
+        assert update["$set"] == {"energy.1": 1.5, "updated": HOUR}
+        assert update["$inc"] == {"total_energy": 1.0}
+        assert update["$max"] == {"max_energy": 1.5}
+
+    def test_delete_one_empties_slot(self):
+        """Test that a delete leaves an empty slot and decrements the totals."""
+        self.collection.find_one.return_value = self.buckets[0]
+        self.collection.update_one.return_value = MagicMock(modified_count=1)
+
+        result = asyncio.run(self.store.delete_one({"id": "usage-0"}))
+
+        update = self.collection.update_one.call_args[0][1]
+        assert update["$set"]["ids.0"] is None
+        assert update["$inc"] == {"count": -1, "total_energy": -0.5, "total_duration": -60}
+        assert result.deleted_count == 1
+
+
+@patch("app.services.usage_buckets._stores", {})
+@patch("app.services.usage_buckets.USAGE_STORAGE", "buckets")
+@patch("app.services.usage_buckets.ub_c", new_callable=AsyncCollectionMock)
+class TestBucketedUsageRoutes:
+    """Tests for the usage routes on bucketed storage."""
+
+    def setup_method(self):
+        app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_ADMIN)
+
+    def teardown_method(self):
+        app.dependency_overrides.clear()
+
+    def test_get_all_usage(self, mock_buckets):
+        """Test that GET /usage/ answers with readings."""
+        mock_buckets.find.return_value = MockCursor([bucket("device-id-123", HOUR, [usage(0, 0), usage(1, 30)])])
+
+        response = TestClient(app).get("/api/v1/usage/?device_id=device-id-123")
+
+        assert response.status_code == 200
+        assert [reading["id"] for reading in response.json()] == ["usage-1", "usage-0"]
+        assert set(response.json()[0]) == {
+            "id", "device_id", "metrics", "timestamp", "duration", "energy_consumed", "status"
+        }
+
+    @patch("app.routes.usage_routes.USAGE_STORAGE", "buckets")
+    def test_get_all_usage_energy_sort(self, mock_buckets):
+        """Test that GET /usage/ refuses energy sorts on bucketed storage."""
+        response = TestClient(app).get("/api/v1/usage/?sort=energy_desc&status=on")
+
+        assert response.status_code == 400
+        mock_buckets.find.assert_not_called()
+
+    def test_get_usage(self, mock_buckets):
+        """Test that GET /usage/{id} finds a reading inside its bucket."""
+        mock_buckets.find.return_value = MockCursor([bucket("device-id-123", HOUR, [usage(0, 0), usage(1, 30)])])
+
+        response = TestClient(app).get("/api/v1/usage/usage-1")
+
+        assert response.status_code == 200
+        assert response.json()["timestamp"] == "2025-01-01T10:30:00"
+
+    def test_create_usage_appends(self, mock_buckets):
+        """Test that POST /usage/ appends to a bucket."""
+        mock_buckets.with_options.return_value = mock_buckets
+        response = TestClient(app).post("/api/v1/usage/", json={
+            "device_id": "device-id-123", "metrics": {"power": 1.0}, "timestamp": "2025-01-01T10:05:00"
+        })
+
+        assert response.status_code == 201
+        operation = mock_buckets.bulk_write.call_args[0][0][0]
+        assert operation._filter["start"] == HOUR
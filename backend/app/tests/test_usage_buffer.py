@@ -0,0 +1,168 @@
+"""
+Test suite for the usage write-behind buffer.
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+from fastapi.testclient import TestClient
+from pymongo.errors import AutoReconnect, BulkWriteError, DuplicateKeyError
+
+from app.main import app
+from app.core.auth import get_current_user
+from app.models.user import UserDB
+from app.services.usage_buffer import UsageBufferFull, UsageWriteBuffer
+from app.tests.mocks import AsyncCollectionMock
+
+MOCK_ADMIN = {
+    "id": "admin-id-123",
+    "username": "admin",
+    "email": "admin@example.com",
+    "hashed_password": "hashed_password",
+    "role": "admin"
+}
+
+
+def usage(n: int) -> dict:
+    """Build a minimal usage document."""
+    return {"id": f"usage-{n}", "device_id": "device-id-123", "metrics": {"power": n}}
+
+
+@patch("app.services.usage_buffer.us_c_ingest", new_callable=AsyncCollectionMock)
+class TestUsageWriteBuffer:
+    """Tests for batching, durability modes and shutdown."""
+
+    def test_coalesces_into_batches(self, mock_collection):
+        """Test that concurrent submits are written with few insert_many calls."""
+        buffer = UsageWriteBuffer(max_records=4, flush_ms=1000, max_queue=100)
+
+        async def run():
+            await asyncio.gather(*(buffer.submit(usage(n)) for n in range(10)))
+            await buffer.close()
+
+        asyncio.run(run())
+
+        sizes = [len(call[0][0]) for call in mock_collection.insert_many.call_args_list]
+        assert sizes == [4, 4, 2]
+        assert buffer.stats()["written"] == 10
+        assert buffer.stats()["queued"] == 0
+
+    def test_flushes_after_interval(self, mock_collection):
+        """Test that a partial batch is written once the flush interval passes."""
+        buffer = UsageWriteBuffer(max_records=100, flush_ms=10, durability="written")
+
+        async def run():
+            await asyncio.wait_for(buffer.submit(usage(1)), timeout=1)
+
+        asyncio.run(run())
+
+        mock_collection.insert_many.assert_called_once()
+        assert buffer.stats()["batches"] == 1
+
+    def test_written_mode_reports_duplicates(self, mock_collection):
+        """Test that only the duplicate record's submit fails in written mode."""
+        mock_collection.insert_many.side_effect = BulkWriteError({
+            "writeErrors": [{"index": 1, "code": 11000, "errmsg": "E11000 duplicate key error"}]
+        })
+        buffer = UsageWriteBuffer(max_records=3, flush_ms=1000, durability="written")
+
+        async def run():
+            return await asyncio.gather(
+                *(buffer.submit(usage(n)) for n in range(3)), return_exceptions=True
+            )
+
+        results = asyncio.run(run())
+
+        assert results[0] is None and results[2] is None
+        assert isinstance(results[1], DuplicateKeyError)
+        assert buffer.stats()["duplicates"] == 1
+        assert buffer.stats()["failed"] == 0
+
+    def test_bounded_queue(self, mock_collection):
+        """Test that submits beyond the queue limit are refused."""
+        buffer = UsageWriteBuffer(max_records=2, flush_ms=1000, max_queue=2)
+
+        async def run():
+            await buffer.submit(usage(1))
+            await buffer.submit(usage(2))
+            with pytest.raises(UsageBufferFull):
+                await buffer.submit(usage(3))
+            await buffer.close()
+
+        asyncio.run(run())
+
+        assert buffer.stats()["rejected"] == 1
+        assert buffer.stats()["written"] == 2
+
+    @patch("app.services.usage_buffer.apply_rollups", new_callable=AsyncMock)
+    def test_failed_batch_settles_and_keeps_draining(self, mock_rollups, mock_collection):
+        """Test that a batch failing after its insert fails its waiters and later batches still flush."""
+        mock_rollups.side_effect = [RuntimeError("rollup update failed"), None]
+        buffer = UsageWriteBuffer(max_records=1, flush_ms=1000, durability="written")
+
+        async def run():
+            first = await asyncio.wait_for(
+                asyncio.gather(buffer.submit(usage(1)), return_exceptions=True), timeout=1
+            )
+            await asyncio.wait_for(buffer.submit(usage(2)), timeout=1)
+            return first[0]
+
+        error = asyncio.run(run())
+
+        assert isinstance(error, RuntimeError)
+        assert mock_collection.insert_many.call_count == 2
+        assert buffer.stats()["written"] == 2
+
+    def test_invalid_durability(self, mock_collection):
+        """Test that an unknown durability mode is rejected."""
+        with pytest.raises(ValueError):
+            UsageWriteBuffer(durability="never")
+
+
+class TestCreateUsageBuffered:
+    """Tests for POST /usage/ with the buffer enabled."""
+
+    def setup_method(self):
+        app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_ADMIN)
+
+    @patch("app.routes.usage_routes.USAGE_WRITE_BUFFER", True)
+    @patch("app.routes.usage_routes.usage_buffer")
+    @patch("app.routes.usage_routes.us_c_ingest", new_callable=AsyncCollectionMock)
+    def test_create_usage_is_queued(self, mock_collection, mock_buffer):
+        """Test that single readings go to the buffer instead of insert_one."""
+        mock_buffer.submit = AsyncMock()
+        client = TestClient(app)
+
+        response = client.post("/api/v1/usage/", json={"device_id": "device-id-123", "metrics": {"power": 5}})
+
+        assert response.status_code == 201
+        mock_buffer.submit.assert_called_once()
+        assert mock_buffer.submit.call_args[0][0]["device_id"] == "device-id-123"
+        mock_collection.insert_one.assert_not_called()
+
+    @patch("app.routes.usage_routes.USAGE_WRITE_BUFFER", True)
+    @patch("app.routes.usage_routes.usage_buffer")
+    def test_create_usage_buffer_full(self, mock_buffer):
+        """Test that a full buffer sheds load with 503."""
+        mock_buffer.submit = AsyncMock()
+        mock_buffer.submit.side_effect = UsageBufferFull("full")
+        client = TestClient(app)
+
+        response = client.post("/api/v1/usage/", json={"device_id": "device-id-123", "metrics": {"power": 5}})
+
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
+
+    @patch("app.routes.usage_routes.USAGE_WRITE_BUFFER", True)
+    @patch("app.services.usage_buffer.us_c_ingest", new_callable=AsyncCollectionMock)
+    def test_create_usage_flush_failed(self, mock_collection):
+        """Test that a reading whose batch fails to flush is answered with 503, not 500."""
+        mock_collection.insert_many.side_effect = AutoReconnect("primary stepped down")
+        buffer = UsageWriteBuffer(max_records=1, flush_ms=10, durability="written")
+        client = TestClient(app)
+
+        with patch("app.routes.usage_routes.usage_buffer", buffer):
+            response = client.post("/api/v1/usage/", json={"device_id": "device-id-123", "metrics": {"power": 5}})
+
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
+        assert buffer.stats()["failed"] == 1
@@ -0,0 +1,188 @@
+"""
+Test suite for columnar msgpack usage uploads.
+"""
+from datetime import datetime
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock, patch
+
+from app.main import app
+from app.core.auth import get_current_user
+from app.core.ownership import clear_ownership_caches
+from app.models.user import UserDB
+from app.services.usage_columnar import ColumnarPayloadError, decode_usage_batch
+from app.tests.mocks import AsyncCollectionMock, MockCursor
+
+msgpack = pytest.importorskip("msgpack")
+
+MOCK_ADMIN = {
+    "id": "admin-id-123",
+    "username": "admin",
+    "email": "admin@example.com",
+    "hashed_password": "hashed_password",
+    "role": "admin"
+}
+
+MOCK_USER = {
+    "id": "user-id-456",
+    "username": "testuser",
+    "email": "user@example.com",
+    "hashed_password": "hashed_password",
+    "role": "user"
+}
+
+START_MS = 1_700_000_000_000
+
+
+def frame(device_id: str = "device-id-123", rows: int = 3, **columns) -> dict:
+    """Build a columnar frame with binary timestamp & energy columns."""
+    return {
+        "device_id": device_id,
+        "timestamp": (START_MS + np.arange(rows, dtype="<i8") * 60_000).tobytes(),
+        "energy_consumed": np.full(rows, 0.25, dtype="<f8").tobytes(),
+        **columns,
+    }
+
+
+class TestDecodeUsageBatch:
+    """Tests for decoding frames into usage documents."""
+
+    def test_binary_and_list_columns(self):
+        """Test that binary and list columns decode into documents."""
+        body = msgpack.packb(frame(
+            rows=2, duration=[60, 60], status="on",
+            metrics={"power": [100.0, float("nan")]}
+        ))
+
+        documents = decode_usage_batch(body, now=datetime(2024, 1, 1))
+
+        assert len(documents) == 2
+        assert documents[0]["timestamp"] == datetime(2023, 11, 14, 22, 13, 20)
+        assert documents[1]["timestamp"] == datetime(2023, 11, 14, 22, 14, 20)
+        assert documents[0]["energy_consumed"] == 0.25
+        assert documents[0]["duration"] == 60
+        assert documents[0]["status"] == "on"
+        assert documents[0]["metrics"] == {"power": 100.0}
+        assert documents[1]["metrics"] == {"power": None}
+        assert documents[0]["id"] != documents[1]["id"]
+
+    def test_multiple_frames(self):
+        """Test that an array of frames keeps upload order."""
+        body = msgpack.packb([frame("device-a", rows=2), frame("device-b", rows=1)])
+
+        documents = decode_usage_batch(body)
+
+        assert [document["device_id"] for document in documents] == ["device-a", "device-a", "device-b"]
+
+    @pytest.mark.parametrize("bad_frame, message", [
+        ({"device_id": "device-id-123"}, "no timestamp"),
+        (frame(energy_consumed=[0.1]), "expected 3"),
+        (frame(energy_consumed=[0.1, -0.2, 0.3]), "cannot be negative"),
+        (frame(duration=b"\x00" * 5), "not a valid"),
+        (frame(device_id=""), "Device ID"),
+        (frame(energy_consumed=[0.1, float("inf"), 0.3]), "finite"),
+        (frame(metrics={"power": [1.0, 2.0, float("-inf")]}), "finite"),
+        (frame(timestamp=[START_MS, 2 ** 62, START_MS]), "between the years"),
+        (frame(status=1), "Status must be a string"),
+    ])
+    def test_invalid_frames(self, bad_frame, message):
+        """Test that malformed frames are rejected with a reason."""
+        with pytest.raises(ColumnarPayloadError, match=message):
+            decode_usage_batch(msgpack.packb(bad_frame))
+
+    def test_max_rows(self):
+        """Test that the row limit covers every frame of an upload."""
+        body = msgpack.packb([frame("device-a", rows=2), frame("device-b", rows=2)])
+
+        assert len(decode_usage_batch(body, max_rows=4)) == 4
+        with pytest.raises(ColumnarPayloadError, match="more rows than the upload allows"):
+            decode_usage_batch(body, max_rows=3)
+
+    def test_invalid_msgpack(self):
+        """Test that a body that is not msgpack is rejected."""
+        with pytest.raises(ColumnarPayloadError):
+            decode_usage_batch(b"\xc1")
+
+
+class TestColumnarBulkRoute:
+    """Tests for POST /usage/bulk with a msgpack body."""
+
+    def setup_method(self):
+        app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_ADMIN)
+        clear_ownership_caches()
+
+    def post(self, payload):
+        return TestClient(app).post(
+            "/api/v1/usage/bulk", content=msgpack.packb(payload),
+            headers={"Content-Type": "application/msgpack"}
+        )
+
+    @patch("app.routes.usage_routes.us_c_ingest", new_callable=AsyncCollectionMock)
+    def test_columnar_upload(self, mock_collection):
+        """Test that a columnar upload is inserted with one insert_many."""
+        mock_collection.insert_many.return_value = MagicMock()
+
+        response = self.post(frame(rows=5))
+
+        assert response.status_code == 201
+        assert response.json()["inserted"] == 5
+        documents = mock_collection.insert_many.call_args[0][0]
+        assert len(documents) == 5
+        assert all(document["device_id"] == "device-id-123" for document in documents)
+
+    @patch("app.routes.usage_routes.us_c_ingest", new_callable=AsyncCollectionMock)
+    def test_columnar_upload_invalid(self, mock_collection):
+        """Test that a malformed frame is a bad request."""
+        response = self.post(frame(energy_consumed=[1.0]))
+
+        assert response.status_code == 400
+        assert "expected 3" in response.json()["detail"]
+        mock_collection.insert_many.assert_not_called()
+
+    @patch("app.routes.usage_routes.us_c_ingest", new_callable=AsyncCollectionMock)
+    @patch("app.routes.usage_routes.d_c", new_callable=AsyncCollectionMock)
+    def test_columnar_upload_unowned_device(self, mock_device_collection, mock_collection):
+        """Test that regular users cannot upload frames for other users' devices."""
+        app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_USER)
+        mock_device_collection.find.return_value = MockCursor([{"id": "device-id-123"}])
+
+        response = self.post([frame("device-id-123"), frame("device-id-456")])
+
+        assert response.status_code == 403
+        mock_collection.insert_many.assert_not_called()
+
+    @patch("app.routes.usage_routes.USAGE_BULK_MAX_RECORDS", 4)
+    @patch("app.routes.usage_routes.us_c_ingest", new_callable=AsyncCollectionMock)
+    def test_columnar_upload_too_many_records(self, mock_collection):
+        """Test that columnar uploads are held to the bulk record limit."""
+        response = self.post(frame(rows=5))
+
+        assert response.status_code == 400
+        assert "more rows than the upload allows" in response.json()["detail"]
+        mock_collection.insert_many.assert_not_called()
+
+    @patch("app.routes.usage_routes.USAGE_BULK_MAX_BYTES", 64)
+    @patch("app.routes.usage_routes.us_c_ingest", new_callable=AsyncCollectionMock)
+    def test_columnar_upload_too_large(self, mock_collection):
+        """Test that columnar uploads are held to the bulk body size limit."""
+        response = self.post(frame(rows=50))
+
+        assert response.status_code == 413
+        mock_collection.insert_many.assert_not_called()
+
+    @patch("app.routes.usage_routes.us_c_ingest", new_callable=AsyncCollectionMock)
+    def test_columnar_upload_infinite_energy(self, mock_collection):
+        """Test that non-finite energy is a bad request, as on the JSON path."""
+        response = self.post(frame(energy_consumed=[0.1, float("inf"), 0.3]))
+
+        assert response.status_code == 400
+        mock_collection.insert_many.assert_not_called()
+
+    @patch("app.routes.usage_routes.columnar_supported", return_value=False)
+    def test_columnar_upload_without_msgpack(self, _):
+        """Test that servers without msgpack refuse columnar uploads."""
+        response = self.post(frame())
+
+        assert response.status_code == 415
@@ -0,0 +1,144 @@
+"""
+Test suite for streaming usage exports.
+"""
+import asyncio
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, patch
+
+from app.main import app
+from app.core.auth import get_current_user
+from app.models.usage import ExportFormat
+from app.models.user import UserDB
+from app.services.usage_export import EXPORT_FIELDS, export_chunks
+from app.tests.mocks import AsyncCollectionMock, MockCursor
+
+MOCK_USER = {
+    "id": "user-id-456",
+    "username": "testuser",
+    "email": "user@example.com",
+    "hashed_password": "hashed_password",
+    "role": "user"
+}
+
+START = datetime(2025, 1, 1)
+
+
+def readings(count: int) -> list:
+    """Readings as projected for export."""
+    return [
+        {
+            "id": f"usage-{n}",
+            "device_id": "device-1",
+            "timestamp": START + timedelta(minutes=n),
+            "duration": 60,
+            "energy_consumed": 0.5,
+            "status": "on",
+            "metrics": {"power": 100.0, "note": "a,b"},
+        }
+        for n in range(count)
+    ]
+
+
+def collect(documents, export_format, compress=False, chunk_bytes=1 << 20) -> list:
+    """Run an export to completion and return its chunks."""
+    async def run():
+        return [chunk async for chunk in export_chunks(MockCursor(documents), export_format, compress, chunk_bytes)]
+    return asyncio.run(run())
+
+
+class TestExportChunks:
+    """Tests for serializing readings."""
+
+    def test_ndjson(self):
+        """Test that each reading is one JSON line with an ISO timestamp."""
+        lines = b"".join(collect(readings(2), ExportFormat.NDJSON)).decode().splitlines()
+
+        assert len(lines) == 2
+        assert json.loads(lines[1]) == {
+            "id": "usage-1", "device_id": "device-1", "timestamp": "2025-01-01T00:01:00",
+            "duration": 60, "energy_consumed": 0.5, "status": "on",
+            "metrics": {"power": 100.0, "note": "a,b"},
+        }
+
+    def test_csv(self):
+        """Test that CSV starts with a header and quotes the metrics column."""
+        rows = list(csv.reader(io.StringIO(b"".join(collect(readings(2), ExportFormat.CSV)).decode())))
+
+        assert rows[0] == list(EXPORT_FIELDS)
+        assert rows[1][:3] == ["usage-0", "device-1", "2025-01-01T00:00:00"]
+        assert json.loads(rows[1][6]) == {"power": 100.0, "note": "a,b"}
+
+    def test_empty_csv_has_header(self):
+        """Test that an export without readings still has its header."""
+        assert b"".join(collect([], ExportFormat.CSV)).decode() == ",".join(EXPORT_FIELDS) + "\n"
+
+    def test_chunks(self):
+        """Test that output is split into chunks of about the chunk size."""
+        chunks = collect(readings(50), ExportFormat.NDJSON, chunk_bytes=1000)
+
+        assert len(chunks) > 5
+        assert all(len(chunk) < 1500 for chunk in chunks)
+        assert len(b"".join(chunks).splitlines()) == 50
+
+    def test_gzip(self):
+        """Test that compressed chunks form one gzip stream of the plain export."""
+        plain = b"".join(collect(readings(50), ExportFormat.NDJSON))
+        compressed = collect(readings(50), ExportFormat.NDJSON, compress=True, chunk_bytes=1000)
+
+        assert gzip.decompress(b"".join(compressed)) == plain
+
+
+@patch("app.routes.usage_routes.us_c_analytics", new_callable=AsyncCollectionMock)
+class TestExportRoute:
+    """Tests for GET /usage/export."""
+
+    def setup_method(self):
+        app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_USER)
+
+    def teardown_method(self):
+        app.dependency_overrides.clear()
+
+    @patch("app.routes.usage_routes.owned_device_ids", new_callable=AsyncMock)
+    def test_export_csv(self, mock_owned, mock_usage):
+        """Test that a device's readings download as CSV with a header row."""
+        mock_owned.return_value = {"device-1"}
+        mock_usage.find.return_value = MockCursor(readings(3))
+
+        response = TestClient(app).get("/api/v1/usage/export", params={
+            "format": "csv", "device_id": "device-1", "start_time": START.isoformat()
+        })
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert 'filename="usage.csv"' in response.headers["content-disposition"]
+        assert len(response.text.splitlines()) == 4
+        assert mock_usage.find.call_args[0][0] == {"device_id": "device-1", "timestamp": {"$gte": START}}
+
+    @patch("app.routes.usage_routes.user_device_ids", new_callable=AsyncMock)
+    def test_export_own_devices_gzip(self, mock_user_devices, mock_usage):
+        """Test that without devices a user exports all of theirs, compressed on request."""
+        mock_user_devices.return_value = ["device-1", "device-2"]
+        mock_usage.find.return_value = MockCursor(readings(2))
+
+        response = TestClient(app).get("/api/v1/usage/export", params={"compress": True})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/gzip"
+        assert len(gzip.decompress(response.content).splitlines()) == 2
+        assert mock_usage.find.call_args[0][0] == {"device_id": {"$in": ["device-1", "device-2"]}}
+
+    @patch("app.routes.usage_routes.owned_device_ids", new_callable=AsyncMock)
+    def test_export_not_owned(self, mock_owned, mock_usage):
+        """Test that a device the user does not own is forbidden."""
+        mock_owned.return_value = set()
+
+        response = TestClient(app).get("/api/v1/usage/export", params={"device_id": "device-9"})
+
+        assert response.status_code == 403
+        mock_usage.find.assert_not_called()
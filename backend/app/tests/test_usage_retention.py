@@ -0,0 +1,176 @@
+"""
+Test suite for usage retention & downsampling.
+"""
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+from pymongo import ReplaceOne
+from unittest.mock import patch
+
+from app.db.indexes import BOOTSTRAP_COLLECTION
+from app.services.usage_retention import (
+    CHECKPOINT_ID, RETENTION_LOCK_ID, RetentionPolicy, delete_in_batches, run_retention
+)
+
+NOW = datetime(2025, 3, 1, 12)
+OLD_DAY = datetime(2025, 1, 10)
+
+
+def reading(timestamp: datetime, n: int = 0, device_id: str = "device-id-123") -> dict:
+    """Build a stored usage reading."""
+    return {
+        "id": f"{device_id}-{timestamp.isoformat()}-{n}",
+        "device_id": device_id,
+        "timestamp": timestamp,
+        "energy_consumed": 0.5,
+        "duration": 60,
+        "metrics": {"power": 100.0},
+    }
+
+
+def bulk_write_with(collection):
+    """Apply bulk operations one by one; mongomock cannot run this PyMongo's operation objects."""
+    def bulk_write(operations, ordered=True):
+        for operation in operations:
+            if isinstance(operation, ReplaceOne):
+                collection.replace_one(operation._filter, operation._doc, upsert=operation._upsert)
+            else:
+                collection.update_one(operation._filter, operation._doc, upsert=operation._upsert)
+    return bulk_write
+
+
+@pytest.fixture
+def db():
+    """In-memory database with expired and current readings."""
+    database = mongomock.MongoClient().sync
+    for name in ("usage_hourly", "usage_daily"):
+        database[name].bulk_write = bulk_write_with(database[name])
+    database["usage"].insert_many(
+        [reading(OLD_DAY + timedelta(minutes=20 * n), n) for n in range(6)]                     # Two hours
+        + [reading(OLD_DAY + timedelta(days=1, hours=5), device_id="device-b")]
+        + [reading(NOW - timedelta(days=1), n) for n in range(3)]                               # Within 30 days
+    )
+    return database
+
+
+POLICY = RetentionPolicy(raw_days=30, batch_size=2, pause=0)
+
+
+class TestRunRetention:
+    """Tests for compacting & deleting expired usage data."""
+
+    def test_default_policy_keeps_everything(self, db):
+        """Test that nothing is deleted until a retention period is set."""
+        result = run_retention(db, RetentionPolicy(0, 0, 0), now=NOW)
+
+        assert result["raw_deleted"] == 0
+        assert db["usage"].count_documents({}) == 10
+
+    def test_compacts_then_deletes_expired_readings(self, db):
+        """Test that expired days are folded into buckets and removed in batches."""
+        result = run_retention(db, POLICY, now=NOW)
+
+        assert result["days"] == 2
+        assert result["compacted"] == 7
+        assert result["raw_deleted"] == 7
+        assert db["usage"].count_documents({}) == 3
+        day = db["usage_daily"].find_one({"device_id": "device-id-123", "start": OLD_DAY})
+        assert day["count"] == 6
+        assert day["energy"] == 3.0
+        assert day["metrics"]["power"] == {"sum": 600.0, "count": 6}
+        assert db["usage_hourly"].count_documents({"device_id": "device-id-123"}) == 2
+        checkpoint = db[BOOTSTRAP_COLLECTION].find_one({"_id": CHECKPOINT_ID})
+        assert checkpoint["phase"] == "done"
+        assert checkpoint["compacted_through"] == OLD_DAY + timedelta(days=1)
+
+    def test_rerun_is_a_no_op(self, db):
+        """Test that a second run finds nothing left to expire."""
+        run_retention(db, POLICY, now=NOW)
+        result = run_retention(db, POLICY, now=NOW)
+
+        assert result["days"] == 0
+        assert db["usage_daily"].find_one({"device_id": "device-id-123", "start": OLD_DAY})["count"] == 6
+
+    def test_resumes_deleting_without_recompacting(self, db):
+        """Test that a day checkpointed for deletion is not compacted again."""
+        # A previous run compacted OLD_DAY and deleted some of its readings before stopping
+        db["usage_daily"].insert_one({"device_id": "device-id-123", "start": OLD_DAY, "count": 6, "energy": 3.0})
+        db["usage"].delete_many({"timestamp": {"$lt": OLD_DAY + timedelta(hours=1)}})
+        db[BOOTSTRAP_COLLECTION].insert_one(
+            {"_id": CHECKPOINT_ID, "day": OLD_DAY, "phase": "delete", "compacted_through": OLD_DAY}
+        )
+
+        run_retention(db, POLICY, now=NOW)
+
+        assert db["usage_daily"].find_one({"device_id": "device-id-123", "start": OLD_DAY})["count"] == 6
+        assert db["usage"].count_documents({"timestamp": {"$lt": NOW - timedelta(days=30)}}) == 0
+
+    def test_late_readings_are_added(self, db):
+        """Test that readings arriving for an already compacted day are added to its buckets."""
+        run_retention(db, POLICY, now=NOW)
+        db["usage"].insert_one(reading(OLD_DAY + timedelta(hours=3), 99))
+
+        run_retention(db, POLICY, now=NOW)
+
+        assert db["usage_daily"].find_one({"device_id": "device-id-123", "start": OLD_DAY})["count"] == 7
+
+    @patch("app.services.usage_retention.USAGE_ROLLUPS", True)
+    def test_write_time_rollups_skip_compaction(self, db):
+        """Test that buckets kept up to date on write are not rebuilt."""
+        result = run_retention(db, POLICY, now=NOW)
+
+        assert result["compacted"] == 0
+        assert result["raw_deleted"] == 7
+        assert db["usage_daily"].count_documents({}) == 0
+
+    def test_expires_rollup_buckets(self, db):
+        """Test that hourly buckets past their retention are deleted and daily ones kept."""
+        db["usage_hourly"].insert_many([
+            {"device_id": "device-id-123", "start": NOW - timedelta(days=400)},
+            {"device_id": "device-id-123", "start": NOW - timedelta(days=10)},
+        ])
+        db["usage_daily"].insert_one({"device_id": "device-id-123", "start": NOW - timedelta(days=400)})
+
+        result = run_retention(db, RetentionPolicy(hourly_days=365, batch_size=1, pause=0), now=NOW)
+
+        assert result["hourly_deleted"] == 1
+        assert result["daily_deleted"] == 0
+        assert db["usage_hourly"].count_documents({}) == 1
+        assert db["usage_daily"].count_documents({}) == 1
+
+    def test_skips_while_another_worker_holds_the_lease(self, db):
+        """Test that only one worker runs the job at a time."""
+        db[BOOTSTRAP_COLLECTION].insert_one(
+            {"_id": RETENTION_LOCK_ID, "owner": "other", "locked_until": datetime.utcnow() + timedelta(minutes=5)}
+        )
+
+        result = run_retention(db, POLICY, now=NOW)
+
+        assert result == {"skipped": True}
+        assert db["usage"].count_documents({}) == 10
+
+    def test_releases_the_lease(self, db):
+        """Test that a finished run lets the next one start."""
+        run_retention(db, POLICY, now=NOW)
+
+        assert "locked_until" not in db[BOOTSTRAP_COLLECTION].find_one({"_id": RETENTION_LOCK_ID})
+
+
+class TestDeleteInBatches:
+    """Tests for bounded deletes."""
+
+    def test_deletes_in_bounded_batches(self, db):
+        """Test that each delete_many removes at most batch_size documents."""
+        calls = []
+        delete_many = db["usage"].delete_many
+
+        def spy(query):
+            calls.append(len(query["_id"]["$in"]))
+            return delete_many(query)
+
+        db["usage"].delete_many = spy
+        deleted = delete_in_batches(db["usage"], {}, batch_size=4)
+
+        assert deleted == 10
+        assert calls == [4, 4, 2]
@@ -0,0 +1,338 @@
+"""
+Test suite for hourly & daily usage rollups.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock, patch
+from pymongo import ReplaceOne
+
+from app.main import app
+from app.core.auth import get_current_user
+from app.models.user import UserDB
+from app.services.usage_rollups import (
+    DAY, HOUR, aggregate_usage, apply_rollups, backfill_rollups, bucket_start, bucket_totals_pipeline,
+    facet_totals, fold_readings, plan_ranges, rollup_updates, stored_bucket_totals_pipeline, summarize_readings,
+    totals_pipeline
+)
+from app.tests.mocks import AsyncCollectionMock, MockCursor
+
+MOCK_ADMIN = {
+    "id": "admin-id-123",
+    "username": "admin",
+    "email": "admin@example.com",
+    "hashed_password": "hashed_password",
+    "role": "admin"
+}
+
+START = datetime(2024, 1, 1)
+
+
+def reading(minutes: int, device_id: str = "device-id-123", energy: float = 0.5) -> dict:
+    """Build a usage document `minutes` after START."""
+    return {
+        "id": f"{device_id}-{minutes}",
+        "device_id": device_id,
+        "timestamp": START + timedelta(minutes=minutes),
+        "energy_consumed": energy,
+        "duration": 60,
+        "metrics": {"power": 100.0, "mode": "eco"},
+    }
+
+
+class TestBuckets:
+    """Tests for folding readings into buckets."""
+
+    def test_bucket_start(self):
+        """Test that timestamps truncate to their hour and day."""
+        timestamp = datetime(2024, 1, 1, 13, 45, 10)
+
+        assert bucket_start(timestamp, HOUR) == datetime(2024, 1, 1, 13)
+        assert bucket_start(timestamp, DAY) == datetime(2024, 1, 1)
+
+    def test_fold_readings(self):
+        """Test that readings are summed per device & hour."""
+        readings = [reading(0), reading(30, energy=1.5), reading(61), reading(0, "device-b")]
+
+        buckets = fold_readings(readings, HOUR)
+
+        first = buckets[("device-id-123", START)]
+        assert first.inc["count"] == 2
+        assert first.inc["energy"] == 2.0
+        assert first.inc["duration"] == 120
+        assert first.inc["metrics.power.sum"] == 200.0
+        assert "metrics.mode.sum" not in first.inc
+        assert (first.min_energy, first.max_energy) == (0.5, 1.5)
+        assert len(buckets) == 3
+
+    def test_rollup_updates(self):
+        """Test that inserts upsert buckets and removals only decrement them."""
+        added = rollup_updates([reading(0), reading(5)], DAY)
+        removed = rollup_updates([reading(0)], DAY, sign=-1)
+
+        assert len(added) == 1
+        assert added[0]._doc["$inc"]["count"] == 2
+        assert added[0]._doc["$max"] == {"max_energy": 0.5}
+        assert added[0]._upsert is True
+        assert removed[0]._doc == {"$inc": {"count": -1, "energy": -0.5, "duration": -60,
+                                            "metrics.power.sum": -100.0, "metrics.power.count": -1}}
+        assert removed[0]._upsert is False
+
+
+class TestPlanRanges:
+    """Tests for covering a time range with rollups."""
+
+    def test_short_range_reads_raw(self):
+        """Test that a range inside one hour reads only raw readings."""
+        start, end = START + timedelta(minutes=5), START + timedelta(minutes=50)
+
+        assert plan_ranges(start, end) == {DAY: [], HOUR: [], "raw": [(start, end)]}
+
+    def test_long_range(self):
+        """Test that whole days, edge hours and partial hours are split."""
+        start = datetime(2024, 1, 1, 22, 30)
+        end = datetime(2024, 1, 4, 1, 15)
+
+        plan = plan_ranges(start, end)
+
+        assert plan[DAY] == [(datetime(2024, 1, 2), datetime(2024, 1, 4))]
+        assert plan[HOUR] == [
+            (datetime(2024, 1, 1, 23), datetime(2024, 1, 2)),
+            (datetime(2024, 1, 4), datetime(2024, 1, 4, 1)),
+        ]
+        assert plan["raw"] == [(start, datetime(2024, 1, 1, 23)), (datetime(2024, 1, 4, 1), end)]
+
+    @pytest.mark.parametrize("start_minutes, end_minutes", [
+        (0, 60 * 24 * 3), (17, 60 * 50 + 3), (60, 120), (59, 61), (0, 60 * 24),
+    ])
+    def test_plan_matches_raw_totals(self, start_minutes, end_minutes):
+        """Test that rollups plus edge readings total the same as every reading."""
+        readings = [reading(minutes, energy=minutes / 100) for minutes in range(0, 60 * 24 * 4, 7)]
+        readings.append(reading(end_minutes, energy=9.0))  # On the inclusive end bound
+        start, end = START + timedelta(minutes=start_minutes), START + timedelta(minutes=end_minutes)
+
+        plan = plan_ranges(start, end)
+        count, energy = 0, 0.0
+        for period in (DAY, HOUR):
+            buckets = fold_readings(readings, period)
+            for range_start, range_end in plan[period]:
+                for (_, bucket_start_), bucket in buckets.items():
+                    if range_start <= bucket_start_ < range_end:
+                        count += bucket.inc["count"]
+                        energy += bucket.inc["energy"]
+        for range_start, range_end in plan["raw"]:
+            edge = [r for r in readings if range_start <= r["timestamp"] < range_end
+                    or (range_end == end and r["timestamp"] == end)]
+            count += len(edge)
+            energy += sum(r["energy_consumed"] for r in edge)
+
+        expected = [r for r in readings if start <= r["timestamp"] <= end]
+        assert count == len(expected)
+        assert energy == pytest.approx(sum(r["energy_consumed"] for r in expected))
+
+
+class TestApplyRollups:
+    """Tests for write-time rollup maintenance."""
+
+    @patch("app.services.usage_rollups.USAGE_ROLLUPS", True)
+    @patch("app.services.usage_rollups.usd_c", new_callable=AsyncCollectionMock)
+    @patch("app.services.usage_rollups.ush_c", new_callable=AsyncCollectionMock)
+    def test_writes_hourly_and_daily(self, mock_hourly, mock_daily):
+        """Test that one bulk_write per period folds a whole batch."""
+        asyncio.run(apply_rollups([reading(0), reading(10), reading(70)]))
+
+        assert len(mock_hourly.bulk_write.call_args[0][0]) == 2
+        assert len(mock_daily.bulk_write.call_args[0][0]) == 1
+        assert mock_daily.bulk_write.call_args[1] == {"ordered": False}
+
+    @patch("app.services.usage_rollups.usd_c", new_callable=AsyncCollectionMock)
+    @patch("app.services.usage_rollups.ush_c", new_callable=AsyncCollectionMock)
+    def test_disabled(self, mock_hourly, mock_daily):
+        """Test that nothing is written unless USAGE_ROLLUPS is enabled."""
+        asyncio.run(apply_rollups([reading(0)]))
+
+        mock_hourly.bulk_write.assert_not_called()
+        mock_daily.bulk_write.assert_not_called()
+
+
+class TestAggregateUsage:
+    """Tests for reading totals back from rollups."""
+
+    @patch("app.services.usage_rollups.usd_c", new_callable=AsyncCollectionMock)
+    @patch("app.services.usage_rollups.ush_c", new_callable=AsyncCollectionMock)
+    def test_combines_buckets_and_edges(self, mock_hourly, mock_daily):
+        """Test that daily, hourly and raw totals are added together."""
+        raw = AsyncCollectionMock()
+        mock_daily.aggregate.return_value = MockCursor([{
+            "totals": [{"count": 10, "energy": 5.0, "duration": 600}],
+            "metrics": [{"_id": "power", "sum": 1000.0, "count": 10}],
+        }])
+        mock_hourly.aggregate.return_value = MockCursor([{
+            "totals": [{"count": 2, "energy": 1.0, "duration": 120}], "metrics": []
+        }])
+        raw.aggregate.return_value = MockCursor([{
+            "totals": [{"count": 1, "energy": 0.5, "duration": 60}],
+            "metrics": [{"_id": "power", "sum": 100.0, "count": 1}],
+        }])
+
+        totals = asyncio.run(aggregate_usage(
+            raw, ["device-id-123"], datetime(2024, 1, 1, 22, 30), datetime(2024, 1, 3, 1, 15)
+        ))
+
+        # One daily range, two hourly ranges and two raw edges
+        assert totals["count"] == 10 + 2 * 2 + 2 * 1
+        assert totals["energy"] == pytest.approx(5.0 + 2.0 + 1.0)
+        assert totals["metrics"]["power"] == {"sum": 1200.0, "count": 12}
+        assert raw.aggregate.call_args_list[-1][0][0][0]["$match"] == {
+            "device_id": "device-id-123",
+            "timestamp": {"$gte": datetime(2024, 1, 3, 1), "$lte": datetime(2024, 1, 3, 1, 15)},
+        }
+
+    def test_totals_pipeline(self):
+        """Test that the database totals readings like `summarize_readings`."""
+        usage = mongomock.MongoClient().db.usage
+        readings = [reading(0), reading(1, energy=1.0), reading(2, "device-b"), reading(3, "device-c")]
+        readings[1]["metrics"] = {"power": 300.0, "mode": "eco"}
+        del readings[0]["metrics"]
+        usage.insert_many([dict(document) for document in readings])
+
+        totals = facet_totals(list(usage.aggregate(
+            totals_pipeline({"device_id": {"$in": ["device-id-123", "device-b"]}})
+        )))
+
+        assert totals == summarize_readings(readings[:3])
+        assert totals["metrics"] == {"power": {"sum": 400.0, "count": 2}}
+
+    def test_bucket_totals_pipeline(self):
+        """Test that the database totals rollup buckets."""
+        hourly = mongomock.MongoClient().db.usage_hourly
+        hourly.insert_many([
+            {"device_id": "device-id-123", "start": START, "count": 2, "energy": 1.0, "duration": 120,
+             "metrics": {"power": {"sum": 200.0, "count": 2}}},
+            {"device_id": "device-b", "start": START, "count": 1, "energy": 0.5, "duration": 60,
+             "metrics": {"power": {"sum": 50.0, "count": 1}, "voltage": {"sum": 230.0, "count": 1}}},
+        ])
+
+        totals = facet_totals(list(hourly.aggregate(bucket_totals_pipeline({"start": START}))))
+
+        assert totals == {
+            "count": 3, "energy": 1.5, "duration": 180,
+            "metrics": {"power": {"sum": 250.0, "count": 3}, "voltage": {"sum": 230.0, "count": 1}},
+        }
+
+    def test_stored_bucket_totals_pipeline(self):
+        """Test that the database totals reading buckets from their stored totals."""
+        buckets = mongomock.MongoClient().db.usage_buckets
+        buckets.insert_one({
+            "device_id": "device-id-123", "start": START, "count": 2, "total_energy": 1.5, "total_duration": 120,
+            "ids": ["a", None, "c"], "offsets": [0, 60000, 120000],
+            "metrics": [{"power": 100.0, "mode": "eco"}, None, {"power": 300.0}],
+        })
+
+        totals = facet_totals(list(buckets.aggregate(stored_bucket_totals_pipeline())))
+
+        assert totals == {"count": 2, "energy": 1.5, "duration": 120, "metrics": {"power": {"sum": 400.0, "count": 2}}}
+
+    def test_rollups_and_raw_totals_agree_on_metrics(self):
+        """Test that bool and dotted metrics are left out of rollups and raw totals alike."""
+        usage = mongomock.MongoClient().db.usage
+        readings = [reading(0), reading(1)]
+        readings[0]["metrics"] = {"power": 100.0, "on": True, "phase.a": 5.0, "$bad": 1.0}
+        readings[1]["metrics"] = {"power": 300.0, "on": False, "": 2.0}
+        usage.insert_many([dict(document) for document in readings])
+
+        raw = facet_totals(list(usage.aggregate(totals_pipeline({}))))
+        (bucket,) = fold_readings(readings, HOUR).values()
+        rollup = facet_totals([{"metrics": [
+            {"_id": name, **metric} for name, metric in bucket.document("device-id-123", START)["metrics"].items()
+        ]}])
+
+        assert raw["metrics"] == rollup["metrics"] == {"power": {"sum": 400.0, "count": 2}}
+        assert summarize_readings(readings)["metrics"] == raw["metrics"]
+
+    def test_summarize_readings(self):
+        """Test that raw readings total like buckets."""
+        totals = summarize_readings([reading(0), reading(1)])
+
+        assert totals["count"] == 2
+        assert totals["metrics"] == {"power": {"sum": 200.0, "count": 2}}
+
+
+class TestBackfill:
+    """Tests for rebuilding rollups from raw readings."""
+
+    def database(self, readings):
+        """Raw readings in mongomock, rollup collections recording their writes."""
+        usage = mongomock.MongoClient().db.usage
+        usage.insert_many(readings)
+        return {"usage": usage, "usage_hourly": MagicMock(), "usage_daily": MagicMock()}
+
+    def test_backfill_replaces_buckets(self):
+        """Test that buckets are written as whole-document upserts."""
+        db = self.database([reading(minutes) for minutes in (0, 10, 70, 60 * 25)] + [reading(5, "device-b")])
+
+        counts = backfill_rollups(db, "usage")
+
+        assert counts == {"readings": 5, HOUR: 4, DAY: 3}
+        daily = db["usage_daily"].bulk_write.call_args[0][0]
+        assert all(isinstance(operation, ReplaceOne) and operation._upsert for operation in daily)
+        first_day = next(
+            operation._doc for operation in daily
+            if operation._filter == {"device_id": "device-id-123", "start": START}
+        )
+        assert first_day["count"] == 3
+        assert first_day["energy"] == 1.5
+        assert first_day["metrics"]["power"] == {"sum": 300.0, "count": 3}
+
+    def test_backfill_window(self):
+        """Test that --since/--until limit the rebuild to whole days."""
+        db = self.database([reading(minutes) for minutes in (0, 60 * 25, 60 * 49)])
+
+        counts = backfill_rollups(
+            db, "usage", since=START + timedelta(days=1, hours=5), until=START + timedelta(days=2)
+        )
+
+        assert counts["readings"] == 1
+        daily = db["usage_daily"].bulk_write.call_args[0][0]
+        assert [operation._filter["start"] for operation in daily] == [START + timedelta(days=1)]
+
+
+class TestAggregateRouteWithRollups:
+    """Tests for POST /usage/aggregate/ served from rollups."""
+
+    def setup_method(self):
+        app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_ADMIN)
+
+    def teardown_method(self):
+        app.dependency_overrides.clear()
+
+    @patch("app.routes.usage_routes.USAGE_ROLLUPS", True)
+    @patch("app.routes.usage_routes.aggregate_usage")
+    def test_aggregate_from_rollups(self, mock_aggregate):
+        """Test that the route reports rollup totals."""
+        mock_aggregate.return_value = {
+            "count": 4, "energy": 2.0, "duration": 240, "metrics": {"power": {"sum": 400.0, "count": 4}}
+        }
+
+        response = TestClient(app).post("/api/v1/usage/aggregate/", json={
+            "device_id": "device-id-123", "start_time": "2024-01-01T00:00:00", "end_time": "2024-01-05T00:00:00"
+        })
+
+        assert response.status_code == 200
+        assert response.json()["usage_count"] == 4
+        assert response.json()["average_metrics"] == {"power": 100.0}
+
+    @patch("app.routes.usage_routes.USAGE_ROLLUPS", True)
+    @patch("app.routes.usage_routes.aggregate_usage")
+    def test_aggregate_from_rollups_empty(self, mock_aggregate):
+        """Test that an empty range is still a 404."""
+        mock_aggregate.return_value = summarize_readings([])
+
+        response = TestClient(app).post("/api/v1/usage/aggregate/", json={
+            "device_id": "device-id-123", "start_time": "2024-01-01T00:00:00", "end_time": "2024-01-05T00:00:00"
+        })
+
+        assert response.status_code == 404
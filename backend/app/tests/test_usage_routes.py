@@ -1,17 +1,24 @@
 """
 Test file for usage routes.
 """
+import asyncio
+import json
 import sys
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from unittest.mock import AsyncMock, patch, MagicMock
 from datetime import datetime, timedelta, timezone
 
 # Import the app
 sys.path.append(".")
 from app.main import app
 from app.models.user import UserDB
-from app.models.usage import UsageDB
+from app.models.usage import UsageDB, UsageResponse
+from app.core.ownership import clear_ownership_caches, device_owner_cache
+from app.db.repository import projection_for
+from app.routes.usage_routes import ndjson_lines
+from app.tests.mocks import AsyncCollectionMock, MockCursor
 
 # Initialize test client
 client = TestClient(app)
@@ -85,35 +92,27 @@ MOCK_USAGE_2 = {
     "updated": None
 }
 
+# Answer of the totals pipeline for MOCK_USAGE_1 & MOCK_USAGE_2
+MOCK_AGGREGATE = {
+    "totals": [{"_id": None, "count": 2, "energy": 2.3, "duration": 5400}],
+    "metrics": [
+        {"_id": "temperature", "sum": 45.5, "count": 2},
+        {"_id": "humidity", "sum": 98, "count": 2},
+    ],
+}
+
 # Override auth dependency - default to admin
 from app.core.auth import get_current_user
 app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_ADMIN)
 
-# Define a simple list-like cursor mock that works with iteration
-class MockCursor:
-    def __init__(self, items):
-        self.items = items
-    
-    def skip(self, n):
-        return self
-    
-    def limit(self, n):
-        return self
-    
-    def sort(self, field, direction):
-        return self
-    
-    def __iter__(self):
-        return iter(self.items)
-
-
 class TestUsageRoutes:
     
     def setup_method(self):
         # Reset the auth dependency to admin for each test
         app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_ADMIN)
+        clear_ownership_caches()
     
-    @patch("app.routes.usage_routes.us_c")
+    @patch("app.routes.usage_routes.us_c", new_callable=AsyncCollectionMock)
     def test_get_all_usage_admin(self, mock_usage_collection):
         """Test getting all usage records as admin."""
         # Setup the mock to return our test usage records
@@ -133,15 +132,15 @@ class TestUsageRoutes:
         # Verify the mock was called
         mock_usage_collection.find.assert_called_once()
     
-    @patch("app.routes.usage_routes.us_c")
-    @patch("app.routes.usage_routes.d_c")
+    @patch("app.routes.usage_routes.us_c", new_callable=AsyncCollectionMock)
+    @patch("app.routes.usage_routes.d_c", new_callable=AsyncCollectionMock)
     def test_get_all_usage_user(self, mock_device_collection, mock_usage_collection):
         """Test getting all usage records as regular user."""
         # Set auth to regular user
         app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_USER)
         
         # Setup the mock for device collection to return user's devices
-        mock_device_collection.find.return_value = [MOCK_DEVICE_1]
+        mock_device_collection.find.return_value = MockCursor([MOCK_DEVICE_1])
         
         # Setup the mock for usage collection
         mock_cursor = MockCursor([MOCK_USAGE_1])
@@ -157,9 +156,19 @@ class TestUsageRoutes:
         assert usage_records[0]["id"] == MOCK_USAGE_1["id"]
         
         # Verify the device collection was queried for user's devices
-        mock_device_collection.find.assert_called_once_with({"user_id": MOCK_USER["id"]})
+        mock_device_collection.find.assert_called_once_with({"user_id": MOCK_USER["id"]}, {"_id": 0, "id": 1})
     
-    @patch("app.routes.usage_routes.us_c")
+    @patch("app.routes.usage_routes.check_device_ownership", new_callable=AsyncMock)
+    def test_get_all_usage_device_not_owned(self, mock_ownership):
+        """Test that a user cannot list the usage of another user's device."""
+        app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_USER)
+        mock_ownership.return_value = False
+        
+        response = client.get("/api/v1/usage/?device_id=other-device")
+        
+        assert response.status_code == 403
+    
+    @patch("app.routes.usage_routes.us_c", new_callable=AsyncCollectionMock)
     def test_get_usage_by_id_admin(self, mock_collection):
         """Test getting a usage record by ID as admin."""
         # Setup the mock
@@ -174,10 +183,10 @@ class TestUsageRoutes:
         assert usage["id"] == MOCK_USAGE_1["id"]
         
         # Verify the mock was called with correct parameters
-        mock_collection.find_one.assert_called_once_with({"id": MOCK_USAGE_1["id"]})
+        mock_collection.find_one.assert_called_once_with({"id": MOCK_USAGE_1["id"]}, projection_for(UsageResponse))
     
-    @patch("app.routes.usage_routes.us_c")
-    @patch("app.routes.usage_routes.check_device_ownership")
+    @patch("app.routes.usage_routes.us_c", new_callable=AsyncCollectionMock)
+    @patch("app.routes.usage_routes.check_device_ownership", new_callable=AsyncMock)
     def test_get_usage_by_id_user_owned(self, mock_check_ownership, mock_collection):
         """Test getting a usage record by ID as regular user (device owned by user)."""
         # Set auth to regular user
@@ -195,8 +204,8 @@ class TestUsageRoutes:
         usage = response.json()
         assert usage["id"] == MOCK_USAGE_1["id"]
     
-    @patch("app.routes.usage_routes.us_c")
-    @patch("app.routes.usage_routes.check_device_ownership")
+    @patch("app.routes.usage_routes.us_c", new_callable=AsyncCollectionMock)
+    @patch("app.routes.usage_routes.check_device_ownership", new_callable=AsyncMock)
     def test_get_usage_by_id_user_not_owned(self, mock_check_ownership, mock_collection):
         """Test getting a usage record by ID as regular user (device not owned by user)."""
         # Set auth to regular user
@@ -212,7 +221,7 @@ class TestUsageRoutes:
         # Verify response (should be forbidden)
         assert response.status_code == 403
     
-    @patch("app.routes.usage_routes.us_c")
+    @patch("app.routes.usage_routes.us_c_ingest", new_callable=AsyncCollectionMock)
     def test_create_usage_admin(self, mock_collection):
         """Test creating a usage record as admin."""
         # Setup the mocks
@@ -236,8 +245,8 @@ class TestUsageRoutes:
         # Verify mock calls
         assert mock_collection.insert_one.call_count == 1
     
-    @patch("app.routes.usage_routes.us_c")
-    @patch("app.routes.usage_routes.check_device_ownership")
+    @patch("app.routes.usage_routes.us_c_ingest", new_callable=AsyncCollectionMock)
+    @patch("app.routes.usage_routes.check_device_ownership", new_callable=AsyncMock)
     def test_create_usage_user_owned(self, mock_check_ownership, mock_collection):
         """Test creating a usage record as regular user (device owned by user)."""
         # Set auth to regular user
@@ -262,8 +271,8 @@ class TestUsageRoutes:
         usage = response.json()
         assert usage["device_id"] == "device-id-123"
     
-    @patch("app.routes.usage_routes.us_c")
-    @patch("app.routes.usage_routes.check_device_ownership")
+    @patch("app.routes.usage_routes.us_c_ingest", new_callable=AsyncCollectionMock)
+    @patch("app.routes.usage_routes.check_device_ownership", new_callable=AsyncMock)
     def test_create_usage_user_not_owned(self, mock_check_ownership, mock_collection):
         """Test creating a usage record as regular user (device not owned by user)."""
         # Set auth to regular user
@@ -286,7 +295,7 @@ class TestUsageRoutes:
         # Verify response (should be forbidden)
         assert response.status_code == 403
     
-    @patch("app.routes.usage_routes.us_c")
+    @patch("app.routes.usage_routes.us_c", new_callable=AsyncCollectionMock)
     def test_update_usage_admin(self, mock_collection):
         """Test updating a usage record as admin."""
         # Setup the mocks
@@ -303,11 +312,11 @@ class TestUsageRoutes:
         assert usage["status"] == "inactive"
         
         # Verify mock calls
-        mock_collection.find_one.assert_called_with({"id": MOCK_USAGE_1["id"]})
+        mock_collection.find_one.assert_called_with({"id": MOCK_USAGE_1["id"]}, projection_for(UsageResponse))
         mock_collection.update_one.assert_called_once()
     
-    @patch("app.routes.usage_routes.us_c")
-    @patch("app.routes.usage_routes.check_device_ownership")
+    @patch("app.routes.usage_routes.us_c", new_callable=AsyncCollectionMock)
+    @patch("app.routes.usage_routes.check_device_ownership", new_callable=AsyncMock)
     def test_update_usage_user_owned(self, mock_check_ownership, mock_collection):
         """Test updating a usage record as regular user (device owned by user)."""
         # Set auth to regular user
@@ -327,8 +336,8 @@ class TestUsageRoutes:
         usage = response.json()
         assert usage["status"] == "inactive"
     
-    @patch("app.routes.usage_routes.us_c")
-    @patch("app.routes.usage_routes.check_device_ownership")
+    @patch("app.routes.usage_routes.us_c", new_callable=AsyncCollectionMock)
+    @patch("app.routes.usage_routes.check_device_ownership", new_callable=AsyncMock)
     def test_update_usage_user_not_owned(self, mock_check_ownership, mock_collection):
         """Test updating a usage record as regular user (device not owned by user)."""
         # Set auth to regular user
@@ -345,7 +354,7 @@ class TestUsageRoutes:
         # Verify response (should be forbidden)
         assert response.status_code == 403
     
-    @patch("app.routes.usage_routes.us_c")
+    @patch("app.routes.usage_routes.us_c", new_callable=AsyncCollectionMock)
     def test_delete_usage_admin(self, mock_collection):
         """Test deleting a usage record as admin."""
         # Setup the mocks
@@ -362,8 +371,8 @@ class TestUsageRoutes:
         mock_collection.find_one.assert_called_once_with({"id": MOCK_USAGE_1["id"]})
         mock_collection.delete_one.assert_called_once_with({"id": MOCK_USAGE_1["id"]})
     
-    @patch("app.routes.usage_routes.us_c")
-    @patch("app.routes.usage_routes.check_device_ownership")
+    @patch("app.routes.usage_routes.us_c", new_callable=AsyncCollectionMock)
+    @patch("app.routes.usage_routes.check_device_ownership", new_callable=AsyncMock)
     def test_delete_usage_user_owned(self, mock_check_ownership, mock_collection):
         """Test deleting a usage record as regular user (device owned by user)."""
         # Set auth to regular user
@@ -380,8 +389,8 @@ class TestUsageRoutes:
         # Verify response
         assert response.status_code == 204
     
-    @patch("app.routes.usage_routes.us_c")
-    @patch("app.routes.usage_routes.check_device_ownership")
+    @patch("app.routes.usage_routes.us_c", new_callable=AsyncCollectionMock)
+    @patch("app.routes.usage_routes.check_device_ownership", new_callable=AsyncMock)
     def test_delete_usage_user_not_owned(self, mock_check_ownership, mock_collection):
         """Test deleting a usage record as regular user (device not owned by user)."""
         # Set auth to regular user
@@ -397,11 +406,22 @@ class TestUsageRoutes:
         # Verify response (should be forbidden)
         assert response.status_code == 403
     
-    @patch("app.routes.usage_routes.us_c")
+    @patch("app.routes.usage_routes.USAGE_BULK_MAX_RECORDS", 1)
+    @patch("app.routes.usage_routes.us_c_ingest", new_callable=AsyncCollectionMock)
+    def test_bulk_create_usage_too_many_records(self, mock_collection):
+        """Test that bulk uploads over the record limit are refused."""
+        record = {"device_id": "device-id-123", "metrics": {}}
+        response = client.post("/api/v1/usage/bulk", json={"records": [record, record]})
+        
+        assert response.status_code == 400
+        assert "limited to 1 records" in response.json()["detail"]
+        mock_collection.insert_many.assert_not_called()
+    
+    @patch("app.routes.usage_routes.us_c_ingest", new_callable=AsyncCollectionMock)
     def test_bulk_create_usage_admin(self, mock_collection):
         """Test bulk creating usage records as admin."""
         # Setup the mocks
-        mock_collection.insert_one.return_value = MagicMock()
+        mock_collection.insert_many.return_value = MagicMock()
         
         # Call the endpoint
         bulk_data = {
@@ -426,24 +446,30 @@ class TestUsageRoutes:
         
         # Verify response
         assert response.status_code == 201
-        usage_records = response.json()
-        assert len(usage_records) == 2
-        
-        # Verify mock calls
-        assert mock_collection.insert_one.call_count == 2
+        result = response.json()
+        assert result["inserted"] == 2
+        assert result["failed"] == 0
+        assert [record["status"] for record in result["results"]] == ["created", "created"]
+        
+        # Verify one unordered insert for the whole batch
+        mock_collection.insert_many.assert_called_once()
+        documents = mock_collection.insert_many.call_args[0][0]
+        assert len(documents) == 2
+        assert mock_collection.insert_many.call_args[1]["ordered"] is False
+        mock_collection.insert_one.assert_not_called()
     
-    @patch("app.routes.usage_routes.us_c")
-    @patch("app.routes.usage_routes.check_device_ownership")
-    def test_bulk_create_usage_user(self, mock_check_ownership, mock_collection):
+    @patch("app.routes.usage_routes.us_c_ingest", new_callable=AsyncCollectionMock)
+    @patch("app.routes.usage_routes.d_c", new_callable=AsyncCollectionMock)
+    def test_bulk_create_usage_user(self, mock_device_collection, mock_collection):
         """Test bulk creating usage records as regular user."""
         # Set auth to regular user
         app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_USER)
         
         # Setup the mocks
-        mock_collection.insert_one.return_value = MagicMock()
+        mock_collection.insert_many.return_value = MagicMock()
         
         # First device is owned, second is not
-        mock_check_ownership.side_effect = [True, False]
+        mock_device_collection.find.return_value = MockCursor([{"id": "device-id-123"}])
         
         # Call the endpoint
         bulk_data = {
@@ -468,13 +494,205 @@ class TestUsageRoutes:
         
         # Verify response (should be forbidden because of second device)
         assert response.status_code == 403
+        
+        # Verify ownership was checked with one query for the batch
+        mock_device_collection.find.assert_called_once()
+        query = mock_device_collection.find.call_args[0][0]
+        assert set(query["id"]["$in"]) == {"device-id-123", "device-id-456"}
+        assert query["user_id"] == MOCK_USER["id"]
+        mock_collection.insert_many.assert_not_called()
+    
+    @patch("app.routes.usage_routes.us_c_ingest", new_callable=AsyncCollectionMock)
+    def test_bulk_create_usage_reports_duplicates(self, mock_collection):
+        """Test that a duplicate key fails only its own record."""
+        mock_collection.insert_many.side_effect = BulkWriteError({
+            "writeErrors": [{"index": 1, "code": 11000, "errmsg": "E11000 duplicate key error"}],
+            "nInserted": 2
+        })
+        
+        record = {"device_id": "device-id-123", "metrics": {"temperature": 22.5}}
+        response = client.post("/api/v1/usage/bulk", json={"records": [record, record, record]})
+        
+        assert response.status_code == 201
+        result = response.json()
+        assert result["inserted"] == 2
+        assert result["duplicates"] == 1
+        assert result["failed"] == 0
+        assert [r["status"] for r in result["results"]] == ["created", "duplicate", "created"]
+        assert result["results"][1]["index"] == 1
+    
+    @patch("app.routes.usage_routes.USAGE_NATURAL_KEY", True)
+    @patch("app.routes.usage_routes.us_c", new_callable=AsyncCollectionMock)
+    @patch("app.routes.usage_routes.us_c_ingest", new_callable=AsyncCollectionMock)
+    def test_create_usage_replay_absorbed(self, mock_ingest, mock_collection):
+        """Test that a replayed reading returns the stored record instead of failing."""
+        mock_ingest.insert_one.side_effect = DuplicateKeyError(
+            "E11000", 11000, {"keyPattern": {"device_id": 1, "timestamp": 1}}
+        )
+        mock_collection.find_one.return_value = MOCK_USAGE_1
+        
+        response = client.post("/api/v1/usage/", json={
+            "device_id": MOCK_USAGE_1["device_id"],
+            "metrics": MOCK_USAGE_1["metrics"],
+            "timestamp": MOCK_USAGE_1["timestamp"].isoformat(),
+        })
+        
+        assert response.status_code == 200
+        assert response.json()["id"] == MOCK_USAGE_1["id"]
+        query = mock_collection.find_one.call_args[0][0]
+        assert query["device_id"] == MOCK_USAGE_1["device_id"]
+        assert "timestamp" in query
+    
+    @patch("app.routes.usage_routes.us_c_ingest", new_callable=AsyncCollectionMock)
+    def test_bulk_create_usage_replay(self, mock_collection):
+        """Test that a fully replayed batch succeeds and reports duplicates."""
+        mock_collection.insert_many.side_effect = BulkWriteError({
+            "writeErrors": [
+                {"index": n, "code": 11000, "errmsg": "E11000", "keyPattern": {"device_id": 1, "timestamp": 1}}
+                for n in range(2)
+            ]
+        })
+        record = {"device_id": "device-id-123", "metrics": {}, "timestamp": current_time.isoformat()}
+        
+        response = client.post("/api/v1/usage/bulk", json={"records": [record, record]})
+        
+        assert response.status_code == 201
+        result = response.json()
+        assert result["inserted"] == 0
+        assert result["duplicates"] == 2
+        assert result["failed"] == 0
+        assert "already stored" in result["results"][0]["error"]
+    
+    @patch("app.routes.usage_routes.us_c_ingest", new_callable=AsyncCollectionMock)
+    def test_stream_usage_duplicates_not_rejected(self, mock_collection):
+        """Test that replayed lines are counted as duplicates, not rejections."""
+        mock_collection.insert_many.side_effect = BulkWriteError({
+            "writeErrors": [{"index": 1, "code": 11000, "errmsg": "E11000"}]
+        })
+        record = json.dumps({"device_id": "device-id-123", "metrics": {}})
+        
+        response = client.post("/api/v1/usage/stream", content=f"{record}\n{record}\n")
+        
+        summary = response.json()
+        assert summary["accepted"] == 1
+        assert summary["duplicates"] == 1
+        assert summary["rejected"] == 0
+        assert summary["errors"] == []
+    
+    @patch("app.routes.usage_routes.USAGE_STREAM_BATCH_SIZE", 2)
+    @patch("app.routes.usage_routes.us_c_ingest", new_callable=AsyncCollectionMock)
+    def test_stream_usage_admin(self, mock_collection):
+        """Test streaming NDJSON usage as admin with bad lines mixed in."""
+        mock_collection.insert_many.return_value = MagicMock()
+        
+        record = json.dumps({"device_id": "device-id-123", "metrics": {"temperature": 22.5}})
+        body = "\n".join([
+            record,
+            "{not json",
+            record,
+            "",
+            json.dumps({"device_id": "device-id-123", "metrics": {}, "energy_consumed": -1}),
+            record,
+        ])
+        response = client.post(
+            "/api/v1/usage/stream", content=body, headers={"Content-Type": "application/x-ndjson"}
+        )
+        
+        assert response.status_code == 200
+        summary = response.json()
+        assert summary["lines"] == 5
+        assert summary["accepted"] == 3
+        assert summary["rejected"] == 2
+        assert [error["line"] for error in summary["errors"]] == [2, 5]
+        assert "energy_consumed" in summary["errors"][1]["error"]
+        
+        # Records are written in batches, not one by one
+        assert summary["batches"] == 2
+        assert [len(call[0][0]) for call in mock_collection.insert_many.call_args_list] == [2, 1]
+        mock_collection.insert_one.assert_not_called()
+    
+    @patch("app.routes.usage_routes.us_c_ingest", new_callable=AsyncCollectionMock)
+    @patch("app.routes.usage_routes.d_c", new_callable=AsyncCollectionMock)
+    def test_stream_usage_user(self, mock_device_collection, mock_collection):
+        """Test that streamed lines for devices the user does not own are rejected."""
+        app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_USER)
+        mock_collection.insert_many.return_value = MagicMock()
+        mock_device_collection.find.return_value = MockCursor([{"id": "device-id-123"}])
+        
+        body = "\n".join(
+            json.dumps({"device_id": device_id, "metrics": {"power": 10}})
+            for device_id in ["device-id-123", "device-id-456", "device-id-123"]
+        ) + "\n"
+        response = client.post("/api/v1/usage/stream", content=body)
+        
+        assert response.status_code == 200
+        summary = response.json()
+        assert summary["accepted"] == 2
+        assert summary["rejected"] == 1
+        assert summary["errors"][0]["line"] == 2
+        mock_device_collection.find.assert_called_once()
+        documents = mock_collection.insert_many.call_args[0][0]
+        assert {document["device_id"] for document in documents} == {"device-id-123"}
+    
+    @patch("app.routes.usage_routes.us_c_ingest", new_callable=AsyncCollectionMock)
+    def test_stream_usage_empty(self, mock_collection):
+        """Test that an upload without records is rejected."""
+        response = client.post("/api/v1/usage/stream", content="\n\n")
+        
+        assert response.status_code == 400
+        mock_collection.insert_many.assert_not_called()
+    
+    def test_ndjson_lines(self):
+        """Test line splitting across chunk boundaries and oversized lines."""
+        async def chunks():
+            for chunk in [b'{"a"', b': 1}\n{"b": 2}\n', b"x" * 20, b"y\n", b'{"c": 3}']:
+                yield chunk
+        
+        async def collect():
+            return [item async for item in ndjson_lines(chunks(), max_line_bytes=16)]
+        
+        assert asyncio.run(collect()) == [
+            (1, b'{"a": 1}'), (2, b'{"b": 2}'), (3, None), (4, b'{"c": 3}')
+        ]
+    
+    @patch("app.routes.usage_routes.us_c", new_callable=AsyncCollectionMock)
+    @patch("app.routes.usage_routes.d_c", new_callable=AsyncCollectionMock)
+    def test_ownership_cached_between_requests(self, mock_device_collection, mock_usage_collection):
+        """Test that repeated requests for one device look up its owner once."""
+        app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_USER)
+        mock_device_collection.find_one.return_value = {"user_id": MOCK_USER["id"]}
+        mock_usage_collection.find_one.return_value = MOCK_USAGE_1
+        
+        for _ in range(3):
+            response = client.get(f"/api/v1/usage/{MOCK_USAGE_1['id']}")
+            assert response.status_code == 200
+        
+        mock_device_collection.find_one.assert_called_once()
+        assert device_owner_cache.stats()["hits"] == 2
     
-    @patch("app.routes.usage_routes.us_c")
+    @patch("app.routes.usage_routes.us_c", new_callable=AsyncCollectionMock)
+    @patch("app.routes.usage_routes.d_c", new_callable=AsyncCollectionMock)
+    def test_user_device_list_cached(self, mock_device_collection, mock_usage_collection):
+        """Test that a user's device list is read once across listings."""
+        app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_USER)
+        mock_device_collection.find.return_value = MockCursor([MOCK_DEVICE_1])
+        mock_usage_collection.find.return_value = MockCursor([MOCK_USAGE_1])
+        
+        client.get("/api/v1/usage/")
+        client.get("/api/v1/usage/")
+        # The listing also taught the owner cache about the user's devices
+        mock_usage_collection.find_one.return_value = MOCK_USAGE_1
+        response = client.get(f"/api/v1/usage/{MOCK_USAGE_1['id']}")
+        
+        assert response.status_code == 200
+        mock_device_collection.find.assert_called_once()
+        mock_device_collection.find_one.assert_not_called()
+    
+    @patch("app.routes.usage_routes.us_c_analytics", new_callable=AsyncCollectionMock)
     def test_get_usage_aggregate_admin(self, mock_collection):
         """Test getting aggregated usage statistics as admin."""
         # Setup the mocks
-        mock_cursor = MockCursor([MOCK_USAGE_1, MOCK_USAGE_2])
-        mock_collection.find.return_value = mock_cursor
+        mock_collection.aggregate.return_value = MockCursor([MOCK_AGGREGATE])
         
         # Call the endpoint
         start_time = current_time - timedelta(hours=2)
@@ -490,22 +708,25 @@ class TestUsageRoutes:
         assert response.status_code == 200
         usage_aggregate = response.json()
         assert usage_aggregate["device_id"] == "device-id-123"
-        assert "total_duration" in usage_aggregate
-        assert "total_energy" in usage_aggregate
-        
-        # Verify mock calls
-        mock_collection.find.assert_called_once()
+        assert usage_aggregate["total_duration"] == 5400
+        assert usage_aggregate["total_energy"] == pytest.approx(2.3)
+        assert usage_aggregate["average_metrics"] == {"temperature": 22.75, "humidity": 49}
+        assert usage_aggregate["usage_count"] == 2
+        
+        # Verify the database did the totalling
+        mock_collection.find.assert_not_called()
+        pipeline = mock_collection.aggregate.call_args[0][0]
+        assert pipeline[0]["$match"]["device_id"] == "device-id-123"
     
-    @patch("app.routes.usage_routes.us_c")
-    @patch("app.routes.usage_routes.check_device_ownership")
+    @patch("app.routes.usage_routes.us_c_analytics", new_callable=AsyncCollectionMock)
+    @patch("app.routes.usage_routes.check_device_ownership", new_callable=AsyncMock)
     def test_get_usage_aggregate_user_owned(self, mock_check_ownership, mock_collection):
         """Test getting aggregated usage statistics as regular user (device owned by user)."""
         # Set auth to regular user
         app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_USER)
         
         # Setup the mocks
-        mock_cursor = MockCursor([MOCK_USAGE_1])
-        mock_collection.find.return_value = mock_cursor
+        mock_collection.aggregate.return_value = MockCursor([MOCK_AGGREGATE])
         mock_check_ownership.return_value = True  # User owns the device
         
         # Call the endpoint
@@ -523,7 +744,7 @@ class TestUsageRoutes:
         usage_aggregate = response.json()
         assert usage_aggregate["device_id"] == "device-id-123"
     
-    @patch("app.routes.usage_routes.check_device_ownership")
+    @patch("app.routes.usage_routes.check_device_ownership", new_callable=AsyncMock)
     def test_get_usage_aggregate_user_not_owned(self, mock_check_ownership):
         """Test getting aggregated usage statistics as regular user (device not owned by user)."""
         # Set auth to regular user
@@ -545,7 +766,74 @@ class TestUsageRoutes:
         # Verify response (should be forbidden)
         assert response.status_code == 403
 
-    @patch("app.routes.usage_routes.us_c")
+    @patch("app.routes.usage_routes.us_c_analytics", new_callable=AsyncCollectionMock)
+    @patch("app.routes.usage_routes.owned_device_ids", new_callable=AsyncMock)
+    def test_get_usage_aggregate_multiple_devices(self, mock_owned, mock_collection):
+        """Test aggregating several devices in one call."""
+        app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_USER)
+        mock_owned.return_value = {"device-id-123", "device-id-456"}
+        mock_collection.aggregate.return_value = MockCursor([MOCK_AGGREGATE])
+        
+        response = client.post("/api/v1/usage/aggregate/", json={
+            "start_time": (current_time - timedelta(hours=2)).isoformat(),
+            "end_time": current_time.isoformat(),
+            "device_id": "device-id-123",
+            "device_ids": ["device-id-456", "device-id-123"]
+        })
+        
+        assert response.status_code == 200
+        assert response.json()["device_id"] is None
+        assert response.json()["device_ids"] == ["device-id-123", "device-id-456"]
+        pipeline = mock_collection.aggregate.call_args[0][0]
+        assert pipeline[0]["$match"]["device_id"] == {"$in": ["device-id-123", "device-id-456"]}
+    
+    @patch("app.routes.usage_routes.owned_device_ids", new_callable=AsyncMock)
+    def test_get_usage_aggregate_multiple_devices_not_owned(self, mock_owned):
+        """Test that one device the user does not own forbids the whole call."""
+        app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_USER)
+        mock_owned.return_value = {"device-id-123"}
+        
+        response = client.post("/api/v1/usage/aggregate/", json={
+            "start_time": (current_time - timedelta(hours=2)).isoformat(),
+            "end_time": current_time.isoformat(),
+            "device_ids": ["device-id-123", "device-id-456"]
+        })
+        
+        assert response.status_code == 403
+    
+    @patch("app.routes.usage_routes.us_c_analytics", new_callable=AsyncCollectionMock)
+    @patch("app.routes.usage_routes.user_device_ids", new_callable=AsyncMock)
+    def test_get_usage_aggregate_all_user_devices(self, mock_user_devices, mock_collection):
+        """Test that without devices every device of the user is aggregated."""
+        app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_USER)
+        mock_user_devices.return_value = ["device-id-123", "device-id-789"]
+        mock_collection.aggregate.return_value = MockCursor([MOCK_AGGREGATE])
+        
+        response = client.post("/api/v1/usage/aggregate/", json={
+            "start_time": (current_time - timedelta(hours=2)).isoformat(),
+            "end_time": current_time.isoformat()
+        })
+        
+        assert response.status_code == 200
+        assert response.json()["device_ids"] == ["device-id-123", "device-id-789"]
+        pipeline = mock_collection.aggregate.call_args[0][0]
+        assert pipeline[0]["$match"]["device_id"] == {"$in": ["device-id-123", "device-id-789"]}
+    
+    @patch("app.routes.usage_routes.us_c_analytics", new_callable=AsyncCollectionMock)
+    def test_get_usage_aggregate_all_devices_admin(self, mock_collection):
+        """Test that an admin without devices aggregates every device."""
+        mock_collection.aggregate.return_value = MockCursor([{"totals": [], "metrics": []}])
+        
+        response = client.post("/api/v1/usage/aggregate/", json={
+            "start_time": (current_time - timedelta(hours=2)).isoformat(),
+            "end_time": current_time.isoformat()
+        })
+        
+        # Nothing in the range
+        assert response.status_code == 404
+        assert "device_id" not in mock_collection.aggregate.call_args[0][0][0]["$match"]
+
+    @patch("app.routes.usage_routes.us_c", new_callable=AsyncCollectionMock)
     def test_get_usage_not_found(self, mock_collection):
         """Test getting a non-existent usage record."""
         # Setup the mock
@@ -558,7 +846,7 @@ class TestUsageRoutes:
         assert response.status_code == 404
         assert "not found" in response.json()["detail"]
     
-    @patch("app.routes.usage_routes.us_c")
+    @patch("app.routes.usage_routes.us_c", new_callable=AsyncCollectionMock)
     def test_update_usage_validation_error(self, mock_collection):
         """Test updating a usage record with invalid data."""
         # Setup the mocks
@@ -0,0 +1,230 @@
+"""
+Test suite for time-bucketed usage series.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, patch
+
+from app.main import app
+from app.core.auth import get_current_user
+from app.models.usage import SeriesFill, SeriesInterval
+from app.models.user import UserDB
+from app.services.usage_buckets import BucketedUsage
+from app.services.usage_series import (
+    SeriesError, fill_series, series_axis, series_pipeline, truncate, usage_series
+)
+from app.tests.mocks import AsyncCollectionMock, MockCursor
+
+MOCK_USER = {
+    "id": "user-id-456",
+    "username": "testuser",
+    "email": "user@example.com",
+    "hashed_password": "hashed_password",
+    "role": "user"
+}
+
+START = datetime(2025, 1, 1)
+
+
+def group(device_id: str, start: datetime, total: float, count: int = 1) -> dict:
+    """A `{_id: {device_id, t}, sum, n}` document answered by the series pipeline."""
+    return {"_id": {"device_id": device_id, "t": start}, "sum": total, "n": count}
+
+
+class TestAxis:
+    """Tests for bucket alignment."""
+
+    def test_truncate(self):
+        """Test that weeks start on Monday and months on the first."""
+        moment = datetime(2025, 1, 16, 13, 45, 12)  # A Thursday
+
+        assert truncate(moment, SeriesInterval.MINUTE) == datetime(2025, 1, 16, 13, 45)
+        assert truncate(moment, SeriesInterval.HOUR) == datetime(2025, 1, 16, 13)
+        assert truncate(moment, SeriesInterval.DAY) == datetime(2025, 1, 16)
+        assert truncate(moment, SeriesInterval.WEEK) == datetime(2025, 1, 13)
+        assert truncate(moment, SeriesInterval.MONTH) == datetime(2025, 1, 1)
+
+    def test_axis_covers_partial_buckets(self):
+        """Test that the first and last buckets are included even if partial."""
+        axis = series_axis(datetime(2024, 11, 20), datetime(2025, 2, 3), SeriesInterval.MONTH)
+
+        assert axis == [datetime(2024, 11, 1), datetime(2024, 12, 1), datetime(2025, 1, 1), datetime(2025, 2, 1)]
+
+    def test_axis_limit(self):
+        """Test that an axis longer than the limit is refused."""
+        with pytest.raises(SeriesError):
+            series_axis(START, START + timedelta(days=1), SeriesInterval.MINUTE, max_points=1000)
+
+
+class TestPipeline:
+    """Tests for the grouping pipeline."""
+
+    def test_groups_readings_by_device_and_bucket(self):
+        """Test that readings are summed per device & truncated timestamp."""
+        pipeline = series_pipeline({"device_id": "d"}, "timestamp", SeriesInterval.WEEK, "energy")
+
+        assert pipeline[1]["$group"] == {
+            "_id": {
+                "device_id": "$device_id",
+                "t": {"$dateTrunc": {"date": "$timestamp", "unit": "week", "startOfWeek": "monday"}},
+            },
+            "sum": {"$sum": "$energy_consumed"},
+            "n": {"$sum": 1},
+        }
+
+    def test_metric_from_rollups(self):
+        """Test that metric averages read the rollup sums and counts."""
+        pipeline = series_pipeline({}, "start", SeriesInterval.DAY, "power", rollup=True)
+
+        assert pipeline[1]["$group"]["sum"] == {"$sum": "$metrics.power.sum"}
+        assert pipeline[1]["$group"]["n"] == {"$sum": "$metrics.power.count"}
+
+    def test_rejects_field_paths(self):
+        """Test that a value cannot reach outside the metrics."""
+        with pytest.raises(SeriesError):
+            series_pipeline({}, "timestamp", SeriesInterval.DAY, "$where")
+
+
+class TestFill:
+    """Tests for gap filling."""
+
+    buckets = {("d", START): [2.0, 2], ("d", START + timedelta(hours=2)): [3.0, 1]}
+    axis = [START + timedelta(hours=n) for n in range(4)]
+
+    @pytest.mark.parametrize("fill, expected", [
+        (SeriesFill.NULL, [2.0, None, 3.0, None]),
+        (SeriesFill.ZERO, [2.0, 0, 3.0, 0]),
+        (SeriesFill.PREVIOUS, [2.0, 2.0, 3.0, 3.0]),
+    ])
+    def test_totals(self, fill, expected):
+        """Test that empty buckets are filled as asked."""
+        assert fill_series(self.axis, ["d", "e"], self.buckets, "energy", fill) == {
+            "d": expected, "e": [0] * 4 if fill == SeriesFill.ZERO else [None] * 4
+        }
+
+    def test_metric_average(self):
+        """Test that metric buckets hold averages."""
+        assert fill_series(self.axis, ["d"], self.buckets, "power", SeriesFill.NULL)["d"][0] == 1.0
+
+
+class TestUsageSeries:
+    """Tests for assembling a series."""
+
+    def test_raw_readings(self):
+        """Test that without rollups one pipeline over the readings answers the series."""
+        raw = AsyncCollectionMock()
+        raw.aggregate.return_value = MockCursor([
+            group("a", START, 1.5, 3), group("b", START + timedelta(hours=1), 0.5),
+        ])
+
+        axis, series = asyncio.run(usage_series(
+            raw, ["a", "b"], START, START + timedelta(hours=1, minutes=30), SeriesInterval.HOUR
+        ))
+
+        assert axis == [START, START + timedelta(hours=1)]
+        assert series == {"a": [1.5, None], "b": [None, 0.5]}
+        assert raw.aggregate.call_args[0][0][0]["$match"] == {
+            "device_id": {"$in": ["a", "b"]},
+            "timestamp": {"$gte": START, "$lte": START + timedelta(hours=1, minutes=30)},
+        }
+
+    def test_bucketed_storage(self):
+        """Test that whole buckets are grouped on their stored totals and only the partial hour unwound."""
+        store = BucketedUsage(AsyncCollectionMock())
+        store.collection.aggregate.side_effect = [
+            MockCursor([group("a", START, 0.5, 2)]), MockCursor([group("a", START + timedelta(hours=1), 0.25)])
+        ]
+
+        axis, series = asyncio.run(usage_series(
+            store, ["a"], START, START + timedelta(hours=1, minutes=30), SeriesInterval.HOUR, fill=SeriesFill.ZERO
+        ))
+
+        assert series == {"a": [0.5, 0.25]}
+        whole, edges = [call[0][0] for call in store.collection.aggregate.call_args_list]
+        assert whole[0] == {"$match": {"device_id": "a", "start": {"$gte": START, "$lte": START}}}
+        assert whole[1]["$group"]["sum"] == {"$sum": "$total_energy"}
+        assert {"$unwind": {"path": "$ids", "includeArrayIndex": "slot"}} in edges
+
+    @patch("app.services.usage_series.USAGE_ROLLUPS", True)
+    @patch("app.services.usage_series.usd_c", new_callable=AsyncCollectionMock)
+    @patch("app.services.usage_series.ush_c", new_callable=AsyncCollectionMock)
+    def test_rollups(self, mock_hourly, mock_daily):
+        """Test that whole days & hours come from rollups and only the edges from readings."""
+        raw = AsyncCollectionMock()
+        raw.aggregate.return_value = MockCursor([group("a", START, 0.1)])
+        mock_hourly.aggregate.return_value = MockCursor([group("a", START, 1.0)])
+        mock_daily.aggregate.return_value = MockCursor([group("a", START + timedelta(days=1), 24.0, 24)])
+
+        axis, series = asyncio.run(usage_series(
+            raw, ["a"], START + timedelta(minutes=30), START + timedelta(days=2, minutes=10), SeriesInterval.DAY
+        ))
+
+        assert axis == [START, START + timedelta(days=1), START + timedelta(days=2)]
+        # Day 0: two raw edges & the hourly rollups; day 1: the daily rollup; day 2: only the raw edge
+        assert series["a"][1] == 24.0
+        assert mock_daily.aggregate.call_args[0][0][0]["$match"]["start"] == {
+            "$gte": START + timedelta(days=1), "$lt": START + timedelta(days=2)
+        }
+        assert raw.aggregate.call_count == 2
+
+
+@patch("app.routes.usage_routes.us_c_analytics", new_callable=AsyncCollectionMock)
+class TestSeriesRoute:
+    """Tests for GET /usage/series."""
+
+    def setup_method(self):
+        app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_USER)
+
+    def teardown_method(self):
+        app.dependency_overrides.clear()
+
+    def params(self, **extra) -> dict:
+        return {"start_time": START.isoformat(), "end_time": (START + timedelta(hours=2)).isoformat(), **extra}
+
+    @patch("app.routes.usage_routes.owned_device_ids", new_callable=AsyncMock)
+    def test_series_for_devices(self, mock_owned, mock_usage):
+        """Test that listed devices get one value per bucket."""
+        mock_owned.return_value = {"a", "b"}
+        mock_usage.aggregate.return_value = MockCursor([group("a", START + timedelta(hours=1), 0.75)])
+
+        response = TestClient(app).get("/api/v1/usage/series", params=self.params(device_id=["a", "b"]))
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["timestamps"] == ["2025-01-01T00:00:00", "2025-01-01T01:00:00", "2025-01-01T02:00:00"]
+        assert body["series"] == {"a": [None, 0.75, None], "b": [None, None, None]}
+
+    @patch("app.routes.usage_routes.owned_device_ids", new_callable=AsyncMock)
+    def test_series_not_owned(self, mock_owned, mock_usage):
+        """Test that a device the user does not own is forbidden."""
+        mock_owned.return_value = {"a"}
+
+        response = TestClient(app).get("/api/v1/usage/series", params=self.params(device_id=["a", "b"]))
+
+        assert response.status_code == 403
+
+    @patch("app.routes.usage_routes.d_c", new_callable=AsyncCollectionMock)
+    def test_series_for_room(self, mock_devices, mock_usage):
+        """Test that a room charts the user's devices in it."""
+        mock_devices.find.return_value = MockCursor([{"id": "a"}])
+        mock_usage.aggregate.return_value = MockCursor([])
+
+        response = TestClient(app).get(
+            "/api/v1/usage/series", params=self.params(room_id="room-1", interval="day", fill="zero")
+        )
+
+        assert response.status_code == 200
+        assert response.json()["series"] == {"a": [0]}
+        assert mock_devices.find.call_args[0][0] == {"room_id": "room-1", "user_id": "user-id-456"}
+
+    @patch("app.routes.usage_routes.user_device_ids", new_callable=AsyncMock)
+    def test_series_bad_value(self, mock_user_devices, mock_usage):
+        """Test that an unknown value is a client error."""
+        mock_user_devices.return_value = ["a"]
+
+        response = TestClient(app).get("/api/v1/usage/series", params=self.params(value="metrics.power"))
+
+        assert response.status_code == 400
@@ -10,7 +10,10 @@ from datetime import datetime
 # Import the app
 sys.path.append(".")
 from app.main import app
-from app.models.user import UserDB
+from app.core import password
+from app.models.user import UserDB, UserResponse
+from app.db.repository import projection_for
+from app.tests.mocks import AsyncCollectionMock, MockCursor
 
 # Initialize test client
 client = TestClient(app)
@@ -44,24 +47,9 @@ MOCK_USER = {
 from app.core.auth import get_current_user
 app.dependency_overrides[get_current_user] = lambda: UserDB(**MOCK_ADMIN)
 
-# Define a simple list-like cursor mock that works with iteration
-class MockCursor:
-    def __init__(self, items):
-        self.items = items
-    
-    def skip(self, n):
-        return self
-    
-    def limit(self, n):
-        return self
-    
-    def __iter__(self):
-        return iter(self.items)
-
-
 class TestUserRoutes:
     
-    @patch("app.routes.user_routes.u_c")
+    @patch("app.routes.user_routes.u_c", new_callable=AsyncCollectionMock)
     def test_get_all_users(self, mock_collection):
         """Test getting all users."""
         # Setup the mock to return our test users
@@ -81,7 +69,7 @@ class TestUserRoutes:
         # Verify the mock was called
         mock_collection.find.assert_called_once()
     
-    @patch("app.routes.user_routes.u_c")
+    @patch("app.routes.user_routes.u_c", new_callable=AsyncCollectionMock)
     def test_get_user_by_id(self, mock_collection):
         """Test getting a user by ID."""
         # Setup the mock
@@ -96,9 +84,28 @@ class TestUserRoutes:
         assert user["id"] == MOCK_USER["id"]
         
         # Verify the mock was called with correct parameters
-        mock_collection.find_one.assert_called_once_with({"id": MOCK_USER["id"]})
+        mock_collection.find_one.assert_called_once_with({"id": MOCK_USER["id"]}, projection_for(UserResponse))
+    
+    @patch("app.routes.user_routes.u_c", new_callable=AsyncCollectionMock)
+    def test_create_user_pool_saturated(self, mock_collection):
+        """Test that a saturated password pool is reported as 503 with Retry-After."""
+        mock_collection.find_one.return_value = None
+        limit = password.PASSWORD_POOL_SIZE + password.PASSWORD_POOL_QUEUE
+        
+        with patch.object(password, "PASSWORD_POOL_SIZE", max(1, password.PASSWORD_POOL_SIZE)), \
+             patch.object(password, "_in_flight", limit + 1):
+            response = client.post("/api/v1/users/", json={
+                "username": "newuser",
+                "email": "new@example.com",
+                "password": "Password123!",
+                "role": "user"
+            })
+        
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        mock_collection.insert_one.assert_not_called()
     
-    @patch("app.routes.user_routes.u_c")
+    @patch("app.routes.user_routes.u_c", new_callable=AsyncCollectionMock)
     def test_create_user(self, mock_collection):
         """Test creating a user."""
         # Setup the mocks
@@ -5,7 +5,7 @@ import os
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple, Any
+from typing import List, Dict, Optional, Tuple, Any, Union
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from matplotlib.backends.backend_pdf import PdfPages
@@ -34,12 +34,12 @@ class EnergyReportGenerator:
     Enhanced energy report generator with advanced analytics and visualizations
     """
     
-    def __init__(self, energy_data: List[Dict], user_data: Optional[Dict] = None):
+    def __init__(self, energy_data: Union[List[Dict], pd.DataFrame], user_data: Optional[Dict] = None):
         """
         Initialize the report generator with energy consumption data
         
         Args:
-            energy_data (List[Dict]): Energy consumption records
+            energy_data (Union[List[Dict], pd.DataFrame]): Energy consumption records, or a DataFrame of them
             user_data (Optional[Dict]): User information for personalization
         """
         # Convert data to pandas DataFrame for easier analysis
@@ -737,7 +737,7 @@ class EnergyReportGenerator:
 
 # Function to generate energy report
 def generate_energy_report(
-    energy_data: List[Dict], 
+    energy_data: Union[List[Dict], pd.DataFrame], 
     user_data: Optional[Dict] = None,
     format: str = 'pdf',
     start_date: Optional[str] = None,
@@ -747,7 +747,7 @@ def generate_energy_report(
     Generate a comprehensive energy consumption report
     
     Args:
-        energy_data (List[Dict]): Energy consumption records
+        energy_data (Union[List[Dict], pd.DataFrame]): Energy consumption records, or a DataFrame of them
         user_data (Optional[Dict]): User information for personalization
         format (str): Report format ('pdf' or 'csv')
         start_date (Optional[str]): Start date filter in YYYY-MM-DD format
@@ -762,10 +762,14 @@ def generate_energy_report(
             start_dt = datetime.strptime(start_date, "%Y-%m-%d")
             end_dt = datetime.strptime(end_date, "%Y-%m-%d")
             
-            filtered_data = [
-                record for record in energy_data 
-                if start_dt <= datetime.fromisoformat(str(record['timestamp'])) <= end_dt
-            ]
+            if isinstance(energy_data, pd.DataFrame):
+                timestamps = pd.to_datetime(energy_data['timestamp'])
+                filtered_data = energy_data[(timestamps >= start_dt) & (timestamps <= end_dt)]
+            else:
+                filtered_data = [
+                    record for record in energy_data 
+                    if start_dt <= datetime.fromisoformat(str(record['timestamp'])) <= end_dt
+                ]
         except (ValueError, KeyError):
             # If there's an error in filtering, use all data
             filtered_data = energy_data
@@ -0,0 +1,137 @@
+"""
+Benchmark: latency of unrelated endpoints during a login storm.
+
+Fires concurrent `POST /api/v1/auth/token` requests (one bcrypt verification
+each) while probing `GET /` at a fixed interval, then reports probe latency
+percentiles. With inline hashing the probe waits behind every bcrypt call on
+the event loop; with the password pool it should stay flat.
+
+Compare inline hashing against the process pool by letting the script start
+its own servers (requires a reachable MongoDB at MONGO_URI):
+
+    python benchmarks/auth_latency.py --spawn --pool-sizes 0 4
+
+Or benchmark an already running server:
+
+    python benchmarks/auth_latency.py --url http://localhost:8000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Dict, List
+
+import httpx
+
+from common import ensure_user, percentile, spawn_server, wait_until_ready
+
+BENCH_USERNAME = "bench-auth"
+BENCH_EMAIL = "bench-auth@example.com"
+BENCH_PASSWORD = "BenchPassw0rd!"
+
+
+async def run_scenario(url: str, logins: int, concurrency: int, probe_interval: float) -> Dict[str, float]:
+    """
+    Run one login storm against a server and measure probe latency.
+
+    Args:
+        url (str): Base URL of the API.
+        logins (int): Total number of token requests to send.
+        concurrency (int): Number of concurrent login clients.
+        probe_interval (float): Seconds between probes of `GET /`.
+
+    Returns:
+        Dict[str, float]: Probe latency percentiles (ms) and login throughput.
+    """
+    remaining = logins
+    login_latencies: List[float] = []
+    probe_latencies: List[float] = []
+    failures = 0
+    done = asyncio.Event()
+
+    limits = httpx.Limits(max_connections=concurrency + 2)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        async def login_worker():
+            nonlocal remaining, failures
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                response = await client.post("/api/v1/auth/token", auth=(BENCH_USERNAME, BENCH_PASSWORD))
+                login_latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    failures += 1
+
+        async def prober():
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/")
+                probe_latencies.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(probe_interval)
+
+        probe_task = asyncio.create_task(prober())
+        started = time.perf_counter()
+        await asyncio.gather(*(login_worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+
+    return {
+        "logins_per_sec": logins / elapsed,
+        "login_failures": failures,
+        "login_p50_ms": percentile(login_latencies, 50),
+        "probe_samples": len(probe_latencies),
+        "probe_p50_ms": percentile(probe_latencies, 50),
+        "probe_p95_ms": percentile(probe_latencies, 95),
+        "probe_p99_ms": percentile(probe_latencies, 99),
+        "probe_max_ms": max(probe_latencies) if probe_latencies else 0.0,
+        "probe_mean_ms": statistics.fmean(probe_latencies) if probe_latencies else 0.0,
+    }
+
+
+def report(label: str, result: Dict[str, float]) -> None:
+    """Print a result row."""
+    print(
+        f"{label:<16} logins/s={result['logins_per_sec']:8.1f}  "
+        f"probe p50={result['probe_p50_ms']:8.1f}ms  p95={result['probe_p95_ms']:8.1f}ms  "
+        f"p99={result['probe_p99_ms']:8.1f}ms  max={result['probe_max_ms']:8.1f}ms  "
+        f"(probes={result['probe_samples']}, failed logins={result['login_failures']})"
+    )
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Measure event-loop latency during concurrent logins")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of a running server")
+    parser.add_argument("--spawn", action="store_true", help="Start one server per pool size instead of using --url")
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[0, 4], help="PASSWORD_POOL_SIZE values to compare (0 = inline)")
+    parser.add_argument("--port", type=int, default=8765, help="Port for spawned servers")
+    parser.add_argument("--logins", type=int, default=200, help="Total token requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent login clients")
+    parser.add_argument("--probe-interval", type=float, default=0.01, help="Seconds between health-check probes")
+    return parser.parse_args()
+
+
+def main():
+    """Run the benchmark."""
+    args = parse_args()
+    ensure_user(BENCH_USERNAME, BENCH_EMAIL, BENCH_PASSWORD)
+
+    if not args.spawn:
+        result = asyncio.run(run_scenario(args.url, args.logins, args.concurrency, args.probe_interval))
+        report(args.url, result)
+        return
+
+    url = f"http://127.0.0.1:{args.port}"
+    for pool_size in args.pool_sizes:
+        server = spawn_server(args.port, {"PASSWORD_POOL_SIZE": str(pool_size), "AUTH_CACHE_SIZE": "0"})
+        try:
+            wait_until_ready(url)
+            result = asyncio.run(run_scenario(url, args.logins, args.concurrency, args.probe_interval))
+            report("inline" if pool_size <= 0 else f"pool={pool_size}", result)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
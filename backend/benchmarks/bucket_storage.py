@@ -0,0 +1,82 @@
+"""
+Benchmark: storage footprint of per-reading documents vs. hourly buckets.
+
+Builds the documents each storage mode would write for the same readings and
+reports document count, BSON bytes and index entries (`USAGE_INDEXES` vs.
+`USAGE_BUCKET_INDEXES`; the `ids` index of buckets is multikey, so it still
+holds one entry per reading). Runs in-process; no server or database needed.
+
+    python benchmarks/bucket_storage.py --devices 10 --hours 24 --interval 60
+"""
+import argparse
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import bson
+from bson import ObjectId
+
+import common  # noqa: F401  (puts the backend on sys.path)
+from app.models.usage import UsageDB
+from app.services.usage_buckets import bucket_updates
+
+READING_INDEXES = 5     # _id, id, device_id, timestamp, (device_id, timestamp)
+BUCKET_INDEXES = 3      # _id, (device_id, start), start; plus `ids` per reading
+
+
+def readings(devices: int, hours: int, interval: int) -> List[Dict]:
+    """Readings every `interval` seconds for each device."""
+    start = datetime(2025, 1, 1)
+    return [
+        UsageDB(
+            device_id=f"device-{device}",
+            metrics={"power": 100.0 + step % 7, "voltage": 230.0},
+            timestamp=start + timedelta(seconds=step * interval),
+            duration=interval,
+            energy_consumed=0.0025,
+            status="on",
+        ).model_dump()
+        for device in range(devices)
+        for step in range(hours * 3600 // interval)
+    ]
+
+
+def bucket_documents(documents: List[Dict]) -> List[Dict]:
+    """The bucket documents the appends of `bucket_updates` would produce."""
+    buckets = []
+    operations, _ = bucket_updates(documents)
+    for operation in operations:
+        update = operation._doc
+        bucket = {"_id": ObjectId(), "device_id": operation._filter["device_id"], "start": operation._filter["start"]}
+        bucket.update(update["$inc"])
+        bucket.update({field: value for field, value in update.get("$min", {}).items()})
+        bucket.update({field: value for field, value in update.get("$max", {}).items()})
+        bucket.update({array: push["$each"] for array, push in update["$push"].items()})
+        buckets.append(bucket)
+    return buckets
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Compare per-reading and bucketed usage storage")
+    parser.add_argument("--devices", type=int, default=10, help="Devices reporting")
+    parser.add_argument("--hours", type=int, default=24, help="Hours of readings")
+    parser.add_argument("--interval", type=int, nargs="+", default=[60, 10], help="Seconds between readings")
+    args = parser.parse_args()
+
+    for interval in args.interval:
+        documents = readings(args.devices, args.hours, interval)
+        buckets = bucket_documents(documents)
+        document_bytes = sum(len(bson.encode({"_id": ObjectId(), **document})) for document in documents)
+        bucket_bytes = sum(len(bson.encode(bucket)) for bucket in buckets)
+        document_entries = READING_INDEXES * len(documents)
+        bucket_entries = BUCKET_INDEXES * len(buckets) + len(documents)
+
+        print(f"interval={interval}s readings={len(documents)}")
+        print(f"  documents: {len(documents):>9} docs {document_bytes / 1024:10.1f} KiB {document_entries:>10} index entries")
+        print(f"  buckets:   {len(buckets):>9} docs {bucket_bytes / 1024:10.1f} KiB {bucket_entries:>10} index entries")
+        print(f"  x{len(documents) / len(buckets):.0f} fewer documents, x{document_bytes / bucket_bytes:.1f} fewer bytes, "
+              f"x{document_entries / bucket_entries:.1f} fewer index entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Throughput benchmark for `POST /api/v1/usage/bulk`.
+
+Sends batches of synthetic readings for devices owned by a regular benchmark
+user (so the ownership check is exercised) and reports records per second at
+each batch size.
+
+    python benchmarks/bulk_ingest.py --url http://localhost:8000 --batch-sizes 10 100 1000 10000
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import httpx
+
+from common import ensure_device, ensure_user, fetch_token, percentile
+
+BENCH_USERNAME = "bench-ingest"
+BENCH_EMAIL = "bench-ingest@example.com"
+BENCH_PASSWORD = "BenchPassw0rd!"
+
+
+def make_batch(device_ids: List[str], size: int) -> Dict:
+    """Build a bulk request body of `size` readings spread over the devices."""
+    now = datetime.utcnow()
+    return {
+        "records": [
+            {
+                "device_id": random.choice(device_ids),
+                "metrics": {"power": round(random.uniform(0, 2000), 1), "voltage": 230},
+                "timestamp": (now - timedelta(seconds=n)).isoformat(),
+                "duration": 60,
+                "energy_consumed": round(random.uniform(0, 0.05), 4),
+                "status": "on",
+            }
+            for n in range(size)
+        ]
+    }
+
+
+async def run_batch_size(
+    url: str, token: str, device_ids: List[str], batch_size: int, total: int, concurrency: int
+) -> Dict[str, float]:
+    """
+    Ingest roughly `total` records in batches of `batch_size`.
+
+    Args:
+        url (str): Base URL of the API.
+        token (str): Bearer token of the benchmark user.
+        device_ids (List[str]): Devices the readings are attributed to.
+        batch_size (int): Records per request.
+        total (int): Records to send at this batch size.
+        concurrency (int): Concurrent requests in flight.
+
+    Returns:
+        Dict[str, float]: Throughput and request latency summary.
+    """
+    batches = max(1, total // batch_size)
+    bodies = [make_batch(device_ids, batch_size) for _ in range(min(batches, 8))]
+    latencies: List[float] = []
+    inserted = failed = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for n in range(batches):
+        queue.put_nowait(bodies[n % len(bodies)])
+
+    async with httpx.AsyncClient(
+        base_url=url, timeout=300, headers={"Authorization": f"Bearer {token}"}
+    ) as client:
+        async def worker():
+            nonlocal inserted, failed
+            while not queue.empty():
+                body = queue.get_nowait()
+                started = time.perf_counter()
+                response = await client.post("/api/v1/usage/bulk", json=body)
+                latencies.append((time.perf_counter() - started) * 1000)
+                if response.status_code == 201:
+                    result = response.json()
+                    inserted += result["inserted"]
+                    failed += result["failed"]
+                else:
+                    failed += len(body["records"])
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": batches,
+        "inserted": inserted,
+        "failed": failed,
+        "records_per_sec": inserted / elapsed,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+    }
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Measure bulk usage ingest throughput")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of a running server")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[10, 100, 1000, 10000], help="Records per request")
+    parser.add_argument("--records", type=int, default=50000, help="Records to send per batch size")
+    parser.add_argument("--devices", type=int, default=20, help="Devices owned by the benchmark user")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent requests")
+    return parser.parse_args()
+
+
+def main():
+    """Run the benchmark."""
+    args = parse_args()
+    user_id = ensure_user(BENCH_USERNAME, BENCH_EMAIL, BENCH_PASSWORD)
+    device_ids = [f"bench-device-{n}" for n in range(args.devices)]
+    for device_id in device_ids:
+        ensure_device(device_id, user_id)
+    token = fetch_token(args.url, BENCH_USERNAME, BENCH_PASSWORD)
+
+    for batch_size in args.batch_sizes:
+        result = asyncio.run(run_batch_size(
+            args.url, token, device_ids, batch_size, max(args.records, batch_size), args.concurrency
+        ))
+        print(
+            f"batch={batch_size:<6} records/s={result['records_per_sec']:10.1f}  "
+            f"p50={result['p50_ms']:8.1f}ms  p95={result['p95_ms']:8.1f}ms  "
+            f"(requests={result['requests']}, inserted={result['inserted']}, failed={result['failed']})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark: server-side cost of decoding bulk usage uploads.
+
+Encodes the same readings as a JSON `UsageBulkCreate` body and as columnar
+msgpack frames, then times what `/usage/bulk` does with each body before the
+insert: parsing & validating the JSON into `CreateUsage` / `UsageDB` models
+versus `decode_usage_batch`. Runs in-process; no server or database needed.
+
+    python benchmarks/columnar_decode.py --rows 1000 10000 100000
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+import msgpack
+import numpy as np
+
+import common  # noqa: F401  (puts the backend on sys.path)
+from app.models.usage import UsageBulkCreate, UsageDB
+from app.services.usage_columnar import decode_usage_batch
+
+DEVICES = 10
+
+
+def json_body(rows: int) -> bytes:
+    """Readings for `DEVICES` devices as a JSON bulk body."""
+    start = datetime(2024, 1, 1)
+    return json.dumps({
+        "records": [
+            {
+                "device_id": f"device-{n % DEVICES}",
+                "metrics": {"power": 100.0 + n % 7, "voltage": 230.0},
+                "timestamp": (start + timedelta(seconds=n)).isoformat(),
+                "duration": 60,
+                "energy_consumed": 0.0025,
+                "status": "on",
+            }
+            for n in range(rows)
+        ]
+    }).encode()
+
+
+def columnar_body(rows: int) -> bytes:
+    """The same readings as one columnar frame per device."""
+    start_ms = int(datetime(2024, 1, 1).timestamp() * 1000)
+    frames = []
+    for device in range(DEVICES):
+        index = np.arange(device, rows, DEVICES, dtype="<i8")
+        frames.append({
+            "device_id": f"device-{device}",
+            "timestamp": (start_ms + index * 1000).tobytes(),
+            "energy_consumed": np.full(len(index), 0.0025, dtype="<f8").tobytes(),
+            "duration": np.full(len(index), 60, dtype="<i8").tobytes(),
+            "status": "on",
+            "metrics": {
+                "power": (100.0 + index % 7).astype("<f8").tobytes(),
+                "voltage": np.full(len(index), 230.0, dtype="<f8").tobytes(),
+            },
+        })
+    return msgpack.packb(frames)
+
+
+def decode_json(body: bytes) -> List[dict]:
+    """The JSON path of `read_bulk_documents`."""
+    bulk = UsageBulkCreate.model_validate_json(body)
+    return [UsageDB(**record.model_dump()).model_dump() for record in bulk.records]
+
+
+def best_of(func: Callable[[bytes], List[dict]], body: bytes, repeat: int) -> float:
+    """Fastest of `repeat` runs, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(body)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Compare JSON and columnar bulk decoding")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000], help="Readings per upload")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        bodies = {"json": json_body(rows), "columnar": columnar_body(rows)}
+        timings = {
+            "json": best_of(decode_json, bodies["json"], args.repeat),
+            "columnar": best_of(decode_usage_batch, bodies["columnar"], args.repeat),
+        }
+        for name in ("json", "columnar"):
+            print(
+                f"rows={rows:<7} {name:<8} body={len(bodies[name]) / 1024:9.1f} KiB  "
+                f"decode={timings[name] * 1000:9.1f} ms  {rows / timings[name]:12.0f} rows/s"
+            )
+        print(f"{'':12}speedup x{timings['json'] / timings['columnar']:.1f}, "
+              f"size x{len(bodies['json']) / len(bodies['columnar']):.1f} smaller")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Helpers shared by the benchmark scripts.
+"""
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def spawn_server(port: int, env: Optional[Dict[str, str]] = None, workers: int = 1) -> subprocess.Popen:
+    """Start uvicorn serving the API with extra environment variables."""
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--port", str(port), "--workers", str(workers), "--log-level", "warning",
+        ],
+        cwd=BACKEND_DIR,
+        # Workers share a signing key unless the environment already provides one
+        env={"AUTH_TOKEN_SECRET": "benchmark-token-secret", **os.environ, **(env or {})},
+    )
+
+
+def wait_until_ready(url: str, timeout: float = 30.0) -> None:
+    """Poll the health check until the server answers."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url + "/", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not become ready")
+
+
+def ensure_user(username: str, email: str, password: str, role: str = "user") -> str:
+    """Create a benchmark login directly in MongoDB if it does not exist and return its ID."""
+    from app.db.data import u_c
+    from app.core.password import hash_password
+    from app.models.user import UserDB
+
+    existing = u_c.find_one({"username": username}, {"id": 1})
+    if existing:
+        return existing["id"]
+    user = UserDB(
+        username=username,
+        email=email,
+        hashed_password=hash_password(password),
+        role=role
+    )
+    u_c.insert_one(user.model_dump())
+    return user.id
+
+
+def ensure_device(device_id: str, user_id: str, device_type: Optional[str] = None) -> None:
+    """Create a benchmark device owned by `user_id` if it does not exist."""
+    from app.db.data import d_c
+    from app.models.device import DeviceDB, DeviceType
+
+    device = DeviceDB(id=device_id, name=device_id, type=device_type or DeviceType.SENSOR, user_id=user_id)
+    d_c.update_one({"id": device_id}, {"$setOnInsert": device.model_dump()}, upsert=True)
+
+
+def fetch_token(url: str, username: str, password: str) -> str:
+    """Exchange HTTP Basic credentials for a bearer token."""
+    response = httpx.post(url + "/api/v1/auth/token", auth=(username, password), timeout=30)
+    response.raise_for_status()
+    return response.json()["access_token"]
@@ -0,0 +1,363 @@
+"""
+Load harness for usage ingestion with a simulated device fleet.
+
+Simulates `--devices` virtual devices of every `DeviceType`, each reporting a
+reading every `--interval` simulated seconds along a diurnal power curve for
+its type (lights peak in the evening, thermostats in the morning and evening,
+cameras & sensors are flat, ...). Readings are sent at a fixed target rate
+(open loop: requests are issued on schedule whether or not earlier ones have
+answered) through one of the ingest paths:
+
+- `single`: one `POST /api/v1/usage/` per reading
+- `bulk`:   `POST /api/v1/usage/bulk` with `--batch-size` readings
+- `stream`: `POST /api/v1/usage/stream` with `--batch-size` NDJSON lines
+
+Each rate of the sweep reports achieved readings per second, request latency
+percentiles (measured from the scheduled send time, so queueing in the client
+counts), the error rate and MongoDB operations per second from the
+`serverStatus` op counters. The knee is the first rate the server cannot keep
+up with: achieved throughput below 95% of the target, errors above 1% or p99
+above `--max-p99`. Compare worker counts by spawning servers:
+
+    python benchmarks/ingest_load.py --mode bulk --rates 1000 2000 4000 8000
+    python benchmarks/ingest_load.py --spawn --workers 1 4 --mode single --rates 200 400 800 1600
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import httpx
+from pymongo import MongoClient
+
+from common import (
+    ensure_device, ensure_user, fetch_token, percentile, spawn_server, wait_until_ready
+)
+from app.db.settings import MONGO_URI
+from app.models.device import DeviceType
+
+BENCH_USERNAME = "bench-fleet"
+BENCH_EMAIL = "bench-fleet@example.com"
+BENCH_PASSWORD = "BenchPassw0rd!"
+
+OPCOUNTERS = ("insert", "query", "update", "delete", "getmore", "command")
+
+MODES = {
+    "single": "/api/v1/usage/",
+    "bulk": "/api/v1/usage/bulk",
+    "stream": "/api/v1/usage/stream",
+}
+
+
+@dataclass(frozen=True)
+class LoadProfile:
+    """
+    Diurnal power curve of a device type.
+
+    Attributes:
+        base (float): Standby power in watts.
+        peak (float): Power at the busiest hour in watts.
+        peak_hours (tuple): Hours of day (UTC) around which use peaks.
+        width (float): Hours either side of a peak over which use ramps up.
+    """
+    base: float
+    peak: float
+    peak_hours: tuple = ()
+    width: float = 3.0
+
+    def power(self, when: datetime) -> float:
+        """Expected power at `when`, before noise."""
+        hour = when.hour + when.minute / 60
+        level = 0.0
+        for peak_hour in self.peak_hours:
+            distance = min(abs(hour - peak_hour), 24 - abs(hour - peak_hour))
+            if distance < self.width:
+                level = max(level, (1 + math.cos(math.pi * distance / self.width)) / 2)
+        return self.base + (self.peak - self.base) * level
+
+
+PROFILES: Dict[DeviceType, LoadProfile] = {
+    DeviceType.LIGHT: LoadProfile(0.5, 60.0, (7, 20)),
+    DeviceType.THERMOSTAT: LoadProfile(5.0, 2000.0, (6, 19), width=4.0),
+    DeviceType.LOCK: LoadProfile(0.2, 4.0, (8, 18), width=1.0),
+    DeviceType.CAMERA: LoadProfile(6.0, 6.0),
+    DeviceType.SENSOR: LoadProfile(0.3, 0.3),
+    DeviceType.SWITCH: LoadProfile(0.5, 150.0, (8, 21)),
+    DeviceType.OUTLET: LoadProfile(1.0, 800.0, (12, 19), width=5.0),
+    DeviceType.SPEAKER: LoadProfile(2.0, 30.0, (18,), width=4.0),
+    DeviceType.OTHER: LoadProfile(1.0, 100.0, (13,), width=6.0),
+}
+
+
+class Fleet:
+    """
+    Virtual devices producing readings on a simulated clock.
+
+    Every device keeps its own clock, advanced by `interval` seconds per
+    reading, so (device_id, timestamp) never repeats within a run. The clocks
+    start at the beginning of the current UTC day plus a per-run millisecond
+    offset, so runs against the same database rarely collide either; any
+    collisions are reported as duplicates.
+    """
+
+    def __init__(self, device_ids: List[str], interval: int):
+        types = list(DeviceType)
+        self.devices = [(device_id, types[n % len(types)]) for n, device_id in enumerate(device_ids)]
+        self.interval = interval
+        start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        start += timedelta(milliseconds=random.randrange(1, 60_000))
+        self.clocks = {device_id: start + timedelta(seconds=random.randrange(interval)) for device_id in device_ids}
+        self.next = 0
+
+    def reading(self) -> Dict:
+        """The next reading, taken round-robin across the fleet."""
+        device_id, device_type = self.devices[self.next % len(self.devices)]
+        self.next += 1
+        when = self.clocks[device_id]
+        self.clocks[device_id] = when + timedelta(seconds=self.interval)
+        power = max(0.0, PROFILES[device_type].power(when) * random.uniform(0.9, 1.1))
+        return {
+            "device_id": device_id,
+            "metrics": {"power": round(power, 2), "voltage": round(random.gauss(230, 2), 1)},
+            "timestamp": when.isoformat(timespec="milliseconds"),
+            "duration": self.interval,
+            "energy_consumed": round(power * self.interval / 3_600_000, 6),
+            "status": "on" if power > PROFILES[device_type].base * 1.5 else "idle",
+        }
+
+    def readings(self, count: int) -> List[Dict]:
+        """The next `count` readings."""
+        return [self.reading() for _ in range(count)]
+
+
+def opcounters(mongo: MongoClient) -> Dict[str, int]:
+    """Current MongoDB operation counters."""
+    counters = mongo.admin.command("serverStatus")["opcounters"]
+    return {name: counters.get(name, 0) for name in OPCOUNTERS}
+
+
+def request_kwargs(mode: str, readings: List[Dict]) -> Dict:
+    """Request body of one send in `mode`."""
+    if mode == "single":
+        return {"json": readings[0]}
+    if mode == "bulk":
+        return {"json": {"records": readings}}
+    body = "".join(json.dumps(reading) + "\n" for reading in readings)
+    return {"content": body, "headers": {"Content-Type": "application/x-ndjson"}}
+
+
+def count_result(mode: str, response: httpx.Response, sent: int) -> Dict[str, int]:
+    """Readings stored, duplicated and failed according to the response."""
+    if mode == "single":
+        if response.status_code == 201:
+            return {"stored": 1, "duplicates": 0, "failed": 0}
+        if response.status_code == 200:
+            return {"stored": 0, "duplicates": 1, "failed": 0}
+        return {"stored": 0, "duplicates": 0, "failed": 1}
+    if response.status_code not in (200, 201):
+        return {"stored": 0, "duplicates": 0, "failed": sent}
+    result = response.json()
+    if mode == "bulk":
+        return {"stored": result["inserted"], "duplicates": result["duplicates"], "failed": result["failed"]}
+    return {"stored": result["accepted"], "duplicates": result["duplicates"], "failed": result["rejected"]}
+
+
+async def run_rate(
+    url: str,
+    token: str,
+    fleet: Fleet,
+    mode: str,
+    rate: float,
+    batch_size: int,
+    duration: float,
+    max_in_flight: int,
+    mongo: Optional[MongoClient] = None,
+) -> Dict[str, float]:
+    """
+    Send readings at `rate` per second for `duration` seconds.
+
+    Args:
+        url (str): Base URL of the API.
+        token (str): Bearer token of the fleet owner.
+        fleet (Fleet): Source of readings.
+        mode (str): Ingest path, one of `MODES`.
+        rate (float): Target readings per second.
+        batch_size (int): Readings per request (1 in `single` mode).
+        duration (float): Seconds to send for.
+        max_in_flight (int): Requests in flight before sends are counted as dropped.
+        mongo (Optional[MongoClient]): Client for reading op counters, if reachable.
+
+    Returns:
+        Dict[str, float]: Throughput, latency, error & database summary.
+    """
+    batch_size = 1 if mode == "single" else batch_size
+    period = batch_size / rate
+    sends = max(1, int(duration / period))
+    latencies: List[float] = []
+    totals = {"stored": 0, "duplicates": 0, "failed": 0, "errors": 0, "dropped": 0}
+    in_flight = 0
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits, headers=headers) as client:
+        async def send(scheduled: float, readings: List[Dict]):
+            nonlocal in_flight
+            in_flight += 1
+            try:
+                response = await client.post(MODES[mode], **request_kwargs(mode, readings))
+                counts = count_result(mode, response, len(readings))
+                if response.status_code >= 400:
+                    totals["errors"] += 1
+            except httpx.HTTPError:
+                counts = {"stored": 0, "duplicates": 0, "failed": len(readings)}
+                totals["errors"] += 1
+            finally:
+                in_flight -= 1
+            latencies.append((time.perf_counter() - scheduled) * 1000)
+            for name, value in counts.items():
+                totals[name] += value
+
+        before = opcounters(mongo) if mongo else None
+        tasks = []
+        started = time.perf_counter()
+        for n in range(sends):
+            scheduled = started + n * period
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            readings = fleet.readings(batch_size)
+            if in_flight >= max_in_flight:
+                # The server is this far behind; sending more would only grow the client queue
+                totals["dropped"] += len(readings)
+                continue
+            tasks.append(asyncio.create_task(send(scheduled, readings)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+        after = opcounters(mongo) if mongo else None
+
+    sent = sends * batch_size
+    result = {
+        "target": rate,
+        "sent": sent,
+        "readings_per_sec": totals["stored"] / elapsed,
+        "accepted_per_sec": (totals["stored"] + totals["duplicates"]) / elapsed,
+        "requests": len(latencies),
+        "error_rate": (totals["failed"] + totals["dropped"]) / sent,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "mongo_ops_per_sec": None,
+        **totals,
+    }
+    if before and after:
+        result["mongo_ops_per_sec"] = sum(after[name] - before[name] for name in OPCOUNTERS) / elapsed
+        result["mongo_writes_per_sec"] = sum(
+            after[name] - before[name] for name in ("insert", "update", "delete")
+        ) / elapsed
+    return result
+
+
+def saturated(result: Dict[str, float], max_p99: float) -> bool:
+    """Whether the server failed to keep up with the target rate."""
+    return (
+        result["accepted_per_sec"] < 0.95 * result["target"]
+        or result["error_rate"] > 0.01
+        or result["p99_ms"] > max_p99
+    )
+
+
+def report(label: str, result: Dict[str, float]) -> None:
+    """Print a result row."""
+    mongo = result["mongo_ops_per_sec"]
+    print(
+        f"{label:<10} target={result['target']:>8.0f}/s  achieved={result['readings_per_sec']:9.1f}/s  "
+        f"p50={result['p50_ms']:8.1f}ms  p95={result['p95_ms']:8.1f}ms  p99={result['p99_ms']:8.1f}ms  "
+        f"errors={result['error_rate']:6.2%}  "
+        + (f"mongo={mongo:8.1f} ops/s ({result['mongo_writes_per_sec']:.1f} writes/s)" if mongo is not None else "mongo=n/a")
+        + f"  (requests={result['requests']}, duplicates={result['duplicates']}, dropped={result['dropped']})"
+    )
+
+
+def sweep(args, url: str, token: str, fleet: Fleet, mongo: Optional[MongoClient], label: str) -> None:
+    """Run every rate of the sweep against `url` and report the knee."""
+    asyncio.run(run_rate(
+        url, token, fleet, args.mode, min(args.rates), args.batch_size, args.warmup, args.max_in_flight
+    ))
+    knee = None
+    for rate in sorted(args.rates):
+        result = asyncio.run(run_rate(
+            url, token, fleet, args.mode, rate, args.batch_size, args.duration, args.max_in_flight, mongo
+        ))
+        report(label, result)
+        if knee is None and saturated(result, args.max_p99):
+            knee = rate
+    if knee is None:
+        print(f"{label}: kept up with every rate up to {max(args.rates):.0f} readings/s")
+    else:
+        print(f"{label}: saturated at {knee:.0f} readings/s")
+
+
+def connect_mongo() -> Optional[MongoClient]:
+    """Client for `serverStatus`, or None if the database cannot be asked."""
+    mongo = MongoClient(MONGO_URI, serverSelectionTimeoutMS=2000)
+    try:
+        opcounters(mongo)
+    except Exception as error:
+        print(f"MongoDB op counters unavailable: {error}")
+        mongo.close()
+        return None
+    return mongo
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Drive usage ingestion with a simulated device fleet")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of a running server")
+    parser.add_argument("--mode", choices=sorted(MODES), default="bulk", help="Ingest path to drive")
+    parser.add_argument("--rates", type=float, nargs="+", default=[500, 1000, 2000, 4000], help="Target readings per second")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per rate")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Seconds of warm-up traffic at the lowest rate")
+    parser.add_argument("--devices", type=int, default=1000, help="Virtual devices in the fleet")
+    parser.add_argument("--interval", type=int, default=60, help="Simulated seconds between readings of a device")
+    parser.add_argument("--batch-size", type=int, default=100, help="Readings per bulk or stream request")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Concurrent requests before sends are dropped")
+    parser.add_argument("--max-p99", type=float, default=1000.0, help="p99 latency (ms) counted as saturation")
+    parser.add_argument("--spawn", action="store_true", help="Start one server per worker count instead of using --url")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1], help="Uvicorn worker counts for spawned servers")
+    parser.add_argument("--port", type=int, default=8766, help="Port for spawned servers")
+    return parser.parse_args()
+
+
+def main():
+    """Run the benchmark."""
+    args = parse_args()
+    user_id = ensure_user(BENCH_USERNAME, BENCH_EMAIL, BENCH_PASSWORD)
+    device_ids = [f"bench-fleet-{n}" for n in range(args.devices)]
+    fleet = Fleet(device_ids, args.interval)
+    for device_id, device_type in fleet.devices:
+        ensure_device(device_id, user_id, device_type)
+    mongo = connect_mongo()
+
+    if not args.spawn:
+        sweep(args, args.url, fetch_token(args.url, BENCH_USERNAME, BENCH_PASSWORD), fleet, mongo, args.mode)
+        return
+
+    url = f"http://127.0.0.1:{args.port}"
+    for workers in args.workers:
+        server = spawn_server(args.port, workers=workers)
+        try:
+            wait_until_ready(url)
+            token = fetch_token(url, BENCH_USERNAME, BENCH_PASSWORD)
+            sweep(args, url, token, fleet, mongo, f"workers={workers}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
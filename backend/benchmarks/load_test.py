@@ -0,0 +1,112 @@
+"""
+Throughput benchmark for the read-heavy API endpoints.
+
+Keeps a fixed number of clients busy against a running server for a set
+duration and reports requests per second and latency percentiles at each
+concurrency level. Requests authenticate with a bearer token so the numbers
+reflect the data layer rather than password hashing.
+
+Run it against a server on the commit before and after a change to compare:
+
+    python benchmarks/load_test.py --url http://localhost:8000 --concurrency 50 200
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+import httpx
+
+from common import ensure_user, fetch_token, percentile
+
+BENCH_USERNAME = "bench-load"
+BENCH_EMAIL = "bench-load@example.com"
+BENCH_PASSWORD = "BenchPassw0rd!"
+
+DEFAULT_PATHS = ["/api/v1/devices/", "/api/v1/usage/?limit=50"]
+
+
+async def run_level(url: str, token: str, paths: List[str], concurrency: int, duration: float) -> Dict[str, float]:
+    """
+    Drive one concurrency level for a fixed duration.
+
+    Args:
+        url (str): Base URL of the API.
+        token (str): Bearer token used by every client.
+        paths (List[str]): Request paths, cycled by each client.
+        concurrency (int): Number of concurrent clients.
+        duration (float): Seconds to keep the clients busy.
+
+    Returns:
+        Dict[str, float]: Throughput and latency summary.
+    """
+    latencies: List[float] = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async with httpx.AsyncClient(base_url=url, timeout=30, limits=limits, headers=headers) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker(offset: int):
+            nonlocal errors
+            i = offset
+            while time.perf_counter() < deadline:
+                path = paths[i % len(paths)]
+                i += 1
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_sec": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+def report(concurrency: int, result: Dict[str, float]) -> None:
+    """Print a result row."""
+    print(
+        f"clients={concurrency:<5} req/s={result['requests_per_sec']:9.1f}  "
+        f"p50={result['p50_ms']:8.1f}ms  p95={result['p95_ms']:8.1f}ms  p99={result['p99_ms']:8.1f}ms  "
+        f"(requests={result['requests']}, errors={result['errors']})"
+    )
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Measure API throughput at several concurrency levels")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of a running server")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200], help="Concurrent client counts to test")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per concurrency level")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds of warm-up traffic before measuring")
+    parser.add_argument("--paths", nargs="+", default=DEFAULT_PATHS, help="GET paths to cycle through")
+    return parser.parse_args()
+
+
+def main():
+    """Run the benchmark."""
+    args = parse_args()
+    ensure_user(BENCH_USERNAME, BENCH_EMAIL, BENCH_PASSWORD)
+    token = fetch_token(args.url, BENCH_USERNAME, BENCH_PASSWORD)
+
+    asyncio.run(run_level(args.url, token, args.paths, min(args.concurrency), args.warmup))
+    for concurrency in args.concurrency:
+        report(concurrency, asyncio.run(run_level(args.url, token, args.paths, concurrency, args.duration)))
+
+
+if __name__ == "__main__":
+    main()